@@ -318,6 +318,21 @@ Write-Host "`n[7/7] Configuring settings..." -ForegroundColor Yellow
 $settingsSource = Join-Path $SCRIPT_DIR "config\settings.json"
 $settingsTarget = Join-Path $CLAUDE_DIR "settings.json"
 
+$hookSource = Join-Path $SCRIPT_DIR "scripts\format_hook.py"
+if (Test-Path $hookSource) {
+    $hooksDir = Join-Path $CLAUDE_DIR "hooks"
+    New-Item -ItemType Directory -Force -Path $hooksDir | Out-Null
+    Copy-Item -Force $hookSource (Join-Path $hooksDir "format_hook.py")
+    Write-Host "  ✓ Installed: hooks\format_hook.py" -ForegroundColor Green
+    $formattersTarget = Join-Path $CLAUDE_DIR "formatters.json"
+    if (Test-Path $formattersTarget) {
+        Write-Host "  ℹ Existing formatters.json kept" -ForegroundColor Cyan
+    } else {
+        Copy-Item -Force (Join-Path $SCRIPT_DIR "config\formatters.json") $formattersTarget
+        Write-Host "  ✓ Installed: formatters.json" -ForegroundColor Green
+    }
+}
+
 if (Test-Path $settingsSource) {
     if (Test-Path $settingsTarget) {
         Write-Host "  ℹ Existing settings.json found" -ForegroundColor Cyan
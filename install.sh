@@ -292,6 +292,17 @@ fi
 
 # Merge settings
 echo -e "\n${YELLOW}[7/7] Configuring settings...${NC}"
+if [ -f "$SCRIPT_DIR/scripts/format_hook.py" ]; then
+    mkdir -p "$CLAUDE_DIR/hooks"
+    cp "$SCRIPT_DIR/scripts/format_hook.py" "$CLAUDE_DIR/hooks/format_hook.py"
+    echo -e "${GREEN}  ✓ Installed: hooks/format_hook.py${NC}"
+    if [ -f "$CLAUDE_DIR/formatters.json" ]; then
+        echo -e "${CYAN}  ℹ Existing formatters.json kept${NC}"
+    else
+        cp "$SCRIPT_DIR/config/formatters.json" "$CLAUDE_DIR/formatters.json"
+        echo -e "${GREEN}  ✓ Installed: formatters.json${NC}"
+    fi
+fi
 if [ -f "$SCRIPT_DIR/config/settings.json" ]; then
     if [ -f "$CLAUDE_DIR/settings.json" ]; then
         echo -e "${CYAN}  ℹ Existing settings.json found${NC}"
@@ -0,0 +1,188 @@
+"""
+Shared build artifact cache.
+
+Works like ccache for agents: each compiled variant is stored under a hash
+of everything that determines it (template source, transitive includes,
+the build config, the builder's own code and the dangerous command rules),
+together with its validation report. A build that finds its key in the
+cache skips rendering and validation entirely, so a CI runner restoring the
+cache directory rebuilds an unchanged catalog without rendering anything.
+
+Layout (safe to share between machines over a mounted volume):
+
+    <dir>/ab/cdef....json   one entry per key, written atomically
+    <dir>/stats.json        hit and miss counters
+
+Entries are written to a temporary file in the same directory and moved
+into place with os.replace(), so concurrent builds never see a partial
+entry. Reading an entry refreshes its mtime; prune() evicts the least
+recently used entries until the cache fits its size limit.
+"""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+# Temporary files older than this belong to a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+
+def parse_size(value: Union[int, str]) -> int:
+    """Parse a size such as 500M, 2G or 1048576 into bytes."""
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().upper().rstrip("B")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    number = text[: -len(unit)] if unit else text
+    try:
+        return int(float(number) * SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid cache size '{value}' (examples: 500M, 2G)")
+
+
+def format_size(size: int) -> str:
+    """Format a byte count for humans."""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class ArtifactCache:
+    """Content-addressed store of compiled agents and validation reports."""
+
+    def __init__(self, directory: Union[str, Path], max_size: Union[int, str] = "500M"):
+        self.directory = Path(directory)
+        self.max_size = parse_size(max_size)
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+
+    def entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key[2:]}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the entry stored under key, or None on a miss."""
+        path = self.entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, json.JSONDecodeError):
+            # Corrupt entries are dropped and rebuilt
+            self.misses += 1
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict):
+        """Store an entry atomically; concurrent writers of one key are safe."""
+        path = self.entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        self.inserts += 1
+
+    def entries(self):
+        """Yield (path, size, mtime) of every stored entry."""
+        if not self.directory.exists():
+            return
+        for path in self.directory.glob("??/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+    def prune(self, max_size: Optional[Union[int, str]] = None) -> Tuple[int, int]:
+        """
+        Evict least recently used entries until the cache fits max_size.
+
+        Returns:
+            (entries_removed, bytes_freed)
+        """
+        limit = self.max_size if max_size is None else parse_size(max_size)
+        now = time.time()
+        for temp_path in self.directory.glob("??/.tmp-*"):
+            try:
+                if now - temp_path.stat().st_mtime > STALE_TEMP_SECONDS:
+                    temp_path.unlink()
+            except FileNotFoundError:
+                continue
+
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for path, size, _ in entries:
+            if total <= limit:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def load_counters(self) -> Dict[str, int]:
+        try:
+            with open(self.directory / "stats.json", "r", encoding="utf-8") as f:
+                counters = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            counters = {}
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+        }
+
+    def save_counters(self):
+        """
+        Add this run's hits and misses to the persistent counters.
+
+        Concurrent builds may lose an increment; the counters are for
+        reporting only.
+        """
+        if not (self.hits or self.misses):
+            return
+        counters = self.load_counters()
+        counters["hits"] += self.hits
+        counters["misses"] += self.misses
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(counters, f)
+        os.replace(temp_path, self.directory / "stats.json")
+        self.hits = self.misses = 0
+
+    def stats(self) -> Dict:
+        """Summarize size, entry count and lifetime hit ratio."""
+        entries = list(self.entries())
+        counters = self.load_counters()
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "directory": str(self.directory),
+            "entries": len(entries),
+            "size": sum(size for _, size, _ in entries),
+            "max_size": self.max_size,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_ratio": round(counters["hits"] / lookups, 3) if lookups else 0.0,
+        }
@@ -9,23 +9,179 @@ Usage:
     python scripts/build.py                 # Build all templates
     python scripts/build.py --verbose       # Show detailed output
     python scripts/build.py --validate-only # Validate without compiling
+    python scripts/build.py --agent go-expert # Rebuild selected agents only
+    python scripts/build.py --profile full --profile lite  # Build variants
+    python scripts/build.py --overlay payments  # Base plus one team overlay
+    python scripts/build.py --minify          # Minify compiled prompts
+    python scripts/build.py --cache-layout    # Shared skills first (caching)
+    python scripts/build.py --heatmap         # Tokens per section and source
+    python scripts/build.py heatmap --agent ux-ui-designer  # Section report
+    python scripts/build.py dedupe-report     # Rank copy-pasted passages
+    python scripts/build.py prefix-report     # Shared prompt prefix per agent
+    python scripts/build.py --metrics-file build.prom  # Prometheus metrics
+    python scripts/build.py --max-growth 10%  # Fail if an agent grew >10%
+    python scripts/build.py history           # Token trend per agent
+    python scripts/build.py validate-dir ~/.claude/agents  # Audit .md agents
+    python scripts/build.py verify --manifest audit-v1.2.0.json  # Drift check
+    python scripts/build.py pattern-bench     # Worst-case regex match times
+    python scripts/build.py analyze           # Static render-cost report
+    python scripts/build.py query --tool Bash --model haiku  # Filter agents
+    python scripts/build.py route "tune this slow query"  # Pick an agent
+    python scripts/build.py cache stats       # Shared artifact cache usage
+    python scripts/build.py cache prune       # Evict least recently used
 """
 
+import copy
+import hashlib
 import json
+import os
 import re
+import shutil
 import subprocess
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import click
 import yaml
-from colorama import Fore, Style, init
-from jinja2 import Environment, FileSystemLoader, TemplateError, TemplateNotFound
+from artifact_cache import ArtifactCache, format_size
+from bulk_validate import iter_markdown, summarize, validate_paths
+from cache_layout import reorder_for_cache, shared_prefix_report
+from dedupe import find_near_duplicates
+from heatmap import MarkedLoader, heatmap_rows, section_tokens, strip_markers, treemap
+from jinja2 import (
+    BaseLoader,
+    Environment,
+    FileSystemLoader,
+    TemplateError,
+    TemplateNotFound,
+    meta,
+)
+from log_sinks import ConsoleSink, QuietSink, make_record, make_sink
+from markdown_scan import BASH_LANGUAGES, scan_markdown, strip_powershell_comments
+from merkle import load_manifest, verify_install
+from metrics import BuildMetrics
+from minify import estimate_tokens as estimate_bpe_tokens
+from minify import minify_markdown
+from registry import AgentRegistry, build_index
+from render_cost import DEFAULT_LOOP_ITERATIONS, RenderCostAnalyzer, check_limits
+from router import (
+    Router,
+    build_router_index,
+    evaluate,
+    extract_headings,
+    load_routing_dataset,
+)
+from safe_patterns import (
+    DEFAULT_BUDGET_MS,
+    SafePattern,
+    Watchdog,
+    benchmark,
+    load_patterns,
+)
+from shell_parser import (
+    ShellSyntaxError,
+    matches_command_rule,
+    matches_pattern,
+    matches_redirect_rule,
+)
+from shell_parser import parse as parse_shell
+from shell_parser import validate as validate_shell
+from token_history import (
+    TokenHistory,
+    compare,
+    format_growth,
+    git_revision,
+    parse_growth,
+    record_key,
+    short_sha,
+)
+from validation_rules import ValidationContext, default_registry
+
+# Modules in scripts/ that render or validate agents. Their source is part
+# of every artifact cache key; reporting, eval and install tooling is not,
+# so editing it keeps the cache.
+OUTPUT_MODULES = (
+    "build",
+    "cache_layout",
+    "heatmap",
+    "markdown_scan",
+    "minify",
+    "render_cost",
+    "safe_patterns",
+    "shell_parser",
+    "validation_rules",
+)
+
+_BUILDER_FINGERPRINT: Optional[str] = None
+
+
+def hash_modules(scripts_dir: Path, modules=OUTPUT_MODULES) -> str:
+    """Hash the source of the named modules in scripts_dir."""
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        digest.update(name.encode("utf-8"))
+        digest.update((scripts_dir / f"{name}.py").read_bytes())
+    return digest.hexdigest()
+
+
+def builder_fingerprint() -> str:
+    """
+    Hash the source of the OUTPUT_MODULES.
+
+    Artifact cache keys include it, so changing the builder or a validation
+    rule invalidates cached results without bumping builder_version.
+    """
+    global _BUILDER_FINGERPRINT
+    if _BUILDER_FINGERPRINT is None:
+        _BUILDER_FINGERPRINT = hash_modules(Path(__file__).resolve().parent)
+    return _BUILDER_FINGERPRINT
+
+
+# build_config.yml sections that change rendered or validated output, or
+# (heatmap) what a cache entry records; the rest (history, metrics,
+# logging, cache) only affect reporting
+OUTPUT_CONFIG_SECTIONS = (
+    "build",
+    "templates",
+    "validation",
+    "profiles",
+    "optimize",
+    "layout",
+    "analysis",
+    "heatmap",
+)
+
+# Largest sections listed in a verbose build summary
+HEATMAP_SUMMARY_ROWS = 5
 
-# Initialize colorama for cross-platform colors
-init(autoreset=True)
+# Used when build_config.yml defines no profiles: one full-size variant
+DEFAULT_PROFILES = {"full": {"context": {"include_skills": True}}}
+
+
+class RecordingEnvironment(Environment):
+    """
+    Environment that records the templates loaded while loaded is a list.
+
+    Includes are loaded when they are rendered, so an include skipped by
+    {% if %} is not recorded.
+    """
+
+    loaded: Optional[List[str]] = None
+
+    def get_template(self, name, parent=None, globals=None):
+        template = super().get_template(name, parent, globals)
+        if self.loaded is not None:
+            self.loaded.append(template.name)
+        return template
+
+    def select_template(self, names, parent=None, globals=None):
+        template = super().select_template(names, parent, globals)
+        if self.loaded is not None:
+            self.loaded.append(template.name)
+        return template
 
 
 class AgentBuilder:
@@ -35,15 +191,48 @@ class AgentBuilder:
         self,
         config_path: str = "config/build_config.yml",
         root_dir: Optional[Path] = None,
+        sink=None,
     ):
-        """Initialize the builder with configuration."""
+        """Initialize the builder with configuration and a log sink."""
         self.root_dir = (
             root_dir if root_dir is not None else Path(__file__).parent.parent
         )
+        self.sink = sink if sink is not None else ConsoleSink()
         self.config_path = self.root_dir / config_path
         self.config = self.load_config()
+        if sink is None:
+            logging_config = self.config.get("logging", {})
+            self.sink = make_sink(
+                logging_config.get("format", "text"),
+                logging_config.get("quiet", False),
+                logging_config.get("file"),
+                logging_config.get("level", "debug"),
+            )
         self.stats = {"total": 0, "success": 0, "failed": 0, "warnings": 0}
+        self.catalog: Dict[str, Dict] = {}
+        self._render_cache: Dict[Tuple[str, str], str] = {}
+        self._render_sections: Dict[Tuple[str, str], List[Dict]] = {}
+        self._render_includes: Dict[Tuple[str, str], List[str]] = {}
+        self._marked_env: Optional[Environment] = None
+        self.optimization: Dict[str, Dict] = {}
+        self.sections: Dict[str, List[Dict]] = {}
+        # Templates each variant's render included
+        self.includes: Dict[str, List[str]] = {}
+        self._skill_order: Optional[List[str]] = None
+        self._skill_texts: Optional[Dict[str, str]] = None
+        self._warning_index: Optional[Dict[str, List[str]]] = None
+        self.rules = default_registry()
+        self.rule_timings: Dict[str, float] = {}
+        self.metrics = BuildMetrics()
+        self._source_errors: Dict[Path, List[str]] = {}
+        self._render_costs: Dict[Path, Dict] = {}
+        self._cost_analyzer: Optional[RenderCostAnalyzer] = None
+        self._dangerous_config: Optional[Tuple] = None
+        self.pattern_watchdog = Watchdog()
+        self.overlay: Optional[str] = None
         self.setup_environment()
+        self.artifact_cache = self.open_artifact_cache()
+        self.history = self.open_history()
 
     def load_config(self) -> Dict:
         """Load build configuration from YAML."""
@@ -62,47 +251,273 @@ class AgentBuilder:
             sys.exit(1)
 
     def setup_environment(self):
-        """Configure Jinja2 environment with src/ paths."""
+        """
+        Configure Jinja2 environment with src/ paths.
+
+        For an overlay builder (see overlay_builder()) the overlay's roots
+        are layered on top of src/: templates and skills are looked up in
+        the last root first, and output goes to the overlay's directory.
+        """
         self.source_dir = self.root_dir / self.config["build"]["source_dir"]
         self.output_dir = self.root_dir / self.config["build"]["output_dir"]
         self.skills_dir = self.root_dir / self.config["build"]["skills_dir"]
+        self.base_root = self.root_dir / "src"
+        # Most specific first, src/ last
+        self.source_roots = [*self.overlay_roots(), self.base_root]
+        if self.overlay is not None:
+            settings = self.config["overlays"][self.overlay]
+            self.output_dir = self.root_dir / settings.get(
+                "output_dir", f"{self.config['build']['output_dir']}-{self.overlay}"
+            )
+        self.catalog_path = self.output_dir / self.config["build"].get(
+            "catalog_file", "catalog.json"
+        )
+        self.index_path = self.output_dir / self.config["build"].get(
+            "index_file", "index.json"
+        )
+        self.router_path = self.output_dir / self.config["build"].get(
+            "router_file", "router.json"
+        )
+        self.heatmap_path = self.output_dir / self.config["build"].get(
+            "heatmap_file", "heatmap.json"
+        )
 
         # Create output directory if it doesn't exist
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Setup Jinja2 with src/ as the root
-        self.env = Environment(  # noqa: S701
-            loader=FileSystemLoader(str(self.root_dir / "src")),
+        # Setup Jinja2 with src/ as the root (below any overlay roots)
+        self.env = self.make_environment(
+            FileSystemLoader([str(root) for root in self.source_roots])
+        )
+        self.build_context = self.make_build_context()
+
+    def make_environment(self, loader: BaseLoader) -> Environment:
+        """Create the Jinja2 environment templates are rendered with."""
+        # S701: autoescape disabled intentionally - generating Markdown, not HTML
+        return RecordingEnvironment(  # noqa: S701
+            loader=loader,
             trim_blocks=True,
             lstrip_blocks=True,
             keep_trailing_newline=True,
         )
-        # S701: autoescape disabled intentionally - generating Markdown, not HTML
 
-        # Add build context variables
-        self.build_context = {
+    def make_build_context(self) -> Dict:
+        """Return the build context variables passed to every template."""
+        return {
             "build_timestamp": datetime.now().isoformat(),
             "python_version": f"{sys.version_info.major}.{sys.version_info.minor}",
             "builder_version": "1.0.0",
             "include_skills": False,  # Default, templates can override
         }
 
-    def log(self, message: str, level: str = "info"):
-        """Log a colored message to console."""
-        colors = {
-            "success": Fore.GREEN,
-            "error": Fore.RED,
-            "warning": Fore.YELLOW,
-            "info": Fore.CYAN,
-            "debug": Fore.LIGHTBLACK_EX,
+    def open_artifact_cache(self) -> Optional[ArtifactCache]:
+        """
+        Open the shared artifact cache configured in build_config.yml.
+
+        AGENT_BUILD_CACHE_DIR enables the cache in another directory (for
+        example a volume shared by CI runners), AGENT_BUILD_CACHE_MAXSIZE
+        overrides the size limit and AGENT_BUILD_CACHE_DISABLE=1 turns it off.
+        """
+        settings = self.config.get("cache") or {}
+        directory = os.environ.get("AGENT_BUILD_CACHE_DIR")
+        enabled = bool(directory) or settings.get("enabled", False)
+        if not enabled or os.environ.get("AGENT_BUILD_CACHE_DISABLE") == "1":
+            return None
+        path = Path(directory or settings.get("dir", ".cache/agent-build"))
+        path = path.expanduser()
+        if not path.is_absolute():
+            path = self.root_dir / path
+        max_size = os.environ.get(
+            "AGENT_BUILD_CACHE_MAXSIZE", settings.get("max_size", "500M")
+        )
+        return ArtifactCache(path, max_size)
+
+    def open_history(self, force: bool = False) -> Optional[TokenHistory]:
+        """
+        Open the token history file configured in build_config.yml.
+
+        Returns None when history.enabled is off, unless force is set
+        (reading the history does not require recording it).
+        """
+        settings = self.config.get("history") or {}
+        if not (force or settings.get("enabled", False)):
+            return None
+        path = Path(settings.get("file", ".cache/token-history.jsonl")).expanduser()
+        if not path.is_absolute():
+            path = self.root_dir / path
+        return TokenHistory(path)
+
+    def artifact_key(self, template_path: Path, profile: str) -> str:
+        """
+        Hash everything that determines a compiled variant.
+
+        That is the template and its transitive includes, the context
+        values they reference, the OUTPUT_CONFIG_SECTIONS of the build
+        config, the profile, the source of the OUTPUT_MODULES and the
+        dangerous command rules. Context keys listed in
+        cache.ignore_context (such as build_timestamp) are left out, so
+        cached agents keep the value from the build that produced them.
+        """
+        template_rel = f"agents/{template_path.name}"
+        names = [template_rel] + self.find_includes(template_rel)
+        sources = {}
+        variables = set()
+        for name in names:
+            try:
+                source, _, _ = self.env.loader.get_source(self.env, name)
+            except TemplateNotFound:
+                source = None
+            sources[name] = source
+            if source is not None:
+                variables |= meta.find_undeclared_variables(self.env.parse(source))
+
+        settings = self.config.get("cache") or {}
+        ignored = set(settings.get("ignore_context", []))
+        context = {
+            **self.build_context,
+            **self.get_profile(profile).get("context", {}),
+            "profile": profile,
         }
-        color = colors.get(level, "")
-        print(f"{color}{message}{Style.RESET_ALL}")
+        dangerous_path = self.root_dir / "config" / "dangerous_commands.json"
+        payload = {
+            "sources": sources,
+            "context": {
+                k: context[k] for k in sorted(variables - ignored) if k in context
+            },
+            "config": {
+                k: self.config[k] for k in OUTPUT_CONFIG_SECTIONS if k in self.config
+            },
+            "profile": profile,
+            "builder_version": self.build_context["builder_version"],
+            "builder": builder_fingerprint(),
+            "dangerous_commands": (
+                dangerous_path.read_text(encoding="utf-8")
+                if dangerous_path.exists()
+                else None
+            ),
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def render_and_inspect(
+        self, template_path: Path, profile: str, filename: str
+    ) -> Tuple[Optional[str], Dict]:
+        """
+        Render and validate one variant, using the artifact cache if enabled.
+
+        Render and validation time, tokens against budget and validation
+        findings are recorded in self.metrics.
+
+        Returns:
+            (rendered, report); rendered is None when the template source
+            was rejected before rendering.
+        """
+        settings = self.get_profile(profile)
+        variant_name = (
+            f"{self.template_name(template_path)}{settings.get('suffix', '')}"
+        )
+        budget = settings.get("max_tokens") or self.config["validation"]["max_tokens"]
+
+        key = None
+        if self.artifact_cache is not None:
+            key = self.artifact_key(template_path, profile)
+            entry = self.artifact_cache.get(key)
+            if entry is not None:
+                if entry.get("optimization"):
+                    self.optimization[entry["variant"]] = entry["optimization"]
+                if entry.get("sections"):
+                    self.sections[entry["variant"]] = entry["sections"]
+                if entry.get("includes") is not None:
+                    self.includes[entry["variant"]] = entry["includes"]
+                report = entry["report"]
+                self.metrics.observe_agent(
+                    variant_name,
+                    profile,
+                    0.0,
+                    0.0,
+                    report["tokens"],
+                    budget,
+                    True,
+                    self.overlay or "",
+                )
+                self.metrics.observe_findings(report.get("findings", []))
+                return entry["rendered"], report
+
+        rendered = None
+        render_seconds = 0.0
+        start = time.perf_counter()
+        source_errors = self.check_source(template_path)
+        if source_errors:
+            report = {
+                "errors": source_errors,
+                "warnings": [],
+                "frontmatter": {},
+                "tokens": 0,
+                "findings": [],
+            }
+        else:
+            render_start = time.perf_counter()
+            rendered = self.render_variant(template_path, profile)
+            render_seconds = time.perf_counter() - render_start
+            report = self.inspect_output(
+                rendered, filename, max_tokens=settings.get("max_tokens")
+            )
+        validation_seconds = time.perf_counter() - start - render_seconds
+        self.metrics.observe_agent(
+            variant_name,
+            profile,
+            render_seconds,
+            validation_seconds,
+            report["tokens"],
+            budget,
+            overlay=self.overlay or "",
+        )
+        self.metrics.observe_findings(report.get("findings", []))
+
+        if key is not None:
+            self.artifact_cache.put(
+                key,
+                {
+                    "variant": variant_name,
+                    "rendered": rendered,
+                    "report": {
+                        k: v
+                        for k, v in report.items()
+                        if k
+                        in ("errors", "warnings", "frontmatter", "tokens", "findings")
+                    },
+                    "optimization": self.optimization.get(variant_name),
+                    "sections": self.sections.get(variant_name),
+                    "includes": self.includes.get(variant_name),
+                },
+            )
+        return rendered, report
+
+    def log(self, message: str, level: str = "info", **fields):
+        """Send a log record to the configured sink (console by default)."""
+        self.sink.emit(make_record(message, level, **fields))
+
+    def template_paths(self) -> List[Path]:
+        """
+        List the template files in the source directory.
+
+        With overlay roots, templates of every layer are listed; a template
+        in a more specific root replaces the one of the same name below it.
+        """
+        extension = self.config["templates"]["file_extension"]
+        directories = [root / "agents" for root in self.source_roots[:-1]]
+        paths: Dict[str, Path] = {}
+        for directory in [*directories, self.source_dir]:
+            for path in directory.glob(f"*{extension}"):
+                paths.setdefault(path.name, path)
+        return list(paths.values())
+
+    def read_template_source(self, template_path: Path) -> str:
+        return template_path.read_text(encoding="utf-8")
 
     def discover_templates(self) -> List[Path]:
         """Find all .md.j2 files in src/agents/."""
-        extension = self.config["templates"]["file_extension"]
-        templates = list(self.source_dir.glob(f"*{extension}"))
+        templates = self.template_paths()
 
         if not templates:
             self.log(f"[WARN] No templates found in {self.source_dir}", "warning")
@@ -111,55 +526,339 @@ class AgentBuilder:
         self.log(f"Found {len(templates)} template(s)", "info")
         return templates
 
-    def compile_template(
-        self, template_path: Path, verbose: bool = False
-    ) -> Tuple[bool, Optional[str]]:
+    def get_profile(self, name: str) -> Dict:
+        """Return the settings of a build profile from build_config.yml."""
+        profiles = self.config.get("profiles") or DEFAULT_PROFILES
+        if name not in profiles:
+            raise ValueError(
+                f"Unknown build profile '{name}'. Available: {', '.join(profiles)}"
+            )
+        return profiles[name] or {}
+
+    def active_profiles(self, names: Optional[List[str]] = None) -> List[str]:
+        """Resolve which profiles a build produces (config default: all)."""
+        if names:
+            selected = list(names)
+        else:
+            profiles = self.config.get("profiles") or DEFAULT_PROFILES
+            selected = self.config["build"].get("profiles") or list(profiles)
+        for name in selected:
+            self.get_profile(name)
+        return selected
+
+    def overlay_roots(self) -> List[Path]:
         """
-        Compile single template to dist/agents/.
+        Return this builder's overlay roots, most specific first.
 
-        Returns:
-            (success: bool, output_path: Optional[str])
+        overlays.<name>.roots lists them in layering order (vendor pack,
+        then team overlay); each root mirrors src/ (agents/, skills/).
+        """
+        if self.overlay is None:
+            return []
+        roots = [
+            self.root_dir / root
+            for root in self.config["overlays"][self.overlay]["roots"]
+        ]
+        missing = [str(root) for root in roots if not root.is_dir()]
+        if missing:
+            raise ValueError(
+                f"Overlay '{self.overlay}' root(s) not found: {', '.join(missing)}"
+            )
+        return list(reversed(roots))
+
+    def active_overlays(self, names: Optional[List[str]] = None) -> List[str]:
+        """Resolve which overlays a build produces (default: all configured)."""
+        overlays = self.config.get("overlays") or {}
+        selected = list(names) if names else list(overlays)
+        unknown = [name for name in selected if name not in overlays]
+        if unknown:
+            raise ValueError(
+                f"Unknown overlay(s) '{', '.join(unknown)}'. "
+                f"Available: {', '.join(overlays) or 'none'}"
+            )
+        return selected
+
+    def overlay_builder(self, name: str) -> "AgentBuilder":
         """
-        relative_path = template_path.relative_to(self.source_dir)
+        Return a builder for one overlay of this build.
 
+        It shares the config, log sink, stats, metrics, warning aggregation,
+        artifact cache and dangerous pattern rules; templates, skills,
+        catalog and output directory are its own.
+        """
+        overlay = copy.copy(self)
+        overlay.overlay = name
+        overlay.catalog = {}
+        overlay.optimization = {}
+        overlay.sections = {}
+        overlay.includes = {}
+        overlay.history = None
+        overlay._render_cache = {}
+        overlay._render_sections = {}
+        overlay._render_includes = {}
+        overlay._marked_env = None
+        overlay._source_errors = {}
+        overlay._render_costs = {}
+        overlay._cost_analyzer = None
+        overlay._skill_order = None
+        overlay._skill_texts = None
+        overlay.setup_environment()
+        return overlay
+
+    def overlay_changes(self, template_path: Path) -> List[str]:
+        """
+        Return the sources an overlay provides for a template: the template
+        itself or any template it transitively includes.
+
+        An empty list means the variant renders exactly as in the base
+        build. Dynamic include names cannot be resolved statically (see
+        find_includes()) and are not considered.
+        """
+        template_rel = f"agents/{template_path.name}"
+        changed = []
+        for name in [template_rel] + self.find_includes(template_rel):
+            try:
+                _, filename, _ = self.env.loader.get_source(self.env, name)
+            except TemplateNotFound:
+                continue
+            base_root = os.path.normpath(self.base_root)
+            if not Path(os.path.normpath(filename)).is_relative_to(base_root):
+                changed.append(name)
+        return changed
+
+    def template_name(self, template_path: Path) -> str:
+        """Strip the template extension: "agent.md.j2" -> "agent"."""
         # Remove template extension (.j2) and get base name
         # If file is "agent.md.j2", stem gives "agent.md", then stem again gives "agent"
-        template_name = relative_path.stem  # Remove .j2
+        template_name = Path(template_path.name).stem  # Remove .j2
         if template_name.endswith(".md"):
             template_name = template_name[:-3]  # Remove .md if present
+        return template_name
 
-        # Output filename
-        output_ext = self.config["templates"]["output_extension"]
-        output_filename = f"{template_name}{output_ext}"
-        output_path = self.output_dir / output_filename
+    def profile_applies(self, template_path: Path, profile: str) -> bool:
+        """Check whether a profile builds a variant of this template."""
+        agents = self.get_profile(profile).get("agents")
+        return not agents or self.template_name(template_path) in agents
 
-        try:
-            # Load and render template
-            # Template path relative to src/
-            template_rel = f"agents/{relative_path.name}"
-            template = self.env.get_template(template_rel)
-            rendered = template.render(**self.build_context)
+    def render_variant(self, template_path: Path, profile: str = "full") -> str:
+        """
+        Render one profile variant of a template.
+
+        The Jinja2 environment caches compiled templates and includes, so
+        every variant reuses the same parsed skills. Variants whose render
+        context is identical share a single render. With heatmap.enabled
+        the render goes through source markers and the variant's tokens
+        per section and source are kept in self.sections. The includes the
+        render loaded are kept in self.includes.
+        """
+        settings = self.get_profile(profile)
+        context = {
+            **self.build_context,
+            **settings.get("context", {}),
+            "profile": profile,
+        }
+        template_rel = f"agents/{template_path.name}"
+        context_key = json.dumps(
+            {k: v for k, v in context.items() if k != "profile"},
+            sort_keys=True,
+            default=str,
+        )
+        cache_key = (template_rel, context_key)
+        if cache_key not in self._render_cache:
+            marked = self.config.get("heatmap", {}).get("enabled")
+            env = self.marked_environment() if marked else self.env
+            env.loaded = []
+            try:
+                output = env.get_template(template_rel).render(**context)
+                self._render_includes[cache_key] = sorted(
+                    set(env.loaded) - {template_rel}
+                )
+            finally:
+                env.loaded = None
+            if marked:
+                self._render_sections[cache_key] = section_tokens(
+                    output, self.estimate_tokens
+                )
+                output = strip_markers(output)
+            self._render_cache[cache_key] = output
+        template_name = self.template_name(template_path)
+        variant_name = f"{template_name}{settings.get('suffix', '')}"
+        self.includes[variant_name] = self._render_includes[cache_key]
+        if cache_key in self._render_sections:
+            self.sections[variant_name] = self._render_sections[cache_key]
+        rendered = self.apply_profile_frontmatter(
+            self._render_cache[cache_key], template_name, settings
+        )
 
-            # Validate output
-            is_valid, errors = self.validate_output(rendered, output_filename)
+        if self.config.get("layout", {}).get("cache_friendly"):
+            rendered = self.cache_friendly_layout(rendered, template_rel, context)
 
-            if not is_valid:
-                self.log(f"  [X] Validation failed: {template_name}", "error")
-                for error in errors:
-                    self.log(f"    -> {error}", "error")
+        if self.config.get("optimize", {}).get("minify"):
+            rendered, self.optimization[variant_name] = self.optimize_output(rendered)
+        return rendered
+
+    def marked_environment(self) -> Environment:
+        """Environment rendering the same sources wrapped in source markers."""
+        if self._marked_env is None:
+            self._marked_env = self.make_environment(MarkedLoader(self.env.loader))
+        return self._marked_env
+
+    def shared_skill_order(self) -> List[str]:
+        """
+        Order skills by how many templates include them (most shared first).
+
+        Every agent lays out its skills in this one order, so agents with
+        the same includes share an identical prompt prefix.
+        """
+        if self._skill_order is None:
+            counts: Dict[str, int] = {}
+            for template_path in self.template_paths():
+                for name in self.find_includes(f"agents/{template_path.name}"):
+                    if name.startswith("skills/"):
+                        counts[name] = counts.get(name, 0) + 1
+            self._skill_order = sorted(counts, key=lambda n: (-counts[n], n))
+        return self._skill_order
+
+    def cache_friendly_layout(
+        self, rendered: str, template_rel: str, context: Dict
+    ) -> str:
+        """Move shared skills first and volatile sections last."""
+        includes = set(self.find_includes(template_rel))
+        blocks = [
+            self.env.get_template(name).render(**context)
+            for name in self.shared_skill_order()
+            if name in includes
+        ]
+        volatile_keys = self.config.get("layout", {}).get(
+            "volatile_context", ["build_timestamp"]
+        )
+        volatile = [str(context[key]) for key in volatile_keys if key in context]
+        return reorder_for_cache(rendered, blocks, volatile)
+
+    def optimize_output(self, rendered: str) -> Tuple[str, Dict]:
+        """
+        Run the opt-in minification pass over a rendered agent.
+
+        Returns:
+            (optimized_text, report) where the report holds tokens and bytes
+            before/after plus counts of removed comments, rules and duplicates.
+            Tokens are character-based (minify.estimate_tokens), since the
+            word-based estimate_tokens() does not count whitespace.
+        """
+        min_words = self.config.get("optimize", {}).get("min_duplicate_words", 8)
+        optimized, removed = minify_markdown(rendered, min_words)
+        tokens_before = estimate_bpe_tokens(rendered)
+        tokens_after = estimate_bpe_tokens(optimized)
+        return optimized, {
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_before - tokens_after,
+            "bytes_saved": len(rendered.encode("utf-8"))
+            - len(optimized.encode("utf-8")),
+            **removed,
+        }
+
+    def apply_profile_frontmatter(
+        self, rendered: str, template_name: str, settings: Dict
+    ) -> str:
+        """Rename the agent and retarget its model for a profile variant."""
+        frontmatter_match = re.match(r"^---\s*\n(.*?)\n---\s*\n", rendered, re.DOTALL)
+        if not frontmatter_match:
+            return rendered
+
+        frontmatter = frontmatter_match.group(1)
+        if settings.get("suffix"):
+            frontmatter = re.sub(
+                r"^name:.*$",
+                f"name: {template_name}{settings['suffix']}",
+                frontmatter,
+                count=1,
+                flags=re.MULTILINE,
+            )
+        if settings.get("model"):
+            frontmatter = re.sub(
+                r"^model:.*$",
+                f"model: {settings['model']}",
+                frontmatter,
+                count=1,
+                flags=re.MULTILINE,
+            )
+        start, end = frontmatter_match.span(1)
+        return rendered[:start] + frontmatter + rendered[end:]
+
+    def compile_template(
+        self, template_path: Path, verbose: bool = False, profile: str = "full"
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Compile single template to dist/agents/ for one build profile.
+
+        Returns:
+            (success: bool, output_path: Optional[str])
+        """
+        template_name = self.template_name(template_path)
+        template_rel = f"agents/{template_path.name}"
+
+        try:
+            settings = self.get_profile(profile)
+            variant_name = f"{template_name}{settings.get('suffix', '')}"
+
+            # Output filename
+            output_ext = self.config["templates"]["output_extension"]
+            output_filename = f"{variant_name}{output_ext}"
+            output_path = self.output_dir / output_filename
+
+            # Cached, or source-checked (broken frontmatter is rejected
+            # before paying for the render), rendered and validated
+            rendered, report = self.render_and_inspect(
+                template_path, profile, output_filename
+            )
+            self.log_warnings(report["warnings"], variant_name)
+
+            if report["errors"]:
+                self.log(
+                    f"  [X] Validation failed: {variant_name}",
+                    "error",
+                    agent=variant_name,
+                    errors=report["errors"],
+                )
+                for error in report["errors"]:
+                    self.log(f"    -> {error}", "error", agent=variant_name)
                 return False, None
 
             # Write output
             with open(output_path, "w", encoding="utf-8") as f:
                 f.write(rendered)
 
+            entry = self.catalog_entry(
+                template_rel,
+                output_filename,
+                rendered,
+                report,
+                self.includes.get(variant_name),
+            )
+            entry["profile"] = profile
+            optimization = self.optimization.get(variant_name)
+            if optimization:
+                entry["tokens_saved"] = optimization["tokens_saved"]
+            if variant_name in self.sections:
+                entry["sections"] = self.sections[variant_name]
+            self.catalog[variant_name] = entry
+
+            saved = (
+                f" (-{optimization['tokens_saved']} tokens, "
+                f"-{optimization['bytes_saved']} bytes)"
+                if optimization
+                else ""
+            )
             if verbose:
                 self.log(
-                    f"  [OK] {template_name} -> {output_path.relative_to(self.root_dir)}",
+                    f"  [OK] {variant_name} -> "
+                    f"{output_path.relative_to(self.root_dir)}{saved}",
                     "success",
+                    agent=variant_name,
                 )
             else:
-                self.log(f"  [OK] {template_name}", "success")
+                self.log(f"  [OK] {variant_name}{saved}", "success", agent=variant_name)
 
             return True, str(output_path)
 
@@ -173,29 +872,66 @@ class AgentBuilder:
             self.log(f"  [X] Unexpected error compiling {template_name}: {e}", "error")
             return False, None
 
+    def render_all(self, profile: str = "full") -> Dict[str, str]:
+        """Render every template in memory for reports; nothing is written."""
+        rendered = {}
+        for template_path in sorted(self.discover_templates()):
+            if self.profile_applies(template_path, profile):
+                name = self.template_name(template_path)
+                rendered[name] = self.render_variant(template_path, profile)
+        return rendered
+
+    def skill_texts(self) -> Dict[str, str]:
+        """
+        Read every shared skill, keyed by its path relative to src/.
+
+        Skills in overlay roots replace the ones of the same path below them.
+        """
+        layers = [(self.base_root, self.skills_dir)] + [
+            (root, root / "skills") for root in reversed(self.source_roots[:-1])
+        ]
+        texts: Dict[str, str] = {}
+        for root, skills_dir in layers:
+            for path in sorted(skills_dir.rglob("*.md")):
+                name = path.relative_to(root).as_posix()
+                texts[name] = path.read_text(encoding="utf-8")
+        return dict(sorted(texts.items()))
+
     def estimate_tokens(self, text: str) -> int:
         """
         Estimate token count using word-based approximation.
         Claude typically uses ~1.3 tokens per word on average.
         """
-        words = len(text.split())
+        return self.tokens_for_words(len(text.split()))
+
+    def tokens_for_words(self, words: int) -> int:
+        """Token estimate for a word count (see estimate_tokens)."""
         return int(words * 1.3)
 
     def extract_bash_blocks(self, content: str) -> List[str]:
-        """Extract bash code blocks from markdown."""
-        # Match ```bash or ```sh at line start, followed by code, then closing ```
-        # Using MULTILINE flag so ^ matches line boundaries
-        pattern = r"^```(?:bash|sh)\n(.*?)\n```"
-        matches = re.findall(pattern, content, re.DOTALL | re.MULTILINE)
-        # Filter out empty or whitespace-only blocks
-        return [block.strip() for block in matches if block.strip()]
+        """Extract the code of closed ```bash / ```sh blocks, stripped."""
+        blocks = scan_markdown(content).blocks_for(BASH_LANGUAGES)
+        return [block.code.strip() for block in blocks if block.code.strip()]
 
-    def validate_bash_syntax(self, bash_code: str) -> Tuple[bool, str]:
+    def validate_bash_syntax(
+        self, bash_code: str, backend: Optional[str] = None
+    ) -> Tuple[bool, str]:
         """
-        Validate bash syntax using bash -n.
+        Validate bash syntax.
+
+        The default "python" backend parses in-process (scripts/shell_parser.py);
+        the "bash" backend runs bash -n and is skipped when bash is unusable.
+        The backend comes from validation.bash_backend unless given.
+
         Returns (is_valid, error_message)
         """
+        if backend is None:
+            backend = self.config["validation"].get("bash_backend", "python")
+        if backend == "python":
+            return validate_shell(bash_code)
+
         try:
+            self.metrics.bash_subprocesses += 1
             result = subprocess.run(
                 ["bash", "-n"],  # noqa: S607
                 input=bash_code,
@@ -218,115 +954,605 @@ class AgentBuilder:
         except Exception as e:
             return True, f"Bash validation skipped: {e}"
 
-    def check_dangerous_commands(self, bash_code: str) -> List[Dict]:
+    def load_dangerous_config(self) -> Optional[Dict]:
         """
-        Check bash code against dangerous command patterns.
+        Load config/dangerous_commands.json, or None if missing or invalid.
+
+        The parsed rules are reused until the file changes on disk, so bulk
+        validation does not re-read them for every bash block.
+        """
+        path = self.root_dir / "config" / "dangerous_commands.json"
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._dangerous_config
+        if cached is None or cached[0] != signature:
+            try:
+                with open(path, "r") as f:
+                    dangerous_config = json.load(f)
+            except Exception:
+                dangerous_config = None
+            cached = (signature, dangerous_config, None)
+            self._dangerous_config = cached
+        return cached[1]
+
+    def dangerous_patterns(self) -> Dict[str, List[SafePattern]]:
+        """
+        Return the regex patterns of every category, loaded ReDoS-safe.
+
+        validation.pattern_safety picks the policy (rewrite, reject or off)
+        and validation.pattern_budget_ms the time budget per match; see
+        scripts/safe_patterns.py. Rejected patterns are logged once.
+        """
+        dangerous_config = self.load_dangerous_config()
+        if dangerous_config is None:
+            return {}
+        signature, _, loaded = self._dangerous_config
+        if loaded is None:
+            validation = self.config["validation"]
+            loaded = load_patterns(
+                dangerous_config,
+                validation.get("pattern_safety", "rewrite"),
+                validation.get("pattern_budget_ms", DEFAULT_BUDGET_MS),
+                self.pattern_watchdog,
+            )
+            self._dangerous_config = (signature, dangerous_config, loaded)
+            for pattern in loaded[1]:
+                kinds = ", ".join(issue["kind"] for issue in pattern.issues)
+                self.log(
+                    f"  [WARN] Dangerous pattern rejected ({pattern.category}): "
+                    f"{pattern.source} [{kinds}]",
+                    "warning",
+                    pattern=pattern.source,
+                )
+        return loaded[0]
+
+    def log_pattern_budgets(self, verbose: bool = False):
+        """Report patterns that ran over their time budget during the build."""
+        for pattern in self.iter_dangerous_patterns():
+            if pattern.timeouts or pattern.overruns:
+                self.log(
+                    f"  [WARN] Pattern exceeded its "
+                    f"{pattern.budget * 1000:g} ms budget "
+                    f"({pattern.timeouts} timeout(s), {pattern.overruns} "
+                    f"overrun(s)): {pattern.source}",
+                    "warning",
+                    summary=True,
+                    pattern=pattern.source,
+                    category=pattern.category,
+                )
+            elif verbose and pattern.risky:
+                self.log(
+                    f"  Pattern run under the watchdog: {pattern.source}",
+                    "debug",
+                    summary=True,
+                    pattern=pattern.source,
+                )
+
+    def iter_dangerous_patterns(self):
+        if self._dangerous_config is None or self._dangerous_config[2] is None:
+            return
+        for patterns in self._dangerous_config[2][0].values():
+            yield from patterns
+
+    def check_dangerous_commands(
+        self, bash_code: str, language: str = "bash"
+    ) -> List[Dict]:
+        """
+        Check code against the dangerous command patterns of its language.
+
+        Categories apply to bash unless they set "language". Bash code is
+        parsed first, so regex patterns only match commands (not comments,
+        quoted text or here-document bodies), and structural "commands"
+        rules match on program, flags, arguments and redirect targets. Code
+        that does not parse falls back to raw regex matching. Other
+        languages are matched by regex with their comments removed.
+
         Returns list of warnings with pattern info.
         """
         warnings = []
 
-        # Load dangerous commands config
-        dangerous_config_path = self.root_dir / "config" / "dangerous_commands.json"
-        if not dangerous_config_path.exists():
+        dangerous_config = self.load_dangerous_config()
+        if dangerous_config is None:
             return warnings
-
-        try:
-            with open(dangerous_config_path, "r") as f:
-                dangerous_config = json.load(f)
-        except Exception:
-            return warnings
-
-        # Check against patterns
+        patterns = self.dangerous_patterns()
+
+        script = None
+        if language == "bash":
+            try:
+                script = parse_shell(bash_code)
+            except ShellSyntaxError:
+                pass
+        elif language == "powershell":
+            bash_code = strip_powershell_comments(bash_code)
+
+        def matches(pattern: SafePattern) -> bool:
+            if script is None:
+                return pattern.search(bash_code)
+            return matches_pattern(script, pattern)
+
+        # Check against patterns, then structural rules the patterns missed
         for category_name, category in dangerous_config.get("categories", {}).items():
-            for pattern in category.get("patterns", []):
-                if re.search(pattern, bash_code):
-                    warnings.append(
-                        {
-                            "category": category_name,
-                            "severity": category.get("severity", "medium"),
-                            "pattern": pattern,
-                            "description": category.get("description", ""),
-                        }
-                    )
+            if category.get("language", "bash") != language:
+                continue
+            hits = [p.source for p in patterns.get(category_name, []) if matches(p)]
+            if not hits and script is not None:
+                for rule in category.get("commands", []):
+                    if "redirect" in rule:
+                        matched = matches_redirect_rule(script, rule)
+                    else:
+                        matched = any(
+                            matches_command_rule(command, rule)
+                            for command in script.commands
+                        )
+                    if matched:
+                        hits.append(json.dumps(rule, sort_keys=True))
+            for pattern in hits:
+                warnings.append(
+                    {
+                        "category": category_name,
+                        "severity": category.get("severity", "medium"),
+                        "pattern": pattern,
+                        "description": category.get("description", ""),
+                    }
+                )
 
         return warnings
 
-    def validate_output(self, content: str, filename: str) -> Tuple[bool, List[str]]:
+    def inspect_output(
+        self, content: str, filename: str, max_tokens: Optional[int] = None
+    ) -> Dict:
         """
         Validate YAML frontmatter, agent content, tokens, and bash code.
 
+        Runs the rule registry (self.rules) cheapest rule first; expensive
+        bash checks are skipped once the content already has an error.
+        max_tokens overrides the configured budget (used by build profiles).
+
+        Returns:
+            Dict with "errors", "warnings", the parsed "frontmatter", the
+            estimated "tokens" of the rendered content, per-rule "timings"
+            and the "skipped" rules.
+        """
+        context = ValidationContext(self, content, filename, max_tokens)
+        report = self.rules.run(context)
+        self.record_timings(report["timings"])
+        return report
+
+    def check_source(self, template_path: Path) -> List[str]:
+        """
+        Run the source-stage rules on a template before rendering it.
+
+        Only a template that starts with a literal --- frontmatter block
+        free of Jinja2 syntax is checked here. One that starts with a
+        comment, {% set %} or {% extends %}, takes its frontmatter from an
+        include or templates it can only be checked after rendering. With analysis.enforce, a
+        template over a render-cost limit fails here too. Results are
+        cached per template because every build profile renders the same
+        source.
+        """
+        if template_path not in self._source_errors:
+            source = self.read_template_source(template_path)
+            errors: List[str] = []
+            frontmatter_match = re.match(r"^---\s*\n(.*?)\n---", source, re.DOTALL)
+            if frontmatter_match and not re.search(
+                r"{{|{%", frontmatter_match.group(1)
+            ):
+                context = ValidationContext(
+                    self, source, template_path.name, stage="source"
+                )
+                report = self.rules.run(context)
+                self.record_timings(report["timings"])
+                errors = report["errors"]
+            if (self.config.get("analysis") or {}).get("enforce"):
+                errors = errors + [
+                    f"Render cost: {violation}"
+                    for violation in self.analyze_template(template_path)["violations"]
+                ]
+            self._source_errors[template_path] = errors
+        return self._source_errors[template_path]
+
+    def analyze_template(self, template_path: Path) -> Dict:
+        """
+        Estimate a template's render cost without rendering it.
+
+        Returns the RenderCostAnalyzer report plus "violations" of the
+        limits in the analysis section of the config. A template that
+        cannot be loaded or parsed has that error as its only violation.
+        """
+        if template_path not in self._render_costs:
+            settings = self.config.get("analysis") or {}
+            if self._cost_analyzer is None:
+                self._cost_analyzer = RenderCostAnalyzer(
+                    self.env,
+                    self.build_context,
+                    settings.get("loop_iterations", DEFAULT_LOOP_ITERATIONS),
+                )
+            template_rel = f"agents/{template_path.name}"
+            try:
+                report = self._cost_analyzer.analyze(template_rel)
+                report["violations"] = check_limits(report, settings)
+            except TemplateError as e:
+                report = {
+                    "template": template_rel,
+                    "violations": [f"Template error: {e}"],
+                }
+            self._render_costs[template_path] = report
+        return self._render_costs[template_path]
+
+    def record_timings(self, timings: Dict[str, float]):
+        """Accumulate per-rule validation time across the build."""
+        for rule, seconds in timings.items():
+            self.rule_timings[rule] = self.rule_timings.get(rule, 0.0) + seconds
+
+    def block_origin(self, code: str) -> Optional[str]:
+        """Return the skill a code block was included from, if any."""
+        if self._skill_texts is None:
+            self._skill_texts = self.skill_texts()
+        for name, text in self._skill_texts.items():
+            if code in text:
+                return name
+        return None
+
+    def log_warnings(self, warnings: List[str], agent: Optional[str] = None):
+        """
+        Log validation warnings (they never fail the build).
+
+        During build_all, warnings are collected per distinct message and
+        logged once in the summary with the agents they affect.
+        """
+        self.stats["warnings"] += len(warnings)
+        if self._warning_index is not None and agent is not None:
+            for warning in warnings:
+                self._warning_index.setdefault(warning, []).append(agent)
+            return
+        if warnings and self.config["logging"]["show_warnings"]:
+            for warning in warnings:
+                self.log(f"    [WARN] {warning}", "warning", agent=agent)
+
+    def flush_warnings(self):
+        """Log each aggregated warning once with the agents it affects."""
+        index, self._warning_index = self._warning_index or {}, None
+        if not self.config["logging"]["show_warnings"]:
+            return
+        for warning, agents in index.items():
+            agents = sorted(agents)
+            shown = ", ".join(agents[:5]) + (", ..." if len(agents) > 5 else "")
+            self.log(
+                f"  [WARN] {warning} (affecting {len(agents)} agent(s): {shown})",
+                "warning",
+                summary=True,
+                agents=agents,
+            )
+
+    def validate_output(
+        self, content: str, filename: str, max_tokens: Optional[int] = None
+    ) -> Tuple[bool, List[str]]:
+        """
+        Validate rendered agent content and log any warnings.
+
         Returns:
             (is_valid: bool, errors: List[str])
         """
-        errors = []
-        warnings = []
+        report = self.inspect_output(content, filename, max_tokens)
+        self.log_warnings(report["warnings"])
+        return len(report["errors"]) == 0, report["errors"]
 
-        # Extract YAML frontmatter
-        frontmatter_match = re.match(r"^---\s*\n(.*?)\n---\s*\n", content, re.DOTALL)
+    def find_includes(self, template_name: str) -> List[str]:
+        """
+        Return every template transitively included by template_name.
 
-        if not frontmatter_match:
-            errors.append("Missing YAML frontmatter (must start with ---)")
-            return False, errors
+        Dynamic include names (expressions rather than string literals)
+        cannot be resolved statically and are skipped.
+        """
+        seen: List[str] = []
+        pending = [template_name]
+        while pending:
+            name = pending.pop()
+            try:
+                source, _, _ = self.env.loader.get_source(self.env, name)
+            except TemplateNotFound:
+                continue
+            for ref in meta.find_referenced_templates(self.env.parse(source)):
+                if ref and ref not in seen:
+                    seen.append(ref)
+                    pending.append(ref)
+        return sorted(seen)
+
+    def catalog_entry(
+        self,
+        template_rel: str,
+        output_filename: str,
+        rendered: str,
+        report: Dict,
+        includes: Optional[List[str]] = None,
+    ) -> Dict:
+        """
+        Describe one compiled agent for catalog.json.
 
-        frontmatter_text = frontmatter_match.group(1)
+        includes are the templates the render loaded; without them, every
+        template the source references is listed.
+        """
+        encoded = rendered.encode("utf-8")
+        return {
+            "template": template_rel,
+            "output": output_filename,
+            "frontmatter": report["frontmatter"],
+            "tokens": report["tokens"],
+            "size": len(encoded),
+            "sha256": hashlib.sha256(encoded).hexdigest(),
+            "includes": (
+                includes if includes is not None else self.find_includes(template_rel)
+            ),
+            "headings": extract_headings(rendered),
+            "warnings": report["warnings"],
+        }
 
+    def load_catalog(self) -> Dict[str, Dict]:
+        """Load the agent entries of a previously written catalog, if any."""
         try:
-            frontmatter = yaml.safe_load(frontmatter_text)
-        except yaml.YAMLError as e:
-            errors.append(f"Invalid YAML frontmatter: {e}")
-            return False, errors
-
-        # Validate required fields
-        required_fields = self.config["validation"]["required_frontmatter"]
-        for field in required_fields:
-            if field not in frontmatter:
-                errors.append(f"Missing required frontmatter field: {field}")
-
-        # Validate model field
-        if "model" in frontmatter:
-            allowed_models = self.config["validation"]["allowed_models"]
-            if frontmatter["model"] not in allowed_models:
-                errors.append(
-                    f"Invalid model '{frontmatter['model']}'. Allowed: {', '.join(allowed_models)}"
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("agents", {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            return {}
+
+    def write_catalog(
+        self, prune: bool = False, profiles: Optional[List[str]] = None
+    ) -> Path:
+        """
+        Merge entries compiled in this run into catalog.json.
+
+        Agents that were not rebuilt keep their previous entry. With prune,
+        entries whose template no longer exists, or whose profile is not in
+        profiles (default: the active profiles), are dropped. The registry
+        index (index.json) and the router index (router.json) are rewritten
+        from the merged entries, and with heatmap.enabled the section token
+        treemap (heatmap.json) of the entries that have sections.
+        """
+        agents = self.load_catalog()
+        agents.update(self.catalog)
+        if prune:
+            templates = {path.name for path in self.template_paths()}
+            profiles = set(profiles or self.active_profiles())
+            agents = {
+                name: entry
+                for name, entry in agents.items()
+                if Path(entry["template"]).name in templates
+                and entry.get("profile", "full") in profiles
+            }
+
+        catalog = {
+            "builder_version": self.build_context["builder_version"],
+            "agents": dict(sorted(agents.items())),
+        }
+        with open(self.catalog_path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, indent=2, sort_keys=False)
+            f.write("\n")
+
+        # Compact registry index for queries that should not parse Markdown
+        index = build_index(agents, self.build_context["builder_version"])
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+            f.write("\n")
+
+        with open(self.router_path, "w", encoding="utf-8") as f:
+            json.dump(build_router_index(agents), f, separators=(",", ":"))
+            f.write("\n")
+
+        if self.config.get("heatmap", {}).get("enabled"):
+            sections = {
+                name: entry["sections"]
+                for name, entry in agents.items()
+                if entry.get("sections")
+            }
+            with open(self.heatmap_path, "w", encoding="utf-8") as f:
+                json.dump(treemap(sections), f, indent=2)
+                f.write("\n")
+        return self.catalog_path
+
+    def write_metrics(self, path: str) -> Path:
+        """Write this build's metrics as a Prometheus textfile."""
+        metrics = self.metrics
+        metrics.finished = time.time()
+        metrics.builder_version = self.build_context["builder_version"]
+        metrics.succeeded = self.stats["success"]
+        metrics.failed = self.stats["failed"]
+        metrics.warnings = self.stats["warnings"]
+        metrics.rule_seconds = dict(self.rule_timings)
+
+        target = Path(path).expanduser()
+        if not target.is_absolute():
+            target = self.root_dir / target
+        openmetrics = self.config["metrics"].get("format") == "openmetrics"
+        return metrics.write(target, openmetrics=openmetrics)
+
+    def record_history(self) -> Tuple[Optional[Dict], List[Dict]]:
+        """
+        Compare this build's agents with the baseline, then append them.
+
+        The baseline is history.baseline (a commit sha or prefix) when set,
+        otherwise the latest build of another commit.
+
+        Returns:
+            (baseline record or None, comparison rows from compare())
+        """
+        settings = self.config.get("history") or {}
+        sha, dirty = git_revision(self.root_dir)
+        baseline = self.history.baseline(
+            record_key({"sha": sha, "dirty": dirty}), settings.get("baseline")
+        )
+        max_growth = settings.get("max_growth")
+        limit = parse_growth(max_growth) if max_growth not in (None, "") else None
+        rows = compare(self.catalog, baseline["agents"], limit) if baseline else []
+        self.history.append(
+            self.catalog, sha, dirty, self.build_context["builder_version"]
+        )
+        return baseline, rows
+
+    def log_growth(self, baseline: Optional[Dict], rows: List[Dict], verbose: bool):
+        """Summarize token growth against the baseline build."""
+        if baseline is None:
+            self.log(
+                "  Growth:  no baseline yet (history recorded)", "info", summary=True
+            )
+            return
+
+        grew = [row for row in rows if row["delta"] > 0]
+        shrank = [row for row in rows if row["delta"] < 0]
+        largest = (
+            f" (largest: {grew[0]['agent']} {grew[0]['percent']:+.1f}%)" if grew else ""
+        )
+        self.log(
+            f"  Growth:  vs {short_sha(baseline)}: {len(grew)} grew, "
+            f"{len(shrank)} shrank{largest}",
+            "info",
+            summary=True,
+        )
+
+        settings = self.config.get("history") or {}
+        limit = settings.get("max_growth")
+        for row in rows:
+            if not (row["exceeded"] or (verbose and row["delta"])):
+                continue
+            message = (
+                f"    {row['agent']:<28} {row['before']:>5} -> {row['after']:>5} "
+                f"tokens ({row['delta']:+d}, {row['percent']:+.1f}%)"
+            )
+            if row["exceeded"]:
+                message += f" exceeds max growth {format_growth(parse_growth(limit))}"
+            self.log(
+                message,
+                "error" if row["exceeded"] else "debug",
+                summary=True,
+                agent=row["agent"],
+                tokens=row["after"],
+                baseline_tokens=row["before"],
+            )
+
+    def process_variant(
+        self,
+        template_path: Path,
+        profile: str,
+        verbose: bool = False,
+        validate_only: bool = False,
+    ) -> Optional[str]:
+        """
+        Compile (or only validate) one variant and count it in the stats.
+
+        Returns:
+            None on success, otherwise the label reported as failed
+        """
+        self.stats["total"] += 1
+
+        if validate_only:
+            # Just validate without writing
+            label = f"{template_path.stem} [{profile}]"
+            try:
+                _, report = self.render_and_inspect(
+                    template_path, profile, template_path.stem
                 )
+                self.log_warnings(report["warnings"], label)
+                errors = report["errors"]
 
-        # Check for unresolved Jinja2 syntax (compilation error indicator)
-        if "{{" in content or "{%" in content:
-            errors.append(
-                "Unresolved Jinja2 syntax found in output (template compilation incomplete)"
-            )
-
-        # Token budget validation
-        token_count = self.estimate_tokens(content)
-        max_tokens = self.config["validation"]["max_tokens"]
-        if token_count > max_tokens:
-            errors.append(f"Token count {token_count} exceeds limit of {max_tokens}")
-
-        # Bash syntax validation (warnings only)
-        bash_blocks = self.extract_bash_blocks(content)
-        for i, bash_code in enumerate(bash_blocks):
-            is_valid, error_msg = self.validate_bash_syntax(bash_code)
-            if not is_valid:
-                warnings.append(f"Bash block {i+1} syntax error: {error_msg}")
-
-            # Check for dangerous commands
-            dangerous_warnings = self.check_dangerous_commands(bash_code)
-            for warn in dangerous_warnings:
-                if warn["severity"] == "critical":
-                    warnings.append(
-                        f"Bash block {i+1}: CRITICAL - {warn['description']}"
-                    )
+                if not errors:
+                    self.log(f"  [OK] {label} (valid)", "success")
+                    self.stats["success"] += 1
+                    return None
+                self.log(f"  [X] {label} (invalid)", "error")
+                for error in errors:
+                    self.log(f"    -> {error}", "error")
+            except Exception as e:
+                self.log(f"  [X] {label}: {e}", "error")
+            self.stats["failed"] += 1
+            return label
+
+        success, _ = self.compile_template(template_path, verbose, profile)
+        if success:
+            self.stats["success"] += 1
+            return None
+        self.stats["failed"] += 1
+        return f"{self.template_name(template_path)} [{profile}]"
+
+    def build_overlay(
+        self,
+        base: "AgentBuilder",
+        profiles: List[str],
+        agents: Optional[List[str]] = None,
+        verbose: bool = False,
+        validate_only: bool = False,
+    ) -> Tuple[int, int, List[str]]:
+        """
+        Build this overlay's variants on top of the base build.
 
-        # Log warnings but don't fail build
-        if warnings and self.config["logging"]["show_warnings"]:
-            for warning in warnings:
-                self.log(f"    [WARN] {warning}", "warning")
+        Only variants whose template or includes the overlay provides are
+        rendered; the others are identical to the base build, so their
+        output and catalog entry are copied from it (and not validated
+        again). A variant the base build did not produce is rendered.
 
-        return len(errors) == 0, errors
+        Returns:
+            (rendered, unchanged, failed labels)
+        """
+        self.log(f"\n[OVERLAY] {self.overlay}", "info")
+        templates = sorted(self.template_paths())
+        if agents:
+            templates = [t for t in templates if self.template_name(t) in agents]
+
+        rendered = unchanged = 0
+        failed: List[str] = []
+        for profile in profiles:
+            settings = self.get_profile(profile)
+            for template_path in templates:
+                if not self.profile_applies(template_path, profile):
+                    continue
+                name = (
+                    f"{self.template_name(template_path)}{settings.get('suffix', '')}"
+                )
+                changes = self.overlay_changes(template_path)
+                entry = base.catalog.get(name)
+                if not changes and validate_only:
+                    unchanged += 1
+                    continue
+                if not changes and entry and entry.get("profile") == profile:
+                    shutil.copyfile(
+                        base.output_dir / entry["output"],
+                        self.output_dir / entry["output"],
+                    )
+                    self.catalog[name] = dict(entry)
+                    unchanged += 1
+                    continue
+
+                if changes and verbose:
+                    self.log(
+                        f"  {name}: overlay provides {', '.join(changes)}",
+                        "debug",
+                        agent=name,
+                        overlay=self.overlay,
+                    )
+                rendered += 1
+                label = self.process_variant(
+                    template_path, profile, verbose, validate_only
+                )
+                if label is not None:
+                    failed.append(label)
 
-    def build_all(self, verbose: bool = False, validate_only: bool = False) -> int:
+        if not validate_only:
+            self.write_catalog(prune=not agents, profiles=profiles)
+        return rendered, unchanged, failed
+
+    def build_all(
+        self,
+        verbose: bool = False,
+        validate_only: bool = False,
+        agents: Optional[List[str]] = None,
+        profiles: Optional[List[str]] = None,
+        overlays: Optional[List[str]] = None,
+    ) -> int:
         """
-        Compile all agent templates.
+        Compile all agent templates (or only the named agents) once per
+        active build profile, then every configured overlay (or the named
+        overlays) on top of them.
 
         Returns:
             exit_code: 0 for success, 1 for failures
@@ -334,71 +1560,240 @@ class AgentBuilder:
         self.log("\n[BUILD] Claude Agent Build System", "info")
         self.log("=" * 50, "info")
 
+        if self.config["logging"].get("aggregate_warnings", True):
+            self._warning_index = {}
+
         templates = self.discover_templates()
+        if agents:
+            extension = self.config["templates"]["file_extension"]
+            templates = [
+                t for t in templates if t.name[: -len(extension)] in set(agents)
+            ]
 
         if not templates:
-            self.log("\n[WARN] No templates to build", "warning")
+            self.log("\n[WARN] No templates to build", "warning", summary=True)
+            self.sink.flush()
             return 0
 
-        self.log(f"\nBuilding {len(templates)} agent(s)...\n", "info")
+        profiles = self.active_profiles(profiles)
+        variants = [
+            (template_path, profile)
+            for profile in profiles
+            for template_path in templates
+            if self.profile_applies(template_path, profile)
+        ]
+
+        self.log(
+            f"\nBuilding {len(variants)} agent(s) "
+            f"[profiles: {', '.join(profiles)}]...\n",
+            "info",
+        )
 
-        for template_path in templates:
-            self.stats["total"] += 1
+        failed: List[str] = []
+        for template_path, profile in variants:
+            label = self.process_variant(template_path, profile, verbose, validate_only)
+            if label is not None:
+                failed.append(label)
 
-            if validate_only:
-                # Just validate without writing
-                try:
-                    template_rel = f"agents/{template_path.name}"
-                    template = self.env.get_template(template_rel)
-                    rendered = template.render(**self.build_context)
-                    is_valid, errors = self.validate_output(
-                        rendered, template_path.stem
-                    )
+        growth_failures: List[str] = []
+        if not validate_only:
+            self.write_catalog(prune=not agents, profiles=profiles)
+            if self.history is not None and self.catalog:
+                baseline, growth = self.record_history()
+                growth_failures = [row["agent"] for row in growth if row["exceeded"]]
+
+        overlay_lines: List[str] = []
+        for name in self.active_overlays(overlays):
+            overlay = self.overlay_builder(name)
+            rendered, reused, overlay_failed = overlay.build_overlay(
+                self, profiles, agents, verbose, validate_only
+            )
+            failed.extend(f"{name}/{label}" for label in overlay_failed)
+            overlay_lines.append(
+                f"  Overlay: {name}: {rendered} rendered, {reused} unchanged "
+                f"-> {overlay.output_dir.relative_to(self.root_dir)}/"
+            )
 
-                    if is_valid:
-                        self.log(f"  [OK] {template_path.stem} (valid)", "success")
-                        self.stats["success"] += 1
-                    else:
-                        self.log(f"  [X] {template_path.stem} (invalid)", "error")
-                        for error in errors:
-                            self.log(f"    -> {error}", "error")
-                        self.stats["failed"] += 1
-                except Exception as e:
-                    self.log(f"  [X] {template_path.stem}: {e}", "error")
-                    self.stats["failed"] += 1
-            else:
-                success, output_path = self.compile_template(template_path, verbose)
-                if success:
-                    self.stats["success"] += 1
-                else:
-                    self.stats["failed"] += 1
+        cache = self.artifact_cache
+        cache_line = None
+        if cache is not None and (cache.hits or cache.misses):
+            cache_line = f"  Cache:   {cache.hits} hit(s), {cache.misses} miss(es)"
+            self.metrics.cache_hits = cache.hits
+            self.metrics.cache_misses = cache.misses
+            cache.save_counters()
+            if cache.inserts:
+                cache.prune()
 
         # Print summary
-        self.log("\n" + "=" * 50, "info")
-        self.log("[STATS] Build Summary", "info")
-        self.log("=" * 50, "info")
-        self.log(f"  Total:   {self.stats['total']}", "info")
-        self.log(f"  Success: {self.stats['success']}", "success")
+        self.log("\n" + "=" * 50, "info", summary=True)
+        self.log("[STATS] Build Summary", "info", summary=True)
+        self.log("=" * 50, "info", summary=True)
+        self.log(f"  Total:   {self.stats['total']}", "info", summary=True)
+        self.log(f"  Success: {self.stats['success']}", "success", summary=True)
 
         if self.stats["failed"] > 0:
-            self.log(f"  Failed:  {self.stats['failed']}", "error")
+            self.log(
+                f"  Failed:  {self.stats['failed']} ({', '.join(failed)})",
+                "error",
+                summary=True,
+                agents=failed,
+            )
+
+        if cache_line:
+            self.log(cache_line, "info", summary=True)
+        for line in overlay_lines:
+            self.log(line, "info", summary=True)
+
+        if self.stats["warnings"] > 0:
+            self.log(f"  Warnings: {self.stats['warnings']}", "warning", summary=True)
+        self.flush_warnings()
+        self.log_pattern_budgets(verbose)
+        self.pattern_watchdog.close()
+
+        if self.history is not None and not validate_only and self.catalog:
+            self.log_growth(baseline, growth, verbose)
+            if growth_failures:
+                self.log(
+                    f"  Failed:  token growth limit ({', '.join(growth_failures)})",
+                    "error",
+                    summary=True,
+                    agents=growth_failures,
+                )
+
+        if self.optimization:
+            saved = sum(o["tokens_saved"] for o in self.optimization.values())
+            self.log(f"  Minified: -{saved} tokens", "info", summary=True)
+
+        if self.sections and not validate_only:
+            rows = heatmap_rows(self.sections)
+            self.log(
+                f"  Heatmap: {self.heatmap_path.relative_to(self.root_dir)} "
+                f"(largest: {rows[0]['agent']} / {rows[0]['section']}, "
+                f"{rows[0]['tokens']} tokens)",
+                "info",
+                summary=True,
+            )
+            if verbose:
+                for row in rows[:HEATMAP_SUMMARY_ROWS]:
+                    self.log(
+                        f"    {row['tokens']:>5}  {row['agent']} / {row['section']}"
+                        f"  <- {row['source']}",
+                        "debug",
+                        summary=True,
+                    )
+
+        if verbose and self.rule_timings:
+            self.log("  Validation time by rule:", "debug", summary=True)
+            for rule, seconds in sorted(
+                self.rule_timings.items(), key=lambda item: -item[1]
+            ):
+                self.log(
+                    f"    {rule:<20} {seconds * 1000:8.1f} ms",
+                    "debug",
+                    summary=True,
+                    rule=rule,
+                    seconds=round(seconds, 6),
+                )
 
         if not validate_only:
             self.log(
-                f"\n  Output: {self.output_dir.relative_to(self.root_dir)}/", "info"
+                f"\n  Output: {self.output_dir.relative_to(self.root_dir)}/",
+                "info",
+                summary=True,
             )
 
+        metrics_path = self.config.get("metrics", {}).get("textfile")
+        if metrics_path:
+            path = self.write_metrics(metrics_path)
+            self.log(f"  Metrics: {path}", "info", summary=True)
+
+        self.sink.flush()
+
         # Return exit code
-        return 1 if self.stats["failed"] > 0 else 0
+        return 1 if self.stats["failed"] > 0 or growth_failures else 0
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option(
     "--validate-only", is_flag=True, help="Validate templates without compiling"
 )
 @click.option("--verbose", is_flag=True, help="Show detailed output")
 @click.option("--strict", is_flag=True, help="Fail on warnings (stricter validation)")
-def main(validate_only: bool, verbose: bool, strict: bool):
+@click.option(
+    "--minify", is_flag=True, help="Strip redundant whitespace, rules and duplicates"
+)
+@click.option(
+    "--cache-layout",
+    is_flag=True,
+    help="Put shared skills first and volatile sections last (prompt caching)",
+)
+@click.option(
+    "--heatmap",
+    is_flag=True,
+    help="Attribute tokens per section to templates and skills (heatmap.json)",
+)
+@click.option("--quiet", is_flag=True, help="Only print the final build summary")
+@click.option(
+    "--log-format",
+    type=click.Choice(["text", "json"]),
+    default=None,
+    help="Log as colored text or buffered JSON lines (default: config)",
+)
+@click.option(
+    "--log-file", type=click.Path(), help="Append JSON-line logs to this file"
+)
+@click.option(
+    "--agent",
+    "agents",
+    multiple=True,
+    help="Only build the named agent (repeatable); catalog.json is merged",
+)
+@click.option(
+    "--profile",
+    "profiles",
+    multiple=True,
+    help="Build profile from build_config.yml (repeatable, e.g. full, lite)",
+)
+@click.option(
+    "--overlay",
+    "overlays",
+    multiple=True,
+    help="Only build this overlay from build_config.yml (repeatable)",
+)
+@click.option("--no-cache", is_flag=True, help="Bypass the shared artifact cache")
+@click.option(
+    "--metrics-file",
+    type=click.Path(),
+    help="Write Prometheus textfile metrics here (e.g. build.prom)",
+)
+@click.option(
+    "--max-growth",
+    help="Fail if an agent grew more than this vs the baseline (e.g. 10% or 200)",
+)
+@click.option(
+    "--baseline",
+    help="Commit sha (or prefix) in the token history to compare against",
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    validate_only: bool,
+    verbose: bool,
+    strict: bool,
+    minify: bool,
+    cache_layout: bool,
+    heatmap: bool,
+    quiet: bool,
+    log_format: Optional[str],
+    log_file: Optional[str],
+    agents: Tuple[str, ...],
+    profiles: Tuple[str, ...],
+    overlays: Tuple[str, ...],
+    no_cache: bool,
+    metrics_file: Optional[str],
+    max_growth: Optional[str],
+    baseline: Optional[str],
+):
     """
     Build system for Claude Agent Suite.
 
@@ -409,15 +1804,50 @@ def main(validate_only: bool, verbose: bool, strict: bool):
     - Token budget validation (max 2500 tokens)
     - Bash syntax checking
     - Dangerous command pattern detection
+    - catalog.json describing every compiled agent
+
+    Run without a command to build; see the commands below for reports.
     """
+    if ctx.invoked_subcommand is not None:
+        return
+    sink = builder = None
     try:
-        builder = AgentBuilder()
+        if quiet or log_format or log_file:
+            sink = make_sink(
+                log_format or ("json" if log_file else "text"), quiet, log_file
+            )
+        builder = AgentBuilder(sink=sink)
         if strict:
             builder.config["logging"]["show_warnings"] = True
             builder.log(
                 "\n[INFO] Strict mode enabled - warnings will fail build", "warning"
             )
-        exit_code = builder.build_all(verbose=verbose, validate_only=validate_only)
+        if minify:
+            builder.config.setdefault("optimize", {})["minify"] = True
+        if cache_layout:
+            builder.config.setdefault("layout", {})["cache_friendly"] = True
+        if heatmap:
+            builder.config.setdefault("heatmap", {})["enabled"] = True
+        if no_cache:
+            builder.artifact_cache = None
+        if metrics_file:
+            builder.config.setdefault("metrics", {})["textfile"] = metrics_file
+        if max_growth or baseline:
+            history = builder.config.setdefault("history", {})
+            history["enabled"] = True
+            if max_growth:
+                parse_growth(max_growth)
+                history["max_growth"] = max_growth
+            if baseline:
+                history["baseline"] = baseline
+            builder.history = builder.open_history()
+        exit_code = builder.build_all(
+            verbose=verbose,
+            validate_only=validate_only,
+            agents=list(agents),
+            profiles=list(profiles),
+            overlays=list(overlays),
+        )
         sys.exit(exit_code)
     except KeyboardInterrupt:
         print("\n\n[WARN] Build interrupted by user")
@@ -425,6 +1855,716 @@ def main(validate_only: bool, verbose: bool, strict: bool):
     except Exception as e:
         print(f"\n[X] Fatal error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        # Buffered JSON lines logged before a fatal error are written too
+        active = builder.sink if builder is not None else sink
+        if active is not None:
+            active.flush()
+
+
+@main.command("dedupe-report")
+@click.option(
+    "--threshold",
+    default=0.8,
+    show_default=True,
+    help="Minimum estimated similarity for two paragraphs to match",
+)
+@click.option(
+    "--min-words",
+    default=15,
+    show_default=True,
+    help="Ignore paragraphs shorter than this",
+)
+@click.option("--limit", default=20, show_default=True, help="Findings to print")
+@click.option(
+    "--output", type=click.Path(), help="Also write all findings to a JSON file"
+)
+def dedupe_report(threshold: float, min_words: int, limit: int, output: Optional[str]):
+    """
+    Find passages copy-pasted across agents (MinHash/LSH).
+
+    Ranks near-duplicate paragraphs by the tokens that extracting them into
+    a shared skill under src/skills/ would remove from the templates.
+    Paragraphs that already come from a skill are not reported.
+    """
+    try:
+        builder = AgentBuilder()
+        findings = find_near_duplicates(
+            builder.render_all(),
+            threshold=threshold,
+            min_words=min_words,
+            exclude=builder.skill_texts().values(),
+            token_counter=builder.estimate_tokens,
+        )
+
+        builder.log("\n[DEDUPE] Near-duplicate content across agents", "info")
+        builder.log("=" * 50, "info")
+        if not findings:
+            builder.log("  No cross-agent duplicates found", "success")
+        for rank, finding in enumerate(findings[:limit], 1):
+            sample = " ".join(finding["sample"].split())
+            builder.log(
+                f"  {rank:>2}. ~{finding['tokens_saved']} tokens "
+                f"x{len(finding['occurrences'])} "
+                f"(similarity >= {finding['similarity']:.2f})",
+                "warning",
+            )
+            builder.log(f"      agents: {', '.join(finding['agents'])}", "info")
+            builder.log(f'      "{sample[:100]}"', "debug")
+
+        total = sum(f["tokens_saved"] for f in findings)
+        builder.log(
+            f"\n  {len(findings)} finding(s), ~{total} duplicated tokens", "info"
+        )
+
+        if output:
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(findings, f, indent=2)
+            builder.log(f"  Report: {output}", "info")
+    except KeyboardInterrupt:
+        print("\n\n[WARN] Report interrupted by user")
+        sys.exit(130)
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("prefix-report")
+@click.option(
+    "--cache-layout/--as-configured",
+    default=True,
+    show_default=True,
+    help="Measure the cache-friendly layout or the configured one",
+)
+@click.option("--profile", default="full", show_default=True, help="Build profile")
+def prefix_report(cache_layout: bool, profile: str):
+    """
+    Report each agent's prompt prefix shared with another agent.
+
+    Provider prompt caching reuses identical prefixes, so a longer shared
+    prefix means more cache hits when several agents run in one session.
+    """
+    try:
+        builder = AgentBuilder()
+        if cache_layout:
+            builder.config.setdefault("layout", {})["cache_friendly"] = True
+        rows = shared_prefix_report(
+            builder.render_all(profile), builder.estimate_tokens
+        )
+
+        builder.log("\n[PREFIX] Shared prompt prefix per agent", "info")
+        builder.log("=" * 50, "info")
+        for row in rows:
+            builder.log(
+                f"  {row['agent']:<28} {row['prefix_tokens']:>5} / "
+                f"{row['total_tokens']:<5} tokens ({row['ratio']:.0%}) "
+                f"shared with {row['shared_with'] or '-'}",
+                "info",
+            )
+        if rows:
+            average = sum(row["prefix_tokens"] for row in rows) / len(rows)
+            builder.log(f"\n  Average shared prefix: {average:.0f} tokens", "info")
+    except KeyboardInterrupt:
+        print("\n\n[WARN] Report interrupted by user")
+        sys.exit(130)
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("heatmap")
+@click.option("--agent", "agents", multiple=True, help="Only this agent (repeatable)")
+@click.option("--profile", default="full", show_default=True, help="Build profile")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="Sorted table or JSON treemap (agents > sections > sources)",
+)
+@click.option("--top", default=20, show_default=True, help="Table rows shown")
+def heatmap_report(agents: Tuple[str, ...], profile: str, output_format: str, top: int):
+    """
+    Report tokens per Markdown section and the template or skill behind them.
+
+    Renders every agent in memory through source markers; nothing is
+    written. Example: build.py heatmap --agent ux-ui-designer
+    """
+    try:
+        builder = AgentBuilder(sink=QuietSink())
+        builder.config.setdefault("heatmap", {})["enabled"] = True
+        builder.render_all(profile)
+        sections = {
+            name: rows
+            for name, rows in sorted(builder.sections.items())
+            if not agents or name in agents
+        }
+        unknown = sorted(set(agents) - set(builder.sections))
+        if unknown:
+            raise ValueError(f"Unknown agent(s): {', '.join(unknown)}")
+
+        if output_format == "json":
+            print(json.dumps(treemap(sections), indent=2))
+            return
+        rows = heatmap_rows(sections)
+        print(f"  {'tokens':>6} {'share':>6}  {'agent / section':<50} source")
+        for row in rows[:top]:
+            label = f"{row['agent']} / {row['section']}"
+            print(
+                f"  {row['tokens']:>6} {row['share']:>6.1%}  {label[:50]:<50} "
+                f"{row['source']}"
+            )
+        total = sum(row["tokens"] for row in rows)
+        print(f"\n  {len(rows)} row(s), {total} tokens in {len(sections)} agent(s)")
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("query")
+@click.option(
+    "--tool", "tools", multiple=True, help="Agents with this tool (repeatable)"
+)
+@click.option("--model", help="Agents pinned to this model")
+@click.option(
+    "--include",
+    "includes",
+    multiple=True,
+    help="Agents including this skill, by path or file name (repeatable)",
+)
+@click.option("--profile", help="Agents built by this profile")
+@click.option("--max-tokens", type=int, help="Agents at or under this token count")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "names", "json"]),
+    default="table",
+    show_default=True,
+)
+def query(
+    tools: Tuple[str, ...],
+    model: Optional[str],
+    includes: Tuple[str, ...],
+    profile: Optional[str],
+    max_tokens: Optional[int],
+    output_format: str,
+):
+    """
+    Filter compiled agents using the prebuilt registry index.
+
+    Example: build.py query --tool Bash --model haiku
+    """
+    try:
+        builder = AgentBuilder(sink=QuietSink())
+        if not builder.index_path.exists():
+            print(
+                f"[X] No registry index at {builder.index_path}; run a build first",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        registry = AgentRegistry.load(builder.index_path)
+        records = registry.query(
+            tool=tools,
+            model=model,
+            include=includes,
+            profile=profile,
+            max_tokens=max_tokens,
+        )
+
+        if output_format == "json":
+            print(json.dumps(records, indent=2))
+        elif output_format == "names":
+            for record in records:
+                print(record["name"])
+        else:
+            for record in records:
+                print(
+                    f"  {record['name']:<28} {record['model'] or '-':<7} "
+                    f"{record['tokens']:>5} tokens  {', '.join(record['tools'])}"
+                )
+            print(f"\n  {len(records)} agent(s)")
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+ROUTING_DATASET = Path(__file__).parent.parent / "eval" / "datasets" / "routing.jsonl"
+
+
+@main.command("route")
+@click.argument("task", nargs=-1)
+@click.option("--limit", type=int, default=3, show_default=True)
+@click.option(
+    "--profile", help="Rank variants of this profile (default: first built profile)"
+)
+@click.option(
+    "--eval",
+    "dataset",
+    is_flag=False,
+    flag_value=str(ROUTING_DATASET),
+    type=click.Path(dir_okay=False),
+    help="Score the router on a labeled JSONL dataset instead",
+)
+@click.option(
+    "--min-accuracy",
+    type=float,
+    help="With --eval, fail when top-1 accuracy is below this (0-1)",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print JSON")
+def route(
+    task: Tuple[str, ...],
+    limit: int,
+    profile: Optional[str],
+    dataset: Optional[str],
+    min_accuracy: Optional[float],
+    as_json: bool,
+):
+    """
+    Rank compiled agents for a task using the prebuilt router index.
+
+    Example: build.py route "my goroutines leak on shutdown"
+    """
+    try:
+        builder = AgentBuilder(sink=QuietSink())
+        if not builder.router_path.exists():
+            print(
+                f"[X] No router index at {builder.router_path}; run a build first",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        router = Router.load(builder.router_path)
+        profile = profile or builder.active_profiles()[0]
+
+        if dataset:
+            result = evaluate(router, load_routing_dataset(dataset), limit, profile)
+            passed = min_accuracy is None or result["accuracy"] >= min_accuracy
+            if as_json:
+                print(json.dumps({**result, "success": passed}, indent=2))
+            else:
+                print(
+                    f"  {result['tasks']} tasks: accuracy {result['accuracy']:.1%}, "
+                    f"recall@{limit} {result['recall']:.1%}, MRR {result['mrr']:.3f}"
+                )
+                print(
+                    f"  Routing time: {result['mean_ms']:.3f} ms mean, "
+                    f"{result['max_ms']:.3f} ms max"
+                )
+                for miss in result["misses"]:
+                    got = ", ".join(miss["got"]) or "-"
+                    print(f"  [!] {miss['task']}")
+                    print(f"      expected {', '.join(miss['expected'])}; got {got}")
+            if not passed:
+                sys.exit(1)
+            return
+
+        if not task:
+            raise click.UsageError("Give a task to route, or --eval")
+        matches = router.route(" ".join(task), limit, profile)
+        if as_json:
+            print(json.dumps(matches, indent=2))
+        elif not matches:
+            print("  No agent matches this task")
+        else:
+            for match in matches:
+                print(f"  {match['agent']:<28} {match['score']:>7.3f}")
+                print(f"      {match['description'][:100]}")
+    except click.UsageError:
+        raise
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.group("cache")
+def cache_group():
+    """Inspect or prune the shared artifact cache."""
+
+
+def open_cache_or_exit() -> ArtifactCache:
+    """Return the configured artifact cache or exit if it is disabled."""
+    cache = AgentBuilder(sink=QuietSink()).artifact_cache
+    if cache is None:
+        print(
+            "[X] Artifact cache is disabled "
+            "(set cache.enabled in build_config.yml or AGENT_BUILD_CACHE_DIR)",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    return cache
+
+
+@cache_group.command("stats")
+@click.option("--json", "as_json", is_flag=True, help="Print stats as JSON")
+def cache_stats(as_json: bool):
+    """Show size, entry count and hit ratio of the artifact cache."""
+    try:
+        stats = open_cache_or_exit().stats()
+        if as_json:
+            print(json.dumps(stats, indent=2))
+            return
+        print(f"Cache directory: {stats['directory']}")
+        print(f"Entries:         {stats['entries']}")
+        print(
+            f"Size:            {format_size(stats['size'])} "
+            f"of {format_size(stats['max_size'])}"
+        )
+        print(
+            f"Hits / misses:   {stats['hits']} / {stats['misses']} "
+            f"({stats['hit_ratio']:.0%} hit ratio)"
+        )
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@cache_group.command("prune")
+@click.option(
+    "--max-size",
+    default=None,
+    help="Evict least recently used entries down to this size (e.g. 100M, 0)",
+)
+def cache_prune(max_size: Optional[str]):
+    """Evict least recently used entries until the cache fits its limit."""
+    try:
+        cache = open_cache_or_exit()
+        removed, freed = cache.prune(max_size)
+        print(
+            f"Removed {removed} entr{'y' if removed == 1 else 'ies'}, "
+            f"freed {format_size(freed)}"
+        )
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("validate-dir")
+@click.argument("path", type=click.Path(exists=True))
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Worker processes (default: CPU count; 1 validates in-process)",
+)
+@click.option("--max-tokens", type=int, help="Token budget (default: config)")
+@click.option(
+    "--no-recursive", is_flag=True, help="Only validate files directly in PATH"
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "json", "jsonl"]),
+    default="table",
+    show_default=True,
+    help="jsonl streams one result per file as it completes",
+)
+@click.option("--output", type=click.Path(), help="Write the report to a file")
+@click.option("--strict", is_flag=True, help="Also fail on warnings")
+def validate_dir(
+    path: str,
+    workers: Optional[int],
+    max_tokens: Optional[int],
+    no_recursive: bool,
+    output_format: str,
+    output: Optional[str],
+    strict: bool,
+):
+    """
+    Validate already-compiled agent .md files under PATH.
+
+    Runs the build's validation rules (frontmatter, model allowlist, token
+    budget, bash syntax, dangerous commands) over hand-written, vendored
+    or installed agents. Example: build.py validate-dir ~/.claude/agents
+    """
+    try:
+        builder = AgentBuilder(sink=QuietSink())
+        if workers is None:
+            workers = os.cpu_count() or 1
+        stream = open(output, "w", encoding="utf-8") if output else sys.stdout
+        try:
+            results = []
+            paths = iter_markdown(Path(path).expanduser(), not no_recursive)
+            for result in validate_paths(builder, paths, workers, max_tokens):
+                results.append(result)
+                if output_format == "jsonl":
+                    stream.write(json.dumps(result) + "\n")
+            results.sort(key=lambda r: r["path"])
+            summary = summarize(results)
+
+            if output_format == "json":
+                json.dump({"summary": summary, "files": results}, stream, indent=2)
+                stream.write("\n")
+            elif output_format == "table":
+                for result in results:
+                    status = "[OK]" if result["valid"] else "[X] "
+                    if result["valid"] and result["warnings"]:
+                        status = "[!] "
+                    stream.write(
+                        f"  {status} {result['path']} ({result['tokens']} tokens)\n"
+                    )
+                    for error in result["errors"]:
+                        stream.write(f"       -> {error}\n")
+                    for warning in result["warnings"]:
+                        stream.write(f"       !  {warning}\n")
+                stream.write(
+                    f"\n  {summary['files']} file(s): {summary['valid']} valid, "
+                    f"{summary['invalid']} invalid, {summary['warnings']} warning(s)\n"
+                )
+        finally:
+            if output:
+                stream.close()
+
+        failed = summary["invalid"] or (strict and summary["warnings"])
+        sys.exit(1 if failed else 0)
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("analyze")
+@click.option(
+    "--agent",
+    "agents",
+    multiple=True,
+    help="Analyze only this agent (repeatable)",
+)
+@click.option(
+    "--top", default=3, show_default=True, help="Largest includes/loops shown"
+)
+@click.option("--json", "as_json", is_flag=True, help="Print reports as JSON")
+def analyze(agents: Tuple[str, ...], top: int, as_json: bool):
+    """
+    Report the static render cost of every template.
+
+    Walks each template's Jinja2 AST without rendering it: include depth,
+    fan-out, repeated includes, loop nesting and the estimated size and
+    token contribution of every include and loop. Exits 1 if a template
+    exceeds a limit in the analysis section of build_config.yml.
+    """
+    try:
+        builder = AgentBuilder(sink=QuietSink())
+        templates = builder.discover_templates()
+        if agents:
+            unknown = sorted(
+                set(agents) - {builder.template_name(t) for t in templates}
+            )
+            if unknown:
+                raise ValueError(f"Unknown agent(s): {', '.join(unknown)}")
+            templates = [t for t in templates if builder.template_name(t) in agents]
+        reports = {
+            builder.template_name(t): builder.analyze_template(t)
+            for t in sorted(templates, key=builder.template_name)
+        }
+        over = sorted(name for name, r in reports.items() if r["violations"])
+
+        if as_json:
+            print(json.dumps(reports, indent=2))
+        else:
+            print(
+                f"  {'agent':<28} {'depth':>5} {'fan-out':>7} {'inc-max':>7} "
+                f"{'loops':>5} {'~tokens':>8}"
+            )
+            for name, report in reports.items():
+                if "tokens" in report:
+                    print(
+                        f"  {name:<28} {report['include_depth']:>5} "
+                        f"{report['fan_out']:>7} {report['include_count']:>7} "
+                        f"{report['loop_depth']:>5} {report['tokens']:>8}"
+                    )
+                    for node in report["nodes"][:top]:
+                        print(
+                            f"      {node['kind']:<7} {node['label']:<44} "
+                            f"{node['tokens']:>6} tokens  "
+                            f"({node['template']}:{node['line']})"
+                        )
+                for violation in report["violations"]:
+                    print(f"  [X] {name}: {violation}")
+            print(f"\n  {len(reports)} template(s), {len(over)} over a limit")
+        sys.exit(1 if over else 0)
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("pattern-bench")
+@click.option(
+    "--size", default=2000, show_default=True, help="Characters per fuzz input"
+)
+@click.option(
+    "--samples", default=10, show_default=True, help="Random inputs per pattern"
+)
+@click.option("--seed", default=0, show_default=True, help="Fuzz seed")
+@click.option(
+    "--cap-ms",
+    default=2000,
+    show_default=True,
+    help="Stop a single match after this long",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print results as JSON")
+def pattern_bench(size: int, samples: int, seed: int, cap_ms: int, as_json: bool):
+    """
+    Fuzz dangerous command patterns and report worst-case match times.
+
+    Every pattern runs as written and as loaded (rewritten if risky)
+    against adversarial inputs built from its own literals. Exits 1 if a
+    loaded pattern exceeds validation.pattern_budget_ms.
+    """
+    try:
+        builder = AgentBuilder(sink=QuietSink())
+        dangerous_config = builder.load_dangerous_config() or {}
+        patterns = [
+            (category_name, pattern)
+            for category_name, category in dangerous_config.get(
+                "categories", {}
+            ).items()
+            for pattern in category.get("patterns", [])
+        ]
+        budget = builder.config["validation"].get(
+            "pattern_budget_ms", DEFAULT_BUDGET_MS
+        )
+        rows = benchmark(patterns, size, samples, seed, cap_ms)
+        over = [row for row in rows if row["effective_ms"] > budget]
+
+        if as_json:
+            print(json.dumps(rows, indent=2))
+        else:
+            print(f"  {'original':>10} {'loaded':>10}  status     pattern")
+            for row in rows:
+                status = (
+                    "risky"
+                    if row["risky"]
+                    else "rewritten" if row["rewritten"] else "ok"
+                )
+                print(
+                    f"  {row['original_ms']:>8.2f}ms {row['effective_ms']:>8.2f}ms"
+                    f"  {status:<10} {row['pattern']}"
+                )
+                if row["rewritten"]:
+                    print(f"  {'':>22}  -> {row['rewritten']}")
+            print(
+                f"\n  {len(rows)} pattern(s), {size}-character inputs, "
+                f"{len(over)} over the {budget:g} ms budget"
+            )
+        sys.exit(1 if over else 0)
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("history")
+@click.option("--agent", "agents", multiple=True, help="Only this agent (repeatable)")
+@click.option("--limit", default=10, show_default=True, help="Commits per agent")
+@click.option("--json", "as_json", is_flag=True, help="Print the trends as JSON")
+def history(agents: Tuple[str, ...], limit: int, as_json: bool):
+    """
+    Show each agent's token count over the recorded commits.
+
+    Example: build.py history --agent go-expert --limit 20
+    """
+    try:
+        builder = AgentBuilder(sink=QuietSink())
+        token_history = builder.open_history(force=True)
+        names = list(agents) or token_history.agents()
+        trends = {name: token_history.trend(name, limit) for name in names}
+
+        if as_json:
+            print(json.dumps(trends, indent=2))
+            return
+        if not any(trends.values()):
+            print(f"[X] No token history in {token_history.path}", file=sys.stderr)
+            sys.exit(1)
+        for name, series in trends.items():
+            if not series:
+                continue
+            first, last = series[0]["tokens"], series[-1]["tokens"]
+            change = (last - first) / first * 100 if first else 0.0
+            path = " -> ".join(str(point["tokens"]) for point in series)
+            print(
+                f"  {name:<28} {path}  ({change:+.1f}% over "
+                f"{len(series)} commit(s), now {short_sha(series[-1])})"
+            )
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("verify")
+@click.argument(
+    "install_dir", type=click.Path(file_okay=False), default="~/.claude/agents"
+)
+@click.option(
+    "--manifest",
+    type=click.Path(exists=True, dir_okay=False),
+    default="evidence.json",
+    show_default=True,
+    help="Release evidence manifest (scripts/generate-evidence.sh)",
+)
+@click.option(
+    "--root",
+    "expected_root",
+    help="Merkle root the manifest must produce (default: its merkle_root)",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Hashing threads (default: CPU count, at most 8)",
+)
+@click.option("--fail-fast", is_flag=True, help="Stop at the first difference found")
+@click.option("--allow-extra", is_flag=True, help="Do not fail on unreleased agents")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+def verify(
+    install_dir: str,
+    manifest: str,
+    expected_root: Optional[str],
+    workers: Optional[int],
+    fail_fast: bool,
+    allow_extra: bool,
+    as_json: bool,
+):
+    """
+    Check installed agents against a release evidence manifest.
+
+    Compares INSTALL_DIR (default ~/.claude/agents) with the manifest's
+    Merkle tree and reports modified, missing and extra agents. Exits 1 on
+    any difference (extra agents too, unless --allow-extra).
+    """
+    try:
+        entries, recorded_root = load_manifest(Path(manifest))
+        directory = Path(install_dir).expanduser()
+        if not directory.is_dir():
+            raise ValueError(f"Install directory not found: {directory}")
+        report = verify_install(
+            entries,
+            directory,
+            workers=workers,
+            fail_fast=fail_fast,
+            expected_root=expected_root or recorded_root,
+        )
+        drift = bool(
+            report["modified"]
+            or report["missing"]
+            or (report["extra"] and not allow_extra)
+        )
+
+        if as_json:
+            print(json.dumps({"manifest": manifest, **report}, indent=2))
+        else:
+            for label in ("modified", "missing", "extra"):
+                for name in report[label]:
+                    print(f"  [{'!' if label == 'extra' else 'X'}] {label:<8} {name}")
+            status = "matches" if report["ok"] else "differs from"
+            scope = "" if report["complete"] else " (stopped at first difference)"
+            print(
+                f"\n  {directory} {status} {manifest}{scope}: "
+                f"{len(entries)} released, {report['hashed']} hashed, "
+                f"{report['elapsed_ms']:.1f} ms"
+            )
+            print(f"  Merkle root: {report['root']}")
+        sys.exit(1 if drift else 0)
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,352 @@
+"""
+In-memory build API.
+
+AgentBuilder is driven by a checkout: it reads build_config.yml, renders
+templates from src/ and writes dist/. build_agents() compiles agents from
+mappings instead, so a service can render personalized agents on request
+and tests can build without a project directory:
+
+    report = build_agents(
+        templates={"go-expert": "---\\nname: go-expert\\n..."},
+        skills={"skills/common/cognitive_protocol.md": "..."},
+        context={"team": "payments"},
+    )
+    if report.ok:
+        prompt = report.agents["go-expert"].output
+
+Nothing is read from or written to disk: there is no output directory,
+artifact cache, token history, catalog or metrics file, and log records
+are kept in the report. Every build_agents() call uses its own builder, so
+concurrent calls share no state. A MemoryBuilder can also be kept and
+reused (templates are then parsed once); its builds are serialized.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from build import AgentBuilder
+from jinja2 import DictLoader, TemplateError
+from log_sinks import MemorySink
+from safe_patterns import DEFAULT_BUDGET_MS
+
+# Settings used for whatever the config mapping leaves out; the same
+# defaults as config/build_config.yml, minus everything that touches disk
+DEFAULT_CONFIG: Dict = {
+    "build": {
+        "source_dir": "src/agents",
+        "output_dir": "dist/agents",
+        "skills_dir": "src/skills",
+    },
+    "validation": {
+        "max_tokens": 2500,
+        "required_frontmatter": ["name", "description", "tools", "model"],
+        "allowed_models": ["sonnet", "haiku", "opus"],
+        "bash_backend": "python",
+        "pattern_safety": "rewrite",
+        "pattern_budget_ms": DEFAULT_BUDGET_MS,
+    },
+    "templates": {"file_extension": ".md.j2", "output_extension": ".md"},
+    "logging": {"show_warnings": True, "aggregate_warnings": False},
+}
+
+# Virtual project root; template paths are only used for naming
+MEMORY_ROOT = Path("<memory>")
+
+
+def merge_config(config: Optional[Dict]) -> Dict:
+    """
+    Overlay a (partial) build config on DEFAULT_CONFIG.
+
+    Sections are merged one level deep: {"validation": {"max_tokens": 900}}
+    keeps the default models and required fields.
+    """
+    if config is not None and not isinstance(config, dict):
+        raise ValueError("Build config must be a mapping")
+    merged = copy.deepcopy(DEFAULT_CONFIG)
+    for section, values in (config or {}).items():
+        default = merged.get(section)
+        if isinstance(default, dict):
+            if not isinstance(values, dict):
+                raise ValueError(f"Config section '{section}' must be a mapping")
+            merged[section] = {**default, **copy.deepcopy(values)}
+        else:
+            merged[section] = copy.deepcopy(values)
+    return merged
+
+
+class AgentResult:
+    """One compiled variant: its output, diagnostics and timings."""
+
+    def __init__(
+        self,
+        name: str,
+        template: str,
+        profile: str,
+        output: Optional[str],
+        report: Dict,
+        render_seconds: float = 0.0,
+        validation_seconds: float = 0.0,
+        optimization: Optional[Dict] = None,
+    ):
+        self.name = name
+        self.template = template
+        self.profile = profile
+        self.output = output
+        self.errors: List[str] = list(report["errors"])
+        self.warnings: List[str] = list(report["warnings"])
+        self.findings: List[Dict] = list(report.get("findings", []))
+        self.frontmatter: Dict = report.get("frontmatter") or {}
+        self.tokens: int = report.get("tokens", 0)
+        self.rule_timings: Dict[str, float] = dict(report.get("timings", {}))
+        self.skipped_rules: List[str] = list(report.get("skipped", []))
+        self.render_seconds = render_seconds
+        self.validation_seconds = validation_seconds
+        self.optimization = optimization
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    @property
+    def size(self) -> int:
+        return len(self.output.encode("utf-8")) if self.output else 0
+
+    @property
+    def sha256(self) -> Optional[str]:
+        if self.output is None:
+            return None
+        return hashlib.sha256(self.output.encode("utf-8")).hexdigest()
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "template": self.template,
+            "profile": self.profile,
+            "valid": self.valid,
+            "output": self.output,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "findings": self.findings,
+            "frontmatter": self.frontmatter,
+            "tokens": self.tokens,
+            "size": self.size,
+            "sha256": self.sha256,
+            "render_seconds": round(self.render_seconds, 6),
+            "validation_seconds": round(self.validation_seconds, 6),
+            "rule_timings": {k: round(v, 6) for k, v in self.rule_timings.items()},
+            "skipped_rules": self.skipped_rules,
+            "optimization": self.optimization,
+        }
+
+
+class BuildReport:
+    """Result of an in-memory build, with one AgentResult per variant."""
+
+    def __init__(
+        self,
+        results: List[AgentResult],
+        profiles: List[str],
+        seconds: float,
+        log: Optional[List[Dict]] = None,
+    ):
+        self.agents: Dict[str, AgentResult] = {r.name: r for r in results}
+        self.profiles = profiles
+        self.seconds = seconds
+        self.log = log or []
+
+    @property
+    def ok(self) -> bool:
+        return all(result.valid for result in self.agents.values())
+
+    @property
+    def failed(self) -> List[str]:
+        return [name for name, result in self.agents.items() if not result.valid]
+
+    @property
+    def tokens(self) -> int:
+        return sum(result.tokens for result in self.agents.values())
+
+    def outputs(self) -> Dict[str, str]:
+        """Rendered content of every valid variant, by name."""
+        return {
+            name: result.output
+            for name, result in self.agents.items()
+            if result.valid and result.output is not None
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "ok": self.ok,
+            "profiles": self.profiles,
+            "seconds": round(self.seconds, 6),
+            "tokens": self.tokens,
+            "failed": self.failed,
+            "agents": {name: r.to_dict() for name, r in self.agents.items()},
+            "log": self.log,
+        }
+
+
+class MemoryBuilder(AgentBuilder):
+    """
+    AgentBuilder whose sources, config and rules come from mappings.
+
+    templates maps agent names ("go-expert", or "go-expert.md.j2") to
+    template sources; skills maps include paths relative to src/
+    ("skills/common/cognitive_protocol.md") to their text. context is added
+    to the build context of every template, and dangerous_commands has the
+    structure of config/dangerous_commands.json (None: no command rules).
+    """
+
+    def __init__(
+        self,
+        templates: Dict[str, str],
+        skills: Optional[Dict[str, str]] = None,
+        config: Optional[Dict] = None,
+        context: Optional[Dict] = None,
+        dangerous_commands: Optional[Dict] = None,
+        sink=None,
+    ):
+        self._templates = dict(templates)
+        self._skills = dict(skills or {})
+        self._config_input = config
+        self._context = dict(context or {})
+        self._dangerous_input = dangerous_commands
+        self._lock = threading.Lock()
+        super().__init__(
+            root_dir=MEMORY_ROOT, sink=sink if sink is not None else MemorySink()
+        )
+
+    def load_config(self) -> Dict:
+        return merge_config(self._config_input)
+
+    def setup_environment(self):
+        """Serve templates and skills from memory; no directory is created."""
+        build = self.config["build"]
+        self.source_dir = self.root_dir / build["source_dir"]
+        self.output_dir = self.root_dir / build["output_dir"]
+        self.skills_dir = self.root_dir / build["skills_dir"]
+
+        extension = self.config["templates"]["file_extension"]
+        self.template_sources: Dict[str, str] = {}
+        for name, source in self._templates.items():
+            if not name.endswith(extension):
+                name += extension
+            self.template_sources[f"agents/{name}"] = source
+        self.env = self.make_environment(
+            DictLoader({**self._skills, **self.template_sources})
+        )
+        self.build_context = {**self.make_build_context(), **self._context}
+
+    def open_artifact_cache(self):
+        return None
+
+    def open_history(self, force: bool = False):
+        return None
+
+    def template_paths(self) -> List[Path]:
+        return [
+            self.source_dir / name[len("agents/") :]
+            for name in sorted(self.template_sources)
+        ]
+
+    def read_template_source(self, template_path: Path) -> str:
+        return self.template_sources[f"agents/{template_path.name}"]
+
+    def skill_texts(self) -> Dict[str, str]:
+        return dict(sorted(self._skills.items()))
+
+    def load_dangerous_config(self) -> Optional[Dict]:
+        if self._dangerous_input is None:
+            return None
+        if self._dangerous_config is None:
+            self._dangerous_config = (None, self._dangerous_input, None)
+        return self._dangerous_config[1]
+
+    def build(
+        self,
+        agents: Optional[List[str]] = None,
+        profiles: Optional[List[str]] = None,
+    ) -> BuildReport:
+        """
+        Render and validate every template (or the named agents) once per
+        active profile.
+
+        Raises:
+            ValueError: for unknown agents or profiles
+        """
+        with self._lock:
+            try:
+                return self._build(agents, profiles)
+            finally:
+                self.pattern_watchdog.close()
+
+    def _build(
+        self, agents: Optional[List[str]], profiles: Optional[List[str]]
+    ) -> BuildReport:
+        start = time.perf_counter()
+        log = self.sink.records if isinstance(self.sink, MemorySink) else []
+        first_record = len(log)
+
+        templates = self.template_paths()
+        if agents:
+            known = {self.template_name(t) for t in templates}
+            unknown = sorted(set(agents) - known)
+            if unknown:
+                raise ValueError(f"Unknown agent(s): {', '.join(unknown)}")
+            templates = [t for t in templates if self.template_name(t) in agents]
+        profiles = self.active_profiles(profiles)
+
+        results = [
+            self.build_variant(template_path, profile)
+            for profile in profiles
+            for template_path in templates
+            if self.profile_applies(template_path, profile)
+        ]
+        return BuildReport(
+            results, profiles, time.perf_counter() - start, log[first_record:]
+        )
+
+    def build_variant(self, template_path: Path, profile: str) -> AgentResult:
+        """Render and validate one variant without writing it."""
+        settings = self.get_profile(profile)
+        template_name = self.template_name(template_path)
+        name = f"{template_name}{settings.get('suffix', '')}"
+        filename = f"{name}{self.config['templates']['output_extension']}"
+        try:
+            rendered, report = self.render_and_inspect(template_path, profile, filename)
+        except TemplateError as e:
+            rendered = None
+            report = {"errors": [f"Template error: {e}"], "warnings": []}
+        observed = self.metrics.agents.get((name, profile), {})
+        return AgentResult(
+            name,
+            template_name,
+            profile,
+            rendered,
+            report,
+            observed.get("render_seconds", 0.0),
+            observed.get("validation_seconds", 0.0),
+            self.optimization.get(name),
+        )
+
+
+def build_agents(
+    templates: Dict[str, str],
+    skills: Optional[Dict[str, str]] = None,
+    config: Optional[Dict] = None,
+    context: Optional[Dict] = None,
+    dangerous_commands: Optional[Dict] = None,
+    agents: Optional[List[str]] = None,
+    profiles: Optional[List[str]] = None,
+) -> BuildReport:
+    """
+    Compile agents from in-memory sources; see MemoryBuilder for arguments.
+
+    Safe to call from several threads at once.
+    """
+    builder = MemoryBuilder(templates, skills, config, context, dangerous_commands)
+    return builder.build(agents, profiles)
@@ -0,0 +1,184 @@
+"""
+Bulk validation of already-compiled agents.
+
+Runs the same rule registry as the build (frontmatter, model allowlist,
+token budget, bash syntax, dangerous commands) over every .md file under
+a directory, such as ~/.claude/agents or a vendor pack:
+
+    python scripts/build.py validate-dir ~/.claude/agents --format jsonl
+
+Directory entries are streamed with os.scandir() rather than listed up
+front, files are read through mmap, and batches of files are validated in
+worker processes, each with its own AgentBuilder. At most a few batches
+per worker are in flight, so memory stays flat on very large trees.
+"""
+
+import mmap
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+BATCH_SIZE = 32
+
+# Set in each worker process by init_worker()
+_worker_builder = None
+
+
+def iter_markdown(root: Union[str, Path], recursive: bool = True) -> Iterator[Path]:
+    """
+    Yield .md files under root, streaming directory entries.
+
+    Symlinked directories are not followed (no cycles); symlinked files are.
+    A single file path yields itself.
+    """
+    root = Path(root)
+    if root.is_file():
+        yield root
+        return
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                subdirs = []
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and not entry.name.startswith("."):
+                                subdirs.append(entry.path)
+                        elif entry.name.endswith(".md") and entry.is_file():
+                            yield Path(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        pending.extend(sorted(subdirs, reverse=True))
+
+
+def read_text(path: Path) -> str:
+    """Read a UTF-8 file through mmap (empty files cannot be mapped)."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:size].decode("utf-8")
+
+
+def validate_file(builder, path: Path, max_tokens: Optional[int] = None) -> Dict:
+    """Validate one compiled agent and describe the result."""
+    result = {
+        "path": str(path),
+        "valid": False,
+        "errors": [],
+        "warnings": [],
+        "name": None,
+        "model": None,
+        "tokens": 0,
+        "size": 0,
+    }
+    try:
+        content = read_text(path)
+    except UnicodeDecodeError as e:
+        result["errors"].append(f"File is not valid UTF-8: {e.reason}")
+        return result
+    except OSError as e:
+        result["errors"].append(f"Could not read file: {e.strerror or e}")
+        return result
+
+    report = builder.inspect_output(content, path.name, max_tokens)
+    frontmatter = report["frontmatter"] or {}
+    result.update(
+        valid=not report["errors"],
+        errors=report["errors"],
+        warnings=report["warnings"],
+        name=frontmatter.get("name"),
+        model=frontmatter.get("model"),
+        tokens=report["tokens"],
+        size=len(content.encode("utf-8")),
+    )
+    return result
+
+
+def init_worker(root_dir: str, config_path: str, overrides: Dict):
+    """Create the AgentBuilder a worker process validates with."""
+    global _worker_builder
+    from build import AgentBuilder
+    from log_sinks import QuietSink
+
+    _worker_builder = AgentBuilder(
+        config_path=config_path, root_dir=Path(root_dir), sink=QuietSink()
+    )
+    _worker_builder.config["validation"].update(overrides)
+
+
+def validate_batch(paths: List[str], max_tokens: Optional[int]) -> List[Dict]:
+    return [validate_file(_worker_builder, Path(p), max_tokens) for p in paths]
+
+
+def batched(paths: Iterable[Path], size: int) -> Iterator[List[str]]:
+    batch: List[str] = []
+    for path in paths:
+        batch.append(str(path))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_paths(
+    builder,
+    paths: Iterable[Path],
+    workers: int = 1,
+    max_tokens: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[Dict]:
+    """
+    Validate files and yield results as they complete.
+
+    With workers > 1, batches are validated in worker processes built from
+    the builder's root directory, config file and validation settings;
+    results then arrive in completion order, not path order.
+    """
+    if workers <= 1:
+        for path in paths:
+            yield validate_file(builder, Path(path), max_tokens)
+        return
+
+    init_args = (
+        str(builder.root_dir),
+        str(builder.config_path),
+        dict(builder.config["validation"]),
+    )
+    batches = batched(paths, batch_size)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=init_args
+    ) as executor:
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            # Keep every worker busy without materializing the whole tree
+            while not exhausted and len(in_flight) < workers * 2:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                else:
+                    in_flight.add(executor.submit(validate_batch, batch, max_tokens))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def summarize(results: List[Dict]) -> Dict:
+    """Count files, failures, warnings and tokens of a validation run."""
+    return {
+        "files": len(results),
+        "valid": sum(1 for r in results if r["valid"]),
+        "invalid": sum(1 for r in results if not r["valid"]),
+        "warnings": sum(len(r["warnings"]) for r in results),
+        "tokens": sum(r["tokens"] for r in results),
+    }
@@ -0,0 +1,138 @@
+"""
+Prompt-cache-friendly layout for compiled agents.
+
+Provider-side prompt caching only reuses an identical prefix. This module
+moves shared skill content to the top of each agent (in one canonical order
+for the whole catalog), keeps agent-specific sections after it and pushes
+sections that embed volatile build values (such as the build timestamp) to
+the very end. It also measures how long a prefix each agent shares with the
+rest of the catalog.
+"""
+
+import re
+from typing import Callable, Dict, Iterable, List
+
+from minify import split_fences, split_frontmatter
+
+SECTION_RE = re.compile(r"^#{1,2}\s")
+
+
+def collapse_blank_lines(text: str) -> str:
+    """Collapse runs of blank lines outside code fences."""
+    lines: List[str] = []
+    for is_code, segment in split_fences(text):
+        for line in segment:
+            if not is_code and not line.strip() and lines and not lines[-1].strip():
+                continue
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def split_sections(body: str) -> List[str]:
+    """Split a Markdown body at level 1-2 headings outside code fences."""
+    sections: List[List[str]] = [[]]
+    for is_code, lines in split_fences(body):
+        for line in lines:
+            if not is_code and SECTION_RE.match(line) and any(sections[-1]):
+                sections.append([])
+            sections[-1].append(line)
+    return ["\n".join(section) for section in sections]
+
+
+def reorder_for_cache(
+    document: str,
+    shared_blocks: Iterable[str],
+    volatile_values: Iterable[str] = (),
+) -> str:
+    """
+    Reorder a compiled agent so shared content forms its prefix.
+
+    Args:
+        document: Rendered agent including frontmatter.
+        shared_blocks: Rendered skill texts in canonical catalog order. Each
+            block found in the body is moved, in this order, to the top.
+        volatile_values: Strings that change between builds; sections that
+            contain one are moved to the end.
+
+    Frontmatter stays first and is otherwise unchanged.
+    """
+    frontmatter, body = split_frontmatter(document)
+    volatile_values = [v for v in volatile_values if v]
+
+    moved: List[str] = []
+    for block in shared_blocks:
+        text = block.strip("\n")
+        if text and text in body:
+            body = body.replace(text, "", 1)
+            moved.append(text)
+
+    stable: List[str] = []
+    volatile: List[str] = []
+    for section in split_sections(collapse_blank_lines(body)):
+        section = section.strip("\n")
+        if not section:
+            continue
+        if any(value in section for value in volatile_values):
+            volatile.append(section)
+        else:
+            stable.append(section)
+
+    reordered = "\n\n".join(moved + stable + volatile) + "\n"
+    if not frontmatter:
+        return reordered
+    return frontmatter.rstrip("\n") + "\n\n" + reordered
+
+
+def common_prefix_length(left: str, right: str) -> int:
+    """Return the length of the longest common prefix of two strings."""
+    limit = min(len(left), len(right))
+    i = 0
+    while i < limit and left[i] == right[i]:
+        i += 1
+    return i
+
+
+def shared_prefix_report(
+    documents: Dict[str, str], token_counter: Callable[[str], int]
+) -> List[Dict]:
+    """
+    Measure each agent's longest prompt prefix shared with another agent.
+
+    Frontmatter is ignored because it is not part of the system prompt.
+    After sorting the bodies, the longest common prefix of any body is found
+    with one of its sorted neighbours, so this runs in O(n log n) compares.
+
+    Returns:
+        One row per agent with prefix_tokens, total_tokens, the cacheable
+        ratio and the agent it shares the prefix with, longest prefix first.
+    """
+    bodies = {name: split_frontmatter(text)[1] for name, text in documents.items()}
+    ordered = sorted(bodies, key=lambda name: (bodies[name], name))
+
+    rows = []
+    for i, name in enumerate(ordered):
+        best_length, partner = 0, None
+        for j in (i - 1, i + 1):
+            if 0 <= j < len(ordered):
+                length = common_prefix_length(bodies[name], bodies[ordered[j]])
+                if length > best_length:
+                    best_length, partner = length, ordered[j]
+
+        prefix = bodies[name][:best_length]
+        if best_length < len(bodies[name]) and not prefix[-1:].isspace():
+            # Only count whole words of a prefix that ends mid-word
+            prefix = prefix[: max(prefix.rfind(" "), prefix.rfind("\n")) + 1]
+        total = token_counter(bodies[name])
+        prefix_tokens = token_counter(prefix)
+        rows.append(
+            {
+                "agent": name,
+                "prefix_tokens": prefix_tokens,
+                "total_tokens": total,
+                "ratio": round(prefix_tokens / total, 3) if total else 0.0,
+                "shared_with": partner,
+            }
+        )
+
+    rows.sort(key=lambda row: (-row["prefix_tokens"], row["agent"]))
+    return rows
@@ -0,0 +1,192 @@
+"""
+Cross-agent near-duplicate content detection.
+
+Rendered agents are split into paragraphs, each paragraph is reduced to a
+MinHash signature over word shingles, and locality-sensitive hashing (LSH)
+buckets signatures by band so only likely matches are compared. This keeps
+the analysis near-linear in the number of paragraphs instead of comparing
+every pair of agents.
+
+Paragraphs that already come from a shared skill are excluded, so the
+report only lists copy-pasted passages that could still be extracted.
+"""
+
+import random
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from minify import split_fences, split_frontmatter
+
+# Mersenne prime used for universal hashing of shingle ids
+_PRIME = (1 << 61) - 1
+
+
+def estimate_tokens(text: str) -> int:
+    """Word-based token estimate matching AgentBuilder.estimate_tokens."""
+    return int(len(text.split()) * 1.3)
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace so formatting never hides a copy."""
+    return " ".join(text.lower().split())
+
+
+def split_paragraphs(text: str, min_words: int = 15) -> List[str]:
+    """
+    Split a Markdown document into paragraphs of at least min_words words.
+
+    Frontmatter is skipped; each fenced code block counts as one paragraph.
+    """
+    _, body = split_frontmatter(text)
+    result: List[str] = []
+    for is_code, lines in split_fences(body):
+        blocks = ["\n".join(lines)] if is_code else "\n".join(lines).split("\n\n")
+        for block in blocks:
+            block = block.strip()
+            if len(block.split()) >= min_words:
+                result.append(block)
+    return result
+
+
+class MinHasher:
+    """Compute fixed-size MinHash signatures over word shingles."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        rng = random.Random(seed)
+        self.shingle_size = shingle_size
+        self.permutations = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def shingles(self, text: str) -> List[int]:
+        """Hash every run of shingle_size consecutive words."""
+        words = normalize(text).split()
+        size = min(self.shingle_size, len(words))
+        return list(
+            {
+                zlib.crc32(" ".join(words[i : i + size]).encode("utf-8"))
+                for i in range(len(words) - size + 1)
+            }
+        )
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """Return the MinHash signature of text."""
+        shingles = self.shingles(text)
+        if not shingles:
+            return tuple(0 for _ in self.permutations)
+        return tuple(
+            min((a * shingle + b) % _PRIME for shingle in shingles)
+            for a, b in self.permutations
+        )
+
+
+def similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+    """Estimate Jaccard similarity from two signatures."""
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+def find_near_duplicates(
+    documents: Dict[str, str],
+    threshold: float = 0.8,
+    min_words: int = 15,
+    exclude: Iterable[str] = (),
+    bands: int = 16,
+    hasher: Optional[MinHasher] = None,
+    token_counter: Callable[[str], int] = estimate_tokens,
+) -> List[Dict]:
+    """
+    Find paragraphs repeated (exactly or nearly) across documents.
+
+    Args:
+        documents: Mapping of agent name to rendered Markdown.
+        threshold: Minimum estimated Jaccard similarity for a match.
+        min_words: Ignore paragraphs shorter than this.
+        exclude: Texts (e.g. shared skills) whose paragraphs are skipped.
+        bands: LSH bands; must divide the signature length.
+
+    Returns:
+        Findings sorted by tokens_saved, each with the agents involved, the
+        occurrences and a sample paragraph. tokens_saved is the size of all
+        copies except one, i.e. what extracting a shared skill would remove
+        from the templates.
+    """
+    hasher = hasher or MinHasher()
+    rows = len(hasher.permutations) // bands
+    if rows * bands != len(hasher.permutations):
+        raise ValueError("bands must divide the number of permutations")
+
+    excluded = {
+        normalize(paragraph)
+        for text in exclude
+        for paragraph in split_paragraphs(text, min_words)
+    }
+
+    occurrences: List[Tuple[str, str]] = []
+    signatures: List[Tuple[int, ...]] = []
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+    for agent, text in sorted(documents.items()):
+        for paragraph in split_paragraphs(text, min_words):
+            if normalize(paragraph) in excluded:
+                continue
+            index = len(occurrences)
+            signature = hasher.signature(paragraph)
+            occurrences.append((agent, paragraph))
+            signatures.append(signature)
+            for band in range(bands):
+                key = (band, signature[band * rows : (band + 1) * rows])
+                buckets[key].append(index)
+
+    # Union-find over candidate pairs that share at least one LSH bucket
+    parent = list(range(len(occurrences)))
+    best: Dict[int, float] = {}
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for i in members:
+            for j in members:
+                if j <= i or (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                score = similarity(signatures[i], signatures[j])
+                if score >= threshold:
+                    root_i, root_j = find(i), find(j)
+                    if root_i != root_j:
+                        parent[root_j] = root_i
+                    best[i] = max(best.get(i, 0.0), score)
+                    best[j] = max(best.get(j, 0.0), score)
+
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for index in best:
+        clusters[find(index)].append(index)
+
+    findings = []
+    for members in clusters.values():
+        agents = sorted({occurrences[i][0] for i in members})
+        if len(agents) < 2:
+            continue
+        tokens = sorted((token_counter(occurrences[i][1]) for i in members))
+        findings.append(
+            {
+                "tokens_saved": sum(tokens[:-1]),
+                "similarity": round(min(best[i] for i in members), 2),
+                "agents": agents,
+                "occurrences": [
+                    {"agent": occurrences[i][0], "text": occurrences[i][1]}
+                    for i in sorted(members)
+                ],
+                "sample": occurrences[min(members)][1],
+            }
+        )
+
+    findings.sort(key=lambda f: (-f["tokens_saved"], f["agents"]))
+    return findings
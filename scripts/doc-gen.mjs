@@ -2,8 +2,10 @@
 /**
  * Agent Library Documentation Generator
  * 
- * Scans src/agents/*.md.j2 templates and generates a Docusaurus-compatible
- * library page listing all available agents with their capabilities.
+ * Reads the catalog.json written by scripts/build.py (falling back to scanning
+ * src/agents/*.md.j2 templates when no build has run) and generates a
+ * Docusaurus-compatible library page listing all available agents with their
+ * capabilities.
  */
 
 import { readFileSync, writeFileSync, readdirSync, existsSync, mkdirSync } from 'fs';
@@ -15,6 +17,7 @@ const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
 
 const AGENTS_DIR = join(__dirname, '..', 'src', 'agents');
+const CATALOG_FILE = join(__dirname, '..', '.claude', 'agents', 'catalog.json');
 const OUTPUT_DIR = join(__dirname, '..', 'docs-site', 'docs');
 const OUTPUT_FILE = join(OUTPUT_DIR, 'library.md');
 
@@ -102,13 +105,53 @@ function parseTools(toolsValue) {
 }
 
 /**
- * Main generator function
+ * Build a library entry from an agent id and its parsed frontmatter
  */
-function generateLibrary() {
-  console.log('Scanning agent templates...');
-  console.log(`Agents Dir: ${AGENTS_DIR}`);
-  console.log(`Output File: ${OUTPUT_FILE}`);
+function toAgent(id, filename, frontmatter) {
+  const rawModel = frontmatter.model || 'sonnet';
+  const tools = Array.isArray(frontmatter.tools)
+    ? frontmatter.tools
+    : parseTools(frontmatter.tools);
+
+  return {
+    filename: filename,
+    id: id,
+    name: toTitleCase(frontmatter.name || id),
+    description: frontmatter.description || 'No description available',
+    model: MODEL_MAP[rawModel] || rawModel,
+    tools: tools
+  };
+}
 
+/**
+ * Load agents from the build catalog (null when no build has run)
+ */
+function loadCatalogAgents() {
+  if (!existsSync(CATALOG_FILE)) return null;
+
+  let catalog;
+  try {
+    catalog = JSON.parse(readFileSync(CATALOG_FILE, 'utf-8'));
+  } catch (err) {
+    console.warn(`Warning: Ignoring unreadable catalog ${CATALOG_FILE}: ${err.message}`);
+    return null;
+  }
+
+  // One entry per agent: profile variants (x-lite) share the full agent's page
+  return Object.keys(catalog.agents || {})
+    .filter(id => (catalog.agents[id].profile || 'full') === 'full')
+    .sort()
+    .map(id => {
+      const entry = catalog.agents[id];
+      const filename = entry.template.split('/').pop();
+      return toAgent(id, filename, entry.frontmatter || {});
+    });
+}
+
+/**
+ * Load agents by parsing the frontmatter of every source template
+ */
+function scanTemplateAgents() {
   if (!existsSync(AGENTS_DIR)) {
     console.error(`Error: Agents directory not found: ${AGENTS_DIR}`);
     process.exit(1);
@@ -126,20 +169,28 @@ function generateLibrary() {
     const frontmatter = extractFrontmatter(content);
 
     if (frontmatter) {
-      const id = template.replace('.md.j2', '');
-      const rawModel = frontmatter.model || 'sonnet';
-
-      agents.push({
-        filename: template,
-        id: id,
-        name: toTitleCase(frontmatter.name || id),
-        description: frontmatter.description || 'No description available',
-        model: MODEL_MAP[rawModel] || rawModel,
-        tools: parseTools(frontmatter.tools)
-      });
+      agents.push(toAgent(template.replace('.md.j2', ''), template, frontmatter));
     }
   }
 
+  return agents;
+}
+
+/**
+ * Main generator function
+ */
+function generateLibrary() {
+  console.log(`Output File: ${OUTPUT_FILE}`);
+
+  let agents = loadCatalogAgents();
+  if (agents) {
+    console.log(`Using build catalog: ${CATALOG_FILE}`);
+  } else {
+    console.log('No build catalog found, scanning agent templates...');
+    console.log(`Agents Dir: ${AGENTS_DIR}`);
+    agents = scanTemplateAgents();
+  }
+
   // Generate markdown
   let markdown = `---
 sidebar_position: 2
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Eval pipeline commands: sharded, batch-graded and sequential Promptfoo runs.
+
+These commands run and score the agent evals in eval/; they do not render
+or validate agents, so they live apart from build.py.
+
+Usage:
+    python scripts/eval_cli.py shard --shard 3/16   # Split eval datasets
+    python scripts/eval_cli.py merge eval/results-*.json  # Merge shards
+    python scripts/eval_cli.py grade eval/results.json  # Batched rubrics
+    python scripts/eval_cli.py sequential   # Repeat trials until decided
+"""
+
+import json
+import sys
+from pathlib import Path
+from typing import Optional, Tuple
+
+import click
+from eval_shards import (
+    config_datasets,
+    config_threshold,
+    load_eval_config,
+    merge_results,
+    parse_shard,
+    shard_filename,
+    write_shard,
+)
+from rubric_grading import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_CHARS,
+    AnthropicGrader,
+    BatchGrader,
+    CommandGrader,
+    config_grader_model,
+)
+from rubric_grading import defer_rubrics as defer_rubric_assertions
+from rubric_grading import grade_file, stub_grader
+from sequential_eval import (
+    DEFAULT_ALPHA,
+    DEFAULT_BETA,
+    DEFAULT_CONFIDENCE,
+    DEFAULT_DELTA,
+    DEFAULT_MAX_ROUNDS,
+    DEFAULT_MIN_TRIALS,
+    DEFAULT_RUNNER,
+    METHODS,
+    SequentialTest,
+    command_runner,
+    config_prompts,
+    run_sequential,
+    select_prompts,
+)
+
+EVAL_CONFIG = Path(__file__).parent.parent / "eval" / "promptfoo.yaml"
+
+
+@click.group()
+def main():
+    """
+    Run the agent evals in shards, grade rubrics in batches and repeat
+    trials until each agent's pass rate is decided.
+    """
+
+
+@main.command("shard")
+@click.option("--shard", required=True, help="Shard to write, as INDEX/COUNT (3/16)")
+@click.option(
+    "--dataset",
+    "datasets",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="JSONL dataset (repeatable; default: tests in promptfoo.yaml)",
+)
+@click.option(
+    "--config",
+    "config_path",
+    default=str(EVAL_CONFIG),
+    type=click.Path(dir_okay=False),
+    help="Promptfoo config the datasets are read from",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    help="Shard file (default: eval/shards/shard-INDEX-of-COUNT.jsonl)",
+)
+@click.option(
+    "--defer-rubrics",
+    is_flag=True,
+    help="Leave llm-rubric assertions to grade (batched grading)",
+)
+def eval_shard(
+    shard: str,
+    datasets: Tuple[str, ...],
+    config_path: str,
+    output: Optional[str],
+    defer_rubrics: bool,
+):
+    """
+    Write one shard of the eval datasets for a CI matrix job.
+
+    Rows are streamed and split round-robin, so shards are the same size
+    and stable for a given dataset. Run Promptfoo on the shard with
+    --tests, then combine the result files with merge. With
+    --defer-rubrics, grade the results with grade first.
+    """
+    try:
+        selected = parse_shard(shard)
+        paths = [Path(d) for d in datasets]
+        if not paths:
+            paths = config_datasets(load_eval_config(config_path), config_path)
+        if not paths:
+            raise ValueError(f"No JSONL datasets listed under tests: in {config_path}")
+        target = Path(
+            output or EVAL_CONFIG.parent / "shards" / shard_filename(selected)
+        )
+        transform = defer_rubric_assertions if defer_rubrics else None
+        count = write_shard(paths, target, selected, transform)
+        print(f"[OK] Shard {selected[0]}/{selected[1]}: {count} test(s) -> {target}")
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("merge")
+@click.argument(
+    "results", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False)
+)
+@click.option(
+    "--threshold",
+    type=float,
+    help="Score a test needs to pass (default: defaultTest.threshold)",
+)
+@click.option(
+    "--min-pass-rate",
+    type=float,
+    help="Pass when at least this share of tests passed (default: all must)",
+)
+@click.option(
+    "--config",
+    "config_path",
+    default=str(EVAL_CONFIG),
+    type=click.Path(dir_okay=False),
+    help="Promptfoo config the default threshold is read from",
+)
+@click.option("--output", type=click.Path(), help="Write the merged report as JSON")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+def eval_merge(
+    results: Tuple[str, ...],
+    threshold: Optional[float],
+    min_pass_rate: Optional[float],
+    config_path: str,
+    output: Optional[str],
+    as_json: bool,
+):
+    """
+    Combine per-shard Promptfoo results into one pass/fail report.
+
+    Exits 1 when the merged run fails.
+    """
+    try:
+        if threshold is None and Path(config_path).exists():
+            threshold = config_threshold(load_eval_config(config_path))
+        report = merge_results(results, threshold, min_pass_rate)
+        if output:
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+        if as_json:
+            print(json.dumps(report, indent=2))
+        else:
+            limit = f", threshold {threshold:g}" if threshold is not None else ""
+            print(
+                f"  {report['tests']} test(s) from {report['shards']} shard(s): "
+                f"{report['passed']} passed, {report['failed']} failed "
+                f"({report['errors']} error(s)), pass rate "
+                f"{report['pass_rate']:.1%}{limit}"
+            )
+            for failure in report["failures"]:
+                task = json.dumps(failure["vars"], ensure_ascii=False)
+                print(
+                    f"    [X] {failure['shard']} {failure['prompt'] or ''} "
+                    f"score {failure['score']:g}: {task[:80]}"
+                )
+            status = "[OK] Eval passed" if report["success"] else "[X] Eval failed"
+            print(status)
+        if not report["success"]:
+            sys.exit(1)
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("grade")
+@click.argument(
+    "results", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False)
+)
+@click.option(
+    "--grader",
+    "grader_kind",
+    type=click.Choice(["anthropic", "command", "stub"]),
+    default="anthropic",
+    show_default=True,
+    help="stub grades offline from rubric keywords (pipeline tests only)",
+)
+@click.option(
+    "--grader-command",
+    help="Command for --grader command (request on stdin, verdicts on stdout)",
+)
+@click.option(
+    "--model",
+    help="Grader model (default: defaultTest.options.provider, else Haiku)",
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Rubrics graded per grader call",
+)
+@click.option(
+    "--max-chars",
+    default=DEFAULT_MAX_CHARS,
+    show_default=True,
+    help="Characters of outputs and rubrics per grader call",
+)
+@click.option("--workers", default=2, show_default=True, help="Concurrent calls")
+@click.option(
+    "--config",
+    "config_path",
+    default=str(EVAL_CONFIG),
+    type=click.Path(dir_okay=False),
+    help="Promptfoo config the grader model is read from",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+def eval_grade(
+    results: Tuple[str, ...],
+    grader_kind: str,
+    grader_command: Optional[str],
+    model: Optional[str],
+    batch_size: int,
+    max_chars: int,
+    workers: int,
+    config_path: str,
+    as_json: bool,
+):
+    """
+    Grade deferred llm-rubric assertions of Promptfoo results in batches.
+
+    Packs many (output, rubric) pairs into each grader call and updates
+    the result files in place; run it on results of tests written with
+    shard --defer-rubrics, before merge.
+    """
+    try:
+        if grader_kind == "stub":
+            grader = stub_grader
+        elif grader_kind == "command":
+            if not grader_command:
+                raise ValueError("--grader command needs --grader-command")
+            grader = CommandGrader(grader_command)
+        else:
+            if model is None:
+                config = (
+                    load_eval_config(config_path) if Path(config_path).exists() else {}
+                )
+                model = config_grader_model(config)
+            grader = AnthropicGrader(model)
+
+        reports = {}
+        for path in results:
+            batch_grader = BatchGrader(grader, batch_size, max_chars, workers)
+            reports[path] = grade_file(path, batch_grader)
+
+        if as_json:
+            print(json.dumps(reports, indent=2))
+        else:
+            for path, report in reports.items():
+                print(
+                    f"  {path}: {report['items']} rubric(s) in "
+                    f"{report['calls']} grader call(s), {report['passed']} passed, "
+                    f"{report['failed']} failed"
+                )
+                if report["fallbacks"] or report["invalid"]:
+                    print(
+                        f"    [!] {report['fallbacks']} batch(es) regraded one "
+                        f"item at a time, {report['invalid']} invalid reply(ies)"
+                    )
+                if report["errors"]:
+                    print(
+                        f"    [!] {report['errors']} grader request(s) failed after "
+                        f"{report['retries']} retry(ies); their rubrics failed"
+                    )
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+@main.command("sequential")
+@click.option("--agent", "agents", multiple=True, help="Only this agent (repeatable)")
+@click.option(
+    "--method",
+    type=click.Choice(METHODS),
+    default="sprt",
+    show_default=True,
+    help="Stopping rule: sequential probability ratio test or Wilson interval",
+)
+@click.option(
+    "--pass-rate",
+    type=float,
+    help="Pass rate an agent needs (default: defaultTest.threshold)",
+)
+@click.option(
+    "--threshold",
+    type=float,
+    help="Score one result needs to pass (default: defaultTest.threshold)",
+)
+@click.option(
+    "--delta",
+    default=DEFAULT_DELTA,
+    show_default=True,
+    help="SPRT indifference zone around the pass rate",
+)
+@click.option("--alpha", default=DEFAULT_ALPHA, show_default=True, help="SPRT")
+@click.option("--beta", default=DEFAULT_BETA, show_default=True, help="SPRT")
+@click.option(
+    "--confidence",
+    default=DEFAULT_CONFIDENCE,
+    show_default=True,
+    help="Confidence of the reported (and wilson) intervals",
+)
+@click.option(
+    "--min-trials",
+    default=DEFAULT_MIN_TRIALS,
+    show_default=True,
+    help="Trials before a wilson decision",
+)
+@click.option("--max-rounds", default=DEFAULT_MAX_ROUNDS, show_default=True, help="Cap")
+@click.option(
+    "--repeat", default=1, show_default=True, help="Trials per test in a round"
+)
+@click.option(
+    "--runner-command",
+    default=DEFAULT_RUNNER,
+    show_default=True,
+    help="Command for one round ({config} {prompts} {repeat} {output} {round})",
+)
+@click.option(
+    "--config",
+    "config_path",
+    default=str(EVAL_CONFIG),
+    type=click.Path(dir_okay=False),
+    help="Promptfoo config the agents and threshold are read from",
+)
+@click.option(
+    "--output-dir",
+    default=str(EVAL_CONFIG.parent / "sequential"),
+    show_default=True,
+    help="Where round results are written",
+)
+@click.option("--output", type=click.Path(), help="Write the report as JSON")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+def eval_sequential(
+    agents: Tuple[str, ...],
+    method: str,
+    pass_rate: Optional[float],
+    threshold: Optional[float],
+    delta: float,
+    alpha: float,
+    beta: float,
+    confidence: float,
+    min_trials: int,
+    max_rounds: int,
+    repeat: int,
+    runner_command: str,
+    config_path: str,
+    output_dir: str,
+    output: Optional[str],
+    as_json: bool,
+):
+    """
+    Repeat eval rounds per agent until its pass rate is clearly decided.
+
+    Each round runs the tests of the agents still undecided; an agent
+    stops once the stopping rule settles whether its pass rate is above
+    or below the threshold. Exits 1 when an agent fails.
+    """
+    try:
+        config = load_eval_config(config_path)
+        if threshold is None:
+            threshold = config_threshold(config)
+        if pass_rate is None:
+            pass_rate = threshold
+        if pass_rate is None:
+            raise ValueError(
+                f"No --pass-rate given and no defaultTest.threshold in {config_path}"
+            )
+        prompts = select_prompts(config_prompts(config, config_path), agents)
+        if not prompts:
+            raise ValueError(
+                f"No file:// prompts listed under prompts: in {config_path}"
+            )
+        test = SequentialTest(
+            pass_rate, method, delta, alpha, beta, confidence, min_trials
+        )
+        runner = command_runner(runner_command, config_path, output_dir, repeat)
+        log = None if as_json else print
+        report = run_sequential(prompts, runner, test, max_rounds, threshold, log)
+        if output:
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+
+        if as_json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(
+                f"\n  {'agent':<28} {'decision':<14} {'trials':>6} "
+                f"{'rate':>6}  {confidence:.0%} interval"
+            )
+            for name, agent in report["agents"].items():
+                decision = agent["decision"] + (
+                    " (max)" if agent["inconclusive"] else ""
+                )
+                low, high = agent["interval"]
+                print(
+                    f"  {name:<28} {decision:<14} {agent['trials']:>6} "
+                    f"{agent['pass_rate']:>6.1%}  [{low:.1%}, {high:.1%}]"
+                )
+            print(
+                f"\n  {report['trials']} trial(s) in {report['rounds']} round(s) "
+                f"({method}, pass rate {pass_rate:g}); fixed repetition: "
+                f"{report['fixed_trials']}"
+            )
+            status = "[OK] Eval passed" if report["passed"] else "[X] Eval failed"
+            print(status)
+        if not report["passed"]:
+            sys.exit(1)
+    except Exception as e:
+        print(f"\n[X] Fatal error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
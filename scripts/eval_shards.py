@@ -0,0 +1,277 @@
+"""
+Streaming, sharded eval datasets and merged Promptfoo results.
+
+Large regression suites are split across CI runners instead of being
+evaluated on one box:
+
+    python scripts/eval_cli.py shard --shard 3/16
+    npx promptfoo eval -c eval/promptfoo.yaml \\
+        --tests eval/shards/shard-3-of-16.jsonl --output eval/results-3-of-16.json
+    python scripts/eval_cli.py merge eval/results-*-of-16.json
+
+Datasets are read one line at a time. Rows are assigned to shards
+round-robin by their position across all datasets, so every runner gets
+the same share and the split only changes when the datasets do. Rows of
+other shards are counted but never parsed; a shard's rows are validated
+as they are read, and errors name the file and line.
+
+The merge step streams the shard result files one at a time and applies
+defaultTest.threshold from promptfoo.yaml the way Promptfoo does: a test
+passes when its assertion score reaches the threshold, and the merged
+run fails when any test failed (or, with a minimum pass rate, when too
+few passed).
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import yaml
+
+# Failing tests listed in a merged report
+MAX_FAILURES = 50
+
+
+class DatasetError(ValueError):
+    """A dataset row that is not valid JSON or not a Promptfoo test case."""
+
+    def __init__(self, path: Union[str, Path], line: int, message: str):
+        super().__init__(f"{path}:{line}: {message}")
+        self.path = str(path)
+        self.line = line
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse "3/16" into (3, 16); shards are numbered from 1."""
+    try:
+        index, count = (int(part) for part in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}' (expected INDEX/COUNT, e.g. 3/16)")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard '{value}' is out of range (1 <= INDEX <= COUNT)")
+    return index, count
+
+
+def validate_row(row) -> Optional[str]:
+    """Describe why a parsed row is not a test case, or return None."""
+    if not isinstance(row, dict):
+        return "test case must be a JSON object"
+    if "vars" in row and not isinstance(row["vars"], dict):
+        return "'vars' must be an object"
+    assertions = row.get("assert", [])
+    if not isinstance(assertions, list):
+        return "'assert' must be a list"
+    for i, assertion in enumerate(assertions):
+        if not isinstance(assertion, dict) or not isinstance(
+            assertion.get("type"), str
+        ):
+            return f"assertion {i + 1} must be an object with a 'type'"
+    if "threshold" in row and not isinstance(row["threshold"], (int, float)):
+        return "'threshold' must be a number"
+    return None
+
+
+def iter_lines(
+    paths: Iterable[Union[str, Path]], shard: Optional[Tuple[int, int]] = None
+) -> Iterator[Tuple[Path, int, str]]:
+    """
+    Yield (path, line number, raw line) of the test cases in a shard.
+
+    Blank lines are not test cases and do not count towards the split.
+    """
+    index, count = shard or (1, 1)
+    position = 0
+    for path in paths:
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                position += 1
+                if (position - 1) % count == index - 1:
+                    yield path, number, line
+
+
+def iter_rows(
+    paths: Iterable[Union[str, Path]], shard: Optional[Tuple[int, int]] = None
+) -> Iterator[Dict]:
+    """
+    Yield the parsed test cases of a shard, validating each as it is read.
+
+    Raises:
+        DatasetError: on the first invalid row of the shard
+    """
+    for path, number, line in iter_lines(paths, shard):
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise DatasetError(path, number, f"invalid JSON: {e.msg}")
+        problem = validate_row(row)
+        if problem:
+            raise DatasetError(path, number, problem)
+        yield row
+
+
+def write_shard(
+    paths: Iterable[Union[str, Path]],
+    output: Union[str, Path],
+    shard: Tuple[int, int],
+    transform: Optional[Callable[[Dict], Dict]] = None,
+) -> int:
+    """
+    Write the validated rows of a shard as JSON lines; returns the count.
+
+    transform, if given, rewrites each row before it is written (see
+    rubric_grading.defer_rubrics). The file is written next to its
+    destination and renamed into place, so a failed validation leaves no
+    partial shard behind.
+    """
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=output.parent, prefix=".tmp-")
+    count = 0
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for row in iter_rows(paths, shard):
+                if transform:
+                    row = transform(row)
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+        os.replace(temp_path, output)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+    return count
+
+
+def shard_filename(shard: Tuple[int, int]) -> str:
+    return f"shard-{shard[0]}-of-{shard[1]}.jsonl"
+
+
+def load_eval_config(path: Union[str, Path]) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def config_datasets(config: Dict, config_path: Union[str, Path]) -> List[Path]:
+    """Return the local JSONL files listed under tests: in promptfoo.yaml."""
+    tests = config.get("tests") or []
+    if isinstance(tests, str):
+        tests = [tests]
+    base = Path(config_path).parent
+    datasets = []
+    for entry in tests:
+        if not isinstance(entry, str) or not entry.endswith(".jsonl"):
+            continue
+        if entry.startswith("file://"):
+            entry = entry[len("file://") :]
+        datasets.append(base / entry)
+    return datasets
+
+
+def config_threshold(config: Dict) -> Optional[float]:
+    """Return defaultTest.threshold from promptfoo.yaml, if set."""
+    threshold = (config.get("defaultTest") or {}).get("threshold")
+    return float(threshold) if threshold is not None else None
+
+
+def iter_results(path: Union[str, Path]) -> Iterator[Dict]:
+    """Yield the per-test results of a Promptfoo output file."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    results = data.get("results", data) if isinstance(data, dict) else data
+    if isinstance(results, dict):
+        results = results.get("results", [])
+    if not isinstance(results, list):
+        raise ValueError(f"{path}: not a Promptfoo results file")
+    yield from results
+
+
+def result_score(result: Dict) -> float:
+    grading = result.get("gradingResult") or {}
+    score = result.get("score", grading.get("score"))
+    return float(score) if score is not None else 0.0
+
+
+def result_passed(result: Dict, threshold: Optional[float] = None) -> bool:
+    """
+    Decide whether one test result passed.
+
+    With a threshold (the test's own, else the default) a test passes when
+    its score reaches it, even if single assertions failed; without one,
+    Promptfoo's own verdict counts. Provider errors always fail.
+    """
+    if result.get("error") and not result.get("gradingResult"):
+        return False
+    own = (result.get("testCase") or {}).get("threshold")
+    limit = own if own is not None else threshold
+    if limit is None:
+        return bool(result.get("success"))
+    return result_score(result) >= float(limit)
+
+
+def describe_failure(result: Dict, shard: str) -> Dict:
+    test_vars = result.get("vars") or (result.get("testCase") or {}).get("vars") or {}
+    grading = result.get("gradingResult") or {}
+    return {
+        "shard": shard,
+        "prompt": (result.get("prompt") or {}).get("label"),
+        "vars": test_vars,
+        "score": round(result_score(result), 4),
+        "reason": result.get("error") or grading.get("reason"),
+    }
+
+
+def merge_results(
+    paths: Iterable[Union[str, Path]],
+    threshold: Optional[float] = None,
+    min_pass_rate: Optional[float] = None,
+) -> Dict:
+    """
+    Combine shard result files into one report.
+
+    Returns:
+        {"shards", "tests", "passed", "failed", "errors", "pass_rate",
+        "threshold", "min_pass_rate", "success", "tokens", "cost",
+        "failures"} with at most MAX_FAILURES failing tests listed
+    """
+    report = {
+        "shards": 0,
+        "tests": 0,
+        "passed": 0,
+        "failed": 0,
+        "errors": 0,
+        "pass_rate": 0.0,
+        "threshold": threshold,
+        "min_pass_rate": min_pass_rate,
+        "success": False,
+        "tokens": 0,
+        "cost": 0.0,
+        "failures": [],
+    }
+    for path in paths:
+        report["shards"] += 1
+        for result in iter_results(path):
+            report["tests"] += 1
+            usage = (result.get("response") or {}).get("tokenUsage") or {}
+            report["tokens"] += usage.get("total", 0) or 0
+            report["cost"] += result.get("cost", 0) or 0
+            if result_passed(result, threshold):
+                report["passed"] += 1
+                continue
+            report["failed"] += 1
+            if result.get("error") and not result.get("gradingResult"):
+                report["errors"] += 1
+            if len(report["failures"]) < MAX_FAILURES:
+                report["failures"].append(describe_failure(result, Path(path).name))
+
+    tests = report["tests"]
+    report["pass_rate"] = round(report["passed"] / tests, 4) if tests else 0.0
+    report["cost"] = round(report["cost"], 6)
+    if min_pass_rate is None:
+        report["success"] = tests > 0 and report["failed"] == 0
+    else:
+        report["success"] = tests > 0 and report["pass_rate"] >= min_pass_rate
+    return report
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Debounced, batched runner for PostToolUse formatting hooks.
+
+A PostToolUse hook on Edit|Write runs once per edit, so a formatter
+called from it directly starts one process per edit: an agent making 50
+edits in a burst formats overlapping files 50 times. This runner splits
+the work:
+
+    python3 ~/.claude/hooks/format_hook.py enqueue   # the hook command
+
+enqueue reads the hook input from stdin and appends the edited path to a
+spool file for the project, which takes a few milliseconds. It then
+starts a detached flusher unless one is already running. The flusher
+waits until no edit has arrived for the debounce window. It then takes
+the spool, dedupes the paths, drops files that no longer exist, and runs
+every configured formatter once over the files that match its patterns.
+Edits that arrive while formatters run are picked up by the next round,
+and the flusher exits once the spool is empty.
+
+One flusher per project is guaranteed by a non-blocking lock on
+<spool>.lock. A flusher that finds the spool empty releases that lock
+and checks the spool again. An edit spooled just before the release is
+therefore seen by it, and one spooled after the release starts its own
+flusher.
+
+Formatters and the window come from a JSON config (default
+~/.claude/formatters.json, see config/formatters.json):
+
+    {"window_seconds": 1.5,
+     "formatters": [{"name": "black", "command": ["black", "-q"],
+                     "patterns": ["*.py"], "enabled": true}]}
+
+The shipped config lists common formatters with "enabled": false, so the
+hook formats nothing until one is turned on. Formatters run from the
+project directory and pick up its own settings. Formatters whose program
+is not installed are skipped. Each flush is logged to <spool>.log. Only
+the standard library is used, since the hook runs outside the build
+environment.
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_WINDOW = 1.5
+DEFAULT_CONFIG = Path.home() / ".claude" / "formatters.json"
+DEFAULT_SPOOL_DIR = Path.home() / ".claude" / "hook-spool"
+# Files passed to one formatter process; larger sets are split
+MAX_FILES_PER_RUN = 200
+FORMATTER_TIMEOUT = 120
+
+# Tool input keys that name the edited file
+PATH_KEYS = ("file_path", "notebook_path")
+
+
+def spool_path(spool_dir: Path, project_dir: Path) -> Path:
+    """Spool file of one project (projects are formatted separately)."""
+    key = hashlib.sha256(str(project_dir.resolve()).encode("utf-8")).hexdigest()
+    return spool_dir / f"{key[:16]}.spool"
+
+
+def hook_paths(payload: Dict) -> List[str]:
+    """Edited file paths in a PostToolUse hook payload."""
+    tool_input = payload.get("tool_input") or {}
+    return [tool_input[key] for key in PATH_KEYS if tool_input.get(key)]
+
+
+def lock(fd: int, wait: bool = True) -> bool:
+    """
+    Lock an open file exclusively; False when the lock was not taken.
+
+    That is when wait is off and the lock is held, or when waiting gives
+    up (msvcrt retries for about 10 seconds).
+    """
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        else:
+            # msvcrt locks bytes from the current position: always byte 0
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def release(fd: int):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def enqueue(spool: Path, paths: List[str], project_dir: Path):
+    """Append absolute paths to the spool, one per line."""
+    if not paths:
+        return
+    spool.parent.mkdir(parents=True, exist_ok=True)
+    lines = "".join(f"{(project_dir / path).resolve()}\n" for path in paths)
+    fd = os.open(spool, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        # Held only for the write; take_spool() reads and truncates under it.
+        # Without it the append still goes in: losing an edit is worse.
+        locked = lock(fd)
+        try:
+            os.write(fd, lines.encode("utf-8"))
+        finally:
+            if locked:
+                release(fd)
+    finally:
+        os.close(fd)
+
+
+def take_spool(spool: Path) -> List[str]:
+    """
+    Take the spooled paths, deduplicated in first-seen order.
+
+    The spool is read and truncated under its lock rather than renamed
+    away, so an enqueue that opened the file earlier cannot append to a
+    copy that was already read. When the lock cannot be taken, nothing is
+    taken and the paths stay for the next round.
+    """
+    try:
+        fd = os.open(spool, os.O_RDWR)
+    except FileNotFoundError:
+        return []
+    try:
+        if not lock(fd):
+            return []
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            chunks = []
+            while True:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            os.ftruncate(fd, 0)
+        finally:
+            release(fd)
+    finally:
+        os.close(fd)
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    return list(dict.fromkeys(line for line in lines if line))
+
+
+def pending(spool: Path) -> bool:
+    """Whether the spool holds paths that were not taken yet."""
+    try:
+        return spool.stat().st_size > 0
+    except FileNotFoundError:
+        return False
+
+
+def try_lock(path: Path) -> Optional[int]:
+    """Take the flusher lock without waiting; returns its fd, or None."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    if not lock(fd, wait=False):
+        os.close(fd)
+        return None
+    return fd
+
+
+def unlock(fd: int):
+    """Release a lock taken with try_lock() and close it."""
+    release(fd)
+    os.close(fd)
+
+
+def load_config(path: Path) -> Dict:
+    """Formatter config; a missing file means no formatters."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return {"formatters": []}
+    for formatter in config.get("formatters", []):
+        if not formatter.get("command") or not formatter.get("patterns"):
+            raise ValueError(
+                f"{path}: formatter {formatter.get('name')!r} needs "
+                "'command' and 'patterns'"
+            )
+    return config
+
+
+def run_formatters(
+    paths: List[str],
+    formatters: List[Dict],
+    cwd: Path,
+    log: Callable[[str], None] = lambda line: None,
+) -> Dict[str, int]:
+    """
+    Run each formatter once over the existing files matching its patterns.
+
+    Returns:
+        {formatter name: files formatted}
+    """
+    existing = [path for path in paths if os.path.isfile(path)]
+    counts = {}
+    for formatter in formatters:
+        if not formatter.get("enabled", True):
+            continue
+        name = formatter.get("name") or formatter["command"][0]
+        files = [
+            path
+            for path in existing
+            if any(
+                fnmatch.fnmatch(os.path.basename(path), pattern)
+                for pattern in formatter["patterns"]
+            )
+        ]
+        if not files:
+            continue
+        if shutil.which(formatter["command"][0]) is None:
+            log(f"skip {name}: {formatter['command'][0]} not found")
+            continue
+        for start in range(0, len(files), MAX_FILES_PER_RUN):
+            chunk = files[start : start + MAX_FILES_PER_RUN]
+            try:
+                completed = subprocess.run(
+                    [*formatter["command"], *chunk],
+                    cwd=cwd,
+                    capture_output=True,
+                    text=True,
+                    timeout=formatter.get("timeout", FORMATTER_TIMEOUT),
+                )
+                status = completed.returncode
+                detail = (completed.stderr or completed.stdout).strip()[-500:]
+            except (OSError, subprocess.TimeoutExpired) as e:
+                status, detail = -1, str(e)
+            log(f"{name}: {len(chunk)} file(s), exit {status} {detail}".rstrip())
+        counts[name] = len(files)
+    return counts
+
+
+def flush(
+    spool: Path,
+    config: Dict,
+    cwd: Path,
+    window: Optional[float] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    log: Callable[[str], None] = lambda line: None,
+) -> List[Dict[str, int]]:
+    """
+    Debounce and format until the spool stays empty.
+
+    Returns the formatter counts of every round, or [] when another
+    flusher holds the lock.
+    """
+    if window is None:
+        window = float(config.get("window_seconds", DEFAULT_WINDOW))
+    lock_path = spool.with_suffix(".lock")
+    rounds = []
+    while True:
+        fd = try_lock(lock_path)
+        if fd is None:
+            return rounds
+        try:
+            while True:
+                # Quiet period: no append to the spool for a whole window
+                if not pending(spool):
+                    break
+                idle = time.time() - spool.stat().st_mtime
+                if idle < window:
+                    sleep(window - idle)
+                    continue
+                paths = take_spool(spool)
+                counts = run_formatters(paths, config.get("formatters", []), cwd, log)
+                log(f"flushed {len(paths)} path(s): {counts}")
+                rounds.append(counts)
+        finally:
+            unlock(fd)
+        if not pending(spool):
+            return rounds
+
+
+def start_flusher(args: argparse.Namespace, project_dir: Path):
+    """Start a detached flusher that outlives the hook process."""
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "flush",
+        "--config",
+        str(args.config.resolve()),
+        "--spool-dir",
+        str(args.spool_dir.resolve()),
+        "--project-dir",
+        str(project_dir),
+    ]
+    if args.window is not None:
+        command += ["--window", str(args.window)]
+    options = {}
+    if os.name == "nt":
+        options["creationflags"] = subprocess.DETACHED_PROCESS
+    else:
+        options["start_new_session"] = True
+    subprocess.Popen(
+        command,
+        cwd=project_dir,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **options,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("mode", choices=["enqueue", "flush"])
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG)
+    parser.add_argument("--spool-dir", type=Path, default=DEFAULT_SPOOL_DIR)
+    parser.add_argument(
+        "--project-dir", type=Path, help="Default: hook cwd, else current dir"
+    )
+    parser.add_argument("--window", type=float, help="Debounce seconds")
+    parser.add_argument(
+        "--now", action="store_true", help="flush: do not wait for a quiet window"
+    )
+    args = parser.parse_args(argv)
+
+    if args.mode == "enqueue":
+        try:
+            payload = json.load(sys.stdin)
+        except ValueError:
+            payload = {}
+        project_dir = Path(
+            args.project_dir
+            or os.environ.get("CLAUDE_PROJECT_DIR")
+            or payload.get("cwd")
+            or os.getcwd()
+        )
+        spool = spool_path(args.spool_dir, project_dir)
+        paths = hook_paths(payload)
+        enqueue(spool, paths, project_dir)
+        fd = try_lock(spool.with_suffix(".lock")) if paths else None
+        if fd is not None:
+            # No flusher running; release so the new one can take the lock
+            unlock(fd)
+            start_flusher(args, project_dir)
+        return 0
+
+    project_dir = Path(args.project_dir or os.getcwd())
+    spool = spool_path(args.spool_dir, project_dir)
+    config = load_config(args.config)
+    log_path = spool.with_suffix(".log")
+
+    def log(line: str):
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {line}\n")
+
+    flush(spool, config, project_dir, 0.0 if args.now else args.window, log=log)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -49,6 +49,14 @@ fi
 echo '' >> "$OUTPUT_FILE"
 echo '    ],' >> "$OUTPUT_FILE"
 
+# Merkle root over the agent hashes (checked by build.py verify)
+if [ -d "$ROOT_DIR/dist/agents" ]; then
+    merkle_root=$(python3 "$SCRIPT_DIR/merkle.py" "$ROOT_DIR/dist/agents")
+    echo "    \"merkle_root\": \"$merkle_root\"," >> "$OUTPUT_FILE"
+else
+    echo '    "merkle_root": null,' >> "$OUTPUT_FILE"
+fi
+
 # Include dangerous commands config hash
 echo '    "security_config": {' >> "$OUTPUT_FILE"
 if [ -f "$ROOT_DIR/config/dangerous_commands.json" ]; then
@@ -0,0 +1,209 @@
+"""
+Per-section token heatmap for compiled agents.
+
+The token budget check only sees one total per agent. To show which parts
+of an agent inflate it, templates are rendered through a MarkedLoader:
+every template and skill source is wrapped in invisible start and end
+markers, so the rendered text records where each piece came from. The
+markers are stripped for the output, and the marked text is split into
+Markdown heading sections whose tokens are attributed to the template or
+include that produced them:
+
+    ## Security Checklist        412 tokens
+       skills/security/input_validation.md   398
+       agents/backend-engineer.md.j2          14
+
+Attribution needs no second render, so builds with the heatmap enabled
+cost one marker pass per agent. Sizes are those of the rendered template,
+before the optional layout and minify passes.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from jinja2 import BaseLoader, Environment
+from minify import FENCE_RE
+
+# Template starts are "\x02<name>\x03", ends "\x02\x03"
+MARK_START = "\x02"
+MARK_END = "\x03"
+MARKER_RE = re.compile("\x02([^\x02\x03]*)\x03")
+
+HEADING_RE = re.compile(r"^(#{1,3})\s+(.+?)\s*#*\s*$")
+
+FRONTMATTER = "(frontmatter)"
+PREAMBLE = "(preamble)"
+
+
+class MarkedLoader(BaseLoader):
+    """Serve the sources of another loader wrapped in source markers."""
+
+    def __init__(self, loader: BaseLoader):
+        self.loader = loader
+
+    def get_source(self, environment: Environment, template: str):
+        source, filename, uptodate = self.loader.get_source(environment, template)
+        marked = f"{MARK_START}{template}{MARK_END}{source}{MARK_START}{MARK_END}"
+        return marked, filename, uptodate
+
+    def list_templates(self) -> List[str]:
+        return self.loader.list_templates()
+
+
+def strip_markers(text: str) -> str:
+    return MARKER_RE.sub("", text)
+
+
+def marked_lines(text: str) -> List[List[Tuple[str, str]]]:
+    """
+    Split marked text into lines of (origin, fragment) pairs.
+
+    The origin of a fragment is the innermost template being rendered
+    where it appears.
+    """
+    stack: List[str] = []
+    lines: List[List[Tuple[str, str]]] = [[]]
+    position = 0
+    for match in [*MARKER_RE.finditer(text), None]:
+        end = match.start() if match else len(text)
+        origin = stack[-1] if stack else ""
+        for i, fragment in enumerate(text[position:end].split("\n")):
+            if i:
+                lines.append([])
+            if fragment:
+                lines[-1].append((origin, fragment))
+        if match is None:
+            break
+        if match.group(1):
+            stack.append(match.group(1))
+        elif stack:
+            stack.pop()
+        position = match.end()
+    return lines
+
+
+def section_tokens(marked: str, estimate_tokens: Callable[[str], int]) -> List[Dict]:
+    """
+    Attribute the tokens of a marked render to its heading sections.
+
+    Headings of levels 1-3 outside fenced code start a section; text
+    before the first one is the frontmatter and preamble.
+
+    Returns:
+        [{"section", "level", "line", "tokens", "sources"}] in document
+        order; "sources" maps each contributing template to its tokens.
+    """
+    sections: List[Dict] = []
+    texts: List[Dict[str, List[str]]] = []
+
+    def start(title: str, level: int, line: int):
+        sections.append({"section": title, "level": level, "line": line})
+        texts.append({})
+
+    fence: Optional[str] = None
+    in_frontmatter = False
+    for number, fragments in enumerate(marked_lines(marked), 1):
+        plain = "".join(fragment for _, fragment in fragments)
+        if number == 1 and plain.strip() == "---":
+            in_frontmatter = True
+            start(FRONTMATTER, 0, 1)
+        elif in_frontmatter and plain.strip() == "---":
+            in_frontmatter = False
+        elif not in_frontmatter:
+            fence_match = FENCE_RE.match(plain)
+            if fence is None and fence_match:
+                fence = fence_match.group(1)
+            elif fence is not None:
+                stripped = plain.strip()
+                if stripped.startswith(fence) and not stripped.strip(fence[0]):
+                    fence = None
+            else:
+                heading = HEADING_RE.match(plain)
+                if heading:
+                    start(heading.group(2), len(heading.group(1)), number)
+                elif not sections or (
+                    sections[-1]["section"] == FRONTMATTER and plain.strip()
+                ):
+                    start(PREAMBLE, 0, number)
+        if not sections:
+            start(PREAMBLE, 0, number)
+        for origin, fragment in fragments:
+            texts[-1].setdefault(origin, []).append(fragment)
+
+    result = []
+    for section, by_origin in zip(sections, texts):
+        sources = {
+            origin: estimate_tokens(" ".join(parts))
+            for origin, parts in by_origin.items()
+        }
+        sources = {
+            origin: tokens
+            for origin, tokens in sorted(sources.items(), key=lambda item: -item[1])
+            if tokens
+        }
+        if sources:
+            result.append(
+                {**section, "tokens": sum(sources.values()), "sources": sources}
+            )
+    return result
+
+
+def heatmap_rows(agents: Dict[str, List[Dict]]) -> List[Dict]:
+    """
+    Flatten per-agent sections into table rows, largest first.
+
+    Each row is one (agent, section, source) with its tokens and its share
+    of the agent's total.
+    """
+    rows = []
+    for agent, sections in agents.items():
+        total = sum(section["tokens"] for section in sections) or 1
+        for section in sections:
+            for source, tokens in section["sources"].items():
+                rows.append(
+                    {
+                        "agent": agent,
+                        "section": section["section"],
+                        "line": section["line"],
+                        "source": source,
+                        "tokens": tokens,
+                        "share": round(tokens / total, 4),
+                    }
+                )
+    rows.sort(key=lambda row: (-row["tokens"], row["agent"], row["line"]))
+    return rows
+
+
+def treemap(agents: Dict[str, List[Dict]]) -> Dict:
+    """
+    Nest per-agent sections as a treemap: agents > sections > sources.
+
+    Every node has "name" and "tokens"; inner nodes have "children"
+    (the shape d3.hierarchy and most treemap widgets read).
+    """
+    children = []
+    for agent, sections in sorted(agents.items()):
+        agent_children = [
+            {
+                "name": section["section"],
+                "line": section["line"],
+                "tokens": section["tokens"],
+                "children": [
+                    {"name": source, "tokens": tokens}
+                    for source, tokens in section["sources"].items()
+                ],
+            }
+            for section in sections
+        ]
+        children.append(
+            {
+                "name": agent,
+                "tokens": sum(child["tokens"] for child in agent_children),
+                "children": agent_children,
+            }
+        )
+    return {
+        "name": "agents",
+        "tokens": sum(child["tokens"] for child in children),
+        "children": children,
+    }
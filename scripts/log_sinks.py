@@ -0,0 +1,151 @@
+"""
+Pluggable log sinks for the build system.
+
+AgentBuilder.log() turns every message into a record
+({"ts", "level", "message", ...fields}) and hands it to a sink:
+
+- ConsoleSink: colored text, one line per record (the default)
+- JsonLinesSink: buffered JSON lines for machines, written in batches
+- QuietSink: console output of the final build summary only
+- MemorySink: records kept in a list (in-memory builds, tests)
+
+Records passed with summary=True belong to the end-of-build summary.
+"""
+
+import json
+import sys
+import time
+from typing import Dict, List, Optional, TextIO
+
+from colorama import Fore, Style, init
+
+# Initialize colorama for cross-platform colors
+init(autoreset=True)
+
+LEVELS = {"debug": 10, "info": 20, "success": 25, "warning": 30, "error": 40}
+
+COLORS = {
+    "success": Fore.GREEN,
+    "error": Fore.RED,
+    "warning": Fore.YELLOW,
+    "info": Fore.CYAN,
+    "debug": Fore.LIGHTBLACK_EX,
+}
+
+
+class ConsoleSink:
+    """Print colored messages at or above a minimum level."""
+
+    def __init__(self, level: str = "debug", stream: Optional[TextIO] = None):
+        self.level = LEVELS[level]
+        self.stream = stream
+
+    def accepts(self, record: Dict) -> bool:
+        """Check whether a record passes the level filter."""
+        return LEVELS.get(record["level"], LEVELS["info"]) >= self.level
+
+    def emit(self, record: Dict):
+        """Print one record."""
+        if self.accepts(record):
+            color = COLORS.get(record["level"], "")
+            print(
+                f"{color}{record['message']}{Style.RESET_ALL}",
+                file=self.stream or sys.stdout,
+            )
+
+    def flush(self):
+        """Console output is unbuffered; nothing to do."""
+
+
+class QuietSink(ConsoleSink):
+    """Print only records that are part of the final summary."""
+
+    def accepts(self, record: Dict) -> bool:
+        return bool(record.get("summary")) and super().accepts(record)
+
+
+class MemorySink:
+    """Keep records at or above a minimum level in a list."""
+
+    def __init__(self, level: str = "debug"):
+        self.level = LEVELS[level]
+        self.records: List[Dict] = []
+
+    def emit(self, record: Dict):
+        if LEVELS.get(record["level"], LEVELS["info"]) >= self.level:
+            self.records.append(record)
+
+    def flush(self):
+        """Records stay in memory; nothing to do."""
+
+
+class JsonLinesSink:
+    """
+    Buffer records and write them as JSON lines.
+
+    Records are serialized on emit but written in one call per batch, so a
+    large build costs a handful of writes instead of one per message.
+    Without a path, lines go to stdout when flushed.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        level: str = "debug",
+        buffer_size: int = 1000,
+    ):
+        self.path = path
+        self.level = LEVELS[level]
+        self.buffer_size = buffer_size
+        self.buffer: List[str] = []
+
+    def emit(self, record: Dict):
+        """Queue one record; write the batch once the buffer is full."""
+        if LEVELS.get(record["level"], LEVELS["info"]) < self.level:
+            return
+        self.buffer.append(json.dumps(record, default=str))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered records."""
+        if not self.buffer:
+            return
+        data = "\n".join(self.buffer) + "\n"
+        self.buffer = []
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+        else:
+            sys.stdout.write(data)
+            sys.stdout.flush()
+
+
+def make_record(message: str, level: str, **fields) -> Dict:
+    """Build a log record with a timestamp, level and extra fields."""
+    return {"ts": time.time(), "level": level, "message": message, **fields}
+
+
+def make_sink(
+    log_format: str = "text",
+    quiet: bool = False,
+    path: Optional[str] = None,
+    level: str = "debug",
+):
+    """
+    Create the sink selected by CLI options or build_config.yml.
+
+    Raises:
+        ValueError: when a log file is given for the text format, which
+            only writes to the console
+    """
+    if path and log_format != "json":
+        raise ValueError(
+            f"Log file '{path}' needs the json log format "
+            "(--log-format json or logging.format: json)"
+        )
+    if log_format == "json":
+        return JsonLinesSink(path=path, level=level)
+    if quiet:
+        return QuietSink(level=level)
+    return ConsoleSink(level=level)
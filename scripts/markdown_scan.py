@@ -0,0 +1,119 @@
+"""
+Single-pass line scanner for rendered agents.
+
+Validation used to walk each document several times: a frontmatter regex,
+substring searches for leftover Jinja2, a split() for the token estimate
+and a DOTALL findall that only recognised ```bash and ```sh fences.
+scan_markdown() collects all of it in one pass over the lines:
+
+- the frontmatter text and its line span
+- the word count the token estimate is based on
+- every unresolved "{{" / "{%" with its line and column
+- every fenced code block with its language, line span and whether it
+  was closed
+
+Frontmatter that is never closed is not frontmatter; the document then
+fails the frontmatter rule and the rest of it is not scanned for blocks.
+
+Fences follow CommonMark: up to three spaces of indentation, ``` or ~~~,
+closed by a fence of the same character at least as long.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})\s*([^`\s]*)")
+JINJA_RE = re.compile(r"\{\{|\{%")
+POWERSHELL_COMMENT_RE = re.compile(r"<#.*?#>|#[^\n]*", re.DOTALL)
+
+# Fence info strings that select a checker
+BASH_LANGUAGES = frozenset({"bash", "sh"})
+POWERSHELL_LANGUAGES = frozenset({"powershell", "pwsh", "ps1", "ps"})
+
+
+class CodeBlock:
+    """One fenced code block; lines are 1-based, fences included."""
+
+    def __init__(self, language: str, line: int, fence: str):
+        self.language = language
+        self.line = line
+        self.end_line = line
+        self.fence = fence
+        self.lines: List[str] = []
+        self.closed = False
+
+    @property
+    def code(self) -> str:
+        return "\n".join(self.lines)
+
+    def __repr__(self) -> str:
+        return f"CodeBlock({self.language!r}, lines {self.line}-{self.end_line})"
+
+
+class MarkdownScan:
+    """Everything validation needs to know about one document."""
+
+    def __init__(self):
+        self.frontmatter: Optional[str] = None
+        self.frontmatter_lines: Optional[Tuple[int, int]] = None
+        self.words = 0
+        self.lines = 0
+        # (line, column, "{{" or "{%"), 1-based
+        self.jinja: List[Tuple[int, int, str]] = []
+        self.blocks: List[CodeBlock] = []
+
+    def blocks_for(self, languages) -> List[CodeBlock]:
+        """Closed blocks in one of the given languages."""
+        return [b for b in self.blocks if b.closed and b.language in languages]
+
+    @property
+    def unclosed(self) -> List[CodeBlock]:
+        return [b for b in self.blocks if not b.closed]
+
+
+def scan_markdown(content: str) -> MarkdownScan:
+    """Scan a rendered document once; see the module docstring."""
+    scan = MarkdownScan()
+    frontmatter: Optional[List[str]] = None
+    block: Optional[CodeBlock] = None
+
+    lines = content.split("\n")
+    scan.lines = len(lines)
+    for number, line in enumerate(lines, 1):
+        scan.words += len(line.split())
+        if "{" in line:
+            for match in JINJA_RE.finditer(line):
+                scan.jinja.append((number, match.start() + 1, match.group(0)))
+
+        if number == 1 and line.rstrip() == "---":
+            frontmatter = []
+            continue
+        if frontmatter is not None and scan.frontmatter is None:
+            if line.rstrip() == "---" and number < len(lines):
+                scan.frontmatter = "\n".join(frontmatter)
+                scan.frontmatter_lines = (1, number)
+            else:
+                frontmatter.append(line)
+            continue
+
+        if block is not None:
+            block.end_line = number
+            stripped = line.strip()
+            if stripped.startswith(block.fence) and not stripped.strip(block.fence[0]):
+                block.closed = True
+                block = None
+            else:
+                block.lines.append(line)
+            continue
+
+        match = FENCE_RE.match(line)
+        if match:
+            block = CodeBlock(match.group(2).lower(), number, match.group(1))
+            scan.blocks.append(block)
+
+    return scan
+
+
+def strip_powershell_comments(code: str) -> str:
+    """Remove # line comments and <# ... #> block comments."""
+    return POWERSHELL_COMMENT_RE.sub("", code)
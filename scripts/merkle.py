@@ -0,0 +1,305 @@
+"""
+Merkle manifest verification of installed agents.
+
+The release evidence manifest (scripts/generate-evidence.sh) lists the
+SHA-256 and size of every released agent. Its entries are arranged as a
+Merkle tree over the agent file names in sorted order:
+
+    leaf = sha256(0x00 || name || 0x00 || file digest)
+    node = sha256(0x01 || left || right)
+
+A node without a sibling is promoted to the next level unchanged. The
+manifest records the root as artifacts.merkle_root, so one hash pins the
+whole release. If the entries do not produce that root, the manifest has
+been altered and verification stops there.
+
+verify_install() checks an install directory against the manifest:
+
+- one directory scan finds missing and extra files and compares sizes, so
+  files of the wrong size count as modified without being read
+- the remaining files are hashed through mmap, in parallel when there are
+  enough bytes for threads to pay off (hashlib releases the GIL)
+- the installed tree is compared with the released one from the root down,
+  and only subtrees whose hashes differ are descended into
+
+With fail_fast the check stops at the first difference it finds: a
+missing, extra or resized file ends it before anything is hashed, and a
+hash mismatch cancels the hashing still pending.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+# Below this many bytes in total, hashing inline beats starting threads
+PARALLEL_MIN_BYTES = 1 << 20
+
+# Leaf of a file that is missing, or whose size already shows it changed
+UNREADABLE = bytes(32)
+
+AGENT_SUFFIX = ".md"
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file read through mmap (empty files cannot be mapped)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b"").hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def leaf_hash(name: str, digest: str) -> bytes:
+    return hashlib.sha256(
+        LEAF_PREFIX + name.encode("utf-8") + LEAF_PREFIX + bytes.fromhex(digest)
+    ).digest()
+
+
+class MerkleTree:
+    """
+    Merkle tree over (name, leaf hash) pairs in name order.
+
+    levels[0] are the leaves, levels[-1] holds the root.
+    """
+
+    def __init__(self, names: List[str], leaves: List[bytes]):
+        self.names = names
+        self.levels: List[List[bytes]] = [leaves]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = [
+                hashlib.sha256(NODE_PREFIX + level[i] + level[i + 1]).digest()
+                for i in range(0, len(level) - 1, 2)
+            ]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self.levels.append(parents)
+
+    @classmethod
+    def from_digests(cls, digests: Dict[str, str]) -> "MerkleTree":
+        names = sorted(digests)
+        return cls(names, [leaf_hash(name, digests[name]) for name in names])
+
+    @property
+    def root(self) -> str:
+        if not self.names:
+            return hashlib.sha256(b"").hexdigest()
+        return self.levels[-1][0].hex()
+
+    def diff(self, other: "MerkleTree") -> Tuple[List[str], int]:
+        """
+        Names whose leaves differ from those of a tree over the same names.
+
+        Subtrees with equal hashes are skipped. Returns the names and the
+        number of nodes compared.
+        """
+        if self.names != other.names:
+            raise ValueError("Merkle trees cover different names")
+        if not self.names:
+            return [], 0
+        changed: List[str] = []
+        compared = 0
+        pending = [(len(self.levels) - 1, 0)]
+        while pending:
+            level, index = pending.pop()
+            compared += 1
+            if self.levels[level][index] == other.levels[level][index]:
+                continue
+            if level == 0:
+                changed.append(self.names[index])
+                continue
+            children = range(2 * index, min(2 * index + 2, len(self.levels[level - 1])))
+            pending.extend((level - 1, child) for child in reversed(children))
+        return changed, compared
+
+
+def load_manifest(path: Path) -> Tuple[Dict[str, Dict], Optional[str]]:
+    """
+    Read the agent entries of an evidence manifest.
+
+    Returns:
+        ({file name: {"sha256", "size"}}, recorded merkle_root or None)
+
+    Raises:
+        ValueError: when the file has no agent list
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        evidence = json.load(f)
+    artifacts = evidence.get("artifacts") if isinstance(evidence, dict) else None
+    if not isinstance(artifacts, dict) or not isinstance(artifacts.get("agents"), list):
+        raise ValueError(f"{path} is not an evidence manifest (no artifacts.agents)")
+    entries = {
+        agent["file"]: {"sha256": agent["sha256"], "size": agent.get("size")}
+        for agent in artifacts["agents"]
+    }
+    return entries, artifacts.get("merkle_root")
+
+
+def directory_root(directory: Path) -> str:
+    """Merkle root of the agent files in a directory (used for manifests)."""
+    return MerkleTree.from_digests(
+        {
+            path.name: hash_file(path)
+            for path in directory.glob(f"*{AGENT_SUFFIX}")
+            if path.is_file()
+        }
+    ).root
+
+
+def scan_install(directory: Path) -> Dict[str, int]:
+    """Agent files of an install directory with their sizes."""
+    installed = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(AGENT_SUFFIX) and entry.is_file():
+                installed[entry.name] = entry.stat().st_size
+    return installed
+
+
+def hash_files(
+    paths: Iterable[Path],
+    workers: int,
+    stop: Optional[Callable[[str, str], bool]] = None,
+) -> Dict[str, str]:
+    """
+    Hash files, in parallel when they are large enough together.
+
+    stop(name, digest) is called as each digest arrives; when it returns
+    True the hashing still pending is cancelled and the digests so far are
+    returned.
+    """
+    paths = list(paths)
+    digests: Dict[str, str] = {}
+    total = sum(path.stat().st_size for path in paths)
+    if workers <= 1 or len(paths) < 2 or total < PARALLEL_MIN_BYTES:
+        for path in paths:
+            digests[path.name] = hash_file(path)
+            if stop and stop(path.name, digests[path.name]):
+                break
+        return digests
+
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(paths)))
+    try:
+        pending = {executor.submit(hash_file, path): path.name for path in paths}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                digests[name] = future.result()
+                if stop and stop(name, digests[name]):
+                    return digests
+        return digests
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def verify_install(
+    manifest: Dict[str, Dict],
+    install_dir: Path,
+    workers: Optional[int] = None,
+    fail_fast: bool = False,
+    expected_root: Optional[str] = None,
+) -> Dict:
+    """
+    Verify an install directory against manifest entries.
+
+    expected_root is the root the manifest must produce (the recorded
+    merkle_root, or one pinned by the caller).
+
+    Returns:
+        {"root", "installed_root", "ok", "modified", "missing", "extra",
+        "hashed", "compared", "complete", "elapsed_ms"}. "installed_root"
+        is the root of the installed copies of the released files, None
+        unless every one of them was hashed; "compared" counts the tree
+        nodes compared, None when fail_fast stopped before the trees
+        were, and "complete" is False whenever it stopped early.
+
+    Raises:
+        ValueError: when the manifest does not produce expected_root
+    """
+    started = time.perf_counter()
+    released = MerkleTree.from_digests(
+        {name: entry["sha256"] for name, entry in manifest.items()}
+    )
+    if expected_root is not None and released.root != expected_root.lower():
+        raise ValueError(
+            f"Manifest entries produce Merkle root {released.root}, "
+            f"expected {expected_root}"
+        )
+    if workers is None:
+        workers = min(8, os.cpu_count() or 1)
+
+    installed = scan_install(install_dir)
+    missing = sorted(set(manifest) - set(installed))
+    extra = sorted(set(installed) - set(manifest))
+    resized = sorted(
+        name
+        for name in set(manifest) & set(installed)
+        if manifest[name].get("size") is not None
+        and manifest[name]["size"] != installed[name]
+    )
+    report = {
+        "root": released.root,
+        "installed_root": None,
+        "ok": False,
+        "modified": resized,
+        "missing": missing,
+        "extra": extra,
+        "hashed": 0,
+        "compared": None,
+        "complete": True,
+    }
+
+    def finish() -> Dict:
+        report["ok"] = not (report["modified"] or missing or extra)
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return report
+
+    if fail_fast and (missing or extra or resized):
+        report["complete"] = False
+        return finish()
+
+    to_hash = [
+        name for name in released.names if name in installed and name not in resized
+    ]
+
+    def mismatch(name: str, digest: str) -> bool:
+        return fail_fast and digest != manifest[name]["sha256"]
+
+    digests = hash_files(
+        (install_dir / name for name in to_hash), workers, stop=mismatch
+    )
+    report["hashed"] = len(digests)
+    if len(digests) < len(to_hash):
+        # Stopped at the first mismatch
+        report["modified"] = sorted(
+            name for name, digest in digests.items() if mismatch(name, digest)
+        )
+        report["complete"] = False
+        return finish()
+
+    current = MerkleTree(
+        released.names,
+        [
+            leaf_hash(name, digests[name]) if name in digests else UNREADABLE
+            for name in released.names
+        ],
+    )
+    changed, report["compared"] = released.diff(current)
+    report["modified"] = sorted(name for name in changed if name in installed)
+    report["installed_root"] = current.root if not missing and not resized else None
+    return finish()
+
+
+if __name__ == "__main__":
+    # generate-evidence.sh: print the Merkle root of a directory of agents
+    print(directory_root(Path(sys.argv[1])))
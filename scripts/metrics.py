@@ -0,0 +1,243 @@
+"""
+Build metrics in Prometheus textfile format.
+
+AgentBuilder records what each build did (per-agent render and validation
+time, tokens against budget, bash subprocesses, validation findings, rule
+timings and artifact cache usage) in a BuildMetrics collector. After the
+build the snapshot can be written for the node_exporter textfile collector
+(or any OpenMetrics consumer), so dashboards can alert when build time or
+prompt size regresses without scraping logs.
+
+All metrics are gauges: each file describes one build.
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+PREFIX = "agent_build"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def escape_label(value: str) -> str:
+    """Escape a label value for the exposition format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{name}="{escape_label(value)}"' for name, value in labels)
+    return "{" + inner + "}"
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(round(float(value), 6))
+
+
+class BuildMetrics:
+    """Collects one build's measurements."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.agents: Dict[Tuple[str, str, str], Dict] = {}
+        self.findings: Dict[Tuple[str, str], int] = {}
+        self.rule_seconds: Dict[str, float] = {}
+        self.bash_subprocesses = 0
+        self.warnings = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.builder_version = ""
+
+    def observe_agent(
+        self,
+        agent: str,
+        profile: str,
+        render_seconds: float,
+        validation_seconds: float,
+        tokens: int,
+        budget: int,
+        cached: bool = False,
+        overlay: str = "",
+    ):
+        """Record one compiled (or validated) variant, of an overlay if given."""
+        self.agents[(agent, profile, overlay)] = {
+            "render_seconds": render_seconds,
+            "validation_seconds": validation_seconds,
+            "tokens": tokens,
+            "budget": budget,
+            "cached": cached,
+        }
+
+    def observe_findings(self, findings: List[Dict]):
+        """Count validation findings by category and severity."""
+        for finding in findings:
+            key = (finding["category"], finding["severity"])
+            self.findings[key] = self.findings.get(key, 0) + 1
+
+    def samples(self) -> List[Tuple[str, str, str, List[Tuple[Labels, float]]]]:
+        """Return (name, type, help, [(labels, value)]) for every metric."""
+        per_agent = sorted(self.agents.items())
+
+        def agent_series(field: str) -> List[Tuple[Labels, float]]:
+            # Base agents carry no overlay label (the same as overlay="")
+            return [
+                (
+                    (("agent", agent), ("profile", profile))
+                    + ((("overlay", overlay),) if overlay else ()),
+                    values[field],
+                )
+                for (agent, profile, overlay), values in per_agent
+            ]
+
+        lookups = self.cache_hits + self.cache_misses
+        duration = (self.finished or time.time()) - self.started
+        return [
+            (
+                "version",
+                "gauge",
+                "Builder version of the last build",
+                [((("builder_version", self.builder_version),), 1)],
+            ),
+            (
+                "timestamp_seconds",
+                "gauge",
+                "Unix time the last build finished",
+                [((), self.finished or time.time())],
+            ),
+            ("duration_seconds", "gauge", "Wall time of the build", [((), duration)]),
+            (
+                "agents",
+                "gauge",
+                "Variants built by status",
+                [
+                    ((("status", "success"),), self.succeeded),
+                    ((("status", "failed"),), self.failed),
+                ],
+            ),
+            (
+                "render_seconds",
+                "gauge",
+                "Time spent rendering each variant",
+                agent_series("render_seconds"),
+            ),
+            (
+                "validation_seconds",
+                "gauge",
+                "Time spent validating each variant",
+                agent_series("validation_seconds"),
+            ),
+            ("tokens", "gauge", "Estimated tokens per variant", agent_series("tokens")),
+            (
+                "token_budget",
+                "gauge",
+                "Token budget per variant",
+                agent_series("budget"),
+            ),
+            (
+                "token_budget_ratio",
+                "gauge",
+                "Estimated tokens divided by the token budget",
+                [
+                    (labels, tokens / budget if budget else 0.0)
+                    for (labels, tokens), (_, budget) in zip(
+                        agent_series("tokens"), agent_series("budget")
+                    )
+                ],
+            ),
+            (
+                "cached",
+                "gauge",
+                "1 if the variant was restored from the artifact cache",
+                agent_series("cached"),
+            ),
+            (
+                "rule_seconds",
+                "gauge",
+                "Time spent in each validation rule across the build",
+                [
+                    ((("rule", rule),), s)
+                    for rule, s in sorted(self.rule_seconds.items())
+                ],
+            ),
+            (
+                "bash_subprocesses",
+                "gauge",
+                "bash processes spawned for syntax checks",
+                [((), self.bash_subprocesses)],
+            ),
+            (
+                "warnings",
+                "gauge",
+                "Warnings reported by the build",
+                [((), self.warnings)],
+            ),
+            (
+                "validation_findings",
+                "gauge",
+                "Validation findings by category and severity",
+                [
+                    ((("category", category), ("severity", severity)), count)
+                    for (category, severity), count in sorted(self.findings.items())
+                ],
+            ),
+            (
+                "cache_lookups",
+                "gauge",
+                "Artifact cache lookups by result",
+                [
+                    ((("result", "hit"),), self.cache_hits),
+                    ((("result", "miss"),), self.cache_misses),
+                ],
+            ),
+            (
+                "cache_hit_ratio",
+                "gauge",
+                "Artifact cache hits divided by lookups",
+                [((), self.cache_hits / lookups if lookups else 0.0)],
+            ),
+        ]
+
+    def render(self, openmetrics: bool = False) -> str:
+        """Render the snapshot in Prometheus text (or OpenMetrics) format."""
+        lines: List[str] = []
+        for name, metric_type, help_text, series in self.samples():
+            full_name = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in series:
+                lines.append(
+                    f"{full_name}{format_labels(labels)} {format_value(value)}"
+                )
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Union[str, Path], openmetrics: bool = False) -> Path:
+        """
+        Write the snapshot atomically.
+
+        The textfile collector may read at any moment, so the file is
+        written next to its destination and renamed into place.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render(openmetrics))
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        return path
@@ -0,0 +1,200 @@
+"""
+Prompt minification for compiled agents.
+
+Every token of a compiled agent is sent with every request, so this module
+removes what Jinja2 rendering leaves behind without changing meaning:
+HTML comments, decorative horizontal rules, trailing and repeated
+whitespace, inconsistent list markers and paragraphs that appear twice
+(typically the same skill included through two nested templates).
+
+Fenced code blocks and YAML frontmatter are always copied verbatim.
+"""
+
+import re
+from typing import Dict, List, Set, Tuple
+
+FRONTMATTER_RE = re.compile(r"^---\s*\n.*?\n---\s*\n", re.DOTALL)
+FENCE_RE = re.compile(r"^\s*(`{3,}|~{3,})")
+COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+RULE_RE = re.compile(r"^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+BULLET_RE = re.compile(r"^(\s*)[-*+][ \t]+(?=\S)")
+ORDERED_RE = re.compile(r"^(\s*)(\d+[.)])[ \t]+(?=\S)")
+INNER_SPACE_RE = re.compile(r"(?<=\S)[ \t]{2,}")
+
+# BPE tokenizers average about four characters of English per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Character-based token estimate.
+
+    Whitespace costs tokens too, which the word-based estimate used for
+    token budgets cannot see, so minification savings are measured with
+    this one.
+    """
+    return round(len(text) / CHARS_PER_TOKEN)
+
+
+def split_frontmatter(text: str) -> Tuple[str, str]:
+    """Split text into (frontmatter block, body); frontmatter may be empty."""
+    match = FRONTMATTER_RE.match(text)
+    if not match:
+        return "", text
+    return match.group(0), text[match.end() :]
+
+
+def split_fences(body: str) -> List[Tuple[bool, List[str]]]:
+    """
+    Split a Markdown body into alternating prose and fenced-code segments.
+
+    Returns:
+        List of (is_code, lines). Fence delimiter lines belong to the code
+        segment. An unclosed fence runs to the end of the document.
+    """
+    segments: List[Tuple[bool, List[str]]] = []
+    current: List[str] = []
+    fence = None
+
+    for line in body.split("\n"):
+        match = FENCE_RE.match(line)
+        if fence is None and match:
+            if current:
+                segments.append((False, current))
+            current = [line]
+            fence = match.group(1)
+        elif fence is not None:
+            current.append(line)
+            if line.strip().startswith(fence) and not line.strip().strip(fence[0]):
+                segments.append((True, current))
+                current = []
+                fence = None
+        else:
+            current.append(line)
+
+    if current:
+        segments.append((fence is not None, current))
+    return segments
+
+
+def normalize_line(line: str) -> str:
+    """Trim trailing whitespace, unify list markers and collapse spacing."""
+    line = line.rstrip()
+    if RULE_RE.match(line):
+        return line
+    line = BULLET_RE.sub(r"\1- ", line)
+    line = ORDERED_RE.sub(r"\1\2 ", line)
+    indent = len(line) - len(line.lstrip())
+    if "`" not in line and indent < 4:
+        line = INNER_SPACE_RE.sub(" ", line)
+    return line
+
+
+def group_paragraphs(lines: List[str]) -> Tuple[List[List[str]], bool, bool]:
+    """
+    Group prose lines into paragraphs separated by blank lines.
+
+    Returns:
+        (paragraphs, leading_blank, trailing_blank)
+    """
+    paragraphs: List[List[str]] = []
+    current: List[str] = []
+    for line in lines:
+        if line.strip():
+            current.append(line)
+        elif current:
+            paragraphs.append(current)
+            current = []
+    if current:
+        paragraphs.append(current)
+
+    leading_blank = bool(lines) and not lines[0].strip()
+    trailing_blank = bool(lines) and not lines[-1].strip()
+    return paragraphs, leading_blank, trailing_blank
+
+
+def drop_duplicates(
+    paragraphs: List[List[str]], seen: Set[str], min_words: int
+) -> Tuple[List[List[str]], int]:
+    """
+    Remove runs of paragraphs that already appeared earlier in the document.
+
+    A run of consecutive repeated paragraphs is only dropped when it holds
+    at least min_words words, so short repeated lines such as "**Example:**"
+    survive while a skill included twice is removed as a whole, headings
+    included.
+    """
+    kept: List[List[str]] = []
+    run: List[List[str]] = []
+    run_words = 0
+    dropped = 0
+
+    def flush():
+        nonlocal run, run_words, dropped
+        if run_words >= min_words:
+            dropped += len(run)
+        else:
+            kept.extend(run)
+        run, run_words = [], 0
+
+    for paragraph in paragraphs:
+        key = " ".join(" ".join(paragraph).split())
+        if key in seen:
+            run.append(paragraph)
+            run_words += len(key.split())
+            continue
+        flush()
+        seen.add(key)
+        kept.append(paragraph)
+    flush()
+    return kept, dropped
+
+
+def minify_markdown(text: str, min_duplicate_words: int = 8) -> Tuple[str, Dict]:
+    """
+    Minify a compiled agent while preserving frontmatter and fenced code.
+
+    Returns:
+        (minified_text, stats) where stats counts removed comments,
+        rules and duplicate paragraphs.
+    """
+    stats = {"comments": 0, "rules": 0, "duplicates": 0}
+    frontmatter, body = split_frontmatter(text)
+    seen: Set[str] = set()
+    output: List[str] = []
+
+    for is_code, lines in split_fences(body):
+        if is_code:
+            output.extend(lines)
+            continue
+
+        prose, removed = COMMENT_RE.subn("", "\n".join(lines))
+        stats["comments"] += removed
+
+        normalized: List[str] = []
+        for line in prose.split("\n"):
+            line = normalize_line(line)
+            previous_blank = not normalized or not normalized[-1].strip()
+            if RULE_RE.match(line) and previous_blank:
+                # A rule right after text is a setext heading underline: keep it
+                stats["rules"] += 1
+                continue
+            normalized.append(line)
+
+        paragraphs, leading_blank, trailing_blank = group_paragraphs(normalized)
+        paragraphs, dropped = drop_duplicates(paragraphs, seen, min_duplicate_words)
+        stats["duplicates"] += dropped
+
+        if leading_blank and output:
+            output.append("")
+        for i, paragraph in enumerate(paragraphs):
+            if i:
+                output.append("")
+            output.extend(paragraph)
+        if trailing_blank and paragraphs:
+            output.append("")
+
+    minified = "\n".join(output).strip("\n")
+    if text.endswith("\n"):
+        minified += "\n"
+    return frontmatter + minified, stats
@@ -0,0 +1,186 @@
+"""
+Indexed registry of compiled agents.
+
+The build writes index.json next to catalog.json. It describes every
+compiled agent with compact inverted indexes (model, tool, include and
+profile -> sorted agent ids) plus per-agent columns (tokens, size, sha256,
+output file), so installers, the doc site and CI scripts can answer
+"every haiku agent with the Bash tool" without parsing Markdown or
+scanning the catalog:
+
+    from registry import AgentRegistry
+    registry = AgentRegistry.load(".claude/agents/index.json")
+    registry.query(tool="Bash", model="haiku")
+"""
+
+import json
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+INDEX_VERSION = 1
+INVERTED_FIELDS = ("model", "tool", "include", "profile")
+
+
+def parse_tools(tools: Union[str, List[str], None]) -> List[str]:
+    """Normalize a frontmatter tools value ("Read, Bash" or a list)."""
+    if not tools:
+        return []
+    if isinstance(tools, str):
+        tools = tools.split(",")
+    return sorted({str(tool).strip() for tool in tools if str(tool).strip()})
+
+
+def build_index(agents: Dict[str, Dict], builder_version: str = "") -> Dict:
+    """
+    Build the registry index from catalog.json agent entries.
+
+    Agent ids are positions in the sorted name list; every posting list
+    is sorted so lookups and intersections stay cheap.
+    """
+    names = sorted(agents)
+    index: Dict = {
+        "version": INDEX_VERSION,
+        "builder_version": builder_version,
+        "agents": names,
+        "tokens": [],
+        "size": [],
+        "sha256": [],
+        "output": [],
+        **{field: {} for field in INVERTED_FIELDS},
+    }
+    for agent_id, name in enumerate(names):
+        entry = agents[name]
+        frontmatter = entry.get("frontmatter") or {}
+        index["tokens"].append(entry.get("tokens", 0))
+        index["size"].append(entry.get("size", 0))
+        index["sha256"].append(entry.get("sha256", ""))
+        index["output"].append(entry.get("output", ""))
+
+        values = {
+            "model": [frontmatter.get("model")],
+            "tool": parse_tools(frontmatter.get("tools")),
+            "include": entry.get("includes", []),
+            "profile": [entry.get("profile", "full")],
+        }
+        for field, keys in values.items():
+            for key in keys:
+                if key:
+                    index[field].setdefault(str(key), []).append(agent_id)
+    return index
+
+
+def contains(postings: List[int], agent_id: int) -> bool:
+    """Binary search a sorted posting list."""
+    i = bisect_left(postings, agent_id)
+    return i < len(postings) and postings[i] == agent_id
+
+
+class AgentRegistry:
+    """Query API over a prebuilt index."""
+
+    def __init__(self, index: Dict):
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(
+                f"Unsupported registry index version {index.get('version')!r}"
+            )
+        self.index = index
+        self.names: List[str] = index["agents"]
+        self.ids = {name: agent_id for agent_id, name in enumerate(self.names)}
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "AgentRegistry":
+        """Load an index.json written by the build."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def postings(self, field: str, key: str) -> List[int]:
+        """
+        Return the agent ids with a field value.
+
+        Includes may also be given by file name ("input_validation.md")
+        instead of their path relative to src/.
+        """
+        inverted = self.index[field]
+        if key in inverted:
+            return inverted[key]
+        if field == "include":
+            ids = set()
+            for path, agent_ids in inverted.items():
+                if Path(path).name == key:
+                    ids.update(agent_ids)
+            return sorted(ids)
+        if field == "tool":
+            # Tool names are case-insensitive for convenience
+            for tool, agent_ids in inverted.items():
+                if tool.lower() == key.lower():
+                    return agent_ids
+        return []
+
+    def select(
+        self,
+        tool: Union[str, Iterable[str], None] = None,
+        model: Optional[str] = None,
+        include: Union[str, Iterable[str], None] = None,
+        profile: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> List[int]:
+        """Return the sorted ids of agents matching every given filter."""
+        filters = []
+        for field, keys in (("tool", tool), ("include", include)):
+            if keys:
+                for key in [keys] if isinstance(keys, str) else keys:
+                    filters.append(self.postings(field, key))
+        if model:
+            filters.append(self.postings("model", model))
+        if profile:
+            filters.append(self.postings("profile", profile))
+
+        if filters:
+            # Intersect starting from the shortest posting list
+            filters.sort(key=len)
+            selected = set(filters[0])
+            for postings in filters[1:]:
+                selected.intersection_update(postings)
+        else:
+            selected = set(range(len(self.names)))
+
+        if max_tokens is not None:
+            tokens = self.index["tokens"]
+            selected = {i for i in selected if tokens[i] <= max_tokens}
+        return sorted(selected)
+
+    def record(self, agent_id: int) -> Dict:
+        """Reassemble one agent's record from the columns and indexes."""
+
+        def keys(field: str) -> List[str]:
+            return sorted(
+                key for key, ids in self.index[field].items() if contains(ids, agent_id)
+            )
+
+        models = keys("model")
+        profiles = keys("profile")
+        return {
+            "name": self.names[agent_id],
+            "model": models[0] if models else None,
+            "tools": keys("tool"),
+            "includes": keys("include"),
+            "profile": profiles[0] if profiles else None,
+            "tokens": self.index["tokens"][agent_id],
+            "size": self.index["size"][agent_id],
+            "sha256": self.index["sha256"][agent_id],
+            "output": self.index["output"][agent_id],
+        }
+
+    def get(self, name: str) -> Optional[Dict]:
+        """Return the record of one agent by name."""
+        agent_id = self.ids.get(name)
+        return None if agent_id is None else self.record(agent_id)
+
+    def query(self, **filters) -> List[Dict]:
+        """Return records of agents matching the filters of select()."""
+        return [self.record(agent_id) for agent_id in self.select(**filters)]
+
+    def values(self, field: str) -> Dict[str, int]:
+        """Count agents per value of an indexed field (e.g. every tool)."""
+        return {key: len(ids) for key, ids in sorted(self.index[field].items())}
@@ -0,0 +1,366 @@
+"""
+Static render-cost analysis of Jinja2 templates.
+
+A loop over a large list, a deep include chain or a skill included twice
+only shows up once builds slow down or prompts blow their token budget.
+The analyzer walks a template's parsed AST, without rendering it, and
+reports per template:
+
+- include depth, fan-out (include statements in one template) and
+  templates included more than once
+- loop nesting
+- the estimated rendered size and token count, and the contribution of
+  every include and loop to it
+
+Sizes are estimates. Static text counts as written and a loop repeats its
+body once per item of a literal or context list, or loop_iterations times
+when the iterable is unknown. A conditional counts its largest branch,
+since any profile may take it, and the includes of the branch that
+includes a template most. Expressions count their value when it is
+a constant or a context value, and EXPRESSION_WORDS otherwise.
+
+check_limits() compares a report with the configured limits (the analysis
+section of build_config.yml); `build.py analyze` prints the reports, and
+analysis.enforce fails a template at build time before it is rendered.
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from jinja2 import Environment, TemplateNotFound, nodes
+
+# Iterations assumed for a loop whose iterable is unknown until render time
+DEFAULT_LOOP_ITERATIONS = 10
+
+# Size assumed for an expression whose value is unknown at analysis time
+EXPRESSION_CHARS = 12
+EXPRESSION_WORDS = 2
+
+# Same heuristic as AgentBuilder.estimate_tokens
+TOKENS_PER_WORD = 1.3
+
+# Limit settings and the report value each one bounds
+LIMITS = {
+    "max_include_depth": ("include_depth", "include depth"),
+    "max_fan_out": ("fan_out", "include fan-out"),
+    "max_include_count": ("include_count", "includes of one template"),
+    "max_loop_depth": ("loop_depth", "loop nesting"),
+    "max_tokens": ("tokens", "estimated tokens"),
+}
+
+Size = Tuple[int, int]
+
+
+def estimate_tokens(words: int) -> int:
+    return int(words * TOKENS_PER_WORD)
+
+
+def largest(sizes: Sequence[Size]) -> Size:
+    """The size with the most words (then characters)."""
+    return max(sizes, key=lambda size: (size[1], size[0]))
+
+
+def describe_expression(node: nodes.Node) -> str:
+    """Short source-like label for a loop iterable."""
+    if isinstance(node, nodes.Name):
+        return node.name
+    if isinstance(node, nodes.Getattr):
+        return f"{describe_expression(node.node)}.{node.attr}"
+    if isinstance(node, (nodes.List, nodes.Tuple)):
+        return f"[{len(node.items)} items]"
+    if isinstance(node, nodes.Const):
+        return repr(node.value)[:30]
+    if isinstance(node, nodes.Call):
+        return f"{describe_expression(node.node)}(...)"
+    if isinstance(node, nodes.Filter):
+        return f"{describe_expression(node.node)} | {node.name}"
+    return type(node).__name__.lower()
+
+
+class RenderCostAnalyzer:
+    """
+    Estimate the render cost of templates served by a Jinja2 environment.
+
+    context holds the values templates are rendered with; lists in it give
+    loops over them a known length. Parsed templates are kept, so one
+    analyzer can walk every agent sharing the same skills cheaply.
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        context: Optional[Dict] = None,
+        loop_iterations: int = DEFAULT_LOOP_ITERATIONS,
+    ):
+        self.env = env
+        self.context = dict(context or {})
+        self.loop_iterations = loop_iterations
+        self._parsed: Dict[str, nodes.Template] = {}
+        self._report: Dict = {}
+        self._included: Counter = Counter()
+
+    def parse(self, name: str) -> nodes.Template:
+        if name not in self._parsed:
+            source, _, _ = self.env.loader.get_source(self.env, name)
+            self._parsed[name] = self.env.parse(source, name)
+        return self._parsed[name]
+
+    def analyze(self, name: str) -> Dict:
+        """
+        Analyze one template and everything it includes.
+
+        Returns:
+            {"template", "chars", "tokens", "include_depth", "fan_out",
+            "include_count", "repeated_includes", "loop_depth",
+            "dynamic_includes", "missing_includes", "cycles", "nodes"};
+            "nodes" lists every include and loop with its location and its
+            estimated contribution, largest first.
+
+        Raises:
+            TemplateNotFound: when the template itself does not exist
+            TemplateSyntaxError: when a template cannot be parsed
+        """
+        self._report = {
+            "template": name,
+            "chars": 0,
+            "tokens": 0,
+            "include_depth": 0,
+            "fan_out": 0,
+            "include_count": 0,
+            "repeated_includes": {},
+            "loop_depth": 0,
+            "dynamic_includes": 0,
+            "missing_includes": [],
+            "cycles": [],
+            "nodes": [],
+        }
+        self._included = Counter()
+        chars, words = self._measure_template(name, [name], 0, 1)
+        report = self._report
+        report["chars"] = chars
+        report["tokens"] = estimate_tokens(words)
+        report["repeated_includes"] = {
+            included: count
+            for included, count in sorted(self._included.items())
+            if count > 1
+        }
+        report["include_count"] = max(self._included.values(), default=0)
+        report["nodes"].sort(key=lambda node: (-node["tokens"], node["template"]))
+        return report
+
+    def _measure_template(
+        self, name: str, chain: List[str], loops: int, multiplier: int
+    ) -> Size:
+        body = self.parse(name).body
+        fan_out = sum(1 for _ in self.parse(name).find_all(nodes.Include))
+        self._report["fan_out"] = max(self._report["fan_out"], fan_out)
+        return self._measure(body, name, chain, loops, multiplier)
+
+    def _measure(
+        self,
+        body: Sequence[nodes.Node],
+        template: str,
+        chain: List[str],
+        loops: int,
+        multiplier: int,
+    ) -> Size:
+        """Sum the estimated size of a list of statements."""
+        chars = words = 0
+        for node in body:
+            node_chars, node_words = self._measure_node(
+                node, template, chain, loops, multiplier
+            )
+            chars += node_chars
+            words += node_words
+        return chars, words
+
+    def _measure_node(
+        self,
+        node: nodes.Node,
+        template: str,
+        chain: List[str],
+        loops: int,
+        multiplier: int,
+    ) -> Size:
+        if isinstance(node, nodes.Output):
+            chars = words = 0
+            for child in node.nodes:
+                child_chars, child_words = self._measure_expression(child)
+                chars += child_chars
+                words += child_words
+            return chars, words
+
+        if isinstance(node, nodes.Include):
+            return self._measure_include(node, template, chain, loops, multiplier)
+
+        if isinstance(node, nodes.For):
+            iterations = self._iterations(node.iter)
+            depth = loops + 1
+            self._report["loop_depth"] = max(self._report["loop_depth"], depth)
+            body, other = self._measure_branches(
+                [
+                    (node.body, depth, multiplier * iterations),
+                    (node.else_, loops, multiplier),
+                ],
+                template,
+                chain,
+            )
+            size = largest([(body[0] * iterations, body[1] * iterations), other])
+            self._record(
+                "for",
+                template,
+                node.lineno,
+                f"for ... in {describe_expression(node.iter)}",
+                size,
+                multiplier,
+                iterations=iterations,
+            )
+            return size
+
+        if isinstance(node, nodes.If):
+            branches = [node.body, *(branch.body for branch in node.elif_), node.else_]
+            return largest(
+                self._measure_branches(
+                    [(branch, loops, multiplier) for branch in branches],
+                    template,
+                    chain,
+                )
+            )
+
+        if isinstance(node, (nodes.Macro, nodes.Set, nodes.Import, nodes.FromImport)):
+            # Definitions render nothing where they stand
+            return 0, 0
+
+        body = getattr(node, "body", None)
+        if isinstance(body, list):
+            # With, Scope, FilterBlock, CallBlock, Block, ...
+            return self._measure(body, template, chain, loops, multiplier)
+        return 0, 0
+
+    def _measure_branches(
+        self,
+        branches: Sequence[Tuple[Sequence[nodes.Node], int, int]],
+        template: str,
+        chain: List[str],
+    ) -> List[Size]:
+        """
+        Measure mutually exclusive (body, loops, multiplier) branches.
+
+        Only one branch renders, so a template included in several of them
+        counts as often as the branch that includes it most, not the sum.
+        """
+        before = self._included
+        sizes = []
+        counts = []
+        for body, loops, multiplier in branches:
+            self._included = Counter(before)
+            sizes.append(self._measure(body, template, chain, loops, multiplier))
+            counts.append(self._included)
+        self._included = Counter(before)
+        for name in set().union(*counts):
+            self._included[name] = max(count[name] for count in counts)
+        return sizes
+
+    def _measure_include(
+        self,
+        node: nodes.Include,
+        template: str,
+        chain: List[str],
+        loops: int,
+        multiplier: int,
+    ) -> Size:
+        target = node.template
+        if not isinstance(target, nodes.Const) or not isinstance(target.value, str):
+            self._report["dynamic_includes"] += 1
+            return EXPRESSION_CHARS, EXPRESSION_WORDS
+
+        name = target.value
+        self._included[name] += 1
+        if name in chain:
+            self._report["cycles"].append(" -> ".join([*chain, name]))
+            return 0, 0
+        depth = len(chain)
+        self._report["include_depth"] = max(self._report["include_depth"], depth)
+        try:
+            size = self._measure_template(name, [*chain, name], loops, multiplier)
+        except TemplateNotFound:
+            if name not in self._report["missing_includes"]:
+                self._report["missing_includes"].append(name)
+            return 0, 0
+        self._record("include", template, node.lineno, name, size, multiplier)
+        return size
+
+    def _measure_expression(self, node: nodes.Node) -> Size:
+        if isinstance(node, nodes.TemplateData):
+            return len(node.data), len(node.data.split())
+        value = None
+        if isinstance(node, nodes.Const):
+            value = node.value
+        elif isinstance(node, nodes.Name) and node.name in self.context:
+            value = self.context[node.name]
+        if isinstance(value, (str, int, float)):
+            text = str(value)
+            return len(text), len(text.split())
+        return EXPRESSION_CHARS, EXPRESSION_WORDS
+
+    def _iterations(self, node: nodes.Node) -> int:
+        """Items a loop runs over: known for literals and context values."""
+        value = None
+        if isinstance(node, (nodes.List, nodes.Tuple)):
+            return len(node.items)
+        if isinstance(node, nodes.Const):
+            value = node.value
+        elif isinstance(node, nodes.Name):
+            value = self.context.get(node.name)
+        elif (
+            isinstance(node, nodes.Call)
+            and isinstance(node.node, nodes.Name)
+            and node.node.name == "range"
+            and len(node.args) == 1
+            and isinstance(node.args[0], nodes.Const)
+            and isinstance(node.args[0].value, int)
+        ):
+            return max(node.args[0].value, 0)
+        if isinstance(value, (list, tuple, dict, str)):
+            return len(value)
+        return self.loop_iterations
+
+    def _record(
+        self,
+        kind: str,
+        template: str,
+        line: int,
+        label: str,
+        size: Size,
+        multiplier: int,
+        **extra,
+    ):
+        chars, words = size
+        self._report["nodes"].append(
+            {
+                "kind": kind,
+                "template": template,
+                "line": line,
+                "label": label,
+                "chars": chars * multiplier,
+                "tokens": estimate_tokens(words * multiplier),
+                **extra,
+            }
+        )
+
+
+def check_limits(report: Dict, limits: Dict) -> List[str]:
+    """
+    Compare an analysis report with limits; returns the violations.
+
+    Limits left out (or null) are not checked. Include cycles are always
+    reported, since rendering them never finishes.
+    """
+    violations = [f"Include cycle: {cycle}" for cycle in report["cycles"]]
+    for setting, (key, label) in LIMITS.items():
+        limit = limits.get(setting)
+        if limit is not None and report[key] > limit:
+            violations.append(
+                f"{label.capitalize()} {report[key]} exceeds limit of {limit}"
+            )
+    return violations
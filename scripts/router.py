@@ -0,0 +1,276 @@
+"""
+Local task router over compiled agents.
+
+Agent descriptions are written as routing hints ("Use for complex logic,
+refactoring, and performance optimization in Python"). Instead of having
+a model read every description to pick an agent, the build writes
+router.json next to index.json: a BM25 inverted index over each agent's
+description, name and section headings. Ranking a task then takes a few
+posting-list lookups:
+
+    from router import Router
+    router = Router.load(".claude/agents/router.json")
+    router.route("my goroutines leak when the context is cancelled")
+
+Fields are weighted (BM25F-style): a term in the description counts more
+than one in a heading. Headings inside fenced code are ignored.
+"""
+
+import json
+import math
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from minify import split_fences, split_frontmatter
+
+ROUTER_VERSION = 1
+
+# Term frequency weight per field
+FIELD_WEIGHTS = {"description": 3, "name": 2, "headings": 1}
+
+# BM25 saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+STOPWORDS = frozenset(
+    """a an and are as at be but by can do does for from has have how i in
+    into is it its me my of on or our should so that the their them then
+    there these this to use using was we what when where which while who
+    why will with without you your""".split()
+)
+
+# Spellings that should meet in the index
+ALIASES = {
+    "golang": "go",
+    "postgres": "postgresql",
+    "psql": "postgresql",
+    "mongo": "mongodb",
+    "js": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "pwsh": "powershell",
+    "ps1": "powershell",
+}
+
+SUFFIXES = (
+    ("ations", ""),
+    ("ation", ""),
+    ("ings", ""),
+    ("ing", ""),
+    ("ies", "y"),
+    ("es", ""),
+    ("ed", ""),
+    ("s", ""),
+    ("e", ""),
+)
+
+
+def stem(word: str) -> str:
+    """Strip one common English suffix ("caching", "caches" -> "cach")."""
+    if word.endswith("ss") or not word.isalpha():
+        return word
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split, drop stopwords, resolve aliases and stem."""
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(stem(ALIASES.get(token, token)))
+    return terms
+
+
+def extract_headings(content: str) -> List[str]:
+    """Return the Markdown headings of an agent, outside fenced code."""
+    _, body = split_frontmatter(content)
+    headings = []
+    for is_code, lines in split_fences(body):
+        if is_code:
+            continue
+        for line in lines:
+            if line.startswith("#"):
+                heading = line.lstrip("#").strip()
+                if heading:
+                    headings.append(heading)
+    return headings
+
+
+def build_router_index(agents: Dict[str, Dict]) -> Dict:
+    """
+    Build the router index from catalog.json agent entries.
+
+    Each entry contributes its frontmatter description, its name and its
+    "headings". Posting lists hold [agent id, weighted term frequency].
+    """
+    names = sorted(agents)
+    index: Dict = {
+        "version": ROUTER_VERSION,
+        "k1": K1,
+        "b": B,
+        "agents": names,
+        "profiles": [],
+        "descriptions": [],
+        "lengths": [],
+        "postings": {},
+    }
+    for agent_id, name in enumerate(names):
+        entry = agents[name]
+        description = str((entry.get("frontmatter") or {}).get("description") or "")
+        fields = {
+            "description": description,
+            "name": name.replace("-", " "),
+            "headings": " ".join(entry.get("headings", [])),
+        }
+        frequencies: Dict[str, int] = {}
+        for field, text in fields.items():
+            for term in tokenize(text):
+                frequencies[term] = frequencies.get(term, 0) + FIELD_WEIGHTS[field]
+        index["profiles"].append(entry.get("profile", "full"))
+        index["descriptions"].append(" ".join(description.split()))
+        index["lengths"].append(sum(frequencies.values()))
+        for term, frequency in frequencies.items():
+            index["postings"].setdefault(term, []).append([agent_id, frequency])
+    index["postings"] = dict(sorted(index["postings"].items()))
+    return index
+
+
+class Router:
+    """BM25 ranking of agents for a task description."""
+
+    def __init__(self, index: Dict):
+        if index.get("version") != ROUTER_VERSION:
+            raise ValueError(
+                f"Unsupported router index version {index.get('version')} "
+                f"(expected {ROUTER_VERSION}); rebuild the agents"
+            )
+        self.agents: List[str] = index["agents"]
+        self.profiles: List[str] = index["profiles"]
+        self.descriptions: List[str] = index["descriptions"]
+        self.lengths: List[int] = index["lengths"]
+        self.postings: Dict[str, List[List[int]]] = index["postings"]
+        self.k1 = index.get("k1", K1)
+        self.b = index.get("b", B)
+        count = len(self.agents)
+        self.average_length = sum(self.lengths) / count if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Router":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def route(
+        self, task: str, limit: int = 3, profile: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Rank agents for a task, best first.
+
+        Returns up to limit {"agent", "score", "description"} entries;
+        agents sharing no term with the task are left out. With profile,
+        only variants of that build profile are ranked.
+        """
+        query: Dict[str, int] = {}
+        for term in tokenize(task):
+            query[term] = query.get(term, 0) + 1
+
+        scores: Dict[int, float] = {}
+        for term, repeats in query.items():
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for agent_id, frequency in self.postings[term]:
+                if profile is not None and self.profiles[agent_id] != profile:
+                    continue
+                norm = (
+                    1
+                    - self.b
+                    + self.b * self.lengths[agent_id] / (self.average_length or 1)
+                )
+                score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+                scores[agent_id] = scores.get(agent_id, 0.0) + score * repeats
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            {
+                "agent": self.agents[agent_id],
+                "score": round(score, 4),
+                "description": self.descriptions[agent_id],
+            }
+            for agent_id, score in ranked[:limit]
+        ]
+
+
+def load_routing_dataset(path: Union[str, Path]) -> List[Dict]:
+    """
+    Read labeled tasks: one {"task": ..., "agent": ...} JSON object per
+    line; "agents" may list several acceptable agents instead.
+    """
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            expected = row.get("agents") or [row.get("agent")]
+            if not isinstance(row.get("task"), str) or not all(expected):
+                raise ValueError(f"{path}:{number}: expected 'task' and 'agent'")
+            rows.append({"task": row["task"], "agents": list(expected)})
+    return rows
+
+
+def evaluate(
+    router: Router,
+    rows: Iterable[Dict],
+    limit: int = 3,
+    profile: Optional[str] = None,
+) -> Dict:
+    """
+    Measure routing quality on labeled tasks.
+
+    Returns accuracy (top-1), recall (expected agent within the top limit),
+    mean reciprocal rank, mean and worst routing time in milliseconds, and
+    the tasks not routed to an expected agent first.
+    """
+    total = top1 = hits = 0
+    reciprocal = 0.0
+    times: List[float] = []
+    misses = []
+    for row in rows:
+        start = time.perf_counter()
+        ranked = [r["agent"] for r in router.route(row["task"], limit, profile)]
+        times.append((time.perf_counter() - start) * 1000)
+        total += 1
+        rank = next(
+            (i + 1 for i, agent in enumerate(ranked) if agent in row["agents"]), None
+        )
+        if rank == 1:
+            top1 += 1
+        else:
+            misses.append(
+                {"task": row["task"], "expected": row["agents"], "got": ranked}
+            )
+        if rank is not None:
+            hits += 1
+            reciprocal += 1 / rank
+    return {
+        "tasks": total,
+        "accuracy": round(top1 / total, 4) if total else 0.0,
+        "limit": limit,
+        "recall": round(hits / total, 4) if total else 0.0,
+        "mrr": round(reciprocal / total, 4) if total else 0.0,
+        "mean_ms": round(sum(times) / total, 4) if total else 0.0,
+        "max_ms": round(max(times), 4) if times else 0.0,
+        "misses": misses,
+    }
@@ -0,0 +1,530 @@
+"""
+Batched grading of llm-rubric assertions.
+
+Promptfoo grades every llm-rubric assertion with its own grader call, so a
+dataset with one rubric per test pays one extra model call per response.
+Batched grading moves rubrics out of Promptfoo and grades many of them in
+one request:
+
+    python scripts/eval_cli.py shard --shard 1/1 --defer-rubrics
+    npx promptfoo eval -c eval/promptfoo.yaml \\
+        --tests eval/shards/shard-1-of-1.jsonl --output eval/results.json
+    python scripts/eval_cli.py grade eval/results.json
+
+defer_rubrics() moves a test's llm-rubric assertions to its metadata, so
+Promptfoo only runs the cheap assertions and keeps the rubrics with the
+result. grade_results() then packs (output, rubric) items into batches of
+up to batch_size items and max_chars characters, asks the grader for a
+JSON array with one verdict per item and validates it: every item must
+be answered exactly once, with a boolean "pass", a score between 0 and 1
+and a reason. When a reply fails validation, the items of that batch are
+graded one at a time instead, and an item whose single reply is invalid
+too fails with the parse error as its reason. A request that fails in
+transport (an HTTP error such as 429 or 529, a timeout, a grader command
+that exits non-zero) is retried with exponential backoff; when the
+retries run out, only the items of that request fail, with the error as
+their reason, and the rest of the file is still graded.
+
+Verdicts are added to each result's gradingResult as component results,
+and its score and pass are recomputed as Promptfoo computes them (the
+weighted mean of assertion scores; pass when every assertion passed), so
+the merge command reads graded files like any other.
+
+A grader is any callable that takes the request text and returns the
+reply text: AnthropicGrader calls the Messages API, CommandGrader runs a
+local command (request on stdin, reply on stdout) and stub_grader answers
+offline from rubric keywords, for testing the pipeline without a model.
+"""
+
+import http.client
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+RUBRIC_TYPE = "llm-rubric"
+
+# Where defer_rubrics() keeps the rubrics of a test case
+METADATA_KEY = "deferredRubrics"
+
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_MAX_CHARS = 24000
+# Attempts after a failed grader request, waiting backoff * 2**n before each
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 2.0
+DEFAULT_GRADER_MODEL = "claude-haiku-4-20250514"
+ANTHROPIC_PROVIDER = "anthropic:messages:"
+
+ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
+ANTHROPIC_VERSION = "2023-06-01"
+
+Grader = Callable[[str], str]
+
+INSTRUCTIONS = """\
+You are grading model outputs against rubrics. For each item, decide
+whether the output satisfies its rubric.
+
+Reply with only a JSON array holding one object per item:
+[{"id": <item id>, "pass": true or false, "score": <number from 0 to 1>,
+  "reason": "<one sentence>"}]
+
+Items:
+"""
+
+
+# Grader request failures (urllib's HTTPError and URLError are OSErrors,
+# a response cut short raises an HTTPException such as IncompleteRead, a
+# failed or timed out grader command is a SubprocessError)
+TRANSPORT_ERRORS = (OSError, http.client.HTTPException, subprocess.SubprocessError)
+
+# HTTP statuses that a later attempt can get past; other 4xx are final
+RETRY_STATUSES = {408, 409, 429}
+
+
+class GraderReplyError(ValueError):
+    """A grader reply that is not a valid verdict for every item."""
+
+
+def retryable(error: Exception) -> bool:
+    """Whether a failed grader request is worth another attempt."""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500 or error.code in RETRY_STATUSES
+    return True
+
+
+def defer_rubrics(row: Dict) -> Dict:
+    """Return a test case with its llm-rubric assertions moved to metadata."""
+    assertions = row.get("assert") or []
+    rubrics = [a for a in assertions if a.get("type") == RUBRIC_TYPE]
+    if not rubrics:
+        return row
+    deferred = dict(row)
+    deferred["assert"] = [a for a in assertions if a.get("type") != RUBRIC_TYPE]
+    deferred["metadata"] = {**(row.get("metadata") or {}), METADATA_KEY: rubrics}
+    return deferred
+
+
+def build_request(items: List[Dict]) -> str:
+    """Grader request for items of {"id", "rubric", "output"}."""
+    return INSTRUCTIONS + json.dumps(items, indent=2, ensure_ascii=False)
+
+
+def parse_verdicts(reply: str, ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    Validate a grader reply against the ids of the items it grades.
+
+    The array may be wrapped in prose or a code fence; everything between
+    its first "[" and last "]" is parsed.
+
+    Returns:
+        {id: {"pass", "score", "reason"}}
+
+    Raises:
+        GraderReplyError: when the reply is not one valid verdict per item
+    """
+    start, end = reply.find("["), reply.rfind("]")
+    if start < 0 or end < start:
+        raise GraderReplyError("no JSON array in grader reply")
+    try:
+        verdicts = json.loads(reply[start : end + 1])
+    except json.JSONDecodeError as e:
+        raise GraderReplyError(f"invalid JSON in grader reply: {e.msg}")
+    if not isinstance(verdicts, list):
+        raise GraderReplyError("grader reply is not a JSON array")
+
+    expected = set(ids)
+    parsed: Dict[int, Dict] = {}
+    for verdict in verdicts:
+        if not isinstance(verdict, dict):
+            raise GraderReplyError("verdict is not an object")
+        item = verdict.get("id")
+        if not isinstance(item, int) or isinstance(item, bool):
+            raise GraderReplyError(f"verdict id {item!r} is not an item number")
+        if item not in expected:
+            raise GraderReplyError(f"verdict for unknown item {item!r}")
+        if item in parsed:
+            raise GraderReplyError(f"item {item} graded twice")
+        if not isinstance(verdict.get("pass"), bool):
+            raise GraderReplyError(f"item {item}: 'pass' must be true or false")
+        score = verdict.get("score", 1.0 if verdict["pass"] else 0.0)
+        if (
+            isinstance(score, bool)
+            or not isinstance(score, (int, float))
+            or not 0 <= score <= 1
+        ):
+            raise GraderReplyError(f"item {item}: 'score' must be between 0 and 1")
+        reason = verdict.get("reason", "")
+        if not isinstance(reason, str):
+            raise GraderReplyError(f"item {item}: 'reason' must be a string")
+        parsed[item] = {
+            "pass": verdict["pass"],
+            "score": float(score),
+            "reason": reason,
+        }
+    if set(parsed) != expected:
+        missing = ", ".join(str(i) for i in sorted(expected - set(parsed)))
+        raise GraderReplyError(f"no verdict for item(s) {missing}")
+    return parsed
+
+
+def pack_batches(
+    items: List[Dict], batch_size: int, max_chars: int
+) -> List[List[Dict]]:
+    """
+    Split items into batches of at most batch_size items and max_chars
+    characters of output and rubric; a larger item gets a batch of its own.
+    """
+    batches: List[List[Dict]] = []
+    current: List[Dict] = []
+    size = 0
+    for item in items:
+        item_size = len(item["output"]) + len(item["rubric"])
+        if current and (len(current) >= batch_size or size + item_size > max_chars):
+            batches.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += item_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchGrader:
+    """
+    Grade items in batches with a grader, falling back to single items.
+
+    stats counts the grader "calls", the "batches" sent, the "fallbacks"
+    (batches whose reply failed validation), the "invalid" single
+    replies, the "retries" of failed requests and the "errors" (requests
+    that failed after every retry).
+    """
+
+    def __init__(
+        self,
+        grader: Grader,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_chars: int = DEFAULT_MAX_CHARS,
+        workers: int = 1,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.grader = grader
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.sleep = sleep
+        self.stats = {
+            "calls": 0,
+            "batches": 0,
+            "fallbacks": 0,
+            "invalid": 0,
+            "retries": 0,
+            "errors": 0,
+        }
+        self._lock = threading.Lock()
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def ask(self, items: List[Dict]) -> Dict[int, Dict]:
+        request = build_request(items)
+        attempt = 0
+        while True:
+            self.count("calls")
+            try:
+                reply = self.grader(request)
+                break
+            except TRANSPORT_ERRORS as e:
+                if attempt >= self.retries or not retryable(e):
+                    raise
+                self.count("retries")
+                self.sleep(self.backoff * 2**attempt)
+                attempt += 1
+        return parse_verdicts(reply, (item["id"] for item in items))
+
+    def failed(self, items: List[Dict], reason: str) -> Dict[int, Dict]:
+        return {
+            item["id"]: {"pass": False, "score": 0.0, "reason": reason}
+            for item in items
+        }
+
+    def grade_batch(self, batch: List[Dict]) -> Dict[int, Dict]:
+        self.count("batches")
+        try:
+            return self.ask(batch)
+        except TRANSPORT_ERRORS as e:
+            # Regrading one item at a time would only repeat the failure
+            self.count("errors")
+            return self.failed(batch, f"Grader request failed: {e}")
+        except GraderReplyError:
+            if len(batch) == 1:
+                return self.grade_single(batch[0])
+            self.count("fallbacks")
+        verdicts: Dict[int, Dict] = {}
+        for item in batch:
+            verdicts.update(self.grade_single(item))
+        return verdicts
+
+    def grade_single(self, item: Dict) -> Dict[int, Dict]:
+        try:
+            return self.ask([item])
+        except TRANSPORT_ERRORS as e:
+            self.count("errors")
+            return self.failed([item], f"Grader request failed: {e}")
+        except GraderReplyError as e:
+            self.count("invalid")
+            return self.failed([item], f"Grader reply could not be used: {e}")
+
+    def grade(self, items: List[Dict]) -> Dict[int, Dict]:
+        """Grade items of {"id", "rubric", "output"}; returns {id: verdict}."""
+        batches = pack_batches(items, self.batch_size, self.max_chars)
+        verdicts: Dict[int, Dict] = {}
+        if self.workers == 1 or len(batches) < 2:
+            for batch in batches:
+                verdicts.update(self.grade_batch(batch))
+            return verdicts
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch_verdicts in executor.map(self.grade_batch, batches):
+                verdicts.update(batch_verdicts)
+        return verdicts
+
+
+def result_output(result: Dict) -> Optional[str]:
+    output = (result.get("response") or {}).get("output")
+    if output is None:
+        return None
+    return output if isinstance(output, str) else json.dumps(output)
+
+
+def deferred_items(results: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, Dict]]]:
+    """
+    Collect the deferred rubrics of results as grading items.
+
+    Returns:
+        (items, [(result index, rubric assertion)] in item id order);
+        results without an output (provider errors) and rubrics graded
+        by an earlier run are skipped
+    """
+    items: List[Dict] = []
+    owners: List[Tuple[int, Dict]] = []
+    for index, result in enumerate(results):
+        metadata = (result.get("testCase") or {}).get("metadata") or {}
+        output = result_output(result)
+        if output is None:
+            continue
+        components = (result.get("gradingResult") or {}).get("componentResults")
+        graded = [component.get("assertion") for component in components or []]
+        for assertion in metadata.get(METADATA_KEY) or []:
+            if assertion in graded:
+                continue
+            items.append(
+                {
+                    "id": len(items),
+                    "rubric": str(assertion.get("value")),
+                    "output": output,
+                }
+            )
+            owners.append((index, assertion))
+    return items, owners
+
+
+def apply_verdict(result: Dict, assertion: Dict, verdict: Dict):
+    """Add a rubric verdict to a result and recompute its score and pass."""
+    grading = result.setdefault(
+        "gradingResult", {"pass": True, "score": 1.0, "reason": ""}
+    )
+    components = grading.setdefault("componentResults", [])
+    components.append({**verdict, "assertion": assertion})
+
+    weights = [
+        float((component.get("assertion") or {}).get("weight", 1))
+        for component in components
+    ]
+    total = sum(weights)
+    score = (
+        sum(float(c.get("score", 0)) * w for c, w in zip(components, weights)) / total
+        if total
+        else 0.0
+    )
+    passed = all(component.get("pass") for component in components)
+    grading["score"] = score
+    grading["pass"] = passed
+    if not verdict["pass"]:
+        grading["reason"] = verdict["reason"]
+    result["score"] = score
+    result["success"] = passed
+
+
+def grade_results(results: List[Dict], batch_grader: BatchGrader) -> Dict:
+    """
+    Grade the deferred rubrics of Promptfoo results in place.
+
+    Returns:
+        {"items", "passed", "failed", **batch_grader.stats}
+    """
+    items, owners = deferred_items(results)
+    verdicts = batch_grader.grade(items) if items else {}
+    passed = 0
+    for item, (index, assertion) in zip(items, owners):
+        verdict = verdicts[item["id"]]
+        apply_verdict(results[index], assertion, verdict)
+        passed += verdict["pass"]
+    return {
+        "items": len(items),
+        "passed": passed,
+        "failed": len(items) - passed,
+        **batch_grader.stats,
+    }
+
+
+def grade_file(
+    path: Union[str, Path],
+    batch_grader: BatchGrader,
+    output: Optional[Union[str, Path]] = None,
+) -> Dict:
+    """
+    Grade a Promptfoo results file and write it back (or to output).
+
+    The file is written next to its destination and renamed into place.
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    results = data.get("results", data) if isinstance(data, dict) else data
+    if isinstance(results, dict):
+        results = results.get("results")
+    if not isinstance(results, list):
+        raise ValueError(f"{path}: not a Promptfoo results file")
+
+    report = grade_results(results, batch_grader)
+    target = Path(output or path)
+    fd, temp_path = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        os.replace(temp_path, target)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+    return report
+
+
+def config_grader_model(config: Dict) -> str:
+    """Grader model from defaultTest.options.provider in promptfoo.yaml."""
+    options = (config.get("defaultTest") or {}).get("options") or {}
+    provider = options.get("provider")
+    if isinstance(provider, dict):
+        provider = provider.get("id")
+    if isinstance(provider, str) and provider.startswith(ANTHROPIC_PROVIDER):
+        return provider[len(ANTHROPIC_PROVIDER) :]
+    return DEFAULT_GRADER_MODEL
+
+
+class AnthropicGrader:
+    """Grader that calls the Anthropic Messages API (ANTHROPIC_API_KEY)."""
+
+    def __init__(
+        self,
+        model: str = DEFAULT_GRADER_MODEL,
+        api_key: Optional[str] = None,
+        max_tokens: int = 4096,
+        timeout: float = 120.0,
+        url: str = ANTHROPIC_URL,
+    ):
+        self.model = model
+        self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
+        if not self.api_key:
+            raise ValueError("ANTHROPIC_API_KEY is not set")
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.url = url
+
+    def __call__(self, prompt: str) -> str:
+        body = json.dumps(
+            {
+                "model": self.model,
+                "max_tokens": self.max_tokens,
+                "temperature": 0,
+                "messages": [{"role": "user", "content": prompt}],
+            }
+        ).encode("utf-8")
+        request = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={
+                "content-type": "application/json",
+                "x-api-key": self.api_key,
+                "anthropic-version": ANTHROPIC_VERSION,
+            },
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = response.read()
+        try:
+            reply = json.loads(body)
+        except ValueError as e:
+            raise GraderReplyError(f"invalid JSON from the Messages API: {e}")
+        if not isinstance(reply, dict):
+            raise GraderReplyError("Messages API reply is not a JSON object")
+        return "".join(
+            block.get("text", "")
+            for block in reply.get("content", [])
+            if block.get("type") == "text"
+        )
+
+
+class CommandGrader:
+    """Grader that runs a local command: request on stdin, reply on stdout."""
+
+    def __init__(self, command: str, timeout: float = 120.0):
+        self.command = command
+        self.timeout = timeout
+
+    def __call__(self, prompt: str) -> str:
+        completed = subprocess.run(
+            self.command,
+            shell=True,
+            input=prompt,
+            capture_output=True,
+            text=True,
+            timeout=self.timeout,
+            check=True,
+        )
+        return completed.stdout
+
+
+def stub_grader(prompt: str) -> str:
+    """
+    Offline grader: an output passes when it contains at least half of the
+    longer words (5+ letters) of its rubric. Only for pipeline tests.
+    """
+    items = json.loads(prompt[len(INSTRUCTIONS) :])
+    verdicts = []
+    for item in items:
+        terms = sorted(set(re.findall(r"[a-z]{5,}", item["rubric"].lower())))
+        output = item["output"].lower()
+        hits = sum(1 for term in terms if term[:5] in output)
+        score = hits / len(terms) if terms else 1.0
+        verdicts.append(
+            {
+                "id": item["id"],
+                "pass": score >= 0.5,
+                "score": round(score, 4),
+                "reason": f"stub: {hits}/{len(terms)} rubric terms found",
+            }
+        )
+    return json.dumps(verdicts)
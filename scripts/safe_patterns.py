@@ -0,0 +1,813 @@
+"""
+ReDoS-safe loading and matching of dangerous command patterns.
+
+The regexes in config/dangerous_commands.json run against arbitrary bash
+blocks, so one contributed pattern with nested or overlapping quantifiers
+can backtrack for minutes on a long line. Patterns are therefore parsed and
+checked when they are loaded:
+
+- nested unbounded quantifiers, e.g. (a+)+: flattened to a single
+  quantifier when the group only wraps the inner repeat, otherwise risky
+- adjacent overlapping quantifiers, e.g. \\s+.* or \\d*\\d+: the one
+  subsumed by its neighbour is made exact (\\s.*), otherwise risky
+- chains of .* gaps, e.g. while\\s+true.*do.*done.*&: every gap followed
+  by a literal is rewritten to stop at the literal's first occurrence,
+  which matches the same lines without polynomial backtracking
+- alternations under a quantifier whose branches can start alike, bounded
+  repeats of an unbounded repeat such as (.*a){20}, and backreferences:
+  risky
+
+Rewrites never change which lines a pattern matches. Under the "rewrite"
+policy risky patterns that could not be rewritten still run, but in a
+watchdog subprocess that is killed when the pattern exceeds its time
+budget; under "reject" they are dropped. Inline matches that overrun the
+budget move their pattern to the watchdog for the rest of the build.
+
+benchmark() fuzzes every pattern with adversarial inputs built from its
+own literals and reports the worst-case match time (build.py pattern-bench).
+"""
+
+import multiprocessing
+import random
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from re import _constants as sre
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants as sre
+    import sre_parse
+
+POLICIES = ("rewrite", "reject", "off")
+DEFAULT_BUDGET_MS = 100
+
+# Characters used to compare character classes (all of ASCII plus a few
+# Unicode letters, digits and spaces)
+SAMPLE_CHARS = (
+    "".join(chr(i) for i in range(128)) + "\u00e9\u00df\u4e2d\u0663\u00a0\u2003"
+)
+
+REPEATS = (sre.MAX_REPEAT, sre.MIN_REPEAT)
+SINGLE_CHAR = (sre.LITERAL, sre.NOT_LITERAL, sre.ANY, sre.IN)
+
+CATEGORIES = {
+    sre.CATEGORY_DIGIT: r"\d",
+    sre.CATEGORY_NOT_DIGIT: r"\D",
+    sre.CATEGORY_SPACE: r"\s",
+    sre.CATEGORY_NOT_SPACE: r"\S",
+    sre.CATEGORY_WORD: r"\w",
+    sre.CATEGORY_NOT_WORD: r"\W",
+}
+ANCHORS = {
+    sre.AT_BEGINNING: "^",
+    sre.AT_BEGINNING_STRING: r"\A",
+    sre.AT_END: "$",
+    sre.AT_END_STRING: r"\Z",
+    sre.AT_BOUNDARY: r"\b",
+    sre.AT_NON_BOUNDARY: r"\B",
+}
+FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.ASCII: "a"}
+
+Node = Tuple
+
+
+class UnsupportedPattern(Exception):
+    """The pattern uses syntax the rewriter does not reproduce."""
+
+
+# ---------------------------------------------------------------------------
+# Unparsing
+
+
+def class_char(code: int) -> str:
+    char = chr(code)
+    return "\\" + char if char in "\\]^-[" else re.escape(char)
+
+
+def unparse(nodes: Iterable[Node]) -> str:
+    """Turn parsed nodes back into pattern source."""
+    return "".join(unparse_node(op, av) for op, av in nodes)
+
+
+def unparse_node(op, av) -> str:
+    if op == sre.LITERAL:
+        return re.escape(chr(av))
+    if op == sre.NOT_LITERAL:
+        return f"[^{class_char(av)}]"
+    if op == sre.ANY:
+        return "."
+    if op == sre.IN:
+        items = list(av)
+        if len(items) == 1 and items[0][0] == sre.CATEGORY:
+            return CATEGORIES[items[0][1]]
+        negate = bool(items) and items[0][0] == sre.NEGATE
+        parts = []
+        for item_op, item_av in items[1:] if negate else items:
+            if item_op == sre.LITERAL:
+                parts.append(class_char(item_av))
+            elif item_op == sre.RANGE:
+                parts.append(f"{class_char(item_av[0])}-{class_char(item_av[1])}")
+            elif item_op == sre.CATEGORY:
+                parts.append(CATEGORIES[item_av])
+            else:
+                raise UnsupportedPattern(f"character class item {item_op}")
+        return "[" + ("^" if negate else "") + "".join(parts) + "]"
+    if op == sre.AT:
+        return ANCHORS[av]
+    if op == sre.BRANCH:
+        return "(?:" + "|".join(unparse(branch) for branch in av[1]) + ")"
+    if op == sre.SUBPATTERN:
+        group, add_flags, del_flags, body = av
+        if add_flags or del_flags:
+            raise UnsupportedPattern("scoped inline flags")
+        return ("(" if group else "(?:") + unparse(body) + ")"
+    if op in REPEATS or op == getattr(sre, "POSSESSIVE_REPEAT", None):
+        low, high, body = av
+        body = list(body)
+        text = unparse(body)
+        if not (len(body) == 1 and body[0][0] in SINGLE_CHAR + (sre.SUBPATTERN,)):
+            text = f"(?:{text})"
+        if (low, high) == (0, sre.MAXREPEAT):
+            quantifier = "*"
+        elif (low, high) == (1, sre.MAXREPEAT):
+            quantifier = "+"
+        elif (low, high) == (0, 1):
+            quantifier = "?"
+        elif high == sre.MAXREPEAT:
+            quantifier = f"{{{low},}}"
+        elif low == high:
+            quantifier = f"{{{low}}}"
+        else:
+            quantifier = f"{{{low},{high}}}"
+        if op == sre.MIN_REPEAT:
+            quantifier += "?"
+        elif op != sre.MAX_REPEAT:
+            quantifier += "+"
+        return text + quantifier
+    if op == getattr(sre, "ATOMIC_GROUP", None):
+        return "(?>" + unparse(av) + ")"
+    if op in (sre.ASSERT, sre.ASSERT_NOT):
+        direction, body = av
+        kind = {
+            (sre.ASSERT, 1): "?=",
+            (sre.ASSERT, -1): "?<=",
+            (sre.ASSERT_NOT, 1): "?!",
+            (sre.ASSERT_NOT, -1): "?<!",
+        }[(op, direction)]
+        return f"({kind}{unparse(body)})"
+    if op == sre.GROUPREF:
+        return f"(?:\\{av})"
+    raise UnsupportedPattern(f"{op}")
+
+
+def flag_prefix(flags: int) -> str:
+    letters = "".join(letter for flag, letter in FLAGS.items() if flags & flag)
+    return f"(?{letters})" if letters else ""
+
+
+# ---------------------------------------------------------------------------
+# Analysis
+
+
+class Analyzer:
+    """Find (and where possible rewrite) backtracking hazards in a pattern."""
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        parsed = sre_parse.parse(pattern)
+        self.flags = parsed.state.flags
+        self.nodes = list(parsed)
+        self.issues: List[Dict] = []
+        self._charsets: Dict[str, frozenset] = {}
+
+    def charset(self, node: Node) -> frozenset:
+        """Sample characters one single-character node matches."""
+        source = unparse([node])
+        if source not in self._charsets:
+            regex = re.compile(source, self.flags & ~re.VERBOSE)
+            self._charsets[source] = frozenset(
+                c for c in SAMPLE_CHARS if regex.fullmatch(c)
+            )
+        return self._charsets[source]
+
+    def issue(self, kind: str, detail: str, fixed: bool, risk: str):
+        self.issues.append(
+            {"kind": kind, "detail": detail, "fixed": fixed, "risk": risk}
+        )
+
+    def run(self) -> str:
+        """Return the rewritten pattern; self.issues lists what was found."""
+        if self.has_backreference(self.nodes):
+            self.issue(
+                "backreference", "backreferences can backtrack", False, "exponential"
+            )
+            return self.pattern
+        nodes = self.rewrite_sequence(self.nodes, top=True)
+        if not any(issue["fixed"] for issue in self.issues):
+            return self.pattern
+        return flag_prefix(self.flags) + unparse(nodes)
+
+    def has_backreference(self, nodes) -> bool:
+        return any(
+            op in (sre.GROUPREF, sre.GROUPREF_EXISTS)
+            or any(self.has_backreference(child) for child in children(op, av))
+            for op, av in nodes
+        )
+
+    def rewrite_sequence(self, nodes, top: bool = False) -> List[Node]:
+        """Rewrite the nodes of a sequence, then its adjacent repeats."""
+        result = [self.rewrite_node(op, av) for op, av in nodes]
+        if top:
+            result = self.rewrite_gaps(result)
+        result = self.rewrite_pairs(result)
+        self.check_chains(result)
+        return result
+
+    def rewrite_pairs(self, nodes: List[Node]) -> List[Node]:
+        """
+        Make adjacent overlapping repeats split their input one way only.
+
+        For A{m,} followed by B{n,}:
+
+        - if one class contains the other, the contained repeat only needs
+          its minimum count (\\d*\\d+ is \\d+)
+        - if B is optional, B's part must start with a character A cannot
+          take: A{m,}(?:(?!A)B+)?
+        - if A is optional, A's part must end with a character B cannot
+          take: (?:A+(?<!B))?B{n,}
+
+        Each rewrite only moves characters between the two parts, so the
+        pattern matches the same text. The last two add lookarounds, which
+        slow down every step, so they are only used where backtracking is
+        worse than quadratic: in runs of three or more overlapping repeats,
+        or next to a tempered gap from rewrite_gaps().
+        """
+        result = list(nodes)
+        in_long_run = set()
+        for start, end in self.overlapping_runs(result):
+            if end - start >= 3:
+                in_long_run.update(range(start, end))
+
+        # Right to left, so earlier indexes stay valid
+        for i in range(len(result) - 2, -1, -1):
+            first, second = result[i], result[i + 1]
+            a_item, b_item = one_char_item(first), one_char_item(second)
+            if a_item is None or b_item is None:
+                continue
+            a, b = self.charset(a_item[-1]), self.charset(b_item[-1])
+            if not a & b:
+                continue
+            pair = unparse([first, second])
+            plain = len(a_item) == 1 and len(b_item) == 1
+            if plain and (a <= b or b <= a):
+                # The subsumed repeat only needs its minimum count
+                index = i if a <= b else i + 1
+                op, (low, _, body) = result[index]
+                result[index : index + 1] = exactly(op, low, body)
+            elif plain and i not in in_long_run:
+                continue
+            elif second[1][0] == 0:
+                result[i + 1] = (
+                    sre.MAX_REPEAT,
+                    (
+                        0,
+                        1,
+                        [(sre.ASSERT_NOT, (1, a_item))]
+                        + b_item
+                        + [(second[0], (0, sre.MAXREPEAT, b_item))],
+                    ),
+                )
+            elif first[1][0] == 0:
+                result[i] = (
+                    sre.MAX_REPEAT,
+                    (
+                        0,
+                        1,
+                        [(first[0], (0, sre.MAXREPEAT, a_item))]
+                        + a_item
+                        + [(sre.ASSERT_NOT, (-1, b_item))],
+                    ),
+                )
+            else:
+                continue
+            self.issue("overlapping_quantifiers", pair, True, "quadratic")
+        return result
+
+    def overlapping_runs(self, nodes: List[Node]) -> List[Tuple[int, int]]:
+        """(start, end) of every run of 2+ adjacent overlapping repeats."""
+        runs = []
+        start = 0
+        for i in range(1, len(nodes) + 1):
+            if i < len(nodes):
+                previous, item = one_char_item(nodes[i - 1]), one_char_item(nodes[i])
+                if (
+                    previous is not None
+                    and item is not None
+                    and self.charset(previous[-1]) & self.charset(item[-1])
+                ):
+                    continue
+            if i - start > 1:
+                runs.append((start, i))
+            start = i
+        return runs
+
+    def check_chains(self, nodes: List[Node]):
+        """
+        Report adjacent overlapping repeats that could not be rewritten.
+
+        Two backtrack quadratically, which is tolerated; three or more in a
+        row are polynomial and make the pattern risky.
+        """
+        for start, end in self.overlapping_runs(nodes):
+            self.issue(
+                "overlapping_quantifiers",
+                unparse(nodes[start:end]),
+                False,
+                "quadratic" if end - start == 2 else "polynomial",
+            )
+
+    def rewrite_node(self, op, av) -> Node:
+        if op in REPEATS:
+            low, high, body = av
+            body = self.rewrite_sequence(body)
+            if high == sre.MAXREPEAT:
+                inner = unwrap(body)
+                if (
+                    inner is not None
+                    and inner[0] in REPEATS
+                    and inner[1][1] == sre.MAXREPEAT
+                ):
+                    # (x{a,}){b,} matches exactly x{a*b,}
+                    self.issue(
+                        "nested_quantifier", unparse([(op, av)]), True, "exponential"
+                    )
+                    inner_low, _, inner_body = inner[1]
+                    return (op, (low * inner_low, sre.MAXREPEAT, inner_body))
+                if contains_unbounded_repeat(body):
+                    self.issue(
+                        "nested_quantifier", unparse([(op, av)]), False, "exponential"
+                    )
+                self.check_alternation(body)
+            elif high > 1 and contains_unbounded_repeat(body):
+                # (.*a){20} tries every split of the text into 20 parts
+                self.issue(
+                    "nested_quantifier", unparse([(op, av)]), False, "polynomial"
+                )
+            return (op, (low, high, body))
+        if op == sre.SUBPATTERN:
+            group, add_flags, del_flags, body = av
+            return (op, (group, add_flags, del_flags, self.rewrite_sequence(body)))
+        if op == sre.BRANCH:
+            return (op, (av[0], [self.rewrite_sequence(b) for b in av[1]]))
+        if op in (sre.ASSERT, sre.ASSERT_NOT):
+            return (op, (av[0], self.rewrite_sequence(av[1])))
+        return (op, av)
+
+    def check_alternation(self, body):
+        """
+        Flag a repeated alternation whose branches can start alike.
+
+        The parser moves a prefix shared by every branch out of the
+        alternation, so (a|ab) arrives as a(?:|b) and (a|a) as a(?:|): an
+        empty branch after a prefix, or two empty branches, means two of
+        the original branches started alike.
+        """
+        body = list(body)
+        while len(body) == 1 and body[0][0] == sre.SUBPATTERN:
+            body = list(body[0][1][3])
+        for index, node in enumerate(body):
+            if node[0] != sre.BRANCH:
+                continue
+            empty = sum(1 for branch in node[1][1] if not branch)
+            if empty > 1 or (empty and index > 0):
+                self.issue("ambiguous_alternation", unparse(body), False, "exponential")
+                return
+            seen = frozenset()
+            for branch in node[1][1]:
+                if not branch:
+                    continue
+                first = self.first_chars(branch)
+                if first is None or first & seen:
+                    self.issue(
+                        "ambiguous_alternation",
+                        unparse([node]),
+                        False,
+                        "exponential",
+                    )
+                    return
+                seen |= first
+
+    def first_chars(self, nodes) -> Optional[frozenset]:
+        """Characters a sequence can start with, or None if unknown/empty."""
+        for op, av in nodes:
+            if op == sre.AT:
+                continue
+            if op in SINGLE_CHAR:
+                return self.charset((op, av))
+            if op == sre.SUBPATTERN:
+                return self.first_chars(av[3])
+            if op in REPEATS and av[0] >= 1:
+                return self.first_chars(av[2])
+            return None
+        return None
+
+    def rewrite_gaps(self, nodes: List[Node]) -> List[Node]:
+        """
+        Rewrite chains of top-level .* gaps.
+
+        A gap followed by a literal run and then another gap (or the end of
+        the pattern) can stop at the literal's first occurrence: any later
+        occurrence would leave less text for the rest of the pattern.
+        """
+        gaps = [i for i, node in enumerate(nodes) if self.is_gap(node)]
+        if len(gaps) < 2:
+            return nodes
+
+        result = list(nodes)
+        # Right to left, so earlier indexes stay valid
+        for i in reversed(gaps):
+            end = i + 1
+            while end < len(nodes) and nodes[end][0] == sre.LITERAL:
+                end += 1
+            literal = nodes[i + 1 : end]
+            follows = end == len(nodes) or self.is_gap(nodes[end])
+            if not literal or not follows or any(av == 10 for _, av in literal):
+                continue
+            op, (low, _, body) = result[i]
+            tempered = (
+                sre.MAX_REPEAT,
+                (0, sre.MAXREPEAT, [(sre.ASSERT_NOT, (1, literal)), (sre.ANY, None)]),
+            )
+            result[i : i + 1] = exactly(op, low, body) + [tempered]
+
+        remaining = sum(1 for node in result if self.is_gap(node))
+        self.issue(
+            "wildcard_chain",
+            f"{len(gaps)} unbounded .* gaps",
+            remaining < 2,
+            "polynomial",
+        )
+        return result
+
+    def is_gap(self, node: Node) -> bool:
+        """An unbounded repeat of any character (but newline)."""
+        return (
+            node[0] in REPEATS
+            and node[1][1] == sre.MAXREPEAT
+            and len(node[1][2]) == 1
+            and node[1][2][0][0] == sre.ANY
+        )
+
+
+def children(op, av) -> List:
+    if op in REPEATS or op == getattr(sre, "POSSESSIVE_REPEAT", None):
+        return [av[2]]
+    if op == sre.SUBPATTERN:
+        return [av[3]]
+    if op == sre.BRANCH:
+        return list(av[1])
+    if op in (sre.ASSERT, sre.ASSERT_NOT):
+        return [av[1]]
+    if op == getattr(sre, "ATOMIC_GROUP", None):
+        return [av]
+    if op == sre.GROUPREF_EXISTS:
+        return [branch for branch in av[1:] if branch is not None]
+    return []
+
+
+def unwrap(body) -> Optional[Node]:
+    """The single node a repeat body consists of, looking through groups."""
+    body = list(body)
+    while len(body) == 1 and body[0][0] == sre.SUBPATTERN:
+        body = list(body[0][1][3])
+    return body[0] if len(body) == 1 else None
+
+
+def contains_unbounded_repeat(nodes) -> bool:
+    for op, av in nodes:
+        if op in REPEATS and av[1] == sre.MAXREPEAT:
+            return True
+        if op not in (sre.ASSERT, sre.ASSERT_NOT) and any(
+            contains_unbounded_repeat(child) for child in children(op, av)
+        ):
+            return True
+    return False
+
+
+def exactly(op, count: int, body) -> List[Node]:
+    """Nodes matching body exactly count times."""
+    if count == 0:
+        return []
+    if count == 1 and len(body) == 1:
+        return [body[0]]
+    return [(op, (count, count, body))]
+
+
+def one_char_item(node: Node) -> Optional[List[Node]]:
+    """
+    The body of an unbounded repeat that consumes one character per
+    iteration: a character node, optionally behind a negative lookahead
+    (a tempered gap). None for any other node.
+    """
+    if node[0] not in REPEATS or node[1][1] != sre.MAXREPEAT:
+        return None
+    body = list(node[1][2])
+    if len(body) == 2 and body[0][0] == sre.ASSERT_NOT and body[0][1][0] == 1:
+        return body if body[1][0] in SINGLE_CHAR else None
+    return body if len(body) == 1 and body[0][0] in SINGLE_CHAR else None
+
+
+def analyze(pattern: str) -> Tuple[str, List[Dict]]:
+    """
+    Check a pattern for backtracking hazards.
+
+    Returns:
+        (rewritten pattern, issues); each issue has "kind", "detail",
+        "fixed" and "risk" (quadratic, polynomial, exponential or unknown).
+    """
+    analyzer = Analyzer(pattern)
+    try:
+        rewritten = analyzer.run()
+    except UnsupportedPattern as e:
+        return pattern, [
+            {
+                "kind": "unsupported",
+                "detail": f"not analyzed: {e}",
+                "fixed": False,
+                "risk": "unknown",
+            }
+        ]
+    return rewritten, analyzer.issues
+
+
+def is_risky(issues: List[Dict]) -> bool:
+    """Whether unfixed issues can backtrack worse than quadratically."""
+    return any(not issue["fixed"] and issue["risk"] != "quadratic" for issue in issues)
+
+
+# ---------------------------------------------------------------------------
+# Matching
+
+
+def _watchdog_worker(conn):
+    """Match patterns sent by the parent until the pipe closes."""
+    while True:
+        try:
+            pattern, op, text = conn.recv()
+        except EOFError:
+            return
+        regex = re.compile(pattern)
+        start = time.perf_counter()
+        matched = getattr(regex, op)(text) is not None
+        conn.send((matched, time.perf_counter() - start))
+
+
+class Watchdog:
+    """A subprocess that runs risky matches and is killed when they overrun."""
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+
+    def run(self, pattern: str, op: str, text: str, budget: float):
+        """
+        Run regex.<op>(text) in the subprocess.
+
+        Returns:
+            (matched, seconds), or None when the budget ran out.
+        """
+        if self.process is None:
+            self.conn, child = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(
+                target=_watchdog_worker, args=(child,), daemon=True
+            )
+            self.process.start()
+            child.close()
+        self.conn.send((pattern, op, text))
+        if self.conn.poll(budget):
+            return self.conn.recv()
+        self.close()
+        return None
+
+    def close(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+
+class SafePattern:
+    """A loaded pattern that matches within its time budget."""
+
+    def __init__(
+        self,
+        source: str,
+        category: str = "",
+        policy: str = "rewrite",
+        budget_ms: float = DEFAULT_BUDGET_MS,
+        watchdog: Optional[Watchdog] = None,
+    ):
+        self.source = source
+        self.category = category
+        self.budget = budget_ms / 1000
+        self.watchdog = watchdog
+        if policy == "off":
+            self.pattern, self.issues = source, []
+        else:
+            self.pattern, self.issues = analyze(source)
+        self.regex = re.compile(self.pattern)
+        self.risky = is_risky(self.issues)
+        self.guarded = self.risky and policy != "off"
+        self.timeouts = 0
+        self.overruns = 0
+        self.worst = 0.0
+
+    @property
+    def rewritten(self) -> bool:
+        return self.pattern != self.source
+
+    def search(self, text: str) -> bool:
+        return self._run("search", text)
+
+    def match(self, text: str) -> bool:
+        return self._run("match", text)
+
+    def _run(self, op: str, text: str) -> bool:
+        if self.guarded and self.watchdog is not None:
+            result = self.watchdog.run(self.pattern, op, text, self.budget)
+            if result is None:
+                # Undecided: reported as a timeout, not as a match
+                self.timeouts += 1
+                self.worst = max(self.worst, self.budget)
+                return False
+            matched, seconds = result
+        else:
+            start = time.perf_counter()
+            matched = getattr(self.regex, op)(text) is not None
+            seconds = time.perf_counter() - start
+            if seconds > self.budget:
+                self.overruns += 1
+                self.guarded = True
+        self.worst = max(self.worst, seconds)
+        return matched
+
+
+def load_patterns(
+    dangerous_config: Dict,
+    policy: str = "rewrite",
+    budget_ms: float = DEFAULT_BUDGET_MS,
+    watchdog: Optional[Watchdog] = None,
+) -> Tuple[Dict[str, List[SafePattern]], List[SafePattern]]:
+    """
+    Load the regex patterns of every category of dangerous_commands.json.
+
+    Returns:
+        ({category: [SafePattern]}, rejected); under the "reject" policy
+        patterns that stay risky after rewriting are rejected, and patterns
+        that do not compile are rejected under every policy.
+    """
+    if policy not in POLICIES:
+        raise ValueError(
+            f"Unknown pattern safety policy '{policy}' "
+            f"(expected one of: {', '.join(POLICIES)})"
+        )
+    patterns: Dict[str, List[SafePattern]] = {}
+    rejected: List[SafePattern] = []
+    for category_name, category in dangerous_config.get("categories", {}).items():
+        loaded = patterns.setdefault(category_name, [])
+        for source in category.get("patterns", []):
+            try:
+                pattern = SafePattern(
+                    source, category_name, policy, budget_ms, watchdog
+                )
+            except re.error as e:
+                pattern = RejectedPattern(source, category_name, str(e))
+            if isinstance(pattern, RejectedPattern) or (
+                policy == "reject" and pattern.risky
+            ):
+                rejected.append(pattern)
+            else:
+                loaded.append(pattern)
+    return patterns, rejected
+
+
+class RejectedPattern:
+    """A pattern that failed to compile."""
+
+    def __init__(self, source: str, category: str, error: str):
+        self.source = source
+        self.category = category
+        self.issues = [
+            {"kind": "invalid", "detail": error, "fixed": False, "risk": "unknown"}
+        ]
+        self.risky = True
+
+
+# ---------------------------------------------------------------------------
+# Fuzz benchmark
+
+
+def literal_fragments(pattern: str) -> List[str]:
+    """Literal runs of a pattern, in order ("while", "true", "do", ...)."""
+    fragments: List[str] = []
+
+    def walk(nodes):
+        run = ""
+        for op, av in nodes:
+            if op == sre.LITERAL:
+                run += chr(av)
+                continue
+            if run:
+                fragments.append(run)
+                run = ""
+            for child in children(op, av):
+                walk(child)
+        if run:
+            fragments.append(run)
+
+    try:
+        walk(sre_parse.parse(pattern))
+    except re.error:
+        pass
+    return fragments
+
+
+def fuzz_inputs(pattern: str, size: int, samples: int, seed: int = 0):
+    """
+    Yield (kind, text) adversarial inputs of about size characters.
+
+    Inputs repeat the pattern's own literals and separators without ever
+    completing a match, which is where backtracking is worst, plus seeded
+    random mixes of literals, spaces and punctuation.
+    """
+    rng = random.Random(f"{seed}:{pattern}")
+    fragments = literal_fragments(pattern) or ["a"]
+    head, body = fragments[0], fragments[1:-1] or fragments
+    fillers = [" ", "\t", "a", "1", "/", "-", ".", ":", "|", "="]
+
+    def fill(unit: str) -> str:
+        return (unit * (size // max(len(unit), 1) + 1))[:size]
+
+    yield "spaces", head + fill(" ")
+    yield "repeat-first", fill(fragments[0] + " ")
+    yield "repeat-middle", head + " " + fill(" ".join(body) + " ")
+    yield "no-last", fill(" ".join(fragments[:-1] or fragments) + " ")
+    for filler in fillers:
+        yield f"filler {filler!r}", head + fill(filler)
+    for i in range(samples):
+        parts: List[str] = [head]
+        length = len(head)
+        while length < size:
+            piece = rng.choice(fragments + fillers)
+            parts.append(piece)
+            length += len(piece)
+        yield f"random #{i}", "".join(parts)
+
+
+def benchmark(
+    patterns: Sequence[Tuple[str, str]],
+    size: int = 2000,
+    samples: int = 10,
+    seed: int = 0,
+    cap_ms: float = 2000,
+) -> List[Dict]:
+    """
+    Measure the worst-case search time of each (category, pattern).
+
+    Both the original and the rewritten pattern run in a watchdog
+    subprocess, so a catastrophic pattern costs at most cap_ms per input.
+    """
+    watchdog = Watchdog()
+    rows = []
+    try:
+        for category, source in patterns:
+            rewritten, issues = analyze(source)
+            row = {
+                "category": category,
+                "pattern": source,
+                "rewritten": rewritten if rewritten != source else None,
+                "issues": issues,
+                "risky": is_risky(issues),
+            }
+            for label, pattern in (("original", source), ("effective", rewritten)):
+                worst, worst_input = 0.0, None
+                for kind, text in fuzz_inputs(source, size, samples, seed):
+                    result = watchdog.run(pattern, "search", text, cap_ms / 1000)
+                    seconds = cap_ms / 1000 if result is None else result[1]
+                    if seconds >= worst:
+                        worst, worst_input = seconds, kind
+                row[f"{label}_ms"] = round(worst * 1000, 3)
+                row[f"{label}_input"] = worst_input
+                if rewritten == source:
+                    row["effective_ms"] = row["original_ms"]
+                    row["effective_input"] = row["original_input"]
+                    break
+            rows.append(row)
+    finally:
+        watchdog.close()
+    rows.sort(key=lambda row: -row["effective_ms"])
+    return rows
@@ -0,0 +1,291 @@
+"""
+Sequential-testing evals: repeat trials until each agent's pass rate is
+clearly above or below the threshold.
+
+One Promptfoo run per test decides pass/fail on a single, noisy sample,
+and repeating every test a fixed N times multiplies the model calls. The
+sequential mode runs the suite in rounds instead. After each round every
+agent's (test, trial) outcomes are pooled and tested against
+defaultTest.threshold; agents whose decision is settled are dropped from
+the next round, so clear passes and clear failures stop after a few
+rounds and only borderline agents keep sampling.
+
+Two stopping rules:
+
+- "sprt" (default): Wald's sequential probability ratio test of
+  H0: p = threshold - delta against H1: p = threshold + delta. The log
+  likelihood ratio of the outcomes so far is compared with
+  log((1 - beta) / alpha) (pass) and log(beta / (1 - alpha)) (fail), so
+  the error rates alpha and beta hold however many rounds it takes.
+  Rates inside threshold +/- delta are the indifference zone.
+- "wilson": stop once the Wilson score interval of the pass rate lies
+  entirely above or below the threshold. Simpler to read, but checking
+  after every round makes its error rate higher than the nominal
+  confidence.
+
+An agent still undecided after max_rounds is decided on its observed
+pass rate and reported as inconclusive. Every agent is reported with its
+trials, passes, pass rate and Wilson interval.
+"""
+
+import math
+import shlex
+import subprocess
+from pathlib import Path
+from statistics import NormalDist
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from eval_shards import iter_results, result_passed
+
+METHODS = ("sprt", "wilson")
+
+DEFAULT_DELTA = 0.05
+DEFAULT_ALPHA = 0.05
+DEFAULT_BETA = 0.05
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MAX_ROUNDS = 10
+# Wilson intervals from a handful of trials are too wide to mean much
+DEFAULT_MIN_TRIALS = 5
+
+PASS = "pass"
+FAIL = "fail"
+UNDECIDED = "undecided"
+
+# One round: (round number, agent prompt files) -> Promptfoo results file
+RoundRunner = Callable[[int, List[Path]], Path]
+
+DEFAULT_RUNNER = (
+    "npx --yes promptfoo@latest eval -c {config} --prompts {prompts} "
+    "--repeat {repeat} --no-cache --output {output}"
+)
+
+
+def wilson_interval(
+    passes: int, trials: int, confidence: float = DEFAULT_CONFIDENCE
+) -> Tuple[float, float]:
+    """Wilson score interval of a pass rate; (0, 1) without trials."""
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rate = passes / trials
+    denominator = 1 + z * z / trials
+    center = (rate + z * z / (2 * trials)) / denominator
+    margin = (
+        z
+        * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials))
+        / denominator
+    )
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class SequentialTest:
+    """Stopping rule for one agent's pooled outcomes."""
+
+    def __init__(
+        self,
+        threshold: float,
+        method: str = "sprt",
+        delta: float = DEFAULT_DELTA,
+        alpha: float = DEFAULT_ALPHA,
+        beta: float = DEFAULT_BETA,
+        confidence: float = DEFAULT_CONFIDENCE,
+        min_trials: int = DEFAULT_MIN_TRIALS,
+    ):
+        if method not in METHODS:
+            raise ValueError(
+                f"Unknown method '{method}' (expected one of: {', '.join(METHODS)})"
+            )
+        if not 0 < threshold < 1:
+            raise ValueError("threshold must be between 0 and 1")
+        self.threshold = threshold
+        self.method = method
+        self.confidence = confidence
+        self.min_trials = min_trials
+        # SPRT hypotheses, kept inside (0, 1)
+        self.p0 = max(threshold - delta, 1e-6)
+        self.p1 = min(threshold + delta, 1 - 1e-6)
+        if self.p0 >= self.p1:
+            raise ValueError("delta must be positive")
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+
+    def log_likelihood_ratio(self, passes: int, trials: int) -> float:
+        fails = trials - passes
+        return passes * math.log(self.p1 / self.p0) + fails * math.log(
+            (1 - self.p1) / (1 - self.p0)
+        )
+
+    def decide(self, passes: int, trials: int) -> str:
+        if self.method == "sprt":
+            ratio = self.log_likelihood_ratio(passes, trials)
+            if ratio >= self.upper:
+                return PASS
+            if ratio <= self.lower:
+                return FAIL
+            return UNDECIDED
+        if trials < self.min_trials:
+            return UNDECIDED
+        low, high = wilson_interval(passes, trials, self.confidence)
+        if low >= self.threshold:
+            return PASS
+        if high < self.threshold:
+            return FAIL
+        return UNDECIDED
+
+
+def agent_name(label: str) -> str:
+    """Agent of a Promptfoo prompt label ("file://../x/go-expert.md" -> go-expert)."""
+    label = label.split(": ", 1)[0]
+    if label.startswith("file://"):
+        label = label[len("file://") :]
+    name = Path(label).name
+    return name[: -len(".md")] if name.endswith(".md") else name
+
+
+def outcomes_by_agent(
+    path: Union[str, Path], threshold: Optional[float]
+) -> Dict[str, List[bool]]:
+    """Pass/fail of every result in a Promptfoo results file, per agent."""
+    outcomes: Dict[str, List[bool]] = {}
+    for result in iter_results(path):
+        label = (result.get("prompt") or {}).get("label") or ""
+        outcomes.setdefault(agent_name(label), []).append(
+            result_passed(result, threshold)
+        )
+    return outcomes
+
+
+def config_prompts(config: Dict, config_path: Union[str, Path]) -> Dict[str, Path]:
+    """The agent prompt files listed under prompts: in promptfoo.yaml."""
+    prompts = config.get("prompts") or []
+    if isinstance(prompts, str):
+        prompts = [prompts]
+    base = Path(config_path).parent
+    files = {}
+    for entry in prompts:
+        if not isinstance(entry, str) or not entry.startswith("file://"):
+            continue
+        path = (base / entry[len("file://") :]).resolve()
+        files[agent_name(path.name)] = path
+    return files
+
+
+def command_runner(
+    template: str,
+    config_path: Union[str, Path],
+    output_dir: Union[str, Path],
+    repeat: int = 1,
+) -> RoundRunner:
+    """
+    Round runner that runs a command, by default Promptfoo.
+
+    The template's {config}, {prompts}, {repeat}, {output} and {round}
+    are replaced (shell-quoted). A failing exit status is tolerated, as
+    Promptfoo exits non-zero when tests fail; a missing results file is
+    not.
+    """
+    output_dir = Path(output_dir)
+
+    def run(round_number: int, prompts: List[Path]) -> Path:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output = output_dir / f"round-{round_number}.json"
+        output.unlink(missing_ok=True)
+        command = template.format(
+            config=shlex.quote(str(config_path)),
+            prompts=" ".join(shlex.quote(str(p)) for p in prompts),
+            repeat=repeat,
+            output=shlex.quote(str(output)),
+            round=round_number,
+        )
+        subprocess.run(command, shell=True, check=False)
+        if not output.exists():
+            raise RuntimeError(f"Round {round_number} wrote no results: {command}")
+        return output
+
+    return run
+
+
+def run_sequential(
+    prompts: Dict[str, Path],
+    runner: RoundRunner,
+    test: SequentialTest,
+    max_rounds: int = DEFAULT_MAX_ROUNDS,
+    result_threshold: Optional[float] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict:
+    """
+    Run rounds until every agent is decided or max_rounds is reached.
+
+    result_threshold is the score one result needs to pass (see
+    eval_shards.result_passed); test.threshold is the pass rate an agent
+    needs.
+
+    Returns:
+        {"method", "threshold", "rounds", "trials", "fixed_trials",
+        "passed", "agents"}; "fixed_trials" is what max_rounds of fixed
+        repetition would have run, and each agent has "decision",
+        "inconclusive", "rounds", "trials", "passes", "pass_rate" and
+        its Wilson "interval".
+    """
+    state = {
+        name: {"decision": UNDECIDED, "rounds": 0, "trials": 0, "passes": 0}
+        for name in prompts
+    }
+    rounds = 0
+    per_round: Dict[str, int] = {}
+    for rounds in range(1, max_rounds + 1):
+        pending = [name for name in prompts if state[name]["decision"] == UNDECIDED]
+        if not pending:
+            rounds -= 1
+            break
+        results = runner(rounds, [prompts[name] for name in pending])
+        outcomes = outcomes_by_agent(results, result_threshold)
+        for name in pending:
+            agent = state[name]
+            agent["rounds"] += 1
+            agent["trials"] += len(outcomes.get(name, []))
+            agent["passes"] += sum(outcomes.get(name, []))
+            per_round[name] = max(per_round.get(name, 0), len(outcomes.get(name, [])))
+            agent["decision"] = test.decide(agent["passes"], agent["trials"])
+        if log:
+            decided = sum(1 for a in state.values() if a["decision"] != UNDECIDED)
+            log(f"  Round {rounds}: {decided}/{len(state)} agent(s) decided")
+
+    agents = {}
+    for name, agent in state.items():
+        trials, passes = agent["trials"], agent["passes"]
+        rate = passes / trials if trials else 0.0
+        inconclusive = agent["decision"] == UNDECIDED
+        decision = agent["decision"]
+        if inconclusive:
+            decision = PASS if trials and rate >= test.threshold else FAIL
+        low, high = wilson_interval(passes, trials, test.confidence)
+        agents[name] = {
+            "decision": decision,
+            "inconclusive": inconclusive,
+            "rounds": agent["rounds"],
+            "trials": trials,
+            "passes": passes,
+            "pass_rate": round(rate, 4),
+            "interval": [round(low, 4), round(high, 4)],
+        }
+    return {
+        "method": test.method,
+        "threshold": test.threshold,
+        "confidence": test.confidence,
+        "rounds": rounds,
+        "trials": sum(agent["trials"] for agent in agents.values()),
+        "fixed_trials": sum(per_round.values()) * max_rounds,
+        "passed": all(agent["decision"] == PASS for agent in agents.values()),
+        "agents": agents,
+    }
+
+
+def select_prompts(prompts: Dict[str, Path], names: Iterable[str]) -> Dict[str, Path]:
+    names = list(names)
+    if not names:
+        return prompts
+    unknown = sorted(set(names) - set(prompts))
+    if unknown:
+        raise ValueError(f"Unknown agent(s): {', '.join(unknown)}")
+    return {name: prompts[name] for name in names}
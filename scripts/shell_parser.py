@@ -0,0 +1,835 @@
+"""
+In-process shell lexer and parser for bash blocks in agents.
+
+Validation used to fork `bash -n` for every block and regex-match raw text,
+so a dangerous pattern in a comment or a string literal counted as a real
+command. This module tokenizes and parses shell code in Python instead:
+
+- syntax errors: unbalanced quotes, unterminated substitutions, unclosed
+  if/while/for/case/{/( constructs and here-documents without a delimiter
+- a command list where every simple command has its program, arguments,
+  flags, redirect targets, line and pipeline, for structural rule matching
+- a masked copy of the source with comments, quoted text and here-document
+  bodies blanked out, for patterns that still need the raw layout
+
+It is a validator, not a full shell grammar: anything bash accepts for
+agent examples (pipelines, functions, compound commands, arithmetic,
+substitutions, heredocs) must parse, but exotic syntax is tolerated
+rather than modelled precisely.
+"""
+
+import copy
+import re
+import shlex
+from functools import lru_cache
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional, Set, Tuple
+
+OPERATORS = sorted(
+    [
+        ";;&",
+        "<<-",
+        "<<<",
+        "&>>",
+        "&&",
+        "||",
+        ";;",
+        ";&",
+        "<<",
+        ">>",
+        "<&",
+        ">&",
+        "<>",
+        ">|",
+        "&>",
+        "|&",
+        ";",
+        "&",
+        "|",
+        "(",
+        ")",
+        "<",
+        ">",
+    ],
+    key=len,
+    reverse=True,
+)
+REDIRECTS = {"<", ">", ">>", "<&", ">&", "<>", ">|", "&>", "&>>", "<<", "<<-", "<<<"}
+SEPARATORS = {"\n", ";", "&"}
+CASE_ENDS = {";;", ";&", ";;&"}
+LOOPS = {"while", "until", "for", "select"}
+
+# Commands that run another command given as their arguments
+WRAPPERS = {"sudo", "env", "nohup", "exec", "command", "time", "nice", "doas"}
+SHELLS = {"sh", "bash", "zsh", "dash", "ksh"}
+
+ASSIGNMENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\[[^\]]*\])?\+?=")
+IO_NUMBER_RE = re.compile(r"\d+(?=[<>])")
+WORD_BREAK = set(" \t\n;&|()<>")
+
+
+class ShellSyntaxError(Exception):
+    """Shell code that bash would reject, with the line it was found on."""
+
+    def __init__(self, message: str, line: int):
+        super().__init__(f"line {line}: syntax error: {message}")
+        self.line = line
+
+
+class Token:
+    """A word or operator with its literal value and source position."""
+
+    def __init__(self, kind: str, value: str, line: int, quoted: bool = False):
+        self.kind = kind
+        self.value = value
+        self.line = line
+        self.quoted = quoted
+        # (source, line) of command substitutions inside the word
+        self.substitutions: List[Tuple[str, int]] = []
+
+    def __repr__(self):
+        return f"Token({self.kind!r}, {self.value!r}, line={self.line})"
+
+
+class Command:
+    """A simple command: program, arguments and redirects."""
+
+    def __init__(self, program: str, line: int, pipeline: int):
+        self.program = program
+        self.line = line
+        self.pipeline = pipeline
+        self.args: List[str] = []
+        self.quoted: List[bool] = []
+        self.redirects: List[Tuple[str, str]] = []
+
+    def __repr__(self):
+        return f"Command({self.text()!r}, line={self.line})"
+
+    def effective(self) -> Tuple[str, List[str]]:
+        """Return the program and arguments after unwrapping sudo, env, etc."""
+        words = [self.program] + self.args
+        while words and PurePosixPath(words[0]).name in WRAPPERS:
+            wrapper = PurePosixPath(words[0]).name
+            words = words[1:]
+            while words and (
+                words[0].startswith("-") or (wrapper == "env" and "=" in words[0])
+            ):
+                takes_value = wrapper == "sudo" and words[0] in ("-u", "-g")
+                words = words[2:] if takes_value else words[1:]
+        if not words:
+            return "", []
+        return PurePosixPath(words[0]).name, words[1:]
+
+    @property
+    def flags(self) -> Set[str]:
+        """Option flags of the effective command; -rf yields -r and -f."""
+        flags: Set[str] = set()
+        for arg in self.effective()[1]:
+            if arg == "--":
+                break
+            if arg.startswith("--") and len(arg) > 2:
+                flags.add(arg.split("=", 1)[0])
+            elif arg.startswith("-") and len(arg) > 1:
+                flags.update(f"-{c}" for c in arg[1:])
+        return flags
+
+    @property
+    def positional(self) -> List[str]:
+        """Non-flag arguments of the effective command."""
+        return [arg for arg in self.effective()[1] if not arg.startswith("-")]
+
+    def text(self) -> str:
+        """Render the command back to shell text with quoting normalized."""
+        words = [self.program] + [
+            shlex.quote(arg) if quoted else arg
+            for arg, quoted in zip(self.args, self.quoted)
+        ]
+        words += [f"{op} {target}" for op, target in self.redirects]
+        return " ".join(w for w in words if w)
+
+
+class Script:
+    """Parse result: commands, function names and the masked source."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.commands: List[Command] = []
+        self.functions: List[str] = []
+        self.masked = source
+
+    def adopt(self, commands: List[Command]):
+        """
+        Append commands from a nested script (substitution, sh -c string).
+
+        Commands are copied, since parse results are cached, and moved to
+        pipeline numbers after this script's own.
+        """
+        offset = max((c.pipeline for c in self.commands), default=0) + 1
+        for command in commands:
+            command = copy.copy(command)
+            command.pipeline += offset
+            self.commands.append(command)
+
+    @property
+    def redirects(self) -> List[Tuple[str, str]]:
+        return [r for command in self.commands for r in command.redirects]
+
+    def pipeline_texts(self) -> List[str]:
+        """Text of every command through the end of its pipeline."""
+        texts = []
+        for i, command in enumerate(self.commands):
+            parts = [command.text()]
+            for other in self.commands[i + 1 :]:
+                if other.pipeline != command.pipeline:
+                    break
+                parts.append(other.text())
+            texts.append(" | ".join(parts))
+        return texts
+
+
+class Lexer:
+    """Split shell source into word and operator tokens."""
+
+    def __init__(self, source: str, first_line: int = 1):
+        self.source = source
+        self.pos = 0
+        self.line = first_line
+        self.tokens: List[Token] = []
+        self.masked = list(source)
+        self._heredocs: List[Tuple[str, bool, int]] = []
+        self._expect_delimiter: Optional[bool] = None
+
+    def error(self, message: str, line: Optional[int] = None):
+        raise ShellSyntaxError(message, line if line is not None else self.line)
+
+    def mask(self, start: int, end: int):
+        """Blank source[start:end] in the masked copy, keeping newlines."""
+        for i in range(start, end):
+            if self.masked[i] != "\n":
+                self.masked[i] = " "
+
+    def tokenize(self) -> List[Token]:
+        src = self.source
+        while self.pos < len(src):
+            c = src[self.pos]
+            if c in " \t":
+                self.pos += 1
+            elif src.startswith("\\\n", self.pos):
+                self.pos += 2
+                self.line += 1
+            elif c == "#":
+                end = src.find("\n", self.pos)
+                end = len(src) if end == -1 else end
+                self.mask(self.pos, end)
+                self.pos = end
+            elif c == "\n":
+                self.tokens.append(Token("op", "\n", self.line))
+                self.pos += 1
+                self.line += 1
+                self.read_heredocs()
+            elif src.startswith("((", self.pos):
+                self.tokens.append(self.read_arithmetic())
+            elif src.startswith(("<(", ">("), self.pos):
+                self.tokens.append(self.read_word())
+            else:
+                match = IO_NUMBER_RE.match(src, self.pos)
+                start = match.end() if match else self.pos
+                operator = next(
+                    (op for op in OPERATORS if src.startswith(op, start)), None
+                )
+                if operator:
+                    self.pos = start + len(operator)
+                    self.tokens.append(Token("op", operator, self.line))
+                    if operator in ("<<", "<<-"):
+                        self._expect_delimiter = operator == "<<-"
+                else:
+                    self.tokens.append(self.read_word())
+
+        if self._heredocs:
+            delimiter, _, line = self._heredocs[0]
+            self.error(
+                f"here-document delimited by '{delimiter}' is never closed", line
+            )
+        return self.tokens
+
+    def read_arithmetic(self) -> Token:
+        """Read a standalone (( ... )) arithmetic command as one word."""
+        start_line = self.line
+        end = self.skip_balanced(self.pos + 2, "(", ")", "arithmetic expression", 2)
+        token = Token("word", self.source[self.pos : end], start_line)
+        self.pos = end
+        return token
+
+    def skip_balanced(
+        self, pos: int, opener: str, closer: str, what: str, depth: int = 1
+    ) -> int:
+        """Return the index after the closer matching the opener(s) before pos."""
+        src = self.source
+        start_line = self.line
+        while pos < len(src):
+            c = src[pos]
+            if c == "\\":
+                pos += 2
+                continue
+            if c == "\n":
+                self.line += 1
+            if c == "'":
+                end = src.find("'", pos + 1)
+                if end == -1:
+                    self.error("unterminated single quote")
+                self.line += src.count("\n", pos, end)
+                pos = end + 1
+                continue
+            if c == '"':
+                pos = self.skip_double_quote(pos + 1)
+                continue
+            if src.startswith(opener, pos):
+                depth += 1
+                pos += len(opener)
+                continue
+            if src.startswith(closer, pos):
+                depth -= 1
+                pos += len(closer)
+                if depth == 0:
+                    return pos
+                continue
+            pos += 1
+        self.error(f"unterminated {what}", start_line)
+
+    def skip_double_quote(self, pos: int) -> int:
+        """Return the index after the closing double quote."""
+        src = self.source
+        start_line = self.line
+        while pos < len(src):
+            c = src[pos]
+            if c == "\\":
+                pos += 2
+            elif c == '"':
+                return pos + 1
+            elif src.startswith("$(", pos):
+                pos = self.skip_balanced(pos + 2, "(", ")", "command substitution")
+            elif c == "`":
+                pos = self.skip_backquote(pos + 1)
+            else:
+                if c == "\n":
+                    self.line += 1
+                pos += 1
+        self.error("unterminated double quote", start_line)
+
+    def skip_backquote(self, pos: int) -> int:
+        """Return the index after the closing backquote."""
+        src = self.source
+        start_line = self.line
+        while pos < len(src):
+            if src[pos] == "\\":
+                pos += 2
+                continue
+            if src[pos] == "`":
+                return pos + 1
+            if src[pos] == "\n":
+                self.line += 1
+            pos += 1
+        self.error("unterminated backquote", start_line)
+
+    def read_word(self) -> Token:
+        """Read one word, resolving quotes into its literal value."""
+        src = self.source
+        token = Token("word", "", self.line)
+        value: List[str] = []
+
+        if src.startswith(("<(", ">("), self.pos):
+            # Process substitution: <(cmd) and >(cmd)
+            start = self.pos + 2
+            self.pos = self.skip_balanced(start, "(", ")", "process substitution")
+            token.substitutions.append((src[start : self.pos - 1], token.line))
+            value.append(src[start - 2 : self.pos])
+
+        while self.pos < len(src) and (
+            src[self.pos] not in WORD_BREAK or self.at_array_assignment(value)
+        ):
+            c = src[self.pos]
+            if c == "(":
+                # name=(a b c) array assignment
+                start = self.pos
+                self.pos = self.skip_balanced(self.pos + 1, "(", ")", "array")
+                value.append(src[start : self.pos])
+            elif c == "\\":
+                value.append(src[self.pos + 1 : self.pos + 2])
+                self.pos += 2
+            elif src.startswith("$'", self.pos):
+                # ANSI-C quoting allows \' inside the quotes
+                match = re.compile(r"\$'((?:[^'\\]|\\.)*)'", re.DOTALL).match(
+                    src, self.pos
+                )
+                if not match:
+                    self.error("unterminated single quote")
+                value.append(match.group(1))
+                self.mask(self.pos + 2, match.end() - 1)
+                self.line += match.group(0).count("\n")
+                self.pos = match.end()
+                token.quoted = True
+            elif c == "'":
+                end = src.find("'", self.pos + 1)
+                if end == -1:
+                    self.error("unterminated single quote")
+                value.append(src[self.pos + 1 : end])
+                self.mask(self.pos + 1, end)
+                self.line += src.count("\n", self.pos, end)
+                self.pos = end + 1
+                token.quoted = True
+            elif c == '"':
+                self.read_double_quoted(token, value)
+            elif src.startswith("$((", self.pos):
+                start = self.pos
+                self.pos = self.skip_balanced(self.pos + 3, "(", ")", "arithmetic", 2)
+                value.append(src[start : self.pos])
+            elif src.startswith("$(", self.pos):
+                self.read_substitution(token, value)
+            elif src.startswith("${", self.pos):
+                start = self.pos
+                self.pos = self.skip_balanced(
+                    self.pos + 2, "{", "}", "parameter expansion"
+                )
+                value.append(src[start : self.pos])
+            elif c == "`":
+                start = self.pos
+                self.pos = self.skip_backquote(self.pos + 1)
+                token.substitutions.append((src[start + 1 : self.pos - 1], token.line))
+                value.append(src[start : self.pos])
+            else:
+                value.append(c)
+                self.pos += 1
+
+        token.value = "".join(value)
+        if self._expect_delimiter is not None:
+            self._heredocs.append((token.value, self._expect_delimiter, token.line))
+            self._expect_delimiter = None
+        return token
+
+    def at_array_assignment(self, value: List[str]) -> bool:
+        return (
+            self.source[self.pos] == "("
+            and bool(ASSIGNMENT_RE.match("".join(value)))
+            and "".join(value).endswith("=")
+        )
+
+    def read_double_quoted(self, token: Token, value: List[str]):
+        """Read a double-quoted section; substitutions inside stay code."""
+        src = self.source
+        start_line = self.line
+        self.pos += 1
+        token.quoted = True
+        while self.pos < len(src):
+            c = src[self.pos]
+            if c == '"':
+                self.pos += 1
+                return
+            if c == "\\":
+                value.append(src[self.pos + 1 : self.pos + 2])
+                self.mask(self.pos, self.pos + 2)
+                self.pos += 2
+            elif src.startswith("$((", self.pos):
+                start = self.pos
+                self.pos = self.skip_balanced(self.pos + 3, "(", ")", "arithmetic", 2)
+                value.append(src[start : self.pos])
+            elif src.startswith("$(", self.pos):
+                self.read_substitution(token, value)
+            elif c == "`":
+                start = self.pos
+                self.pos = self.skip_backquote(self.pos + 1)
+                token.substitutions.append((src[start + 1 : self.pos - 1], self.line))
+                value.append(src[start : self.pos])
+            else:
+                if c == "\n":
+                    self.line += 1
+                value.append(c)
+                self.mask(self.pos, self.pos + 1)
+                self.pos += 1
+        self.error("unterminated double quote", start_line)
+
+    def read_substitution(self, token: Token, value: List[str]):
+        """Read $( ... ) and remember its source for nested parsing."""
+        start = self.pos
+        line = self.line
+        self.pos = self.skip_balanced(self.pos + 2, "(", ")", "command substitution")
+        token.substitutions.append((self.source[start + 2 : self.pos - 1], line))
+        value.append(self.source[start : self.pos])
+
+    def read_heredocs(self):
+        """Consume the bodies of here-documents opened on the previous line."""
+        src = self.source
+        for delimiter, strip_tabs, line in self._heredocs:
+            while True:
+                if self.pos >= len(src):
+                    self.error(
+                        f"here-document delimited by '{delimiter}' is never closed",
+                        line,
+                    )
+                end = src.find("\n", self.pos)
+                end = len(src) if end == -1 else end
+                text = src[self.pos : end]
+                if strip_tabs:
+                    text = text.lstrip("\t")
+                if text == delimiter:
+                    self.pos = min(end + 1, len(src))
+                    self.line += 1
+                    break
+                self.mask(self.pos, end)
+                self.pos = end + 1
+                self.line += 1
+        self._heredocs = []
+
+
+class Parser:
+    """Build commands from tokens while checking compound structure."""
+
+    def __init__(self, tokens: List[Token], script: Script):
+        self.tokens = tokens
+        self.script = script
+        # Open constructs: [keyword, line, state]
+        self.stack: List[List] = []
+        self.current: Optional[Command] = None
+        self.command_position = True
+        self.pipeline = 0
+        self.redirect: Optional[Tuple[str, int]] = None
+        self.dangling: Optional[Tuple[str, int]] = None
+        self.for_header = False
+        self.in_test = False
+        self.function_name: Optional[str] = None
+        self.nested_commands: List[Command] = []
+        # True until the current statement has a command or assignment
+        self.empty = True
+
+    def error(self, message: str, line: int):
+        raise ShellSyntaxError(message, line)
+
+    def top(self, *keywords: str) -> Optional[List]:
+        if self.stack and self.stack[-1][0] in keywords:
+            return self.stack[-1]
+        return None
+
+    def end_command(self):
+        self.current = None
+        self.command_position = True
+        self.empty = True
+
+    def parse(self):
+        tokens = self.tokens
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token.kind == "word":
+                self.nested_commands.extend(self.nested(token))
+            if self.in_test:
+                self.word_in_test(token)
+            elif token.kind == "op":
+                i = self.operator(token, i)
+            elif self.redirect:
+                op, _ = self.redirect
+                self.redirect = None
+                target = (op, token.value)
+                if self.current is None:
+                    self.current = Command("", token.line, self.pipeline)
+                    self.script.commands.append(self.current)
+                    self.empty = False
+                self.current.redirects.append(target)
+            else:
+                i = self.word(token, i)
+            i += 1
+
+        if self.redirect:
+            self.error(f"missing target after '{self.redirect[0]}'", self.redirect[1])
+        if self.dangling:
+            self.error(
+                f"unexpected end of input after '{self.dangling[0]}'", self.dangling[1]
+            )
+        if self.stack:
+            keyword, line, _ = self.stack[-1]
+            self.error(f"'{keyword}' opened on line {line} is never closed", line)
+
+        self.script.adopt(self.nested_commands)
+
+    def nested(self, token: Token) -> List[Command]:
+        """Parse command substitutions inside a word."""
+        commands: List[Command] = []
+        for source, line in token.substitutions:
+            commands.extend(parse(source, line).commands)
+        return commands
+
+    def word_in_test(self, token: Token):
+        """Collect [[ ... ]] contents as arguments of the [[ command."""
+        self.current.args.append(token.value)
+        self.current.quoted.append(token.quoted)
+        if token.kind == "word" and token.value == "]]":
+            self.in_test = False
+
+    def operator(self, token: Token, i: int) -> int:
+        op = token.value
+        case = self.top("case")
+
+        if self.redirect:
+            self.error(f"unexpected '{op.strip() or 'newline'}'", token.line)
+
+        if case and case[2] == "pattern":
+            if op == ")":
+                case[2] = "body"
+                self.end_command()
+            elif op not in ("(", "|", "\n"):
+                self.error(f"unexpected '{op}' in case pattern", token.line)
+            return i
+
+        if op in REDIRECTS:
+            self.redirect = (op, token.line)
+            return i
+
+        if op in SEPARATORS or op in CASE_ENDS:
+            if op != "\n" and (
+                self.dangling
+                or (op in (";", "&") and self.empty and not self.for_header)
+            ):
+                self.error(f"unexpected '{op}'", token.line)
+            if op in CASE_ENDS:
+                if not case:
+                    self.error(f"unexpected '{op}' outside case", token.line)
+                case[2] = "pattern"
+            self.for_header = False
+            self.pipeline += 1
+            self.end_command()
+            return i
+
+        if op in ("&&", "||", "|", "|&"):
+            if self.current is None and self.command_position:
+                self.error(f"unexpected '{op}'", token.line)
+            if op in ("&&", "||"):
+                self.pipeline += 1
+            self.dangling = (op, token.line)
+            self.end_command()
+            return i
+
+        if op == "(":
+            if self.current is not None and not self.current.args:
+                # name() { ... } function definition
+                if i + 1 < len(self.tokens) and self.tokens[i + 1].value == ")":
+                    self.define_function(self.current.program)
+                    return i + 1
+            if not self.command_position:
+                self.error("unexpected '('", token.line)
+            self.stack.append(["(", token.line, "body"])
+            return i
+
+        if op == ")":
+            if not self.top("("):
+                self.error("unexpected ')'", token.line)
+            if self.dangling:
+                self.error("unexpected ')'", token.line)
+            self.stack.pop()
+            self.end_command()
+            self.command_position = False
+            self.empty = False
+            return i
+
+        self.error(f"unexpected '{op}'", token.line)
+
+    def define_function(self, name: str):
+        self.script.commands.remove(self.current)
+        self.script.functions.append(name)
+        self.end_command()
+
+    def word(self, token: Token, i: int) -> int:
+        value = token.value
+        self.dangling = None
+        case = self.top("case")
+
+        if case and case[2] == "subject":
+            case[2] = "in"
+            return i
+        if case and case[2] == "in":
+            if value != "in":
+                self.error(f"expected 'in' after case, found '{value}'", token.line)
+            case[2] = "pattern"
+            return i
+        if case and case[2] == "pattern":
+            if value == "esac" and not token.quoted:
+                self.stack.pop()
+                self.end_command()
+                self.command_position = False
+                self.empty = False
+            return i
+
+        if self.for_header:
+            return i
+
+        if self.function_name is not None:
+            # function name [()] { ... }
+            self.script.functions.append(value)
+            self.function_name = None
+            if i + 2 < len(self.tokens) and self.tokens[i + 1].value == "(":
+                return i + 2
+            return i
+
+        if self.command_position and not token.quoted and self.keyword(token):
+            return i
+
+        if self.current is None:
+            self.empty = False
+            if ASSIGNMENT_RE.match(value) and self.command_position:
+                return i
+            self.current = Command(value, token.line, self.pipeline)
+            self.script.commands.append(self.current)
+            self.command_position = False
+            self.empty = False
+            if value == "[[":
+                self.in_test = True
+        else:
+            self.current.args.append(value)
+            self.current.quoted.append(token.quoted)
+        return i
+
+    def keyword(self, token: Token) -> bool:
+        """Handle a reserved word in command position; False if not one."""
+        value, line = token.value, token.line
+        if value in ("if", "while", "until"):
+            self.stack.append([value, line, "condition"])
+        elif value in ("for", "select"):
+            self.stack.append([value, line, "condition"])
+            self.for_header = True
+        elif value == "case":
+            self.stack.append(["case", line, "subject"])
+        elif value == "then":
+            block = self.top("if")
+            if not block or block[2] != "condition":
+                self.error("unexpected 'then'", line)
+            block[2] = "then"
+        elif value == "elif":
+            block = self.top("if")
+            if not block or block[2] != "then":
+                self.error("unexpected 'elif'", line)
+            block[2] = "condition"
+        elif value == "else":
+            block = self.top("if")
+            if not block or block[2] != "then":
+                self.error("unexpected 'else'", line)
+            block[2] = "else"
+        elif value == "fi":
+            block = self.top("if")
+            if not block or block[2] not in ("then", "else"):
+                self.error("unexpected 'fi'", line)
+            self.stack.pop()
+            self.command_position = False
+            self.empty = False
+        elif value == "do":
+            block = self.top(*LOOPS)
+            if not block or block[2] != "condition":
+                self.error("unexpected 'do'", line)
+            block[2] = "do"
+        elif value == "done":
+            block = self.top(*LOOPS)
+            if not block or block[2] != "do":
+                self.error("unexpected 'done'", line)
+            self.stack.pop()
+            self.command_position = False
+            self.empty = False
+        elif value == "esac":
+            if not self.top("case"):
+                self.error("unexpected 'esac'", line)
+            self.stack.pop()
+            self.command_position = False
+            self.empty = False
+        elif value == "{":
+            self.stack.append(["{", line, "body"])
+        elif value == "}":
+            if not self.top("{"):
+                self.error("unexpected '}'", line)
+            self.stack.pop()
+            self.command_position = False
+            self.empty = False
+        elif value == "function":
+            self.function_name = ""
+        elif value not in ("!", "time", "in"):
+            return False
+        return True
+
+
+@lru_cache(maxsize=512)
+def parse(source: str, first_line: int = 1) -> Script:
+    """
+    Parse shell source into a Script.
+
+    Raises:
+        ShellSyntaxError: if the source is not valid shell syntax.
+    """
+    script = Script(source)
+    lexer = Lexer(source, first_line)
+    tokens = lexer.tokenize()
+    script.masked = "".join(lexer.masked)
+    Parser(tokens, script).parse()
+
+    # Code passed to `sh -c` or eval runs as a command too
+    for command in list(script.commands):
+        program, args = command.effective()
+        inner = None
+        if program in SHELLS and "-c" in args[:-1]:
+            inner = args[args.index("-c") + 1]
+        elif program == "eval" and args:
+            inner = " ".join(args)
+        if inner:
+            try:
+                script.adopt(parse(inner, command.line).commands)
+            except ShellSyntaxError:
+                pass
+    return script
+
+
+def validate(source: str) -> Tuple[bool, str]:
+    """Check shell syntax; returns (is_valid, error_message)."""
+    try:
+        parse(source)
+    except ShellSyntaxError as e:
+        return False, str(e)
+    return True, ""
+
+
+def matches_command_rule(command: Command, rule: Dict) -> bool:
+    """
+    Match a structural rule from dangerous_commands.json.
+
+    A rule names a "program" and optionally "flags" (each entry lists
+    alternatives separated by |, e.g. "-r|-R|--recursive") and an "args"
+    regex that at least one positional argument must match.
+    """
+    program, _ = command.effective()
+    if program != rule.get("program"):
+        return False
+    flags = command.flags
+    for alternatives in rule.get("flags", []):
+        if not any(flag in flags for flag in alternatives.split("|")):
+            return False
+    pattern = rule.get("args")
+    if pattern and not any(re.match(pattern, arg) for arg in command.positional):
+        return False
+    return True
+
+
+def matches_redirect_rule(script: Script, rule: Dict) -> bool:
+    """Match a {"redirect": regex} rule against redirect targets."""
+    return any(
+        re.match(rule["redirect"], target)
+        for op, target in script.redirects
+        if op not in ("<", "<<", "<<-", "<<<")
+    )
+
+
+def matches_pattern(script: Script, pattern) -> bool:
+    """
+    Match a legacy regex pattern against code, not comments or strings.
+
+    The pattern must either start at a command (through the end of its
+    pipeline) or match the masked source, where comments, quoted text and
+    here-document bodies are blanked out. It may be a string or any object
+    with search() and match() methods (a compiled regex or a SafePattern).
+    """
+    if isinstance(pattern, str):
+        pattern = re.compile(pattern)
+    if pattern.search(script.masked):
+        return True
+    return any(pattern.match(text) for text in script.pipeline_texts())
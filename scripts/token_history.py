@@ -0,0 +1,242 @@
+"""
+Per-agent token and size history.
+
+Every build appends one JSON line recording the token estimate and byte
+size of each agent it compiled, keyed by the git commit it was built from:
+
+    {"sha": "3f2c...", "dirty": false, "timestamp": "...",
+     "builder_version": "1.0.0", "agents": {"go-expert": {"tokens": 1830,
+     "size": 9214}, ...}}
+
+The file is append-only, so it can be kept in CI caches or committed and
+merged without conflicts beyond concatenation. A later build compares its
+agents against the most recent record from another commit (or an explicit
+baseline) and can fail when an agent grows past a percentage or absolute
+token delta, treating prompt size like any other performance budget.
+"""
+
+import json
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+WORKTREE_KEY = "worktree"
+
+
+def git_revision(root_dir: Path) -> Tuple[Optional[str], bool]:
+    """
+    Return (HEAD sha, dirty) for a repository, or (None, False) outside git.
+
+    Only tracked files count towards dirty; build outputs are usually
+    ignored or untracked.
+    """
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=root_dir,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        if sha.returncode != 0:
+            return None, False
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=root_dir,
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None, False
+    return sha.stdout.strip(), bool(status.stdout.strip())
+
+
+def record_key(record: Dict) -> str:
+    """Identify the tree a record was built from."""
+    sha = record.get("sha")
+    if not sha:
+        return WORKTREE_KEY
+    return f"{sha}-dirty" if record.get("dirty") else sha
+
+
+def parse_growth(value: Union[int, float, str]) -> Tuple[str, float]:
+    """
+    Parse a growth limit: "10%" is relative, "150" is absolute tokens.
+
+    Returns:
+        ("percent", 10.0) or ("tokens", 150.0)
+    """
+    text = str(value).strip()
+    try:
+        if text.endswith("%"):
+            limit = ("percent", float(text[:-1]))
+        else:
+            limit = ("tokens", float(text))
+    except ValueError:
+        raise ValueError(
+            f"Invalid growth limit '{value}' (examples: 10% or 200 tokens)"
+        )
+    if limit[1] < 0:
+        raise ValueError(f"Growth limit must not be negative: '{value}'")
+    return limit
+
+
+def format_growth(limit: Tuple[str, float]) -> str:
+    kind, amount = limit
+    return f"{amount:g}%" if kind == "percent" else f"{amount:g} tokens"
+
+
+class TokenHistory:
+    """Append-only JSON-lines store of per-build agent sizes."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+
+    def records(self) -> List[Dict]:
+        """Return every record, oldest first; unreadable lines are skipped."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A concurrent or interrupted writer left a partial line
+                continue
+            if isinstance(record, dict) and isinstance(record.get("agents"), dict):
+                records.append(record)
+        return records
+
+    def append(
+        self,
+        agents: Dict[str, Dict],
+        sha: Optional[str] = None,
+        dirty: bool = False,
+        builder_version: str = "",
+    ) -> Dict:
+        """Append one build's agent sizes and return the record."""
+        record = {
+            "sha": sha,
+            "dirty": dirty,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "builder_version": builder_version,
+            "agents": {
+                name: {"tokens": entry["tokens"], "size": entry["size"]}
+                for name, entry in sorted(agents.items())
+            },
+        }
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            if f.tell() and not self._ends_with_newline():
+                # Terminate a line left partial by an interrupted writer
+                line = "\n" + line
+            # One write() per record keeps concurrent appends line-atomic
+            f.write(line.encode("utf-8"))
+        return record
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, 2)
+            return f.read(1) == b"\n"
+
+    def baseline(self, key: str, ref: Optional[str] = None) -> Optional[Dict]:
+        """
+        Pick the record to compare a build against.
+
+        With ref, the latest record whose sha starts with it. Otherwise the
+        latest record from a different tree than key, so rebuilding the same
+        commit keeps comparing against the previous commit. Agents missing
+        from the chosen record are looked up in older records.
+        """
+        records = self.records()
+        if ref:
+            candidates = [r for r in records if (r.get("sha") or "").startswith(ref)]
+        else:
+            candidates = [r for r in records if record_key(r) != key]
+        if not candidates:
+            return None
+
+        chosen = candidates[-1]
+        agents: Dict[str, Dict] = {}
+        for record in records:
+            agents.update(record["agents"])
+            if record is chosen:
+                break
+        return {**chosen, "agents": agents}
+
+    def trend(self, agent: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Return the agent's size per commit, oldest first.
+
+        Several builds of one tree collapse into their latest record.
+        """
+        points: Dict[str, Dict] = {}
+        for record in self.records():
+            sizes = record["agents"].get(agent)
+            if sizes is None:
+                continue
+            key = record_key(record)
+            points.pop(key, None)
+            points[key] = {
+                "sha": record.get("sha"),
+                "dirty": record.get("dirty", False),
+                "timestamp": record.get("timestamp"),
+                **sizes,
+            }
+        series = list(points.values())
+        return series[-limit:] if limit else series
+
+    def agents(self) -> List[str]:
+        """Every agent name that appears in the history."""
+        names = set()
+        for record in self.records():
+            names.update(record["agents"])
+        return sorted(names)
+
+
+def compare(
+    current: Dict[str, Dict],
+    baseline: Dict[str, Dict],
+    limit: Optional[Tuple[str, float]] = None,
+) -> List[Dict]:
+    """
+    Compare agent sizes with a baseline.
+
+    Returns one row per agent present in both, largest relative growth
+    first; "exceeded" is set when growth is beyond the limit.
+    """
+    rows = []
+    for name in sorted(set(current) & set(baseline)):
+        before = baseline[name]["tokens"]
+        after = current[name]["tokens"]
+        delta = after - before
+        percent = (delta / before * 100) if before else (100.0 if delta else 0.0)
+        exceeded = False
+        if limit is not None and delta > 0:
+            kind, amount = limit
+            exceeded = (percent if kind == "percent" else delta) > amount
+        rows.append(
+            {
+                "agent": name,
+                "before": before,
+                "after": after,
+                "delta": delta,
+                "percent": round(percent, 2),
+                "size_delta": current[name]["size"] - baseline[name].get("size", 0),
+                "exceeded": exceeded,
+            }
+        )
+    rows.sort(key=lambda row: (-row["percent"], row["agent"]))
+    return rows
+
+
+def short_sha(record: Optional[Dict]) -> str:
+    if not record or not record.get("sha"):
+        return "working tree"
+    return record["sha"][:7] + ("+dirty" if record.get("dirty") else "")
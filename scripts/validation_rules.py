@@ -0,0 +1,340 @@
+"""
+Validation rule registry for compiled agents.
+
+Each rule declares a relative cost and the rules it depends on. The
+registry runs rules cheapest first (dependencies always before the rules
+that need them) and short-circuits:
+
+- a rule is skipped when a rule it requires failed or was skipped
+- expensive rules (bash subprocesses, pattern scans) are skipped once the
+  agent already has an error, since it will be rejected anyway
+
+Every rule that runs is timed, so slow rules show up in verbose builds.
+Rules read the document through one shared scan (scripts/markdown_scan.py)
+instead of searching it again each: frontmatter, word count, leftover
+Jinja2 and fenced code blocks are collected in a single pass.
+Rules marked for the "source" stage also run against template sources
+before rendering, to reject broken frontmatter without paying for a render.
+"""
+
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import yaml
+from markdown_scan import (
+    BASH_LANGUAGES,
+    POWERSHELL_LANGUAGES,
+    CodeBlock,
+    MarkdownScan,
+    scan_markdown,
+)
+
+# Unresolved Jinja2 locations listed in one error
+MAX_JINJA_LOCATIONS = 3
+
+# Rules at or above this cost are skipped once an agent has an error
+EXPENSIVE_COST = 10
+
+
+class ValidationContext:
+    """Content under validation and the values rules share with each other."""
+
+    def __init__(
+        self,
+        builder,
+        content: str,
+        filename: str,
+        max_tokens: Optional[int] = None,
+        stage: str = "output",
+    ):
+        self.builder = builder
+        self.content = content
+        self.filename = filename
+        self.max_tokens = max_tokens
+        self.stage = stage
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        # Every finding with its category and severity, reported or not
+        self.findings: List[Dict] = []
+        self.frontmatter: Dict = {}
+        self.tokens = 0
+        self._scan: Optional[MarkdownScan] = None
+
+    def warn(self, message: str, category: str, severity: str = "warning"):
+        """Add a warning and record it as a finding."""
+        self.warnings.append(message)
+        self.findings.append({"category": category, "severity": severity})
+
+    def scan(self) -> MarkdownScan:
+        """The single-pass scan of the content, made once per context."""
+        if self._scan is None:
+            self._scan = scan_markdown(self.content)
+        return self._scan
+
+    def blocks(self, languages: Iterable[str]) -> List[CodeBlock]:
+        """Closed, non-empty code blocks in one of the given languages."""
+        return [
+            block for block in self.scan().blocks_for(languages) if block.code.strip()
+        ]
+
+    def bash_blocks(self) -> List[str]:
+        """Code of the bash blocks, stripped."""
+        return [block.code.strip() for block in self.blocks(BASH_LANGUAGES)]
+
+
+class Rule:
+    """One validation check with its cost, dependencies and stages."""
+
+    def __init__(
+        self,
+        name: str,
+        check: Callable[[ValidationContext], None],
+        cost: int = 1,
+        requires: Iterable[str] = (),
+        stages: Iterable[str] = ("output",),
+    ):
+        self.name = name
+        self.check = check
+        self.cost = cost
+        self.requires = tuple(requires)
+        self.stages = tuple(stages)
+
+    @property
+    def expensive(self) -> bool:
+        return self.cost >= EXPENSIVE_COST
+
+
+class RuleRegistry:
+    """Ordered collection of validation rules."""
+
+    def __init__(self):
+        self.rules: Dict[str, Rule] = {}
+
+    def register(
+        self,
+        name: str,
+        cost: int = 1,
+        requires: Iterable[str] = (),
+        stages: Iterable[str] = ("output",),
+    ):
+        """Decorator registering a check function as a rule."""
+
+        def decorator(check: Callable[[ValidationContext], None]):
+            self.add(Rule(name, check, cost, requires, stages))
+            return check
+
+        return decorator
+
+    def add(self, rule: Rule):
+        """Add or replace a rule."""
+        missing = [name for name in rule.requires if name not in self.rules]
+        if missing:
+            raise ValueError(
+                f"Rule '{rule.name}' requires unknown rule(s): {', '.join(missing)}"
+            )
+        self.rules[rule.name] = rule
+
+    def remove(self, name: str):
+        """Remove a rule and every rule that depends on it."""
+        self.rules.pop(name, None)
+        for rule in list(self.rules.values()):
+            if name in rule.requires:
+                self.remove(rule.name)
+
+    def ordered(self, stage: str = "output") -> List[Rule]:
+        """
+        Return the rules of a stage in execution order.
+
+        Rules run by ascending cost (registration order breaks ties), but a
+        rule is never scheduled before the rules it requires.
+
+        Raises:
+            ValueError: when rules require each other in a cycle (possible
+                by replacing a rule with one that requires its dependent)
+        """
+        pending = sorted(
+            (rule for rule in self.rules.values() if stage in rule.stages),
+            key=lambda rule: rule.cost,
+        )
+        names = {rule.name for rule in pending}
+        done: List[Rule] = []
+        scheduled = set()
+        while pending:
+            for rule in pending:
+                if all(r in scheduled or r not in names for r in rule.requires):
+                    break
+            else:
+                raise ValueError(f"Circular rule requirements: {self.cycle(pending)}")
+            pending.remove(rule)
+            done.append(rule)
+            scheduled.add(rule.name)
+        return done
+
+    def cycle(self, pending: List[Rule]) -> str:
+        """Describe a requirement cycle among rules that cannot be scheduled."""
+        waiting = {rule.name: rule for rule in pending}
+        path: List[str] = []
+        name = pending[0].name
+        # Every waiting rule requires another waiting rule, so this ends
+        while name not in path:
+            path.append(name)
+            name = next(r for r in waiting[name].requires if r in waiting)
+        return " -> ".join(path[path.index(name) :] + [name])
+
+    def run(self, context: ValidationContext) -> Dict:
+        """
+        Run the rules of the context's stage.
+
+        Returns:
+            Dict with "errors", "warnings", "frontmatter", "tokens", plus
+            "findings" (category and severity of every finding), "timings"
+            (seconds per executed rule) and "skipped" rule names.
+        """
+        failed = set()
+        skipped: List[str] = []
+        timings: Dict[str, float] = {}
+
+        for rule in self.ordered(context.stage):
+            blocked = any(r in failed or r in skipped for r in rule.requires)
+            if blocked or (rule.expensive and context.errors):
+                skipped.append(rule.name)
+                continue
+
+            errors_before = len(context.errors)
+            start = time.perf_counter()
+            rule.check(context)
+            timings[rule.name] = time.perf_counter() - start
+            if len(context.errors) > errors_before:
+                failed.add(rule.name)
+
+        return {
+            "errors": context.errors,
+            "warnings": context.warnings,
+            "frontmatter": context.frontmatter,
+            "tokens": context.tokens,
+            "findings": context.findings,
+            "timings": timings,
+            "skipped": skipped,
+        }
+
+
+def default_registry() -> RuleRegistry:
+    """Create the registry with the built-in agent checks."""
+    registry = RuleRegistry()
+
+    @registry.register("frontmatter", cost=1, stages=("source", "output"))
+    def check_frontmatter(ctx: ValidationContext):
+        text = ctx.scan().frontmatter
+        if text is None:
+            ctx.errors.append("Missing YAML frontmatter (must start with ---)")
+            return
+        try:
+            frontmatter = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            ctx.errors.append(f"Invalid YAML frontmatter: {e}")
+            return
+        ctx.frontmatter = frontmatter if isinstance(frontmatter, dict) else {}
+
+    @registry.register(
+        "required_fields", cost=1, requires=["frontmatter"], stages=("source", "output")
+    )
+    def check_required_fields(ctx: ValidationContext):
+        for field in ctx.builder.config["validation"]["required_frontmatter"]:
+            if field not in ctx.frontmatter:
+                ctx.errors.append(f"Missing required frontmatter field: {field}")
+
+    @registry.register(
+        "model", cost=1, requires=["frontmatter"], stages=("source", "output")
+    )
+    def check_model(ctx: ValidationContext):
+        if "model" not in ctx.frontmatter:
+            return
+        allowed_models = ctx.builder.config["validation"]["allowed_models"]
+        if ctx.frontmatter["model"] not in allowed_models:
+            ctx.errors.append(
+                f"Invalid model '{ctx.frontmatter['model']}'. "
+                f"Allowed: {', '.join(allowed_models)}"
+            )
+
+    @registry.register("unresolved_jinja", cost=2, requires=["frontmatter"])
+    def check_unresolved_jinja(ctx: ValidationContext):
+        # Leftover Jinja2 syntax means template compilation was incomplete
+        found = ctx.scan().jinja
+        if found:
+            locations = ", ".join(
+                f"'{marker}' at line {line}:{column}"
+                for line, column, marker in found[:MAX_JINJA_LOCATIONS]
+            )
+            if len(found) > MAX_JINJA_LOCATIONS:
+                locations += f" and {len(found) - MAX_JINJA_LOCATIONS} more"
+            ctx.errors.append(
+                "Unresolved Jinja2 syntax found in output "
+                f"(template compilation incomplete): {locations}"
+            )
+
+    @registry.register("token_budget", cost=3, requires=["frontmatter"])
+    def check_token_budget(ctx: ValidationContext):
+        ctx.tokens = ctx.builder.tokens_for_words(ctx.scan().words)
+        max_tokens = ctx.max_tokens
+        if max_tokens is None:
+            max_tokens = ctx.builder.config["validation"]["max_tokens"]
+        if ctx.tokens > max_tokens:
+            ctx.errors.append(f"Token count {ctx.tokens} exceeds limit of {max_tokens}")
+
+    @registry.register("dangerous_commands", cost=20, requires=["frontmatter"])
+    def check_dangerous_commands(ctx: ValidationContext):
+        report_dangerous(ctx, BASH_LANGUAGES, "bash", "Bash")
+
+    @registry.register("powershell_commands", cost=20, requires=["frontmatter"])
+    def check_powershell_commands(ctx: ValidationContext):
+        report_dangerous(ctx, POWERSHELL_LANGUAGES, "powershell", "PowerShell")
+
+    @registry.register("bash_syntax", cost=100, requires=["frontmatter"])
+    def check_bash_syntax(ctx: ValidationContext):
+        for i, block in enumerate(ctx.blocks(BASH_LANGUAGES)):
+            code = block.code.strip()
+            is_valid, error_msg = ctx.builder.validate_bash_syntax(code)
+            if not is_valid:
+                ctx.warn(
+                    f"{block_label(ctx, block, i)} syntax error: {error_msg}",
+                    "bash_syntax",
+                )
+
+    return registry
+
+
+def report_dangerous(
+    ctx: ValidationContext, languages: Iterable[str], language: str, kind: str
+):
+    """Warn about critical dangerous commands in blocks of one language."""
+    for i, block in enumerate(ctx.blocks(languages)):
+        code = block.code.strip()
+        for warn in ctx.builder.check_dangerous_commands(code, language):
+            if warn["severity"] == "critical":
+                ctx.warn(
+                    f"{block_label(ctx, block, i, kind)}: CRITICAL - "
+                    f"{warn['description']}",
+                    warn["category"],
+                    warn["severity"],
+                )
+            else:
+                # Below critical: counted in metrics, not logged
+                ctx.findings.append(
+                    {"category": warn["category"], "severity": warn["severity"]}
+                )
+
+
+def block_label(
+    ctx: ValidationContext, block: CodeBlock, index: int, kind: str = "Bash"
+) -> str:
+    """
+    Name a code block in warnings.
+
+    Blocks that come from a shared skill are reported against the skill,
+    so identical warnings from many agents aggregate; others by their
+    position and line in the agent.
+    """
+    origin = ctx.builder.block_origin(block.code.strip())
+    if origin:
+        return f"in {origin}"
+    return f"{kind} block {index + 1} (line {block.line})"
@@ -156,6 +156,14 @@ def dangerous_commands_config(temp_project_dir):
                 "severity": "critical",
                 "patterns": [r"rm\s+-rf\s+/", r"mkfs\."],
                 "description": "Commands that can destroy filesystem",
+                "commands": [
+                    {
+                        "program": "rm",
+                        "flags": ["-r|-R|--recursive", "-f|--force"],
+                        "args": r"^/$",
+                    },
+                    {"redirect": r"^/dev/sd[a-z]"},
+                ],
             },
             "system_modification": {
                 "severity": "high",
@@ -1,5 +1,7 @@
 """Unit tests for AgentBuilder class."""
 
+import hashlib
+import json
 import os
 import subprocess
 import sys
@@ -163,7 +165,9 @@ class TestValidateBashSyntax:
         with patch("subprocess.run") as mock_run:
             mock_run.return_value = MagicMock(returncode=0, stderr="")
 
-            is_valid, error_msg = builder.validate_bash_syntax("echo 'test'")
+            is_valid, error_msg = builder.validate_bash_syntax(
+                "echo 'test'", backend="bash"
+            )
 
             assert is_valid is True
             assert error_msg == ""
@@ -179,7 +183,9 @@ class TestValidateBashSyntax:
                 returncode=1, stderr="syntax error near unexpected token"
             )
 
-            is_valid, error_msg = builder.validate_bash_syntax("if [ missing bracket")
+            is_valid, error_msg = builder.validate_bash_syntax(
+                "if [ missing bracket", backend="bash"
+            )
 
             assert is_valid is False
             assert "syntax error" in error_msg
@@ -191,7 +197,9 @@ class TestValidateBashSyntax:
         builder = AgentBuilder(root_dir=temp_project_dir)
 
         with patch("subprocess.run", side_effect=FileNotFoundError):
-            is_valid, error_msg = builder.validate_bash_syntax("echo 'test'")
+            is_valid, error_msg = builder.validate_bash_syntax(
+                "echo 'test'", backend="bash"
+            )
 
             # Should skip validation gracefully
             assert is_valid is True
@@ -203,7 +211,7 @@ class TestValidateBashSyntax:
 
         with patch("subprocess.run", side_effect=subprocess.TimeoutExpired("bash", 5)):
             is_valid, error_msg = builder.validate_bash_syntax(
-                "while true; do echo 'loop'; done"
+                "while true; do echo 'loop'; done", backend="bash"
             )
 
             # Should skip validation on timeout
@@ -219,12 +227,25 @@ class TestValidateBashSyntax:
         with patch("subprocess.run") as mock_run:
             mock_run.return_value = MagicMock(returncode=1, stderr="")
 
-            is_valid, error_msg = builder.validate_bash_syntax("echo 'test'")
+            is_valid, error_msg = builder.validate_bash_syntax(
+                "echo 'test'", backend="bash"
+            )
 
             # Should skip validation when stderr is empty
             assert is_valid is True
             assert error_msg == ""
 
+    def test_python_backend_runs_no_subprocess(self, temp_project_dir, valid_config):
+        """Test that the default backend parses in-process."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        with patch("subprocess.run") as mock_run:
+            is_valid, error_msg = builder.validate_bash_syntax("if true; then echo")
+
+        mock_run.assert_not_called()
+        assert is_valid is False
+        assert "'if' opened on line 1 is never closed" in error_msg
+
 
 class TestCheckDangerousCommands:
     """Test dangerous command detection."""
@@ -269,6 +290,25 @@ class TestCheckDangerousCommands:
 
         assert warnings == []
 
+    def test_check_dangerous_commands_ignores_comments_and_strings(
+        self, temp_project_dir, valid_config, dangerous_commands_config
+    ):
+        """Test that patterns in comments and string literals do not match."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        code = "# never run rm -rf /\necho 'do not type rm -rf /'"
+
+        assert builder.check_dangerous_commands(code) == []
+
+    def test_check_dangerous_commands_structural_rules(
+        self, temp_project_dir, valid_config, dangerous_commands_config
+    ):
+        """Test that command rules catch spellings the regexes miss."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        for code in ("sudo rm -fr /", "rm -r --force /", "cat image > /dev/sda"):
+            warnings = builder.check_dangerous_commands(code)
+            assert [w["category"] for w in warnings] == ["destructive_filesystem"]
+
 
 class TestValidateOutput:
     """Test output validation."""
@@ -486,3 +526,345 @@ class TestBuildAll:
         exit_code = builder.build_all()
 
         assert exit_code == 0
+
+
+class TestCatalog:
+    """Test catalog.json generation."""
+
+    def test_build_all_writes_catalog(
+        self, temp_project_dir, valid_config, template_with_includes
+    ):
+        """Test that a build records each agent in catalog.json."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all()
+
+        catalog_path = temp_project_dir / "dist" / "agents" / "catalog.json"
+        with open(catalog_path, "r") as f:
+            catalog = json.load(f)
+
+        entry = catalog["agents"]["include-agent"]
+        output = (
+            temp_project_dir / "dist" / "agents" / "include-agent.md"
+        ).read_bytes()
+        assert entry["frontmatter"]["model"] == "sonnet"
+        assert entry["includes"] == ["skills/common/cognitive_protocol.md"]
+        assert entry["size"] == len(output)
+        assert entry["sha256"] == hashlib.sha256(output).hexdigest()
+        assert entry["tokens"] > 0
+        assert entry["warnings"] == []
+
+    def test_catalog_records_warnings(
+        self,
+        temp_project_dir,
+        valid_config,
+        template_with_dangerous_commands,
+        dangerous_commands_config,
+    ):
+        """Test that validation warnings are stored with the agent."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all()
+
+        entry = builder.load_catalog()["dangerous-agent"]
+        assert any("CRITICAL" in w for w in entry["warnings"])
+
+    def test_partial_build_merges_catalog(
+        self, temp_project_dir, valid_config, valid_template, template_with_includes
+    ):
+        """Test that rebuilding one agent keeps the other catalog entries."""
+        AgentBuilder(root_dir=temp_project_dir).build_all()
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all(agents=["test-agent"])
+
+        assert builder.stats["total"] == 1
+        assert set(builder.load_catalog()) == {"include-agent", "test-agent"}
+
+    def test_full_build_prunes_removed_templates(
+        self, temp_project_dir, valid_config, valid_template, template_with_includes
+    ):
+        """Test that a full build drops entries for deleted templates."""
+        AgentBuilder(root_dir=temp_project_dir).build_all()
+        template_with_includes.unlink()
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all()
+
+        assert set(builder.load_catalog()) == {"test-agent"}
+
+    def test_validate_only_does_not_write_catalog(
+        self, temp_project_dir, valid_config, valid_template
+    ):
+        """Test that validate-only mode leaves no catalog behind."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all(validate_only=True)
+
+        assert not builder.catalog_path.exists()
+
+
+class TestBuildProfiles:
+    """Test multi-variant builds driven by build profiles."""
+
+    @pytest.fixture
+    def profile_config(self, temp_project_dir, valid_config):
+        """Add full and lite profiles to the build configuration."""
+        valid_config["profiles"] = {
+            "full": {"context": {"include_skills": True}},
+            "lite": {
+                "suffix": "-lite",
+                "model": "haiku",
+                "max_tokens": 300,
+                "context": {"include_skills": False},
+            },
+        }
+        config_path = temp_project_dir / "config" / "build_config.yml"
+        with open(config_path, "w") as f:
+            yaml.dump(valid_config, f)
+        return valid_config
+
+    @pytest.fixture
+    def optional_skill_template(self, temp_project_dir, skill_file):
+        """Create a template whose skill include is optional."""
+        template_path = temp_project_dir / "src" / "agents" / "profile-agent.md.j2"
+        template_path.write_text("""---
+name: profile-agent
+description: Agent with an optional skill
+tools: Read
+model: sonnet
+---
+
+# Identity
+
+Profile test agent.
+
+{% if include_skills %}
+{% include 'skills/common/cognitive_protocol.md' %}
+{% endif %}
+""")
+        return template_path
+
+    def test_default_profile_includes_skills(
+        self, temp_project_dir, valid_config, optional_skill_template
+    ):
+        """Test that builds without configured profiles keep optional skills."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        success, output_path = builder.compile_template(optional_skill_template)
+
+        assert success is True
+        assert "Cognitive Protocol" in Path(output_path).read_text()
+
+    def test_lite_variant_drops_skills_and_retargets_model(
+        self, temp_project_dir, profile_config, optional_skill_template
+    ):
+        """Test that the lite variant is renamed, slimmed and moved to haiku."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        success, output_path = builder.compile_template(
+            optional_skill_template, profile="lite"
+        )
+
+        content = Path(output_path).read_text()
+        assert success is True
+        assert Path(output_path).name == "profile-agent-lite.md"
+        assert "name: profile-agent-lite" in content
+        assert "model: haiku" in content
+        assert "Cognitive Protocol" not in content
+
+    def test_build_all_emits_every_profile(
+        self, temp_project_dir, profile_config, optional_skill_template
+    ):
+        """Test that one build produces a variant per profile."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        exit_code = builder.build_all(profiles=["full", "lite"])
+
+        catalog = builder.load_catalog()
+        assert exit_code == 0
+        assert builder.stats["total"] == 2
+        assert catalog["profile-agent"]["profile"] == "full"
+        assert catalog["profile-agent-lite"]["profile"] == "lite"
+
+    def test_catalog_lists_rendered_includes(
+        self, temp_project_dir, profile_config, optional_skill_template
+    ):
+        """Test that a variant skipping an include does not list it."""
+        for heatmap in (False, True):
+            builder = AgentBuilder(root_dir=temp_project_dir)
+            builder.config["heatmap"] = {"enabled": heatmap}
+            builder.build_all(profiles=["full", "lite"])
+
+            catalog = builder.load_catalog()
+            skill = "skills/common/cognitive_protocol.md"
+            assert catalog["profile-agent"]["includes"] == [skill]
+            assert catalog["profile-agent-lite"]["includes"] == []
+
+    def test_full_build_prunes_inactive_profiles(
+        self, temp_project_dir, profile_config, optional_skill_template
+    ):
+        """Test that variants of profiles no longer built leave the catalog."""
+        profile_config["build"]["profiles"] = ["full"]
+        config_path = temp_project_dir / "config" / "build_config.yml"
+        with open(config_path, "w") as f:
+            yaml.dump(profile_config, f)
+        AgentBuilder(root_dir=temp_project_dir).build_all(profiles=["full", "lite"])
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all()
+
+        assert set(builder.load_catalog()) == {"profile-agent"}
+        index = json.loads((builder.output_dir / "index.json").read_text())
+        assert "profile-agent-lite" not in json.dumps(index)
+
+    def test_profile_token_budget(
+        self, temp_project_dir, profile_config, oversized_template
+    ):
+        """Test that a profile's max_tokens overrides the global budget."""
+        profile_config["profiles"]["lite"]["max_tokens"] = 10000
+        config_path = temp_project_dir / "config" / "build_config.yml"
+        with open(config_path, "w") as f:
+            yaml.dump(profile_config, f)
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        assert builder.compile_template(oversized_template)[0] is False
+        assert builder.compile_template(oversized_template, profile="lite")[0]
+
+    def test_profile_agent_filter(
+        self, temp_project_dir, profile_config, valid_template, optional_skill_template
+    ):
+        """Test that a profile can be limited to selected agents."""
+        profile_config["profiles"]["lite"]["agents"] = ["profile-agent"]
+        config_path = temp_project_dir / "config" / "build_config.yml"
+        with open(config_path, "w") as f:
+            yaml.dump(profile_config, f)
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all(profiles=["full", "lite"])
+
+        assert builder.stats["total"] == 3
+        assert "test-agent-lite" not in builder.load_catalog()
+
+    def test_variants_share_identical_renders(
+        self, temp_project_dir, profile_config, optional_skill_template
+    ):
+        """Test that profiles with the same context reuse one render."""
+        profile_config["profiles"]["haiku"] = {
+            "suffix": "-haiku",
+            "model": "haiku",
+            "context": {"include_skills": True},
+        }
+        config_path = temp_project_dir / "config" / "build_config.yml"
+        with open(config_path, "w") as f:
+            yaml.dump(profile_config, f)
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all(profiles=["full", "lite", "haiku"])
+
+        assert builder.stats["success"] == 3
+        assert len(builder._render_cache) == 2
+
+    def test_unknown_profile_raises(self, temp_project_dir, valid_config):
+        """Test that requesting an undefined profile is an error."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        with pytest.raises(ValueError, match="Unknown build profile"):
+            builder.active_profiles(["missing"])
+
+
+class TestOverlays:
+    """Test layered overlay builds on top of src/."""
+
+    @pytest.fixture
+    def overlay_config(self, temp_project_dir, valid_config, skill_file):
+        """Configure a vendor pack and a team overlay that overrides a skill."""
+        agents_dir = temp_project_dir / "src" / "agents"
+        for name in ("skilled", "plain"):
+            include = (
+                "{% include 'skills/common/cognitive_protocol.md' %}\n"
+                if name == "skilled"
+                else ""
+            )
+            (agents_dir / f"{name}.md.j2").write_text(f"""---
+name: {name}
+description: Overlay test agent
+tools: Read
+model: sonnet
+---
+
+# Identity
+
+{include}""")
+
+        vendor = temp_project_dir / "vendor" / "acme"
+        (vendor / "agents").mkdir(parents=True)
+        (vendor / "agents" / "acme.md.j2").write_text(
+            (agents_dir / "plain.md.j2").read_text().replace("plain", "acme")
+        )
+        team = temp_project_dir / "teams" / "payments"
+        (team / "skills" / "common").mkdir(parents=True)
+        (team / "skills" / "common" / "cognitive_protocol.md").write_text(
+            "# Payments Protocol\n"
+        )
+
+        valid_config["overlays"] = {
+            "payments": {"roots": ["vendor/acme", "teams/payments"]}
+        }
+        with open(temp_project_dir / "config" / "build_config.yml", "w") as f:
+            yaml.dump(valid_config, f)
+        return valid_config
+
+    def test_build_all_builds_overlay(self, temp_project_dir, overlay_config):
+        """Test that only agents an overlay changes are rendered again."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        exit_code = builder.build_all()
+
+        base_dir = temp_project_dir / "dist" / "agents"
+        overlay_dir = temp_project_dir / "dist" / "agents-payments"
+        assert exit_code == 0
+        assert "Cognitive Protocol" in (base_dir / "skilled.md").read_text()
+        assert "Payments Protocol" in (overlay_dir / "skilled.md").read_text()
+        assert (overlay_dir / "plain.md").read_text() == (
+            base_dir / "plain.md"
+        ).read_text()
+        assert (overlay_dir / "acme.md").exists()
+        assert not (base_dir / "acme.md").exists()
+        # 2 base agents, then skilled and acme re-rendered for the overlay
+        assert builder.stats["total"] == 4
+
+        catalog = json.loads((overlay_dir / "catalog.json").read_text())
+        assert sorted(catalog["agents"]) == ["acme", "plain", "skilled"]
+
+    def test_overlay_changes(self, temp_project_dir, overlay_config):
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        overlay = builder.overlay_builder("payments")
+        agents_dir = temp_project_dir / "src" / "agents"
+
+        assert overlay.overlay_changes(agents_dir / "skilled.md.j2") == [
+            "skills/common/cognitive_protocol.md"
+        ]
+        assert overlay.overlay_changes(agents_dir / "plain.md.j2") == []
+        assert builder.overlay_changes(agents_dir / "skilled.md.j2") == []
+        assert "skills/common/cognitive_protocol.md" in overlay.skill_texts()
+        assert overlay.skill_texts()["skills/common/cognitive_protocol.md"] == (
+            "# Payments Protocol\n"
+        )
+
+    def test_validate_only_skips_unchanged(self, temp_project_dir, overlay_config):
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all(validate_only=True)
+
+        overlay_dir = temp_project_dir / "dist" / "agents-payments"
+        assert builder.stats["total"] == 4
+        assert list(overlay_dir.glob("*.md")) == []
+
+    def test_unknown_overlay_raises(self, temp_project_dir, overlay_config):
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        with pytest.raises(ValueError, match="Unknown overlay"):
+            builder.active_overlays(["missing"])
+
+    def test_missing_root_raises(self, temp_project_dir, overlay_config):
+        overlay_config["overlays"]["payments"]["roots"].append("teams/missing")
+        with open(temp_project_dir / "config" / "build_config.yml", "w") as f:
+            yaml.dump(overlay_config, f)
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        with pytest.raises(ValueError, match="teams/missing"):
+            builder.overlay_builder("payments")
@@ -0,0 +1,189 @@
+"""Unit tests for the shared artifact cache."""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import yaml
+from artifact_cache import ArtifactCache, parse_size
+from build import OUTPUT_MODULES, AgentBuilder, hash_modules
+
+
+class TestArtifactCache:
+    """Test storage, eviction and counters."""
+
+    def test_parse_size(self):
+        """Test human-readable size limits."""
+        assert parse_size("500M") == 500 * 1024**2
+        assert parse_size("2g") == 2 * 1024**3
+        assert parse_size("10KB") == 10 * 1024
+        assert parse_size(123) == 123
+        with pytest.raises(ValueError, match="Invalid cache size"):
+            parse_size("lots")
+
+    def test_put_and_get(self, tmp_path):
+        """Test that entries round-trip and no temporary files remain."""
+        cache = ArtifactCache(tmp_path)
+        cache.put("ab" * 32, {"rendered": "text"})
+
+        assert cache.get("ab" * 32) == {"rendered": "text"}
+        assert cache.get("cd" * 32) is None
+        assert (cache.hits, cache.misses, cache.inserts) == (1, 1, 1)
+        assert not list(tmp_path.glob("??/.tmp-*"))
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        """Test that a truncated entry is dropped."""
+        cache = ArtifactCache(tmp_path)
+        cache.put("ab" * 32, {"rendered": "text"})
+        cache.entry_path("ab" * 32).write_text("{trunc")
+
+        assert cache.get("ab" * 32) is None
+        assert not cache.entry_path("ab" * 32).exists()
+
+    def test_prune_evicts_least_recently_used(self, tmp_path):
+        """Test that the oldest entries go first."""
+        cache = ArtifactCache(tmp_path)
+        for i, key in enumerate(("aa" * 32, "bb" * 32, "cc" * 32)):
+            cache.put(key, {"rendered": "x" * 100})
+            os.utime(cache.entry_path(key), (1000 + i, 1000 + i))
+        # Reading an entry makes it the most recently used
+        cache.get("aa" * 32)
+
+        size = cache.entry_path("aa" * 32).stat().st_size
+        removed, freed = cache.prune(max_size=size * 2)
+
+        assert (removed, freed) == (1, size)
+        assert not cache.entry_path("bb" * 32).exists()
+        assert cache.entry_path("aa" * 32).exists()
+
+    def test_stats_accumulate_across_runs(self, tmp_path):
+        """Test persistent hit and miss counters."""
+        for _ in range(2):
+            cache = ArtifactCache(tmp_path)
+            cache.get("aa" * 32)
+            cache.put("aa" * 32, {})
+            cache.get("aa" * 32)
+            cache.save_counters()
+
+        stats = ArtifactCache(tmp_path).stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 1, 1)
+        assert stats["hit_ratio"] == 0.75
+
+
+class TestBuildWithCache:
+    """Test that builds reuse cached artifacts."""
+
+    @pytest.fixture
+    def cached_config(self, temp_project_dir, valid_config, tmp_path):
+        """Enable the artifact cache in a shared directory."""
+        valid_config["cache"] = {"enabled": True, "dir": str(tmp_path / "shared")}
+        with open(temp_project_dir / "config" / "build_config.yml", "w") as f:
+            yaml.dump(valid_config, f)
+        return valid_config
+
+    def test_second_build_renders_nothing(
+        self, temp_project_dir, cached_config, template_with_includes
+    ):
+        """Test that a fresh builder restores every agent from the cache."""
+        AgentBuilder(root_dir=temp_project_dir).build_all()
+        output = temp_project_dir / "dist" / "agents" / "include-agent.md"
+        first = output.read_text()
+        output.unlink()
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        with patch.object(builder, "render_variant") as render:
+            assert builder.build_all() == 0
+
+        render.assert_not_called()
+        assert builder.artifact_cache.stats()["hits"] == 1
+        assert output.read_text() == first
+
+    def test_key_covers_includes_and_rules(
+        self, temp_project_dir, cached_config, template_with_includes
+    ):
+        """Test that editing an include or the dangerous rules misses."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        key = builder.artifact_key(template_with_includes, "full")
+        assert builder.artifact_key(template_with_includes, "full") == key
+
+        skill = temp_project_dir / "src" / "skills" / "common" / "cognitive_protocol.md"
+        skill.write_text(skill.read_text() + "\nOne more rule.\n")
+        edited = builder.artifact_key(template_with_includes, "full")
+        assert edited != key
+
+        rules = temp_project_dir / "config" / "dangerous_commands.json"
+        rules.write_text(json.dumps({"categories": {}}))
+        assert builder.artifact_key(template_with_includes, "full") != edited
+
+    def test_reporting_options_keep_the_cache(
+        self, temp_project_dir, cached_config, template_with_includes
+    ):
+        """Test that --max-growth and --metrics-file still hit."""
+        assert AgentBuilder(root_dir=temp_project_dir).build_all() == 0
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["history"] = {"enabled": True, "max_growth": "50%"}
+        builder.config["metrics"] = {"textfile": str(temp_project_dir / "b.prom")}
+        builder.history = builder.open_history()
+        before = builder.artifact_cache.stats()
+
+        assert builder.build_all() == 0
+        after = builder.artifact_cache.stats()
+        assert after["hits"] - before["hits"] == 1
+        assert after["misses"] == before["misses"]
+
+    def test_heatmap_on_a_warm_cache_records_sections(
+        self, temp_project_dir, cached_config, template_with_includes
+    ):
+        """Test that --heatmap after a plain build still gets section tokens."""
+        assert AgentBuilder(root_dir=temp_project_dir).build_all() == 0
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["heatmap"] = {"enabled": True}
+        assert builder.build_all() == 0
+
+        catalog = json.loads(builder.catalog_path.read_text())
+        assert all(entry.get("sections") for entry in catalog["agents"].values())
+        heatmap = json.loads(builder.heatmap_path.read_text())
+        assert heatmap["children"][0]["children"]
+
+    def test_fingerprint_ignores_eval_tooling(self, tmp_path):
+        """Test that only rendering and validation code invalidates the cache."""
+        scripts_dir = Path(__file__).parent.parent / "scripts"
+        for name in (*OUTPUT_MODULES, "rubric_grading"):
+            shutil.copy(scripts_dir / f"{name}.py", tmp_path)
+        before = hash_modules(tmp_path)
+
+        with open(tmp_path / "rubric_grading.py", "a") as f:
+            f.write("# retry tweak\n")
+        assert hash_modules(tmp_path) == before
+
+        with open(tmp_path / "minify.py", "a") as f:
+            f.write("# new rule\n")
+        assert hash_modules(tmp_path) != before
+
+    def test_cached_failures_still_fail(
+        self, temp_project_dir, cached_config, oversized_template
+    ):
+        """Test that validation results are cached with the output."""
+        assert AgentBuilder(root_dir=temp_project_dir).build_all() == 1
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        assert builder.build_all() == 1
+        assert builder.artifact_cache.stats()["hits"] == 1
+
+    def test_environment_overrides(
+        self, temp_project_dir, valid_config, tmp_path, monkeypatch
+    ):
+        """Test enabling and disabling the cache from the environment."""
+        monkeypatch.setenv("AGENT_BUILD_CACHE_DIR", str(tmp_path / "ci"))
+        monkeypatch.setenv("AGENT_BUILD_CACHE_MAXSIZE", "1M")
+        cache = AgentBuilder(root_dir=temp_project_dir).artifact_cache
+        assert cache.directory == tmp_path / "ci"
+        assert cache.max_size == 1024**2
+
+        monkeypatch.setenv("AGENT_BUILD_CACHE_DISABLE", "1")
+        assert AgentBuilder(root_dir=temp_project_dir).artifact_cache is None
@@ -0,0 +1,187 @@
+"""Unit tests for the in-memory build API."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from build_api import MemoryBuilder, build_agents, merge_config
+
+AGENT = """---
+name: {name}
+description: Test agent
+tools: Read, Grep
+model: {model}
+---
+
+# Identity
+
+You help the {{{{ team | default("platform") }}}} team.
+
+{{% include 'skills/common/style.md' %}}
+"""
+
+SKILLS = {"skills/common/style.md": "## Style\n\nKeep answers short.\n"}
+
+DANGEROUS = {
+    "categories": {
+        "destructive_filesystem": {
+            "severity": "critical",
+            "patterns": ["rm\\s+-rf\\s+/"],
+            "description": "Deletes the filesystem",
+        }
+    }
+}
+
+
+def agent(name: str = "helper", model: str = "sonnet", body: str = "") -> str:
+    return AGENT.format(name=name, model=model) + body
+
+
+class TestBuildAgents:
+    """Test builds from mappings."""
+
+    def test_renders_templates_and_skills(self):
+        report = build_agents({"helper": agent()}, SKILLS)
+
+        assert report.ok
+        result = report.agents["helper"]
+        assert result.valid
+        assert "platform team" in result.output
+        assert "Keep answers short." in result.output
+        assert result.frontmatter["name"] == "helper"
+        assert result.tokens > 0
+        assert result.size == len(result.output.encode("utf-8"))
+        assert "frontmatter" in result.rule_timings
+        assert report.outputs() == {"helper": result.output}
+
+    def test_context_personalizes_output(self):
+        report = build_agents({"helper": agent()}, SKILLS, context={"team": "data"})
+        assert "data team" in report.agents["helper"].output
+
+    def test_touches_no_files(self, tmp_path, monkeypatch):
+        """Test that nothing is created relative to the working directory."""
+        monkeypatch.chdir(tmp_path)
+        report = build_agents(
+            {"helper": agent()},
+            SKILLS,
+            config={"cache": {"enabled": True}, "history": {"enabled": True}},
+        )
+        assert report.ok
+        assert list(tmp_path.iterdir()) == []
+
+    def test_validation_errors_are_reported(self):
+        report = build_agents(
+            {"helper": agent(), "broken": agent("broken", model="gpt")}, SKILLS
+        )
+
+        assert not report.ok
+        assert report.failed == ["broken"]
+        assert "Invalid model 'gpt'" in report.agents["broken"].errors[0]
+        assert "broken" not in report.outputs()
+
+    def test_template_errors_are_reported(self):
+        report = build_agents({"helper": agent()})
+
+        result = report.agents["helper"]
+        assert not result.valid
+        assert result.output is None
+        assert "skills/common/style.md" in result.errors[0]
+
+    def test_dangerous_commands(self):
+        body = "\n```bash\nrm -rf /\n```\n"
+        report = build_agents(
+            {"helper": agent(body=body)}, SKILLS, dangerous_commands=DANGEROUS
+        )
+
+        result = report.agents["helper"]
+        assert result.valid
+        assert any("CRITICAL" in w for w in result.warnings)
+        assert result.findings[0]["category"] == "destructive_filesystem"
+
+    def test_profiles(self):
+        config = {
+            "profiles": {
+                "full": {"context": {"team": "core"}},
+                "lite": {"suffix": "-lite", "model": "haiku", "max_tokens": 5},
+            }
+        }
+        report = build_agents({"helper": agent()}, SKILLS, config, profiles=None)
+
+        assert report.profiles == ["full", "lite"]
+        assert "core team" in report.agents["helper"].output
+        lite = report.agents["helper-lite"]
+        assert lite.frontmatter["model"] == "haiku"
+        assert "exceeds limit of 5" in lite.errors[0]
+
+    def test_selects_agents(self):
+        templates = {"helper": agent(), "other.md.j2": agent("other")}
+        report = build_agents(templates, SKILLS, agents=["other"])
+        assert list(report.agents) == ["other"]
+
+        with pytest.raises(ValueError, match="Unknown agent"):
+            build_agents(templates, SKILLS, agents=["missing"])
+        with pytest.raises(ValueError, match="Unknown build profile"):
+            build_agents(templates, SKILLS, profiles=["missing"])
+
+    def test_report_is_json_serializable(self):
+        report = build_agents({"helper": agent()}, SKILLS)
+        data = json.loads(json.dumps(report.to_dict()))
+        assert data["ok"] is True
+        assert data["agents"]["helper"]["sha256"] == report.agents["helper"].sha256
+
+    def test_concurrent_builds(self):
+        """Test that concurrent builds with different contexts stay separate."""
+        teams = [f"team{i}" for i in range(16)]
+
+        def build(team):
+            report = build_agents(
+                {"helper": agent()},
+                SKILLS,
+                context={"team": team},
+                dangerous_commands=DANGEROUS,
+            )
+            return team, report.agents["helper"].output
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for team, output in pool.map(build, teams):
+                assert f"{team} team" in output
+
+
+class TestMemoryBuilder:
+    """Test the reusable builder."""
+
+    def test_reuse(self):
+        builder = MemoryBuilder({"helper": agent(), "other": agent("other")}, SKILLS)
+
+        first = builder.build(agents=["helper"])
+        second = builder.build()
+
+        assert list(first.agents) == ["helper"]
+        assert sorted(second.agents) == ["helper", "other"]
+        assert first.agents["helper"].output == second.agents["helper"].output
+
+    def test_log_records_are_collected(self):
+        config = {"validation": {"pattern_safety": "reject"}}
+        dangerous = {"categories": {"bad": {"patterns": ["(\\w+\\s?)+$"]}}}
+        report = build_agents(
+            {"helper": agent(body="\n```bash\necho hi\n```\n")},
+            SKILLS,
+            config,
+            dangerous_commands=dangerous,
+        )
+        assert any("rejected" in record["message"] for record in report.log)
+
+
+class TestMergeConfig:
+    """Test partial configs."""
+
+    def test_overlays_sections(self):
+        config = merge_config({"validation": {"max_tokens": 900}})
+        assert config["validation"]["max_tokens"] == 900
+        assert "sonnet" in config["validation"]["allowed_models"]
+
+    def test_rejects_invalid_sections(self):
+        with pytest.raises(ValueError, match="validation"):
+            merge_config({"validation": ["max_tokens"]})
+        with pytest.raises(ValueError):
+            merge_config(["build"])
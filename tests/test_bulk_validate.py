@@ -0,0 +1,102 @@
+"""Unit tests for bulk validation of compiled agents."""
+
+import shutil
+
+import pytest
+from build import AgentBuilder
+from bulk_validate import iter_markdown, read_text, summarize, validate_paths
+
+
+@pytest.fixture
+def agents_dir(
+    temp_project_dir,
+    valid_config,
+    valid_template,
+    template_with_dangerous_commands,
+    invalid_template_no_frontmatter,
+    dangerous_commands_config,
+):
+    """Copy the fixture templates into a tree of installed agents."""
+    installed = temp_project_dir / "installed"
+    (installed / "vendor" / "pack").mkdir(parents=True)
+    (installed / ".git").mkdir()
+    # Compiled agents have no Jinja left
+    compiled = valid_template.read_text().replace("{{ python_version }}", "3.11")
+    (installed / "test-agent.md").write_text(compiled)
+    shutil.copy(template_with_dangerous_commands, installed / "vendor" / "danger.md")
+    shutil.copy(invalid_template_no_frontmatter, installed / "vendor" / "pack" / "x.md")
+    shutil.copy(valid_template, installed / ".git" / "ignored.md")
+    (installed / "notes.txt").write_text("not an agent")
+    return installed
+
+
+class TestIterMarkdown:
+    """Test directory streaming."""
+
+    def test_walks_tree(self, agents_dir):
+        """Test that nested .md files are found and hidden dirs skipped."""
+        names = sorted(p.name for p in iter_markdown(agents_dir))
+        assert names == ["danger.md", "test-agent.md", "x.md"]
+
+    def test_not_recursive(self, agents_dir):
+        paths = list(iter_markdown(agents_dir, recursive=False))
+        assert [p.name for p in paths] == ["test-agent.md"]
+
+    def test_single_file(self, agents_dir):
+        path = agents_dir / "test-agent.md"
+        assert list(iter_markdown(path)) == [path]
+
+
+class TestValidatePaths:
+    """Test validation results."""
+
+    def test_report(self, temp_project_dir, agents_dir):
+        """Test errors, warnings and summary of a mixed directory."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        results = {
+            r["path"]: r for r in validate_paths(builder, iter_markdown(agents_dir))
+        }
+
+        valid = results[str(agents_dir / "test-agent.md")]
+        assert valid["valid"] and valid["name"] == "test-agent"
+        assert valid["model"] == "sonnet" and valid["tokens"] > 0
+
+        danger = results[str(agents_dir / "vendor" / "danger.md")]
+        assert danger["valid"]
+        assert any("CRITICAL" in w for w in danger["warnings"])
+
+        broken = results[str(agents_dir / "vendor" / "pack" / "x.md")]
+        assert not broken["valid"]
+        assert "Missing YAML frontmatter" in broken["errors"][0]
+
+        summary = summarize(list(results.values()))
+        assert (summary["files"], summary["valid"], summary["invalid"]) == (3, 2, 1)
+
+    def test_unreadable_files(self, temp_project_dir, valid_config, tmp_path):
+        """Test that undecodable and empty files are reported, not raised."""
+        (tmp_path / "binary.md").write_bytes(b"---\n\xff\xfe\n---\n")
+        (tmp_path / "empty.md").write_bytes(b"")
+        assert read_text(tmp_path / "empty.md") == ""
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        results = sorted(
+            validate_paths(builder, iter_markdown(tmp_path)), key=lambda r: r["path"]
+        )
+        assert "not valid UTF-8" in results[0]["errors"][0]
+        assert "Missing YAML frontmatter" in results[1]["errors"][0]
+
+    def test_worker_processes(self, temp_project_dir, agents_dir):
+        """Test that worker processes give the same results as in-process."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["validation"]["max_tokens"] = 10
+
+        def key(r):
+            return r["path"]
+
+        serial = sorted(validate_paths(builder, iter_markdown(agents_dir)), key=key)
+        parallel = sorted(
+            validate_paths(builder, iter_markdown(agents_dir), workers=2, batch_size=1),
+            key=key,
+        )
+        assert parallel == serial
+        assert not any(r["valid"] for r in parallel)
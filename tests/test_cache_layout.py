@@ -0,0 +1,103 @@
+"""Unit tests for the prompt-cache-friendly layout and prefix report."""
+
+from build import AgentBuilder
+from cache_layout import reorder_for_cache, shared_prefix_report, split_sections
+
+FRONTMATTER = "---\nname: a\nmodel: sonnet\n---\n\n"
+SKILL = "# Skill\n\nShared guidance for every agent.\n"
+
+
+def count_words(text: str) -> int:
+    """Count whitespace-separated words (a stand-in token counter)."""
+    return len(text.split())
+
+
+class TestSplitSections:
+    """Test heading-based section splitting."""
+
+    def test_ignores_headings_in_code_fences(self):
+        """Test that '#' comments inside code do not start sections."""
+        body = "# One\n\n```bash\n# comment\n```\n\n## Two\ntext"
+
+        assert len(split_sections(body)) == 2
+
+
+class TestReorderForCache:
+    """Test section reordering."""
+
+    def test_moves_shared_skill_first(self):
+        """Test that included skill text becomes the prefix."""
+        document = FRONTMATTER + "# Identity\n\nAgent A.\n\n" + SKILL
+
+        reordered = reorder_for_cache(document, [SKILL])
+
+        assert reordered == FRONTMATTER + SKILL + "\n# Identity\n\nAgent A.\n"
+
+    def test_moves_volatile_sections_last(self):
+        """Test that sections containing volatile values go to the end."""
+        document = (
+            FRONTMATTER + "# Build\n\nBuilt at: 2024-01-01\n\n# Identity\n\nAgent.\n"
+        )
+
+        reordered = reorder_for_cache(document, [], ["2024-01-01"])
+
+        assert reordered.index("# Identity") < reordered.index("# Build")
+
+    def test_skips_blocks_not_in_document(self):
+        """Test that skills the agent does not include are ignored."""
+        document = FRONTMATTER + "# Identity\n\nAgent.\n"
+
+        assert reorder_for_cache(document, [SKILL]) == document
+
+
+class TestSharedPrefixReport:
+    """Test the shared-prefix measurement."""
+
+    def test_reports_longest_shared_prefix(self):
+        """Test prefix lengths against the best matching agent."""
+        documents = {
+            "a": FRONTMATTER + SKILL + "\nAgent alpha text.\n",
+            "b": FRONTMATTER + SKILL + "\nAgent beta text.\n",
+            "c": FRONTMATTER + "Unrelated agent.\n",
+        }
+
+        rows = {
+            row["agent"]: row for row in shared_prefix_report(documents, count_words)
+        }
+
+        assert rows["a"]["shared_with"] == "b"
+        assert rows["a"]["prefix_tokens"] == count_words(SKILL) + 1
+        assert rows["c"]["prefix_tokens"] == 0
+
+    def test_ignores_frontmatter(self):
+        """Test that identical frontmatter does not count as shared prefix."""
+        documents = {"a": FRONTMATTER + "Alpha\n", "b": FRONTMATTER + "Beta\n"}
+
+        rows = shared_prefix_report(documents, count_words)
+
+        assert all(row["prefix_tokens"] == 0 for row in rows)
+
+
+class TestCacheFriendlyBuild:
+    """Test the cache-friendly layout inside AgentBuilder."""
+
+    def test_layout_puts_skill_before_identity(
+        self, temp_project_dir, valid_config, template_with_includes
+    ):
+        """Test that the build moves included skills to the top."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["layout"] = {"cache_friendly": True}
+
+        rendered = builder.render_all()["include-agent"]
+
+        assert rendered.index("# Cognitive Protocol") < rendered.index("# Identity")
+
+    def test_layout_disabled_by_default(
+        self, temp_project_dir, valid_config, template_with_includes
+    ):
+        """Test that template order is kept unless the option is enabled."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        rendered = builder.render_all()["include-agent"]
+
+        assert rendered.index("# Identity") < rendered.index("# Cognitive Protocol")
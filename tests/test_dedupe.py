@@ -0,0 +1,108 @@
+"""Unit tests for the cross-agent near-duplicate analyzer."""
+
+import pytest
+from build import AgentBuilder
+from dedupe import MinHasher, find_near_duplicates, similarity, split_paragraphs
+
+PASSAGE = (
+    "Always validate every input at the trust boundary and reject anything "
+    "that does not match the expected schema before processing it further."
+)
+
+
+def agent(title: str, *paragraphs: str) -> str:
+    """Build a minimal compiled agent document."""
+    body = "\n\n".join(paragraphs)
+    return f"---\nname: {title}\nmodel: sonnet\n---\n\n# {title}\n\n{body}\n"
+
+
+class TestMinHasher:
+    """Test MinHash signatures."""
+
+    def test_signature_is_deterministic(self):
+        """Test that signatures do not depend on process hash seeds."""
+        assert MinHasher().signature(PASSAGE) == MinHasher().signature(PASSAGE)
+
+    def test_similarity_orders_texts(self):
+        """Test that near copies score higher than unrelated text."""
+        hasher = MinHasher()
+        original = hasher.signature(PASSAGE)
+        near = hasher.signature(PASSAGE.replace("Always", "You must always"))
+        unrelated = hasher.signature("Use goroutines and channels for fan-out work")
+
+        assert similarity(original, original) == 1.0
+        assert similarity(original, near) > 0.6
+        assert similarity(original, unrelated) < 0.2
+
+
+class TestSplitParagraphs:
+    """Test paragraph extraction."""
+
+    def test_skips_frontmatter_and_short_paragraphs(self):
+        """Test that only paragraphs with enough words are returned."""
+        paragraphs = split_paragraphs(agent("a", "Short line.", PASSAGE), 15)
+
+        assert paragraphs == [PASSAGE]
+
+
+class TestFindNearDuplicates:
+    """Test duplicate clustering and ranking."""
+
+    def test_finds_copies_across_agents(self):
+        """Test that exact and near copies form one cluster."""
+        documents = {
+            "a": agent("a", PASSAGE),
+            "b": agent("b", PASSAGE),
+            "c": agent("c", PASSAGE.replace("Always", "You must always")),
+            "d": agent("d", "Completely different guidance about Go channels " * 3),
+        }
+        findings = find_near_duplicates(documents, threshold=0.7)
+
+        assert len(findings) == 1
+        assert findings[0]["agents"] == ["a", "b", "c"]
+        assert len(findings[0]["occurrences"]) == 3
+
+    def test_ranks_by_tokens_saved(self):
+        """Test that larger duplicated passages rank first."""
+        longer = PASSAGE + " " + PASSAGE.replace("input", "header")
+        other = "Prefer composition over inheritance " * 4
+        documents = {
+            "a": agent("a", longer, other),
+            "b": agent("b", longer, other),
+        }
+        findings = find_near_duplicates(documents)
+
+        assert [f["sample"] for f in findings] == [longer, other.strip()]
+        assert findings[0]["tokens_saved"] > findings[1]["tokens_saved"]
+
+    def test_ignores_duplicates_within_one_agent(self):
+        """Test that only cross-agent copies are reported."""
+        documents = {"a": agent("a", PASSAGE, PASSAGE), "b": agent("b", "x")}
+
+        assert find_near_duplicates(documents) == []
+
+    def test_excludes_shared_skill_content(self):
+        """Test that paragraphs already provided by a skill are skipped."""
+        documents = {"a": agent("a", PASSAGE), "b": agent("b", PASSAGE)}
+
+        assert find_near_duplicates(documents, exclude=[PASSAGE]) == []
+
+    def test_rejects_bands_not_dividing_signature(self):
+        """Test that an invalid LSH band count is an error."""
+        with pytest.raises(ValueError):
+            find_near_duplicates({}, bands=7)
+
+
+class TestRenderAll:
+    """Test in-memory rendering used by reports."""
+
+    def test_render_all_writes_nothing(
+        self, temp_project_dir, valid_config, template_with_includes
+    ):
+        """Test that reports render agents without writing output."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        rendered = builder.render_all()
+
+        assert "Cognitive Protocol" in rendered["include-agent"]
+        assert list((temp_project_dir / "dist" / "agents").iterdir()) == []
+        assert "skills/common/cognitive_protocol.md" in builder.skill_texts()
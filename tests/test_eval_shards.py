@@ -0,0 +1,169 @@
+"""Unit tests for sharded eval datasets and merged results."""
+
+import json
+
+import pytest
+from eval_shards import (
+    DatasetError,
+    config_datasets,
+    config_threshold,
+    iter_rows,
+    merge_results,
+    parse_shard,
+    result_passed,
+    write_shard,
+)
+
+
+def write_dataset(path, count, prefix="task"):
+    rows = [
+        {
+            "vars": {"task": f"{prefix} {i}"},
+            "assert": [{"type": "contains", "value": "x"}],
+        }
+        for i in range(count)
+    ]
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\n\n")
+    return path
+
+
+def write_results(path, scores, error_at=None):
+    results = []
+    for i, score in enumerate(scores):
+        result = {
+            "vars": {"task": f"task {i}"},
+            "prompt": {"label": "agent.md"},
+            "success": score == 1.0,
+            "score": score,
+            "gradingResult": {"pass": score == 1.0, "score": score, "reason": "r"},
+            "response": {"tokenUsage": {"total": 10}},
+            "cost": 0.001,
+        }
+        if i == error_at:
+            result = {"vars": {"task": "boom"}, "error": "API error", "success": False}
+        results.append(result)
+    path.write_text(json.dumps({"results": {"version": 3, "results": results}}))
+    return path
+
+
+class TestParseShard:
+    def test_valid(self):
+        assert parse_shard("3/16") == (3, 16)
+        assert parse_shard("1/1") == (1, 1)
+
+    @pytest.mark.parametrize("value", ["0/4", "5/4", "3", "a/b", "1/0"])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+class TestShards:
+    """Test streaming and splitting datasets."""
+
+    def test_shards_partition_rows(self, tmp_path):
+        """Test that shards are disjoint, complete and evenly sized."""
+        first = write_dataset(tmp_path / "a.jsonl", 7)
+        second = write_dataset(tmp_path / "b.jsonl", 6, prefix="other")
+
+        shards = [
+            [row["vars"]["task"] for row in iter_rows([first, second], (i, 4))]
+            for i in range(1, 5)
+        ]
+
+        assert [len(s) for s in shards] == [4, 3, 3, 3]
+        everything = sorted(task for shard in shards for task in shard)
+        assert len(everything) == len(set(everything)) == 13
+        assert shards[0][:2] == ["task 0", "task 4"]
+
+    def test_only_rows_of_the_shard_are_validated(self, tmp_path):
+        """Test that invalid rows of other shards do not stop a shard."""
+        path = write_dataset(tmp_path / "a.jsonl", 3)
+        lines = path.read_text().splitlines()
+        lines[1] = "{not json"
+        path.write_text("\n".join(lines) + "\n")
+
+        assert len(list(iter_rows([path], (1, 2)))) == 2
+        with pytest.raises(DatasetError, match=r"a.jsonl:2: invalid JSON"):
+            list(iter_rows([path], (2, 2)))
+
+    @pytest.mark.parametrize(
+        "row, message",
+        [
+            ([], "JSON object"),
+            ({"vars": "x"}, "'vars'"),
+            ({"assert": {"type": "contains"}}, "'assert' must be a list"),
+            ({"assert": [{"value": "x"}]}, "assertion 1"),
+            ({"threshold": "high"}, "'threshold'"),
+        ],
+    )
+    def test_invalid_rows(self, tmp_path, row, message):
+        path = tmp_path / "bad.jsonl"
+        path.write_text(json.dumps(row) + "\n")
+        with pytest.raises(DatasetError, match=message):
+            list(iter_rows([path]))
+
+    def test_write_shard(self, tmp_path):
+        dataset = write_dataset(tmp_path / "a.jsonl", 10)
+        output = tmp_path / "shards" / "shard-2-of-3.jsonl"
+
+        assert write_shard([dataset], output, (2, 3)) == 3
+        rows = [json.loads(line) for line in output.read_text().splitlines()]
+        assert [r["vars"]["task"] for r in rows] == ["task 1", "task 4", "task 7"]
+
+    def test_failed_shard_leaves_no_file(self, tmp_path):
+        dataset = tmp_path / "a.jsonl"
+        dataset.write_text('{"vars": {}}\n[]\n')
+        output = tmp_path / "shard.jsonl"
+
+        with pytest.raises(DatasetError):
+            write_shard([dataset], output, (1, 1))
+        assert list(tmp_path.iterdir()) == [dataset]
+
+    def test_config_datasets_and_threshold(self, tmp_path):
+        config = {
+            "tests": ["file://datasets/a.jsonl", "file://other.csv"],
+            "defaultTest": {"threshold": 0.9},
+        }
+        config_path = tmp_path / "promptfoo.yaml"
+        assert config_datasets(config, config_path) == [
+            tmp_path / "datasets" / "a.jsonl"
+        ]
+        assert config_threshold(config) == 0.9
+        assert config_threshold({}) is None
+
+
+class TestMerge:
+    """Test combining shard results."""
+
+    def test_threshold_applies_per_test(self):
+        partial = {"success": False, "score": 0.95, "gradingResult": {"score": 0.95}}
+        assert result_passed(partial, 0.9)
+        assert not result_passed(partial, None)
+        assert not result_passed({**partial, "testCase": {"threshold": 1.0}}, 0.9)
+        assert not result_passed({"error": "timeout"}, 0.0)
+
+    def test_merge(self, tmp_path):
+        first = write_results(tmp_path / "r1.json", [1.0, 0.95, 1.0])
+        second = write_results(tmp_path / "r2.json", [1.0, 0.5, 1.0], error_at=2)
+
+        report = merge_results([first, second], threshold=0.9)
+
+        assert report["shards"] == 2
+        assert report["tests"] == 6
+        assert report["passed"] == 4
+        assert report["failed"] == 2
+        assert report["errors"] == 1
+        assert report["pass_rate"] == round(4 / 6, 4)
+        assert report["tokens"] == 50
+        assert report["success"] is False
+        assert [f["shard"] for f in report["failures"]] == ["r2.json", "r2.json"]
+
+    def test_min_pass_rate(self, tmp_path):
+        results = write_results(tmp_path / "r.json", [1.0, 1.0, 1.0, 0.0])
+
+        assert merge_results([results], 0.9, min_pass_rate=0.75)["success"]
+        assert not merge_results([results], 0.9, min_pass_rate=0.8)["success"]
+
+    def test_no_results_fail(self, tmp_path):
+        results = write_results(tmp_path / "r.json", [])
+        assert merge_results([results])["success"] is False
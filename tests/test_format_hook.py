@@ -0,0 +1,273 @@
+"""Unit tests for the debounced PostToolUse formatting hook."""
+
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import format_hook
+import pytest
+from format_hook import (
+    enqueue,
+    flush,
+    hook_paths,
+    load_config,
+    run_formatters,
+    spool_path,
+    take_spool,
+    try_lock,
+    unlock,
+)
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "formatters.json"
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    """A formatter that appends its file arguments to calls.jsonl."""
+    script = tmp_path / "record.py"
+    calls = tmp_path / "calls.jsonl"
+    script.write_text(
+        "import json, sys\n"
+        f"with open({str(calls)!r}, 'a') as f:\n"
+        "    f.write(json.dumps(sys.argv[2:]) + '\\n')\n"
+    )
+
+    def formatter(name, patterns):
+        return {
+            "name": name,
+            "command": [sys.executable, str(script), name],
+            "patterns": patterns,
+        }
+
+    def read():
+        if not calls.exists():
+            return []
+        return [json.loads(line) for line in calls.read_text().splitlines()]
+
+    formatter.calls = read
+    return formatter
+
+
+@pytest.fixture
+def project(tmp_path):
+    project_dir = tmp_path / "project"
+    project_dir.mkdir()
+    for name in ("a.py", "b.py", "c.ts"):
+        (project_dir / name).write_text("x = 1\n")
+    return project_dir
+
+
+class TestSpool:
+    def test_hook_paths(self):
+        assert hook_paths({"tool_input": {"file_path": "a.py"}}) == ["a.py"]
+        assert hook_paths({"tool_input": {"notebook_path": "n.ipynb"}}) == ["n.ipynb"]
+        assert hook_paths({"tool_input": {"command": "ls"}}) == []
+        assert hook_paths({}) == []
+
+    def test_enqueue_and_take_dedupes(self, tmp_path, project):
+        spool = spool_path(tmp_path / "spool", project)
+        for path in ("a.py", "b.py", "a.py", str(project / "b.py")):
+            enqueue(spool, [path], project)
+
+        assert take_spool(spool) == [str(project / "a.py"), str(project / "b.py")]
+        assert spool.stat().st_size == 0
+        assert take_spool(spool) == []
+
+    def test_append_to_an_open_spool_is_kept(self, tmp_path, project):
+        """Test that a write through a descriptor opened before a take is kept."""
+        spool = spool_path(tmp_path / "spool", project)
+        enqueue(spool, ["a.py"], project)
+        fd = os.open(spool, os.O_WRONLY | os.O_APPEND)
+        try:
+            assert take_spool(spool) == [str(project / "a.py")]
+            os.write(fd, f"{project / 'b.py'}\n".encode())
+        finally:
+            os.close(fd)
+
+        assert take_spool(spool) == [str(project / "b.py")]
+
+    def test_failed_lock_is_not_released(self, tmp_path, project, monkeypatch):
+        """Test that a lock that gave up neither crashes nor loses paths."""
+        spool = spool_path(tmp_path / "spool", project)
+        monkeypatch.setattr(format_hook, "lock", lambda fd, wait=True: False)
+        monkeypatch.setattr(format_hook, "release", pytest.fail)
+
+        enqueue(spool, ["a.py"], project)
+        assert take_spool(spool) == []
+
+        monkeypatch.undo()
+        assert take_spool(spool) == [str(project / "a.py")]
+
+    def test_projects_have_separate_spools(self, tmp_path):
+        spool_dir = tmp_path / "spool"
+        assert spool_path(spool_dir, tmp_path / "a") != spool_path(
+            spool_dir, tmp_path / "b"
+        )
+
+    def test_lock_is_exclusive(self, tmp_path):
+        lock = tmp_path / "x.lock"
+        fd = try_lock(lock)
+
+        assert fd is not None
+        assert try_lock(lock) is None
+        unlock(fd)
+        fd = try_lock(lock)
+        assert fd is not None
+        unlock(fd)
+
+
+class TestFormatters:
+    def test_one_run_per_formatter(self, project, recorder):
+        formatters = [recorder("py", ["*.py"]), recorder("ts", ["*.ts", "*.tsx"])]
+        paths = [str(project / n) for n in ("a.py", "c.ts", "b.py", "gone.py")]
+
+        counts = run_formatters(paths, formatters, project)
+
+        assert counts == {"py": 2, "ts": 1}
+        assert recorder.calls() == [
+            [str(project / "a.py"), str(project / "b.py")],
+            [str(project / "c.ts")],
+        ]
+
+    def test_large_sets_are_chunked(self, project, recorder, monkeypatch):
+        monkeypatch.setattr(format_hook, "MAX_FILES_PER_RUN", 1)
+
+        run_formatters(
+            [str(project / "a.py"), str(project / "b.py")],
+            [recorder("py", ["*.py"])],
+            project,
+        )
+
+        assert len(recorder.calls()) == 2
+
+    def test_missing_program_is_skipped(self, project):
+        lines = []
+        formatter = {"command": ["no-such-formatter-xyz"], "patterns": ["*.py"]}
+
+        assert (
+            run_formatters([str(project / "a.py")], [formatter], project, lines.append)
+            == {}
+        )
+        assert "not found" in lines[0]
+
+    def test_shipped_config_is_valid(self):
+        config = load_config(CONFIG_PATH)
+        assert config["window_seconds"] > 0
+        assert {f["name"] for f in config["formatters"]} >= {"black", "prettier"}
+        # Opt-in: installing the hook must not reformat anyone's projects
+        assert not any(f.get("enabled", True) for f in config["formatters"])
+
+    def test_disabled_formatters_do_not_run(self, project, recorder):
+        formatter = {**recorder("py", ["*.py"]), "enabled": False}
+
+        assert run_formatters([str(project / "a.py")], [formatter], project) == {}
+        assert recorder.calls() == []
+
+    def test_invalid_config(self, tmp_path):
+        path = tmp_path / "formatters.json"
+        path.write_text(json.dumps({"formatters": [{"name": "x", "command": ["x"]}]}))
+        with pytest.raises(ValueError, match="patterns"):
+            load_config(path)
+        assert load_config(tmp_path / "missing.json") == {"formatters": []}
+
+
+class TestFlush:
+    def test_burst_is_formatted_once(self, tmp_path, project, recorder):
+        spool = spool_path(tmp_path / "spool", project)
+        config = {"formatters": [recorder("py", ["*.py"])]}
+        for _ in range(50):
+            enqueue(spool, ["a.py", "b.py"], project)
+
+        rounds = flush(spool, config, project, window=0.05)
+
+        assert rounds == [{"py": 2}]
+        assert len(recorder.calls()) == 1
+        assert spool.stat().st_size == 0
+
+    def test_waits_for_a_quiet_window(self, tmp_path, project, recorder):
+        spool = spool_path(tmp_path / "spool", project)
+        config = {"formatters": [recorder("py", ["*.py"])]}
+        enqueue(spool, ["a.py"], project)
+        waits = []
+
+        def sleep(seconds):
+            # An edit arrives at the end of the first wait
+            waits.append(seconds)
+            format_hook.time.sleep(seconds)
+            if len(waits) == 1:
+                enqueue(spool, ["b.py"], project)
+
+        rounds = flush(spool, config, project, window=0.05, sleep=sleep)
+
+        assert len(waits) >= 2
+        assert rounds == [{"py": 2}]
+
+    def test_edits_during_a_flush_get_another_round(
+        self, tmp_path, project, recorder, monkeypatch
+    ):
+        spool = spool_path(tmp_path / "spool", project)
+        enqueue(spool, ["a.py"], project)
+        formatters = [recorder("py", ["*.py"])]
+        original = format_hook.run_formatters
+
+        def run(paths, formatters, cwd, log):
+            if not recorder.calls():
+                enqueue(spool, ["b.py"], project)
+            return original(paths, formatters, cwd, log)
+
+        monkeypatch.setattr(format_hook, "run_formatters", run)
+        rounds = flush(spool, {"formatters": formatters}, project, window=0)
+
+        assert rounds == [{"py": 1}, {"py": 1}]
+        assert recorder.calls() == [[str(project / "a.py")], [str(project / "b.py")]]
+
+    def test_second_flusher_backs_off(self, tmp_path, project, recorder):
+        spool = spool_path(tmp_path / "spool", project)
+        enqueue(spool, ["a.py"], project)
+        fd = try_lock(spool.with_suffix(".lock"))
+        try:
+            rounds = flush(spool, {"formatters": [recorder("py", ["*.py"])]}, project)
+        finally:
+            unlock(fd)
+
+        assert rounds == []
+        assert spool.exists()
+
+
+def test_enqueue_command(tmp_path, project, monkeypatch):
+    """Test the hook entry point with the flusher launch stubbed out."""
+    started = []
+    monkeypatch.setattr(
+        format_hook,
+        "start_flusher",
+        lambda args, project_dir: started.append(project_dir),
+    )
+    payload = {"cwd": str(project), "tool_input": {"file_path": "a.py"}}
+    monkeypatch.setattr(sys, "stdin", io.StringIO(json.dumps(payload)))
+    monkeypatch.delenv("CLAUDE_PROJECT_DIR", raising=False)
+    spool_dir = tmp_path / "spool"
+
+    assert format_hook.main(["enqueue", "--spool-dir", str(spool_dir)]) == 0
+
+    assert started == [project]
+    assert take_spool(spool_path(spool_dir, project)) == [str(project / "a.py")]
+
+    monkeypatch.setattr(sys, "stdin", io.StringIO("not json"))
+    assert format_hook.main(["enqueue", "--spool-dir", str(spool_dir)]) == 0
+    assert started == [project]
+
+
+def test_flush_command(tmp_path, project, recorder):
+    spool_dir = tmp_path / "spool"
+    config = tmp_path / "formatters.json"
+    config.write_text(json.dumps({"formatters": [recorder("py", ["*.py"])]}))
+    enqueue(spool_path(spool_dir, project), ["a.py"], project)
+
+    args = ["flush", "--now", "--config", str(config), "--spool-dir", str(spool_dir)]
+    assert format_hook.main([*args, "--project-dir", str(project)]) == 0
+
+    assert recorder.calls() == [[str(project / "a.py")]]
+    log = spool_path(spool_dir, project).with_suffix(".log").read_text()
+    assert "flushed 1 path(s)" in log
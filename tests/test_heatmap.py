@@ -0,0 +1,166 @@
+"""Unit tests for the per-section token heatmap."""
+
+import json
+
+import pytest
+import yaml
+from build import AgentBuilder
+from heatmap import (
+    MarkedLoader,
+    heatmap_rows,
+    marked_lines,
+    section_tokens,
+    strip_markers,
+    treemap,
+)
+from jinja2 import DictLoader, Environment
+from log_sinks import QuietSink
+
+TEMPLATES = {
+    "agent": """---
+name: agent
+---
+
+Intro line.
+
+# Identity
+
+You are {{ role }}.
+
+{% if skills %}
+{% include 'skill' %}
+{% endif %}
+## Notes
+
+```bash
+# not a heading
+echo done
+```
+""",
+    "skill": "## Skill\n\none two three four five six\n",
+}
+
+
+def words(text):
+    return len(text.split())
+
+
+def render(templates, **context):
+    options = {
+        "trim_blocks": True,
+        "lstrip_blocks": True,
+        "keep_trailing_newline": True,
+    }
+    plain = Environment(loader=DictLoader(templates), **options)
+    marked = Environment(loader=MarkedLoader(plain.loader), **options)
+    return (
+        plain.get_template("agent").render(**context),
+        marked.get_template("agent").render(**context),
+    )
+
+
+class TestMarkers:
+    def test_stripped_render_is_unchanged(self):
+        plain, marked = render(TEMPLATES, role="a reviewer", skills=True)
+
+        assert marked != plain
+        assert strip_markers(marked) == plain
+
+    def test_marked_lines(self):
+        _, marked = render({"agent": "a{% include 'b' %}c\nd", "b": "x\ny"})
+
+        assert marked_lines(marked) == [
+            [("agent", "a"), ("b", "x")],
+            [("b", "y"), ("agent", "c")],
+            [("agent", "d")],
+        ]
+
+
+class TestSections:
+    """Test splitting and attribution."""
+
+    def test_sections_and_sources(self):
+        _, marked = render(TEMPLATES, role="a reviewer", skills=True)
+
+        sections = section_tokens(marked, words)
+
+        assert [(s["section"], s["level"]) for s in sections] == [
+            ("(frontmatter)", 0),
+            ("(preamble)", 0),
+            ("Identity", 1),
+            ("Skill", 2),
+            ("Notes", 2),
+        ]
+        by_name = {s["section"]: s for s in sections}
+        assert by_name["Skill"]["sources"] == {"skill": 8}
+        assert by_name["Identity"]["sources"] == {"agent": 6}
+        assert by_name["Notes"]["tokens"] == 10
+        assert by_name["Identity"]["line"] == 7
+
+    def test_conditional_includes(self):
+        _, marked = render(TEMPLATES, role="x", skills=False)
+        sections = section_tokens(marked, words)
+        assert "Skill" not in [s["section"] for s in sections]
+
+    def test_heading_shared_with_an_include(self):
+        templates = {
+            "agent": "# Protocol\n\nSee below.\n{% include 'skill' %}",
+            "skill": "Step one and two.\n",
+        }
+        _, marked = render(templates)
+
+        (section,) = section_tokens(marked, words)
+        assert section["sources"] == {"skill": 4, "agent": 4}
+        assert section["tokens"] == 8
+
+
+class TestReports:
+    @pytest.fixture
+    def agents(self):
+        return {
+            "b": [
+                {"section": "S", "line": 3, "tokens": 10, "sources": {"x": 6, "y": 4}}
+            ],
+            "a": [{"section": "T", "line": 1, "tokens": 30, "sources": {"z": 30}}],
+        }
+
+    def test_rows(self, agents):
+        rows = heatmap_rows(agents)
+
+        assert [(r["agent"], r["source"], r["tokens"]) for r in rows] == [
+            ("a", "z", 30),
+            ("b", "x", 6),
+            ("b", "y", 4),
+        ]
+        assert rows[1]["share"] == 0.6
+
+    def test_treemap(self, agents):
+        tree = treemap(agents)
+
+        assert tree["tokens"] == 40
+        assert [child["name"] for child in tree["children"]] == ["a", "b"]
+        section = tree["children"][1]["children"][0]
+        assert section["children"] == [
+            {"name": "x", "tokens": 6},
+            {"name": "y", "tokens": 4},
+        ]
+
+
+def test_build_writes_heatmap(temp_project_dir, valid_config, template_with_includes):
+    """Test that an enabled heatmap is written without changing the output."""
+    output = temp_project_dir / "dist" / "agents" / "include-agent.md"
+    AgentBuilder(root_dir=temp_project_dir, sink=QuietSink()).build_all()
+    plain = output.read_text()
+
+    valid_config["heatmap"] = {"enabled": True}
+    with open(temp_project_dir / "config" / "build_config.yml", "w") as f:
+        yaml.dump(valid_config, f)
+    builder = AgentBuilder(root_dir=temp_project_dir, sink=QuietSink())
+    assert builder.build_all() == 0
+
+    assert output.read_text() == plain
+    entry = builder.load_catalog()["include-agent"]
+    protocol = [s for s in entry["sections"] if s["section"] == "Cognitive Protocol"]
+    assert list(protocol[0]["sources"]) == ["skills/common/cognitive_protocol.md"]
+    tree = json.loads(builder.heatmap_path.read_text())
+    assert tree["children"][0]["name"] == "include-agent"
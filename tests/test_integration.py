@@ -1,11 +1,14 @@
 """Integration tests for the build system."""
 
+import json
 import sys
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
-from build import AgentBuilder
+from build import AgentBuilder, main
+from click.testing import CliRunner
+from log_sinks import JsonLinesSink, QuietSink
 
 
 class TestEndToEndBuild:
@@ -223,3 +226,131 @@ class TestCLIOptions:
 
         # Warnings should be shown (tested via logging output)
         assert builder.config["logging"]["show_warnings"] is True
+
+
+class TestMinifiedBuild:
+    """Test the opt-in minification stage of the build."""
+
+    def test_minify_disabled_by_default(
+        self, temp_project_dir, valid_config, template_with_includes
+    ):
+        """Test that output is unchanged unless minification is enabled."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.compile_template(template_with_includes)
+
+        assert builder.optimization == {}
+
+    def test_minify_reports_tokens_saved(
+        self, temp_project_dir, valid_config, skill_file
+    ):
+        """Test that duplicate includes are removed and savings recorded."""
+        template_path = temp_project_dir / "src" / "agents" / "dup-agent.md.j2"
+        template_path.write_text("""---
+name: dup-agent
+description: Agent including a skill twice
+tools: Read
+model: sonnet
+---
+
+{% include 'skills/common/cognitive_protocol.md' %}
+
+---
+
+{% include 'skills/common/cognitive_protocol.md' %}
+""")
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["optimize"] = {"minify": True, "min_duplicate_words": 3}
+        builder.build_all()
+
+        output = (temp_project_dir / "dist" / "agents" / "dup-agent.md").read_text()
+        entry = builder.load_catalog()["dup-agent"]
+        assert output.count("# Cognitive Protocol") == 1
+        assert entry["tokens_saved"] > 0
+        assert entry["tokens"] == builder.estimate_tokens(output)
+
+    def test_whitespace_savings_are_counted(self, temp_project_dir, valid_config):
+        """Test that collapsing whitespace alone reports tokens saved."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        rendered = "".join(
+            f"Step {i} uses   tools    carefully.   \n\n\n\n" for i in range(5)
+        )
+
+        optimized, report = builder.optimize_output(rendered)
+
+        assert builder.estimate_tokens(optimized) == builder.estimate_tokens(rendered)
+        assert report["bytes_saved"] > 0
+        assert report["tokens_saved"] > 0
+        assert (
+            report["tokens_saved"] == report["tokens_before"] - report["tokens_after"]
+        )
+
+
+class TestBuildLogging:
+    """Test log sinks and warning aggregation during builds."""
+
+    @pytest.fixture
+    def noisy_skill_agents(self, temp_project_dir, dangerous_commands_config):
+        """Create three agents that include the same dangerous skill."""
+        skill_path = temp_project_dir / "src" / "skills" / "common" / "cleanup.md"
+        skill_path.write_text("# Cleanup\n\n```bash\nrm -rf /tmp/cache\n```\n")
+        for name in ("alpha", "beta", "gamma"):
+            template_path = temp_project_dir / "src" / "agents" / f"{name}.md.j2"
+            template_path.write_text(f"""---
+name: {name}
+description: Agent {name}
+tools: Bash
+model: sonnet
+---
+
+{{% include 'skills/common/cleanup.md' %}}
+""")
+
+    def test_identical_warnings_are_aggregated(
+        self, temp_project_dir, valid_config, noisy_skill_agents, capsys
+    ):
+        """Test that a noisy shared skill is reported once."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all()
+
+        out = capsys.readouterr().out
+        assert out.count("CRITICAL") == 1
+        assert "in skills/common/cleanup.md" in out
+        assert "affecting 3 agent(s)" in out
+        assert builder.stats["warnings"] == 3
+
+    def test_quiet_sink_prints_only_summary(
+        self, temp_project_dir, valid_config, valid_template, capsys
+    ):
+        """Test that quiet mode hides per-agent lines."""
+        builder = AgentBuilder(root_dir=temp_project_dir, sink=QuietSink())
+        builder.build_all()
+
+        out = capsys.readouterr().out
+        assert "[OK] test-agent" not in out
+        assert "Success: 1" in out
+
+    def test_json_sink_records_agents(
+        self, temp_project_dir, valid_config, noisy_skill_agents, tmp_path
+    ):
+        """Test that JSON logs carry structured fields."""
+        log_path = tmp_path / "build.jsonl"
+        builder = AgentBuilder(
+            root_dir=temp_project_dir, sink=JsonLinesSink(path=str(log_path))
+        )
+        builder.build_all()
+
+        records = [json.loads(line) for line in log_path.read_text().splitlines()]
+        warning = next(r for r in records if r["level"] == "warning" and "agents" in r)
+        assert warning["agents"] == ["alpha", "beta", "gamma"]
+        assert {r.get("agent") for r in records} >= {"alpha", "beta", "gamma"}
+
+    def test_json_log_is_flushed_on_fatal_error(self, tmp_path):
+        """Test that records buffered before a fatal error reach the log file."""
+        log_path = tmp_path / "build.jsonl"
+        args = ["--log-file", str(log_path), "--max-growth", "a lot"]
+
+        result = CliRunner().invoke(main, args)
+
+        assert result.exit_code == 1
+        records = [json.loads(line) for line in log_path.read_text().splitlines()]
+        assert "Loaded configuration" in records[0]["message"]
@@ -0,0 +1,79 @@
+"""Unit tests for build log sinks."""
+
+import json
+
+import pytest
+from log_sinks import ConsoleSink, JsonLinesSink, QuietSink, make_record, make_sink
+
+
+class TestConsoleSink:
+    """Test colored console output."""
+
+    def test_console_filters_by_level(self, capsys):
+        """Test that records below the minimum level are dropped."""
+        sink = ConsoleSink(level="warning")
+        sink.emit(make_record("hidden", "info"))
+        sink.emit(make_record("shown", "error"))
+
+        out = capsys.readouterr().out
+        assert "hidden" not in out
+        assert "shown" in out
+
+    def test_quiet_sink_prints_summary_only(self, capsys):
+        """Test that quiet mode keeps only summary records."""
+        sink = QuietSink()
+        sink.emit(make_record("  [OK] agent", "success"))
+        sink.emit(make_record("  Total: 1", "info", summary=True))
+
+        out = capsys.readouterr().out
+        assert "[OK] agent" not in out
+        assert "Total: 1" in out
+
+
+class TestJsonLinesSink:
+    """Test buffered JSON-lines output."""
+
+    def test_buffers_until_flush(self, tmp_path):
+        """Test that nothing is written before flush."""
+        path = tmp_path / "build.jsonl"
+        sink = JsonLinesSink(path=str(path))
+        sink.emit(make_record("hello", "info", agent="a"))
+
+        assert not path.exists()
+
+        sink.flush()
+        record = json.loads(path.read_text().strip())
+        assert record["message"] == "hello"
+        assert record["agent"] == "a"
+        assert record["level"] == "info"
+
+    def test_flushes_when_buffer_full(self, tmp_path):
+        """Test that a full buffer is written as one batch."""
+        path = tmp_path / "build.jsonl"
+        sink = JsonLinesSink(path=str(path), buffer_size=2)
+        for i in range(3):
+            sink.emit(make_record(f"m{i}", "info"))
+
+        assert len(path.read_text().splitlines()) == 2
+        assert len(sink.buffer) == 1
+
+    def test_writes_to_stdout_without_path(self, capsys):
+        """Test JSON lines on stdout."""
+        sink = JsonLinesSink()
+        sink.emit(make_record("hello", "info"))
+        sink.flush()
+
+        assert json.loads(capsys.readouterr().out)["message"] == "hello"
+
+
+def test_make_sink_selects_implementation():
+    """Test sink selection from options."""
+    assert isinstance(make_sink("json"), JsonLinesSink)
+    assert isinstance(make_sink("text", quiet=True), QuietSink)
+    assert type(make_sink()) is ConsoleSink
+
+
+def test_log_file_needs_json_format(tmp_path):
+    """Test that a log file is not silently dropped by the text format."""
+    with pytest.raises(ValueError, match="json log format"):
+        make_sink("text", path=str(tmp_path / "build.log"))
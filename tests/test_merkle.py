@@ -0,0 +1,141 @@
+"""Unit tests for Merkle manifest verification."""
+
+import hashlib
+import json
+
+import merkle
+import pytest
+from build import verify
+from click.testing import CliRunner
+from merkle import (
+    MerkleTree,
+    directory_root,
+    hash_file,
+    load_manifest,
+    verify_install,
+)
+
+AGENTS = {f"agent-{i}.md": f"# Agent {i}\n\nBody {i}.\n" for i in range(7)}
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@pytest.fixture
+def install_dir(tmp_path):
+    directory = tmp_path / "agents"
+    directory.mkdir()
+    for name, text in AGENTS.items():
+        (directory / name).write_text(text)
+    return directory
+
+
+@pytest.fixture
+def manifest():
+    return {
+        name: {"sha256": sha256(text), "size": len(text)}
+        for name, text in AGENTS.items()
+    }
+
+
+class TestTree:
+    def test_root_is_order_independent(self):
+        digests = {name: sha256(text) for name, text in AGENTS.items()}
+        reversed_digests = dict(reversed(list(digests.items())))
+
+        tree = MerkleTree.from_digests(digests)
+        assert tree.root == MerkleTree.from_digests(reversed_digests).root
+        assert len(tree.levels) == 4
+        assert MerkleTree.from_digests({}).root == sha256("")
+
+    def test_diff_skips_equal_subtrees(self):
+        digests = {name: sha256(text) for name, text in AGENTS.items()}
+        tree = MerkleTree.from_digests(digests)
+
+        assert tree.diff(MerkleTree.from_digests(digests)) == ([], 1)
+        changed, compared = tree.diff(
+            MerkleTree.from_digests({**digests, "agent-2.md": sha256("edited")})
+        )
+        assert changed == ["agent-2.md"]
+        # Root, both children, then one path down
+        assert compared == 7
+
+    def test_hash_file(self, tmp_path):
+        empty = tmp_path / "empty.md"
+        empty.write_text("")
+        assert hash_file(empty) == sha256("")
+
+
+class TestVerify:
+    def test_matching_install(self, install_dir, manifest):
+        report = verify_install(manifest, install_dir)
+
+        assert report["ok"]
+        assert report["hashed"] == len(AGENTS)
+        assert report["compared"] == 1
+        assert report["installed_root"] == report["root"]
+        assert report["root"] == directory_root(install_dir)
+
+    def test_drift(self, install_dir, manifest):
+        (install_dir / "agent-1.md").write_text("# Agent 1\n\nBody X.\n")
+        (install_dir / "agent-3.md").write_text("longer than before")
+        (install_dir / "agent-5.md").unlink()
+        (install_dir / "local.md").write_text("mine")
+        (install_dir / "notes.txt").write_text("not an agent")
+
+        report = verify_install(manifest, install_dir, workers=1)
+
+        assert not report["ok"]
+        assert report["modified"] == ["agent-1.md", "agent-3.md"]
+        assert report["missing"] == ["agent-5.md"]
+        assert report["extra"] == ["local.md"]
+        # The resized file is not read
+        assert report["hashed"] == 5
+        assert report["installed_root"] is None
+
+    def test_fail_fast(self, install_dir, manifest):
+        (install_dir / "agent-0.md").write_text("# Agent 0\n\nBody X.\n")
+
+        report = verify_install(manifest, install_dir, workers=1, fail_fast=True)
+
+        assert report["modified"] == ["agent-0.md"]
+        assert report["hashed"] == 1
+        assert not report["complete"]
+
+    def test_parallel_hashing(self, monkeypatch, install_dir, manifest):
+        monkeypatch.setattr(merkle, "PARALLEL_MIN_BYTES", 0)
+        (install_dir / "agent-4.md").write_text("# Agent 4\n\nBody X.\n")
+
+        report = verify_install(manifest, install_dir, workers=4)
+        assert report["modified"] == ["agent-4.md"]
+        assert report["hashed"] == len(AGENTS)
+
+        report = verify_install(manifest, install_dir, workers=4, fail_fast=True)
+        assert report["modified"] == ["agent-4.md"]
+
+    def test_expected_root(self, install_dir, manifest):
+        with pytest.raises(ValueError, match="Merkle root"):
+            verify_install(manifest, install_dir, expected_root="00" * 32)
+
+
+def test_verify_command(tmp_path, install_dir, manifest):
+    """Test the CLI against a manifest in the evidence format."""
+    evidence = tmp_path / "evidence.json"
+    agents = [{"file": name, **entry} for name, entry in manifest.items()]
+    root = directory_root(install_dir)
+    evidence.write_text(
+        json.dumps({"artifacts": {"agents": agents, "merkle_root": root}})
+    )
+    assert load_manifest(evidence) == (manifest, root)
+    runner = CliRunner()
+
+    result = runner.invoke(verify, [str(install_dir), "--manifest", str(evidence)])
+    assert result.exit_code == 0, result.output
+
+    (install_dir / "local.md").write_text("mine")
+    args = [str(install_dir), "--manifest", str(evidence), "--json"]
+    result = runner.invoke(verify, args)
+    assert result.exit_code == 1
+    assert json.loads(result.output)["extra"] == ["local.md"]
+    assert runner.invoke(verify, [*args, "--allow-extra"]).exit_code == 0
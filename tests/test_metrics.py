@@ -0,0 +1,120 @@
+"""Unit tests for Prometheus build metrics."""
+
+import yaml
+from build import AgentBuilder
+from metrics import BuildMetrics, escape_label
+
+
+class TestBuildMetrics:
+    """Test the exposition format."""
+
+    def test_render_agent_series(self):
+        """Test per-agent gauges with labels and HELP/TYPE headers."""
+        metrics = BuildMetrics()
+        metrics.observe_agent("go-expert", "full", 0.25, 0.5, 1000, 2500)
+        text = metrics.render()
+
+        assert "# TYPE agent_build_tokens gauge" in text
+        assert 'agent_build_tokens{agent="go-expert",profile="full"} 1000' in text
+        assert (
+            'agent_build_token_budget_ratio{agent="go-expert",profile="full"} 0.4'
+            in text
+        )
+        assert (
+            'agent_build_render_seconds{agent="go-expert",profile="full"} 0.25' in text
+        )
+        assert not text.rstrip().endswith("# EOF")
+
+    def test_findings_and_cache_ratio(self):
+        """Test counters by category and severity and the hit ratio."""
+        metrics = BuildMetrics()
+        metrics.observe_findings(
+            [
+                {"category": "fork_bombs", "severity": "critical"},
+                {"category": "fork_bombs", "severity": "critical"},
+                {"category": "bash_syntax", "severity": "warning"},
+            ]
+        )
+        metrics.cache_hits, metrics.cache_misses = 3, 1
+        text = metrics.render(openmetrics=True)
+
+        assert (
+            'agent_build_validation_findings{category="fork_bombs",'
+            'severity="critical"} 2' in text
+        )
+        assert "agent_build_cache_hit_ratio 0.75" in text
+        assert text.endswith("# EOF\n")
+
+    def test_escape_label(self):
+        """Test escaping of quotes, backslashes and newlines."""
+        assert escape_label('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+    def test_write_is_atomic(self, tmp_path):
+        """Test that the textfile is written without leftovers."""
+        path = BuildMetrics().write(tmp_path / "textfile" / "build.prom")
+
+        assert path.read_text().startswith("# HELP agent_build_version")
+        assert [p.name for p in path.parent.iterdir()] == ["build.prom"]
+
+
+class TestBuildWithMetrics:
+    """Test metrics collected by a build."""
+
+    def test_build_writes_textfile(
+        self,
+        temp_project_dir,
+        valid_config,
+        template_with_dangerous_commands,
+        dangerous_commands_config,
+    ):
+        """Test that a configured build writes its snapshot."""
+        valid_config["metrics"] = {"textfile": "metrics/build.prom"}
+        with open(temp_project_dir / "config" / "build_config.yml", "w") as f:
+            yaml.dump(valid_config, f)
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.build_all()
+        text = (temp_project_dir / "metrics" / "build.prom").read_text()
+
+        assert 'agent_build_agents{status="success"} 1' in text
+        assert "agent_build_bash_subprocesses 0" in text
+        assert 'category="destructive_filesystem",severity="critical"' in text
+        assert 'agent_build_rule_seconds{rule="frontmatter"}' in text
+
+    def test_bash_backend_counts_subprocesses(
+        self, temp_project_dir, valid_config, template_with_bash_blocks
+    ):
+        """Test that bash -n invocations are counted."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["validation"]["bash_backend"] = "bash"
+        builder.build_all()
+
+        blocks = builder.extract_bash_blocks(
+            (temp_project_dir / "dist" / "agents" / "bash-agent.md").read_text()
+        )
+        assert builder.metrics.bash_subprocesses == len(blocks) > 0
+
+    def test_overlay_agents_are_labelled(
+        self, temp_project_dir, valid_config, valid_template
+    ):
+        """Test that overlay renders land in the same snapshot."""
+        team = temp_project_dir / "teams" / "payments" / "agents"
+        team.mkdir(parents=True)
+        (team / valid_template.name).write_text(
+            valid_template.read_text() + "\nPayments rules.\n"
+        )
+        valid_config["overlays"] = {"payments": {"roots": ["teams/payments"]}}
+        valid_config["metrics"] = {"textfile": "build.prom"}
+        with open(temp_project_dir / "config" / "build_config.yml", "w") as f:
+            yaml.dump(valid_config, f)
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        assert builder.build_all() == 0
+        text = (temp_project_dir / "build.prom").read_text()
+
+        assert 'agent_build_tokens{agent="test-agent",profile="full"}' in text
+        assert (
+            'agent_build_tokens{agent="test-agent",profile="full",'
+            'overlay="payments"}' in text
+        )
+        assert 'agent_build_agents{status="success"} 2' in text
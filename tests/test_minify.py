@@ -0,0 +1,97 @@
+"""Unit tests for the prompt minification pass."""
+
+import pytest
+from minify import minify_markdown, split_fences
+
+FRONTMATTER = """---
+name: test-agent
+description: >-
+  Folded   description
+  spanning lines
+tools: Read
+model: sonnet
+---
+
+"""
+
+
+class TestSplitFences:
+    """Test prose/code segmentation."""
+
+    def test_split_fences_separates_code(self):
+        """Test that fenced blocks become their own segments."""
+        segments = split_fences("text\n```bash\necho hi\n```\nmore")
+
+        assert [is_code for is_code, _ in segments] == [False, True, False]
+        assert segments[1][1] == ["```bash", "echo hi", "```"]
+
+    def test_split_fences_unclosed_fence_runs_to_end(self):
+        """Test that an unclosed fence is treated as code until the end."""
+        segments = split_fences("text\n~~~\ncode   \n")
+
+        assert segments[-1][0] is True
+
+
+class TestMinifyMarkdown:
+    """Test minify_markdown transformations."""
+
+    def test_frontmatter_is_preserved(self):
+        """Test that frontmatter is copied byte for byte."""
+        minified, _ = minify_markdown(FRONTMATTER + "# Title\n")
+
+        assert minified.startswith(FRONTMATTER)
+
+    def test_fenced_code_is_preserved(self):
+        """Test that whitespace inside code fences is untouched."""
+        code = "```bash\necho  'a'   \n\n\n---\n<!-- keep -->\n```\n"
+        minified, _ = minify_markdown(FRONTMATTER + "Intro\n\n" + code)
+
+        assert code in minified
+
+    def test_collapses_blank_lines_and_trailing_whitespace(self):
+        """Test whitespace collapsing outside code."""
+        minified, _ = minify_markdown(FRONTMATTER + "One   two  \n\n\n\nThree\n")
+
+        assert minified.endswith("One two\n\nThree\n")
+
+    def test_drops_comments_and_rules(self):
+        """Test removal of HTML comments and decorative rules."""
+        body = "Intro\n\n<!-- note\nacross lines -->\n\n---\n\n* * *\n\nEnd\n"
+        minified, stats = minify_markdown(FRONTMATTER + body)
+
+        assert minified.endswith("Intro\n\nEnd\n")
+        assert stats["comments"] == 1
+        assert stats["rules"] == 2
+
+    def test_keeps_setext_heading_underline(self):
+        """Test that a rule directly under text is kept as a heading."""
+        minified, stats = minify_markdown(FRONTMATTER + "Heading\n---\n")
+
+        assert "Heading\n---" in minified
+        assert stats["rules"] == 0
+
+    def test_normalizes_list_markers(self):
+        """Test that bullets become '- ' and ordered items lose extra spaces."""
+        minified, _ = minify_markdown(FRONTMATTER + "*   one\n+ two\n1.   three\n")
+
+        assert minified.endswith("- one\n- two\n1. three\n")
+
+    def test_drops_duplicate_include(self):
+        """Test that a skill rendered twice keeps only its first copy."""
+        skill = "## Skill\n\nAlways validate every input at every trust boundary.\n"
+        minified, stats = minify_markdown(
+            FRONTMATTER + skill + "\n## Other\n\n" + skill
+        )
+
+        assert minified.count("## Skill") == 1
+        assert "## Other" in minified
+        assert stats["duplicates"] == 2
+
+    @pytest.mark.parametrize("min_words", [8, 100])
+    def test_keeps_short_repeated_paragraphs(self, min_words):
+        """Test that repeated runs below the threshold are kept."""
+        body = "**Example:**\n\nfirst\n\n**Example:**\n\nsecond\n"
+        minified, stats = minify_markdown(FRONTMATTER + body, min_words)
+
+        assert minified.count("**Example:**") == 2
+        assert stats["duplicates"] == 0
@@ -0,0 +1,102 @@
+"""Unit tests for the indexed agent registry."""
+
+import json
+
+import pytest
+from build import AgentBuilder
+from registry import AgentRegistry, build_index, parse_tools
+
+
+@pytest.fixture
+def catalog_agents():
+    """Catalog entries for three agents."""
+
+    def entry(model, tools, includes, tokens, profile="full"):
+        return {
+            "frontmatter": {"model": model, "tools": tools},
+            "includes": includes,
+            "tokens": tokens,
+            "size": tokens * 5,
+            "sha256": f"{tokens:064x}",
+            "output": "agent.md",
+            "profile": profile,
+        }
+
+    return {
+        "go-expert": entry(
+            "sonnet", "Read, Bash", ["skills/common/cognitive_protocol.md"], 900
+        ),
+        "go-expert-lite": entry("haiku", "Read, Bash", [], 400, profile="lite"),
+        "reviewer": entry(
+            "haiku",
+            ["Read", "Grep"],
+            ["skills/security/input_validation.md"],
+            1200,
+        ),
+    }
+
+
+class TestRegistryIndex:
+    """Test index construction and queries."""
+
+    def test_parse_tools(self):
+        """Test that string and list tool declarations normalize."""
+        assert parse_tools("Read, Bash,Grep") == ["Bash", "Grep", "Read"]
+        assert parse_tools(["Read", " Bash "]) == ["Bash", "Read"]
+        assert parse_tools(None) == []
+
+    def test_index_is_inverted(self, catalog_agents):
+        """Test that postings map values to sorted agent ids."""
+        index = build_index(catalog_agents)
+
+        assert index["agents"] == ["go-expert", "go-expert-lite", "reviewer"]
+        assert index["tool"]["Bash"] == [0, 1]
+        assert index["model"]["haiku"] == [1, 2]
+        assert index["tokens"] == [900, 400, 1200]
+
+    def test_query_intersects_filters(self, catalog_agents):
+        """Test combined tool and model filters."""
+        registry = AgentRegistry(build_index(catalog_agents))
+
+        names = [r["name"] for r in registry.query(tool="Bash", model="haiku")]
+        assert names == ["go-expert-lite"]
+        assert registry.select(tool=["Read", "Grep"]) == [2]
+        assert registry.select(tool="bash", max_tokens=500) == [1]
+        assert registry.select(profile="full") == [0, 2]
+        assert registry.select(model="opus") == []
+
+    def test_include_by_file_name(self, catalog_agents):
+        """Test that includes match by path or by file name."""
+        registry = AgentRegistry(build_index(catalog_agents))
+
+        assert registry.select(include="input_validation.md") == [2]
+        assert registry.select(include="skills/common/cognitive_protocol.md") == [0]
+
+    def test_record_round_trip(self, catalog_agents):
+        """Test that records are reassembled from the index."""
+        registry = AgentRegistry(build_index(catalog_agents))
+        record = registry.get("reviewer")
+
+        assert record["model"] == "haiku"
+        assert record["tools"] == ["Grep", "Read"]
+        assert record["includes"] == ["skills/security/input_validation.md"]
+        assert record["tokens"] == 1200
+        assert registry.get("missing") is None
+        assert registry.values("model") == {"haiku": 2, "sonnet": 1}
+
+    def test_rejects_unknown_version(self):
+        """Test that incompatible indexes are refused."""
+        with pytest.raises(ValueError, match="Unsupported registry index"):
+            AgentRegistry({"version": 99})
+
+
+def test_build_writes_index(temp_project_dir, valid_config, template_with_includes):
+    """Test that the build writes a loadable index next to catalog.json."""
+    builder = AgentBuilder(root_dir=temp_project_dir)
+    builder.build_all()
+
+    registry = AgentRegistry.load(builder.index_path)
+    (record,) = registry.query(include="cognitive_protocol.md", model="sonnet")
+    catalog = json.loads(builder.catalog_path.read_text())["agents"]
+    assert record["name"] == "include-agent"
+    assert record["sha256"] == catalog["include-agent"]["sha256"]
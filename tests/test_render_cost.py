@@ -0,0 +1,172 @@
+"""Unit tests for static render-cost analysis."""
+
+import pytest
+import yaml
+from build import AgentBuilder
+from jinja2 import DictLoader, Environment, TemplateNotFound
+from log_sinks import QuietSink
+from render_cost import RenderCostAnalyzer, check_limits
+
+
+def analyzer(templates, context=None, loop_iterations=10):
+    return RenderCostAnalyzer(
+        Environment(loader=DictLoader(templates)), context, loop_iterations
+    )
+
+
+class TestAnalyzer:
+    """Test AST walking and size estimates."""
+
+    def test_static_text(self):
+        report = analyzer({"a": "one two three four {{ name }}"}).analyze("a")
+
+        assert report["tokens"] == int((4 + 2) * 1.3)
+        assert report["include_depth"] == 0
+        assert report["nodes"] == []
+
+    def test_context_values_are_counted(self):
+        templates = {"a": "{{ team }} {{ 'a b c' }}"}
+        report = analyzer(templates, {"team": "payments platform"}).analyze("a")
+        assert report["tokens"] == int(5 * 1.3)
+
+    def test_includes(self):
+        templates = {
+            "agent": "{% include 'a' %}{% include 'b' %}{% include 'a' %}",
+            "a": "alpha " * 10,
+            "b": "{% include 'c' %}",
+            "c": "{% include 'd' %}gamma",
+            "d": "delta",
+        }
+        report = analyzer(templates).analyze("agent")
+
+        assert report["include_depth"] == 3
+        assert report["fan_out"] == 3
+        assert report["include_count"] == 2
+        assert report["repeated_includes"] == {"a": 2}
+        assert report["tokens"] == int(22 * 1.3)
+        largest = report["nodes"][0]
+        assert (largest["kind"], largest["label"], largest["line"]) == (
+            "include",
+            "a",
+            1,
+        )
+        assert largest["tokens"] == 13
+
+    def test_loops(self):
+        templates = {
+            "agent": (
+                "{% for item in items %}{% for x in [1, 2, 3] %}"
+                "word {% endfor %}{% endfor %}"
+                "{% for row in rows %}{% include 'skill' %}{% endfor %}"
+            ),
+            "skill": "one two",
+        }
+        report = analyzer(templates, {"items": ["a", "b"]}, 4).analyze("agent")
+
+        assert report["loop_depth"] == 2
+        assert report["tokens"] == int((2 * 3 + 4 * 2) * 1.3)
+        loops = {n["label"]: n for n in report["nodes"] if n["kind"] == "for"}
+        assert loops["for ... in items"]["iterations"] == 2
+        assert loops["for ... in rows"]["iterations"] == 4
+        (include,) = [n for n in report["nodes"] if n["kind"] == "include"]
+        assert include["tokens"] == int(8 * 1.3)
+
+    def test_conditionals_count_largest_branch(self):
+        templates = {
+            "agent": (
+                "{% if x %}a{% elif y %}b c d{% else %}{% include 's' %}{% endif %}"
+            ),
+            "s": "one two",
+        }
+        assert analyzer(templates).analyze("agent")["tokens"] == int(3 * 1.3)
+
+    def test_exclusive_branches_count_one_include(self):
+        templates = {
+            "agent": (
+                "{% if lite %}{% include 's' %}{% else %}full "
+                "{% include 's' %}{% endif %}{% include 't' %}"
+                "{% if x %}{% include 't' %}{% endif %}"
+            ),
+            "s": "skill",
+            "t": "tool",
+        }
+        report = analyzer(templates).analyze("agent")
+
+        assert report["include_count"] == 2
+        assert report["repeated_includes"] == {"t": 2}
+        assert check_limits(report, {"max_include_count": 2}) == []
+
+    def test_unresolvable_includes(self):
+        templates = {
+            "agent": "{% include 'loop' %}{% include name %}{% include 'gone' %}",
+            "loop": "{% include 'agent' %}",
+        }
+        report = analyzer(templates).analyze("agent")
+
+        assert report["cycles"] == ["agent -> loop -> agent"]
+        assert report["dynamic_includes"] == 1
+        assert report["missing_includes"] == ["gone"]
+
+    def test_missing_template(self):
+        with pytest.raises(TemplateNotFound):
+            analyzer({}).analyze("agent")
+
+
+class TestLimits:
+    def test_check_limits(self):
+        templates = {
+            "agent": "{% for a in x %}{% for b in y %}{% include 's' %}"
+            "{% endfor %}{% endfor %}{% include 's' %}",
+            "s": "word",
+        }
+        report = analyzer(templates).analyze("agent")
+
+        assert check_limits(report, {}) == []
+        violations = check_limits(
+            report, {"max_loop_depth": 1, "max_include_count": 1, "max_fan_out": None}
+        )
+        assert violations == [
+            "Includes of one template 2 exceeds limit of 1",
+            "Loop nesting 2 exceeds limit of 1",
+        ]
+
+    def test_cycles_always_fail(self):
+        report = analyzer({"a": "{% include 'a' %}"}).analyze("a")
+        assert check_limits(report, {}) == ["Include cycle: a -> a"]
+
+
+class TestBuilderAnalysis:
+    """Test the analysis settings of a build."""
+
+    @pytest.fixture
+    def looping_template(self, temp_project_dir, valid_config):
+        valid_config["analysis"] = {"enforce": True, "max_loop_depth": 1}
+        with open(temp_project_dir / "config" / "build_config.yml", "w") as f:
+            yaml.dump(valid_config, f)
+        path = temp_project_dir / "src" / "agents" / "loop-agent.md.j2"
+        path.write_text(
+            "---\nname: loop-agent\ndescription: Loops\ntools: Read\n"
+            "model: sonnet\n---\n\n# Identity\n\n"
+            "{% for a in [1, 2] %}{% for b in [1, 2] %}x{% endfor %}{% endfor %}\n"
+        )
+        return path
+
+    def test_enforced_limits_fail_the_build(self, temp_project_dir, looping_template):
+        builder = AgentBuilder(root_dir=temp_project_dir, sink=QuietSink())
+
+        assert builder.build_all() == 1
+        assert not (temp_project_dir / "dist" / "agents" / "loop-agent.md").exists()
+        assert builder.check_source(looping_template) == [
+            "Render cost: Loop nesting 2 exceeds limit of 1"
+        ]
+
+    def test_report_without_enforce(
+        self, temp_project_dir, valid_config, looping_template
+    ):
+        builder = AgentBuilder(root_dir=temp_project_dir, sink=QuietSink())
+        builder.config["analysis"]["enforce"] = False
+
+        assert builder.check_source(looping_template) == []
+        report = builder.analyze_template(looping_template)
+        assert report["violations"] == ["Loop nesting 2 exceeds limit of 1"]
+        assert report["template"] == "agents/loop-agent.md.j2"
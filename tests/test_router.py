@@ -0,0 +1,161 @@
+"""Unit tests for the local task router."""
+
+import json
+
+import pytest
+from build import AgentBuilder
+from router import (
+    Router,
+    build_router_index,
+    evaluate,
+    extract_headings,
+    load_routing_dataset,
+    stem,
+    tokenize,
+)
+
+
+@pytest.fixture
+def catalog_agents():
+    """Catalog entries for three agents and one lite variant."""
+
+    def entry(description, headings, profile="full"):
+        return {
+            "frontmatter": {"description": description},
+            "headings": headings,
+            "profile": profile,
+        }
+
+    return {
+        "go-expert": entry(
+            "Go engineer for goroutines, channels and CLI tools",
+            ["Concurrency Patterns", "Error Handling"],
+        ),
+        "go-expert-lite": entry(
+            "Go engineer for goroutines, channels and CLI tools",
+            ["Concurrency Patterns"],
+            profile="lite",
+        ),
+        "postgres-dba": entry(
+            "PostgreSQL administrator; use for slow queries and EXPLAIN ANALYZE",
+            ["Query Tuning", "Indexing"],
+        ),
+        "python-architect": entry(
+            "Python refactoring, asyncio and performance optimization",
+            ["Async Patterns", "Testing"],
+        ),
+    }
+
+
+class TestTokenize:
+    def test_stem(self):
+        assert stem("caching") == stem("caches") == "cach"
+        assert stem("queries") == "query"
+        assert stem("class") == "class"
+        assert stem("go") == "go"
+
+    def test_tokenize(self):
+        assert tokenize("Tune the Postgres queries in my C# app") == [
+            "tun",
+            "postgresql",
+            "query",
+            "c#",
+            "app",
+        ]
+        assert tokenize("golang") == tokenize("Go")
+        assert tokenize("tuning") == tokenize("tune")
+
+    def test_extract_headings_skips_code(self):
+        content = (
+            "---\nname: a\n---\n\n# Identity\n\n```bash\n# not a heading\n```\n"
+            "\n## Error Handling\n"
+        )
+        assert extract_headings(content) == ["Identity", "Error Handling"]
+
+
+class TestRouter:
+    """Test index construction and ranking."""
+
+    def test_routes_to_best_agent(self, catalog_agents):
+        router = Router(build_router_index(catalog_agents))
+
+        best, *rest = router.route("my golang goroutines leak", profile="full")
+        assert best["agent"] == "go-expert"
+        assert best["description"].startswith("Go engineer")
+        assert rest == []
+        assert router.route("slow query, explain it")[0]["agent"] == "postgres-dba"
+
+    def test_headings_are_indexed(self, catalog_agents):
+        router = Router(build_router_index(catalog_agents))
+        assert router.route("add testing", profile="full")[0]["agent"] == (
+            "python-architect"
+        )
+
+    def test_profile_and_limit(self, catalog_agents):
+        router = Router(build_router_index(catalog_agents))
+
+        names = [m["agent"] for m in router.route("goroutines channels")]
+        assert sorted(names) == ["go-expert", "go-expert-lite"]
+        lite = router.route("goroutines", profile="lite")
+        assert [m["agent"] for m in lite] == ["go-expert-lite"]
+        assert len(router.route("go python postgresql", limit=2)) == 2
+
+    def test_no_match(self, catalog_agents):
+        router = Router(build_router_index(catalog_agents))
+        assert router.route("the and of") == []
+        assert router.route("kubernetes") == []
+
+    def test_index_roundtrip(self, catalog_agents, tmp_path):
+        path = tmp_path / "router.json"
+        path.write_text(json.dumps(build_router_index(catalog_agents)))
+        assert Router.load(path).route("asyncio")[0]["agent"] == "python-architect"
+
+    def test_rejects_other_versions(self, catalog_agents):
+        index = build_router_index(catalog_agents)
+        index["version"] = 0
+        with pytest.raises(ValueError, match="rebuild"):
+            Router(index)
+
+
+class TestEvaluate:
+    """Test scoring against labeled tasks."""
+
+    def test_metrics(self, catalog_agents, tmp_path):
+        dataset = tmp_path / "routing.jsonl"
+        rows = [
+            {"task": "goroutines leak", "agent": "go-expert"},
+            {"task": "slow query", "agents": ["postgres-dba", "python-architect"]},
+            {"task": "asyncio performance", "agent": "postgres-dba"},
+            {"task": "kubernetes", "agent": "go-expert"},
+        ]
+        dataset.write_text("\n".join(json.dumps(r) for r in rows) + "\n\n")
+        router = Router(build_router_index(catalog_agents))
+
+        result = evaluate(router, load_routing_dataset(dataset), 3, "full")
+
+        assert result["tasks"] == 4
+        assert result["accuracy"] == 0.5
+        assert result["recall"] == 0.5
+        assert result["mrr"] == 0.5
+        assert [m["task"] for m in result["misses"]] == [
+            "asyncio performance",
+            "kubernetes",
+        ]
+        assert result["max_ms"] >= result["mean_ms"] >= 0
+
+    def test_invalid_rows(self, tmp_path):
+        dataset = tmp_path / "routing.jsonl"
+        dataset.write_text('{"task": "x"}\n')
+        with pytest.raises(ValueError, match="routing.jsonl:1"):
+            load_routing_dataset(dataset)
+
+
+def test_build_writes_router_index(temp_project_dir, valid_config, valid_template):
+    """Test that the build writes a router index next to catalog.json."""
+    builder = AgentBuilder(root_dir=temp_project_dir)
+    builder.build_all()
+
+    entry = builder.load_catalog()["test-agent"]
+    assert entry["headings"] == ["Identity", "Instructions"]
+    (match,) = Router.load(builder.router_path).route("unit testing")
+    assert match["agent"] == "test-agent"
@@ -0,0 +1,269 @@
+"""Unit tests for batched llm-rubric grading."""
+
+import http.client
+import io
+import json
+import subprocess
+import sys
+import urllib.error
+
+import pytest
+import rubric_grading
+from click.testing import CliRunner
+from eval_cli import eval_grade
+from eval_shards import merge_results, write_shard
+from rubric_grading import (
+    INSTRUCTIONS,
+    METADATA_KEY,
+    AnthropicGrader,
+    BatchGrader,
+    CommandGrader,
+    GraderReplyError,
+    defer_rubrics,
+    grade_results,
+    pack_batches,
+    parse_verdicts,
+    stub_grader,
+)
+
+RUBRIC = {"type": "llm-rubric", "value": "Recommends parameterized queries"}
+
+
+def items_of(prompt):
+    return json.loads(prompt[len(INSTRUCTIONS) :])
+
+
+class FakeGrader:
+    """Passes every item; garbles replies to requests of more than max_items."""
+
+    def __init__(self, max_items=None):
+        self.max_items = max_items
+        self.requests = []
+
+    def __call__(self, prompt):
+        items = items_of(prompt)
+        self.requests.append(len(items))
+        if self.max_items is not None and len(items) > self.max_items:
+            return "Sorry, here are the verdicts: [{'id': 0"
+        verdicts = [{"id": i["id"], "pass": True, "reason": "ok"} for i in items]
+        return "```json\n" + json.dumps(verdicts) + "\n```"
+
+
+def make_items(count, size=10):
+    return [{"id": i, "rubric": "r" * size, "output": "o" * size} for i in range(count)]
+
+
+def make_result(output, rubrics, components=()):
+    return {
+        "response": {"output": output},
+        "success": True,
+        "score": 1.0,
+        "gradingResult": {
+            "pass": True,
+            "score": 1.0,
+            "reason": "ok",
+            "componentResults": list(components),
+        },
+        "testCase": {"metadata": {METADATA_KEY: rubrics}},
+    }
+
+
+class TestDefer:
+    def test_defer_rubrics(self):
+        row = {"assert": [{"type": "contains", "value": "x"}, RUBRIC]}
+
+        deferred = defer_rubrics(row)
+        assert deferred["assert"] == [{"type": "contains", "value": "x"}]
+        assert deferred["metadata"] == {METADATA_KEY: [RUBRIC]}
+        assert row["assert"][1] == RUBRIC
+        assert defer_rubrics({"assert": []}) == {"assert": []}
+
+    def test_write_shard_transform(self, tmp_path):
+        dataset = tmp_path / "a.jsonl"
+        dataset.write_text(json.dumps({"vars": {}, "assert": [RUBRIC]}) + "\n")
+
+        write_shard([dataset], tmp_path / "out.jsonl", (1, 1), defer_rubrics)
+        row = json.loads((tmp_path / "out.jsonl").read_text())
+        assert row["assert"] == []
+
+
+class TestVerdicts:
+    def test_parse(self):
+        reply = 'Verdicts:\n[{"id": 1, "pass": false, "score": 0.25, "reason": "no"}]'
+        assert parse_verdicts(reply, [1]) == {
+            1: {"pass": False, "score": 0.25, "reason": "no"}
+        }
+        assert parse_verdicts('[{"id": 0, "pass": true}]', [0])[0]["score"] == 1.0
+
+    @pytest.mark.parametrize(
+        "reply",
+        [
+            "no verdicts",
+            "[{'id': 0}]",
+            '[{"id": 0, "pass": true}, {"id": 0, "pass": true}]',
+            '[{"id": 0, "pass": true}, {"id": 7, "pass": true}]',
+            '[{"id": 0, "pass": "yes"}, {"id": 1, "pass": true}]',
+            '[{"id": 0, "pass": true, "score": 2}, {"id": 1, "pass": true}]',
+            '[{"id": 0, "pass": true}]',
+            '[{"id": [0], "pass": true}, {"id": 1, "pass": true}]',
+            '[{"id": true, "pass": true}, {"id": 1, "pass": true}]',
+        ],
+    )
+    def test_invalid_replies(self, reply):
+        with pytest.raises(GraderReplyError):
+            parse_verdicts(reply, [0, 1])
+
+    def test_pack_batches(self):
+        sizes = [len(b) for b in pack_batches(make_items(25), 10, 10_000)]
+        assert sizes == [10, 10, 5]
+        # 20 characters per item: 3 fit in 60
+        sizes = [len(b) for b in pack_batches(make_items(7), 10, 60)]
+        assert sizes == [3, 3, 1]
+        assert len(pack_batches(make_items(2, size=100), 10, 60)) == 2
+
+
+class TestBatchGrader:
+    def test_batches_cut_calls(self):
+        grader = FakeGrader()
+        batch_grader = BatchGrader(grader, batch_size=10, workers=3)
+
+        verdicts = batch_grader.grade(make_items(25))
+
+        assert sorted(verdicts) == list(range(25))
+        assert sorted(grader.requests) == [5, 10, 10]
+        assert batch_grader.stats["calls"] == 3
+
+    def test_fallback_to_single_items(self):
+        grader = FakeGrader(max_items=1)
+        batch_grader = BatchGrader(grader, batch_size=4)
+
+        verdicts = batch_grader.grade(make_items(4))
+
+        assert all(v["pass"] for v in verdicts.values())
+        assert grader.requests == [4, 1, 1, 1, 1]
+        assert batch_grader.stats["fallbacks"] == 1
+
+    def test_invalid_single_replies_fail_the_item(self):
+        batch_grader = BatchGrader(lambda prompt: "{}", batch_size=2)
+
+        verdicts = batch_grader.grade(make_items(2))
+
+        assert not verdicts[0]["pass"]
+        assert verdicts[0]["reason"].startswith("Grader reply could not be used")
+        assert batch_grader.stats["invalid"] == 2
+
+    def test_command_grader(self):
+        script = (
+            "import json, sys; items = json.loads(sys.stdin.read().split('Items:')[1]); "
+            "print(json.dumps([{'id': i['id'], 'pass': True} for i in items]))"
+        )
+        grader = CommandGrader(f'"{sys.executable}" -c "{script}"')
+        assert BatchGrader(grader).grade(make_items(3))[2]["pass"]
+
+    def test_transport_errors_are_retried(self):
+        grader, failures, waits = FakeGrader(), [429, 529], []
+
+        def flaky(prompt):
+            if failures:
+                code = failures.pop(0)
+                raise urllib.error.HTTPError("url", code, "busy", {}, None)
+            return grader(prompt)
+
+        batch_grader = BatchGrader(flaky, backoff=1.0, sleep=waits.append)
+        verdicts = batch_grader.grade(make_items(3))
+
+        assert all(v["pass"] for v in verdicts.values())
+        assert waits == [1.0, 2.0]
+        assert batch_grader.stats["retries"] == 2
+        assert batch_grader.stats["errors"] == 0
+
+    def test_failed_requests_fail_only_their_batch(self):
+        grader = FakeGrader()
+
+        def broken(prompt):
+            if items_of(prompt)[0]["id"] == 0:
+                raise subprocess.CalledProcessError(1, "grader")
+            return grader(prompt)
+
+        batch_grader = BatchGrader(
+            broken, batch_size=2, workers=2, retries=2, sleep=lambda seconds: None
+        )
+        verdicts = batch_grader.grade(make_items(4))
+
+        assert [verdicts[i]["pass"] for i in range(4)] == [False, False, True, True]
+        assert verdicts[0]["reason"].startswith("Grader request failed")
+        assert batch_grader.stats["errors"] == 1
+        assert batch_grader.stats["retries"] == 2
+
+    def test_anthropic_reply_errors_are_contained(self, monkeypatch):
+        bodies = [http.client.IncompleteRead(b"{"), b"<html>overloaded</html>"]
+
+        def urlopen(request, timeout):
+            body = bodies.pop(0) if bodies else b"<html>overloaded</html>"
+            if isinstance(body, Exception):
+                raise body
+            return io.BytesIO(body)
+
+        monkeypatch.setattr(rubric_grading.urllib.request, "urlopen", urlopen)
+        grader = AnthropicGrader(api_key="test")
+        batch_grader = BatchGrader(grader, sleep=lambda seconds: None)
+
+        verdicts = batch_grader.grade(make_items(1))
+
+        assert verdicts[0]["reason"].startswith("Grader reply could not be used")
+        assert batch_grader.stats["retries"] == 1
+
+    def test_client_errors_are_not_retried(self):
+        def unauthorized(prompt):
+            raise urllib.error.HTTPError("url", 401, "unauthorized", {}, None)
+
+        batch_grader = BatchGrader(unauthorized, sleep=lambda seconds: None)
+        verdicts = batch_grader.grade(make_items(1))
+
+        assert "401" in verdicts[0]["reason"]
+        assert batch_grader.stats["calls"] == 1
+
+
+class TestGradeResults:
+    def test_scores_are_recomputed(self):
+        weighted = {**RUBRIC, "weight": 3}
+        contains = {"pass": True, "score": 1.0, "assertion": {"type": "contains"}}
+        results = [
+            make_result("recommends parameterized queries", [weighted], [contains]),
+            make_result("string formatting", [RUBRIC]),
+            {"error": "API error", "testCase": {"metadata": {METADATA_KEY: [RUBRIC]}}},
+        ]
+
+        report = grade_results(results, BatchGrader(stub_grader))
+
+        assert report["items"] == 2
+        assert report["calls"] == 1
+        assert (report["passed"], report["failed"]) == (1, 1)
+        assert results[0]["success"] and results[0]["score"] == 1.0
+        assert not results[1]["success"]
+        assert results[1]["score"] == 0.0
+        assert "rubric terms" in results[1]["gradingResult"]["reason"]
+
+    def test_regrading_is_a_no_op(self):
+        results = [make_result("recommends parameterized queries", [RUBRIC])]
+        grade_results(results, BatchGrader(stub_grader))
+
+        assert grade_results(results, BatchGrader(stub_grader))["items"] == 0
+        assert len(results[0]["gradingResult"]["componentResults"]) == 1
+
+
+def test_eval_grade_command(tmp_path):
+    """Test grading a results file with the stub grader, then merging it."""
+    path = tmp_path / "results.json"
+    results = [
+        make_result("recommends parameterized queries", [RUBRIC]),
+        make_result("nothing", [RUBRIC]),
+    ]
+    path.write_text(json.dumps({"results": {"version": 3, "results": results}}))
+
+    result = CliRunner().invoke(eval_grade, [str(path), "--grader", "stub", "--json"])
+
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output)[str(path)]["calls"] == 1
+    merged = merge_results([path], threshold=0.9)
+    assert (merged["passed"], merged["failed"]) == (1, 1)
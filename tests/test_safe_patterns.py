@@ -0,0 +1,207 @@
+"""Unit tests for ReDoS-safe dangerous pattern loading."""
+
+import json
+import random
+import re
+from pathlib import Path
+
+import pytest
+from build import AgentBuilder
+from safe_patterns import (
+    SafePattern,
+    Watchdog,
+    analyze,
+    benchmark,
+    load_patterns,
+    sre_parse,
+    unparse,
+)
+
+SHIPPED_CONFIG = Path(__file__).parent.parent / "config" / "dangerous_commands.json"
+
+
+def shipped_patterns():
+    with open(SHIPPED_CONFIG) as f:
+        config = json.load(f)
+    return [p for c in config["categories"].values() for p in c.get("patterns", [])]
+
+
+def kinds(issues, fixed=None):
+    return {i["kind"] for i in issues if fixed is None or i["fixed"] == fixed}
+
+
+class TestAnalyze:
+    """Test static analysis and rewrites."""
+
+    def test_flattens_nested_quantifier(self):
+        assert analyze(r"(a+)+$")[0] == "a+$"
+        assert analyze(r"(x*)*y")[0] == "x*y"
+
+    def test_unflattenable_nesting_is_risky(self):
+        pattern, issues = analyze(r"(\w+\s?)+$")
+        assert pattern == r"(\w+\s?)+$"
+        assert kinds(issues, fixed=False) == {"nested_quantifier"}
+
+    def test_collapses_subsumed_repeat(self):
+        assert analyze(r"\d*\d+")[0] == r"\d+"
+        assert analyze(r"\w+\d+x")[0] == r"\w+\dx"
+
+    def test_rewrites_wildcard_chain(self):
+        """Test that each .* gap stops at the first following literal."""
+        pattern, issues = analyze(r"while\s+true.*do.*done.*&")
+        assert pattern == r"while\s+true(?:(?!do).)*do(?:(?!done).)*done(?:(?!\&).)*\&"
+        assert kinds(issues, fixed=True) == {"wildcard_chain"}
+
+    def test_breaks_overlapping_run(self):
+        """Test that \\s+.*\\s+ no longer backtracks polynomially."""
+        pattern, issues = analyze(r"service\s+.*\s+stop")
+        assert pattern != r"service\s+.*\s+stop"
+        assert not kinds(issues, fixed=False)
+
+    @pytest.mark.parametrize("pattern", [r"(a|a)*b", r"(a|ab)*c", r"(ab|a)+c"])
+    def test_overlapping_alternation_is_risky(self, pattern):
+        """Test branches that start alike after the parser factors them."""
+        assert kinds(analyze(pattern)[1], fixed=False) == {"ambiguous_alternation"}
+
+    @pytest.mark.parametrize("pattern", [r"(ab|ac)*d", r"(a|b)*c", r"(?:x(?:y|z))*"])
+    def test_distinct_alternation_is_safe(self, pattern):
+        assert analyze(pattern)[1] == []
+
+    def test_bounded_repeat_of_unbounded_repeat_is_risky(self):
+        issues = analyze(r"(.*a){20}")[1]
+        assert kinds(issues, fixed=False) == {"nested_quantifier"}
+        assert issues[0]["risk"] == "polynomial"
+        assert analyze(r"(\s*-\w+)?")[1] == []
+
+    def test_backreference_is_risky(self):
+        assert kinds(analyze(r"(a)\1+")[1]) == {"backreference"}
+
+    def test_safe_patterns_are_unchanged(self):
+        pattern, issues = analyze(r"rm\s+-rf\s+/")
+        assert pattern == r"rm\s+-rf\s+/" and issues == []
+
+    @pytest.mark.parametrize("pattern", shipped_patterns())
+    def test_unparse_round_trip(self, pattern):
+        parsed = list(sre_parse.parse(pattern))
+        assert repr(list(sre_parse.parse(unparse(parsed)))) == repr(parsed)
+
+    @pytest.mark.parametrize(
+        "pattern",
+        shipped_patterns() + [r"a.+b.+c", r"x.*ab.*ab", r"a\s*.*\s*b", r"\w+\d+"],
+    )
+    def test_rewrites_match_the_same_text(self, pattern):
+        """Fuzz the rewritten pattern against the original."""
+        rewritten, _ = analyze(pattern)
+        rng = random.Random(pattern)
+        pieces = re.findall(r"[a-z]+|[=:/|&@{}()-]", pattern)
+        pieces += [" ", "\t", "\n", "x", "1", ".", ":", "b"]
+        for _ in range(2000):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+            assert bool(re.search(pattern, text)) == bool(re.search(rewritten, text))
+            assert bool(re.match(pattern, text)) == bool(re.match(rewritten, text))
+
+
+class TestSafePattern:
+    """Test time budgets at match time."""
+
+    def test_overrun_moves_pattern_to_watchdog(self):
+        pattern = SafePattern(r"a.*b", budget_ms=0)
+        assert not pattern.guarded
+        assert pattern.search("xxa--b")
+        assert pattern.overruns == 1 and pattern.guarded
+
+    def test_watchdog_stops_catastrophic_match(self):
+        watchdog = Watchdog()
+        try:
+            pattern = SafePattern(r"(\w+\s?)+$", budget_ms=50, watchdog=watchdog)
+            assert pattern.risky and pattern.guarded
+            assert pattern.search("hello world") is True
+            assert pattern.search("a" * 40 + "!") is False
+            assert pattern.timeouts == 1
+            # The watchdog restarts after being killed
+            assert pattern.search("ok") is True
+        finally:
+            watchdog.close()
+
+    @pytest.mark.parametrize(
+        "source, text", [(r"(a|a)*b", "a" * 40), (r"(a|ab)*c", "ab" * 20000)]
+    )
+    def test_overlapping_alternation_runs_in_watchdog(self, source, text):
+        """Test that the first slow match is stopped, not waited out."""
+        watchdog = Watchdog()
+        try:
+            pattern = SafePattern(source, budget_ms=50, watchdog=watchdog)
+            assert pattern.guarded
+            assert pattern.search(text) is False
+            assert pattern.timeouts == 1
+        finally:
+            watchdog.close()
+
+
+class TestLoadPatterns:
+    """Test loading policies."""
+
+    CONFIG = {
+        "categories": {
+            "risky": {"patterns": [r"(\w+\s?)+$", r"rm\s+-rf", r"([a-z"]},
+        }
+    }
+
+    def test_rewrite_policy_keeps_risky_patterns(self):
+        patterns, rejected = load_patterns(self.CONFIG)
+        assert [p.source for p in patterns["risky"]] == [r"(\w+\s?)+$", r"rm\s+-rf"]
+        assert [p.source for p in rejected] == [r"([a-z"]
+
+    def test_reject_policy(self):
+        patterns, rejected = load_patterns(self.CONFIG, policy="reject")
+        assert [p.source for p in patterns["risky"]] == [r"rm\s+-rf"]
+        assert len(rejected) == 2
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            load_patterns(self.CONFIG, policy="maybe")
+
+
+class TestBuilderPatterns:
+    """Test the builder's use of loaded patterns."""
+
+    def test_rewritten_pattern_still_matches(self, temp_project_dir, valid_config):
+        config = {
+            "categories": {
+                "fork_bombs": {
+                    "severity": "critical",
+                    "patterns": [r"while\s+true.*do.*done.*&"],
+                }
+            }
+        }
+        path = temp_project_dir / "config" / "dangerous_commands.json"
+        path.write_text(json.dumps(config))
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        warnings = builder.check_dangerous_commands("while true; do :; done &")
+        assert [w["pattern"] for w in warnings] == [r"while\s+true.*do.*done.*&"]
+        assert builder.check_dangerous_commands("while true; do :; done") == []
+
+    def test_reject_policy_drops_pattern(self, temp_project_dir, valid_config):
+        config = {"categories": {"x": {"patterns": [r"(\w+\s?)+$"]}}}
+        path = temp_project_dir / "config" / "dangerous_commands.json"
+        path.write_text(json.dumps(config))
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["validation"]["pattern_safety"] = "reject"
+        assert builder.check_dangerous_commands("echo hi") == []
+        assert builder.dangerous_patterns() == {"x": []}
+
+
+def test_benchmark_reports_worst_case():
+    """Test that the fuzz benchmark catches a catastrophic pattern."""
+    rows = benchmark(
+        [("demo", r"while\s+true.*do.*done.*&"), ("safe", r"mkfs\.")],
+        size=600,
+        samples=2,
+        cap_ms=200,
+    )
+    by_pattern = {row["pattern"]: row for row in rows}
+    chain = by_pattern[r"while\s+true.*do.*done.*&"]
+    assert chain["rewritten"] and chain["original_ms"] > chain["effective_ms"]
+    assert by_pattern[r"mkfs\."]["rewritten"] is None
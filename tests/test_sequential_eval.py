@@ -0,0 +1,180 @@
+"""Unit tests for the sequential-testing eval mode."""
+
+import json
+import random
+import sys
+
+import pytest
+import yaml
+from click.testing import CliRunner
+from eval_cli import eval_sequential
+from sequential_eval import (
+    FAIL,
+    PASS,
+    UNDECIDED,
+    SequentialTest,
+    agent_name,
+    config_prompts,
+    outcomes_by_agent,
+    run_sequential,
+    wilson_interval,
+)
+
+TESTS_PER_ROUND = 5
+
+
+def write_round(path, prompts, rates, rng):
+    results = []
+    for prompt in prompts:
+        for _ in range(TESTS_PER_ROUND):
+            score = 1.0 if rng.random() < rates[agent_name(str(prompt))] else 0.0
+            results.append(
+                {
+                    "prompt": {"label": str(prompt)},
+                    "success": score == 1.0,
+                    "score": score,
+                }
+            )
+    path.write_text(json.dumps({"results": {"results": results}}))
+    return path
+
+
+def fake_runner(tmp_path, rates, seed=0):
+    rng = random.Random(seed)
+    calls = []
+
+    def run(round_number, prompts):
+        calls.append([agent_name(str(p)) for p in prompts])
+        path = tmp_path / f"round-{round_number}.json"
+        return write_round(path, prompts, rates, rng)
+
+    run.calls = calls
+    return run
+
+
+class TestStatistics:
+    def test_wilson_interval(self):
+        low, high = wilson_interval(9, 10)
+        assert (round(low, 3), round(high, 3)) == (0.596, 0.982)
+        assert wilson_interval(0, 0) == (0.0, 1.0)
+        assert wilson_interval(50, 50)[1] == 1.0
+
+    def test_sprt(self):
+        test = SequentialTest(0.9, delta=0.05)
+
+        assert test.decide(5, 5) == UNDECIDED
+        assert test.decide(27, 27) == PASS
+        assert test.decide(7, 10) == UNDECIDED
+        assert test.decide(6, 10) == FAIL
+        assert test.decide(0, 3) == FAIL
+
+    def test_wilson(self):
+        test = SequentialTest(0.5, method="wilson", min_trials=5)
+
+        assert test.decide(4, 4) == UNDECIDED
+        assert test.decide(20, 20) == PASS
+        assert test.decide(1, 20) == FAIL
+        assert test.decide(10, 20) == UNDECIDED
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"threshold": 1.0},
+            {"threshold": 0.9, "method": "bayes"},
+            {"threshold": 0.9, "delta": 0},
+        ],
+    )
+    def test_invalid_settings(self, kwargs):
+        with pytest.raises(ValueError):
+            SequentialTest(**kwargs)
+
+
+class TestRun:
+    def test_clear_agents_stop_early(self, tmp_path):
+        rates = {"good": 1.0, "bad": 0.3, "edge": 0.9}
+        prompts = {name: tmp_path / f"{name}.md" for name in rates}
+        runner = fake_runner(tmp_path, rates)
+
+        report = run_sequential(prompts, runner, SequentialTest(0.9), max_rounds=8)
+
+        agents = report["agents"]
+        assert agents["bad"]["decision"] == FAIL
+        assert agents["bad"]["rounds"] == 1
+        assert agents["good"]["decision"] == PASS
+        assert agents["good"]["rounds"] == 6
+        assert agents["good"]["interval"][1] == 1.0
+        assert not report["passed"]
+        assert runner.calls[1] == ["good", "edge"]
+        assert report["trials"] < report["fixed_trials"] == 3 * TESTS_PER_ROUND * 8
+
+    def test_undecided_agents_are_inconclusive(self, tmp_path):
+        rates = {"edge": 0.9}
+        runner = fake_runner(tmp_path, rates)
+
+        report = run_sequential(
+            {"edge": tmp_path / "edge.md"}, runner, SequentialTest(0.9), max_rounds=2
+        )
+
+        assert report["rounds"] == 2
+        assert report["agents"]["edge"]["inconclusive"]
+
+    def test_outcomes_by_agent(self, tmp_path):
+        path = tmp_path / "r.json"
+        path.write_text(
+            json.dumps(
+                [
+                    {"prompt": {"label": "file://../a/x.md"}, "score": 0.95},
+                    {"prompt": {"label": "../a/x.md: You are x"}, "score": 0.5},
+                ]
+            )
+        )
+        assert outcomes_by_agent(path, 0.9) == {"x": [True, False]}
+
+
+def test_eval_sequential_command(tmp_path):
+    """Test the CLI with a runner command standing in for Promptfoo."""
+    agents = tmp_path / "agents"
+    agents.mkdir()
+    for name in ("good", "bad"):
+        (agents / f"{name}.md").write_text(name)
+    config = tmp_path / "promptfoo.yaml"
+    config.write_text(
+        yaml.dump(
+            {
+                "prompts": [f"file://agents/{n}.md" for n in ("good", "bad")],
+                "defaultTest": {"threshold": 0.9},
+            }
+        )
+    )
+    assert list(config_prompts(yaml.safe_load(config.read_text()), config)) == [
+        "good",
+        "bad",
+    ]
+    script = tmp_path / "runner.py"
+    script.write_text(
+        "import json, sys\n"
+        "output, prompts = sys.argv[1], sys.argv[2:]\n"
+        "results = [{'prompt': {'label': p}, 'score': 1.0 if 'good' in p else 0.0}\n"
+        "           for p in prompts for _ in range(10)]\n"
+        "json.dump({'results': {'results': results}}, open(output, 'w'))\n"
+    )
+    args = [
+        "--config",
+        str(config),
+        "--output-dir",
+        str(tmp_path / "rounds"),
+        "--runner-command",
+        f'"{sys.executable}" {script} {{output}} {{prompts}}',
+        "--json",
+    ]
+
+    result = CliRunner().invoke(eval_sequential, args)
+
+    assert result.exit_code == 1
+    report = json.loads(result.output)
+    assert report["agents"]["bad"]["decision"] == FAIL
+    assert report["agents"]["good"]["decision"] == PASS
+    assert report["rounds"] == 3
+
+    result = CliRunner().invoke(eval_sequential, [*args, "--agent", "good"])
+    assert result.exit_code == 0, result.output
@@ -0,0 +1,101 @@
+"""Unit tests for the in-process shell parser."""
+
+import pytest
+from shell_parser import (
+    ShellSyntaxError,
+    matches_command_rule,
+    matches_pattern,
+    parse,
+    validate,
+)
+
+
+class TestSyntaxErrors:
+    """Test detection of code bash -n would reject."""
+
+    @pytest.mark.parametrize(
+        "code, message",
+        [
+            ("echo 'open", "unterminated single quote"),
+            ('echo "open', "unterminated double quote"),
+            ("echo $(ls", "unterminated command substitution"),
+            ("if true; then echo", "'if' opened on line 1 is never closed"),
+            ("for i in 1 2; do\n  echo $i\n", "'for' opened on line 1"),
+            ("case $x in a) echo;;", "'case' opened on line 1"),
+            ("cat <<EOF\nbody", "here-document delimited by 'EOF'"),
+            ("echo hi |", "unexpected end of input after '|'"),
+            ("done", "unexpected 'done'"),
+            ("echo a; ; echo b", "unexpected ';'"),
+            ("ls >", "missing target after '>'"),
+        ],
+    )
+    def test_invalid_code(self, code, message):
+        """Test that invalid code raises with a useful message."""
+        with pytest.raises(ShellSyntaxError, match=message):
+            parse(code)
+
+    @pytest.mark.parametrize(
+        "code",
+        [
+            "if [ -f a ]; then echo a; elif [ -f b ]; then echo b; else echo c; fi",
+            "for f in *.py\ndo\n  echo $f\ndone | sort",
+            'case "$1" in\n  start) run ;;\n  *) exit 1 ;;\nesac',
+            "cat <<-'EOF' > out\n\tif unbalanced (\n\tEOF\necho after",
+            "x=$(( (1+2)*3 )); ((x++)); arr=(a b c)",
+            "f() { echo hi; }; function g { f; }",
+            "diff <(sort a) <(sort b) 2>&1 | tee log &> /dev/null",
+            '[[ -f a && -n "$b" ]] && echo ok || exit 1',
+            "echo $'it\\'s' \"$(printf '%s)' x)\" `date`",
+        ],
+    )
+    def test_valid_code(self, code):
+        """Test that valid code parses."""
+        assert validate(code) == (True, "")
+
+    def test_error_reports_line(self):
+        """Test that errors carry the line they were found on."""
+        with pytest.raises(ShellSyntaxError) as info:
+            parse("echo ok\necho ok\necho 'open")
+
+        assert info.value.line == 3
+
+
+class TestCommandTree:
+    """Test the commands produced for rule matching."""
+
+    def test_program_flags_and_redirects(self):
+        """Test that a simple command is broken into its parts."""
+        (command,) = parse("sudo rm -rf --no-preserve-root /tmp/x > log 2>&1").commands
+
+        assert command.effective() == ("rm", ["-rf", "--no-preserve-root", "/tmp/x"])
+        assert command.flags == {"-r", "-f", "--no-preserve-root"}
+        assert command.positional == ["/tmp/x"]
+        assert command.redirects == [(">", "log"), (">&", "1")]
+
+    def test_pipelines_and_substitutions(self):
+        """Test pipeline grouping and commands nested in substitutions."""
+        script = parse("curl -s https://x | sh\necho $(whoami)")
+
+        assert [c.program for c in script.commands] == ["curl", "sh", "echo", "whoami"]
+        assert script.pipeline_texts()[0] == "curl -s https://x | sh"
+
+    def test_shell_c_strings_are_parsed(self):
+        """Test that code run through bash -c is matched as commands."""
+        programs = [c.program for c in parse("bash -c 'rm -rf /'").commands]
+
+        assert programs == ["bash", "rm"]
+
+    def test_masked_source_hides_data(self):
+        """Test that comments, quotes and heredoc bodies are blanked."""
+        script = parse("echo 'rm -rf /' # rm -rf /\ncat <<EOF\nrm -rf /\nEOF")
+
+        assert "rm" not in script.masked
+        assert not matches_pattern(script, r"rm\s+-rf\s+/")
+
+    def test_command_rule_matching(self):
+        """Test matching on program, flag alternatives and arguments."""
+        rule = {"program": "rm", "flags": ["-r|-R", "-f|--force"], "args": "^/$"}
+
+        assert matches_command_rule(parse("rm -R --force /").commands[0], rule)
+        assert not matches_command_rule(parse("rm -r /").commands[0], rule)
+        assert not matches_command_rule(parse("rm -rf ./build").commands[0], rule)
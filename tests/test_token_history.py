@@ -0,0 +1,126 @@
+"""Unit tests for per-agent token history and growth gates."""
+
+import json
+
+import pytest
+import yaml
+from build import AgentBuilder
+from token_history import TokenHistory, compare, parse_growth, record_key
+
+
+def sizes(**tokens):
+    return {
+        name: {"tokens": count, "size": count * 4} for name, count in tokens.items()
+    }
+
+
+class TestTokenHistory:
+    """Test the append-only store."""
+
+    def test_append_and_read(self, tmp_path):
+        """Test that records round-trip and partial lines are skipped."""
+        history = TokenHistory(tmp_path / "history" / "tokens.jsonl")
+        history.append(sizes(a=100), sha="aaa")
+        with open(history.path, "a") as f:
+            f.write('{"sha": "bbb", "agents": {"a"')
+        history.append(sizes(a=120), sha="ccc")
+
+        records = history.records()
+        assert [r["sha"] for r in records] == ["aaa", "ccc"]
+        assert records[1]["agents"]["a"] == {"tokens": 120, "size": 480}
+
+    def test_baseline_skips_current_commit(self, tmp_path):
+        """Test that rebuilds of one commit compare against the previous one."""
+        history = TokenHistory(tmp_path / "tokens.jsonl")
+        history.append(sizes(a=100, b=50), sha="aaa")
+        history.append(sizes(a=110), sha="bbb")
+        history.append(sizes(a=130), sha="ccc")
+
+        baseline = history.baseline("ccc")
+        assert baseline["sha"] == "bbb"
+        # Agents not rebuilt in bbb come from older records
+        assert baseline["agents"] == sizes(a=110, b=50)
+        assert history.baseline("ccc", ref="aa")["agents"]["a"]["tokens"] == 100
+        assert history.baseline("ccc-dirty")["sha"] == "ccc"
+        assert history.baseline("aaa", ref="zzz") is None
+
+    def test_trend_collapses_rebuilds(self, tmp_path):
+        """Test one point per commit, oldest first."""
+        history = TokenHistory(tmp_path / "tokens.jsonl")
+        history.append(sizes(a=100), sha="aaa")
+        history.append(sizes(a=105), sha="bbb")
+        history.append(sizes(a=104), sha="bbb")
+        history.append(sizes(a=120), sha="bbb", dirty=True)
+
+        trend = history.trend("a")
+        assert [(p["sha"], p["tokens"]) for p in trend] == [
+            ("aaa", 100),
+            ("bbb", 104),
+            ("bbb", 120),
+        ]
+        assert [p["tokens"] for p in history.trend("a", limit=2)] == [104, 120]
+        assert record_key(trend[-1]) == "bbb-dirty"
+
+
+class TestGrowthLimits:
+    """Test growth parsing and comparison."""
+
+    def test_parse_growth(self):
+        assert parse_growth("10%") == ("percent", 10.0)
+        assert parse_growth(200) == ("tokens", 200.0)
+        with pytest.raises(ValueError):
+            parse_growth("ten percent")
+        with pytest.raises(ValueError):
+            parse_growth("-5%")
+
+    def test_compare(self):
+        """Test deltas, ordering and both kinds of limit."""
+        current = sizes(a=115, b=90, c=300, new=10)
+        baseline = sizes(a=100, b=100, c=250)
+
+        rows = compare(current, baseline, parse_growth("16%"))
+        assert [row["agent"] for row in rows] == ["c", "a", "b"]
+        assert rows[0]["percent"] == 20.0
+        assert [row["exceeded"] for row in rows] == [True, False, False]
+
+        rows = compare(current, baseline, parse_growth(10))
+        assert {row["agent"] for row in rows if row["exceeded"]} == {"a", "c"}
+
+
+class TestBuildHistory:
+    """Test the growth gate in builds."""
+
+    @pytest.fixture
+    def history_config(self, temp_project_dir, valid_config, valid_template):
+        valid_config["history"] = {"enabled": True, "file": "history.jsonl"}
+        with open(temp_project_dir / "config" / "build_config.yml", "w") as f:
+            yaml.dump(valid_config, f)
+        return valid_config
+
+    def test_build_records_history(self, temp_project_dir, history_config):
+        """Test that each build appends its agents."""
+        AgentBuilder(root_dir=temp_project_dir).build_all()
+        AgentBuilder(root_dir=temp_project_dir).build_all()
+
+        lines = (temp_project_dir / "history.jsonl").read_text().splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[0])["agents"]["test-agent"]["tokens"] > 0
+
+    def test_max_growth_fails_build(self, temp_project_dir, history_config):
+        """Test that growth past the limit fails the build."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        assert builder.build_all() == 0
+        tokens = builder.catalog["test-agent"]["tokens"]
+
+        # An older commit where the agent was much smaller
+        TokenHistory(temp_project_dir / "history.jsonl").append(
+            sizes(**{"test-agent": tokens // 2}), sha="0123abc"
+        )
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["history"].update(max_growth="50%", baseline="0123")
+        assert builder.build_all() == 1
+
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        builder.config["history"].update(max_growth="150%", baseline="0123")
+        assert builder.build_all() == 0
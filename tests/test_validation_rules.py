@@ -0,0 +1,138 @@
+"""Unit tests for the validation rule registry."""
+
+from unittest.mock import patch
+
+import pytest
+from build import AgentBuilder
+from validation_rules import RuleRegistry, ValidationContext, default_registry
+
+VALID_FRONTMATTER = """---
+name: test
+description: Test
+tools: Bash
+model: sonnet
+---
+"""
+
+
+class TestRuleRegistry:
+    """Test rule ordering and short-circuiting."""
+
+    def test_rules_run_cheapest_first(self):
+        """Test that built-in rules are ordered by cost."""
+        names = [rule.name for rule in default_registry().ordered()]
+
+        assert names[0] == "frontmatter"
+        assert names.index("token_budget") < names.index("dangerous_commands")
+        assert names[-1] == "bash_syntax"
+
+    def test_dependencies_run_before_dependents(self):
+        """Test that a cheap rule waits for the rules it requires."""
+        registry = RuleRegistry()
+        registry.register("base", cost=50)(lambda ctx: None)
+        registry.register("cheap", cost=1, requires=["base"])(lambda ctx: None)
+
+        assert [rule.name for rule in registry.ordered()] == ["base", "cheap"]
+
+    def test_unknown_dependency_rejected(self):
+        """Test that a rule cannot require an unregistered rule."""
+        registry = RuleRegistry()
+        with pytest.raises(ValueError, match="unknown rule"):
+            registry.register("orphan", requires=["missing"])(lambda ctx: None)
+
+    def test_circular_requirements_rejected(self):
+        """Test that a requirement cycle is reported instead of scheduled."""
+        registry = RuleRegistry()
+        registry.register("a")(lambda ctx: None)
+        registry.register("b", requires=["a"])(lambda ctx: None)
+        registry.register("c", requires=["b"])(lambda ctx: None)
+        registry.register("a", requires=["c"])(lambda ctx: None)
+
+        with pytest.raises(ValueError, match="a -> c -> b -> a"):
+            registry.ordered()
+
+    def test_remove_drops_dependents(self):
+        """Test that removing a rule removes the rules that need it."""
+        registry = default_registry()
+        registry.remove("frontmatter")
+
+        assert registry.rules == {}
+
+    def test_failed_rule_skips_dependents(self, temp_project_dir, valid_config):
+        """Test that missing frontmatter skips every dependent rule."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        report = builder.inspect_output("# No frontmatter {{ x }}", "test.md")
+
+        assert len(report["errors"]) == 1
+        assert "token_budget" in report["skipped"]
+        assert list(report["timings"]) == ["frontmatter"]
+
+    def test_expensive_rules_skipped_after_error(self, temp_project_dir, valid_config):
+        """Test that bash checks are skipped once the agent is over budget."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+        content = VALID_FRONTMATTER + "word " * 3000 + "\n```bash\nrm -rf /\n```\n"
+
+        with patch.object(builder, "validate_bash_syntax") as validate_bash:
+            report = builder.inspect_output(content, "test.md")
+
+        validate_bash.assert_not_called()
+        assert any("exceeds limit" in e for e in report["errors"])
+        assert report["warnings"] == []
+        assert {"dangerous_commands", "bash_syntax"} <= set(report["skipped"])
+
+    def test_custom_rule_and_timings(self, temp_project_dir, valid_config):
+        """Test that added rules run and are timed across the build."""
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        @builder.rules.register("no_todo", cost=2, requires=["frontmatter"])
+        def no_todo(ctx: ValidationContext):
+            if "TODO" in ctx.content:
+                ctx.errors.append("Unfinished TODO in output")
+
+        report = builder.inspect_output(VALID_FRONTMATTER + "TODO\n", "test.md")
+
+        assert report["errors"] == ["Unfinished TODO in output"]
+        assert "no_todo" in report["timings"]
+        assert builder.rule_timings["no_todo"] >= 0
+
+
+class TestSourceValidation:
+    """Test frontmatter checks on template sources."""
+
+    def test_broken_source_rejected_before_render(self, temp_project_dir, valid_config):
+        """Test that an invalid model fails without rendering."""
+        template_path = temp_project_dir / "src" / "agents" / "broken.md.j2"
+        template_path.write_text(VALID_FRONTMATTER.replace("sonnet", "gpt-4"))
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        with patch.object(builder, "render_variant") as render:
+            success, _ = builder.compile_template(template_path)
+
+        render.assert_not_called()
+        assert success is False
+
+    def test_templated_frontmatter_checked_after_render(
+        self, temp_project_dir, valid_config
+    ):
+        """Test that Jinja2 in frontmatter defers checks to the output."""
+        template_path = temp_project_dir / "src" / "agents" / "dynamic.md.j2"
+        template_path.write_text(
+            VALID_FRONTMATTER.replace("model: sonnet", "model: {{ 'haiku' }}")
+        )
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        assert builder.check_source(template_path) == []
+        success, _ = builder.compile_template(template_path)
+        assert success is True
+
+    def test_leading_comment_checked_after_render(self, temp_project_dir, valid_config):
+        """Test that a template opening with a Jinja2 comment still builds."""
+        template_path = temp_project_dir / "src" / "agents" / "commented.md.j2"
+        template_path.write_text(
+            "{# Maintained by the platform team #}\n" + VALID_FRONTMATTER
+        )
+        builder = AgentBuilder(root_dir=temp_project_dir)
+
+        assert builder.check_source(template_path) == []
+        success, _ = builder.compile_template(template_path)
+        assert success is True